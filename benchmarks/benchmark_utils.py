@@ -0,0 +1,45 @@
+"""
+Helpers shared by the benchmarks. Named so as not to shadow the packages of the application, as the folder of the
+script being run comes first in `sys.path`.
+"""
+import random
+import subprocess
+
+PRODUCTS = ['Remedy', 'Helix ITSM', 'Digital Workplace', 'Discovery', 'Control-M', 'TrueSight', 'Innovation Suite']
+ACTIONS = ['submitting an incident', 'approving a change request', 'logging in with SSO', 'exporting a report',
+           'importing users', 'restarting the mid-tier', 'upgrading the server', 'attaching a file']
+SYMPTOMS = ['the request times out after 60 seconds', 'the page stays blank', 'an error message is displayed',
+            'the form does not load', 'the service stops responding', 'the user is redirected to the login page']
+CAUSES = ['A misconfigured {setting} setting in the {component} configuration.',
+          'The {component} cache holds stale entries after the upgrade to version {version}.',
+          'The certificate of the {component} server expired.',
+          'A filter on the {component} form locks the record during the update.']
+STEPS = ['Log in to the {component} as an administrator.', 'Open the {setting} configuration page.',
+         'Set {setting} to {value} and save the changes.', 'Restart the {component} service.',
+         'Clear the cache of the browser and sign in again.', 'Check the {component} logs for error {code}.',
+         'Run the health check from the administration console.', 'Contact support with the logs if it persists.']
+COMPONENTS = ['mid-tier', 'AR System server', 'email engine', 'approval server', 'Smart IT', 'REST API', 'database']
+SETTINGS = ['Max-Entries-Per-Query', 'Session-Timeout', 'Allowed-Origins', 'Thread-Count', 'Cache-Mode']
+
+
+def generate_article(rng: random.Random) -> str:
+    """ Returns a knowledge article like the RKM/HKM ones, generated from templates, without customer data. """
+    def fill(template: str) -> str:
+        return template.format(component=rng.choice(COMPONENTS), setting=rng.choice(SETTINGS),
+                               value=rng.randint(1, 5000), version=f'{rng.randint(19, 23)}.{rng.randint(1, 4)}',
+                               code=f'ARERR {rng.randint(1, 9999)}')
+
+    title = f"Error ARERR {rng.randint(1, 9999)} when {rng.choice(ACTIONS)} in {rng.choice(PRODUCTS)}"
+    problem = ' '.join(f"When {rng.choice(ACTIONS)}, {rng.choice(SYMPTOMS)}." for _ in range(rng.randint(1, 6)))
+    cause = ' '.join(fill(rng.choice(CAUSES)) for _ in range(rng.randint(1, 3)))
+    steps = '\n'.join(f"{number}. {fill(rng.choice(STEPS))}" for number in range(1, rng.randint(3, 15)))
+    return f"{title}\n\nProblem\n\n{problem}\n\nCause\n\n{cause}\n\nResolution\n\n{steps}\n"
+
+
+def get_commit() -> str | None:
+    """ Returns the commit the benchmark runs, to tell the results apart, `None` outside of a git checkout. """
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
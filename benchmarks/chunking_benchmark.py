@@ -0,0 +1,69 @@
+"""
+Compares the character splitter (500 characters overlapping by 100) with the token chunker on text files: time to
+chunk, including the tokenization the embedding needs, number of chunks, and how the chunks fill the model input.
+
+    PYTHONPATH=src python benchmarks/chunking_benchmark.py article1.txt article2.txt [--repeat 3] [--chunk-size 256]
+
+Only the tokenizer of the embedding model is loaded (`--model`).
+"""
+import argparse
+import statistics
+import time
+
+from langchain.schema import Document
+from transformers import AutoTokenizer
+
+from chunking.service import TokenChunker, generate_chunks
+from config import Settings
+
+
+def _best_time(repeat: int, function) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('text', nargs='+', help='paths of the text files to chunk')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per measure, the best one is reported')
+    parser.add_argument('--model', default='intfloat/multilingual-e5-base')
+    parser.add_argument('--max-seq-length', type=int, default=512, help='max number of tokens of the model input')
+    parser.add_argument('--chunk-size', type=int, default=Settings.CHUNK_SIZE_TOKENS)
+    parser.add_argument('--chunk-overlap', type=int, default=Settings.CHUNK_OVERLAP_TOKENS)
+    args = parser.parse_args()
+
+    documents = []
+    for path in args.text:
+        with open(path, encoding='utf-8', errors='replace') as file:
+            documents.append(Document(page_content=file.read(), metadata={'source': path}))
+
+    tokenizer = AutoTokenizer.from_pretrained(args.model)
+    token_chunker = TokenChunker(tokenizer, args.chunk_size, args.chunk_overlap, prefix=Settings.CHUNK_PREFIX)
+    max_token_count = args.max_seq_length - tokenizer.num_special_tokens_to_add(pair=False)
+
+    def split_in_characters():
+        chunks = generate_chunks(documents, 500, 100)
+        # the embedding tokenizes the chunks again
+        token_ids = tokenizer([Settings.CHUNK_PREFIX + chunk.page_content for chunk in chunks],
+                              add_special_tokens=False, verbose=False)['input_ids']
+        return token_ids
+
+    def split_in_tokens():
+        return [token_chunker.prefix_token_ids + chunk.token_ids for chunk in token_chunker.split_documents(documents)]
+
+    print(f"{'splitter':<12} {'seconds':>9} {'chunks':>7} {'tokens/chunk':>13} {'truncated':>10} {'< 25% full':>11}")
+    for name, split in [('characters', split_in_characters), ('tokens', split_in_tokens)]:
+        seconds = _best_time(args.repeat, split)
+        token_counts = [len(token_ids) for token_ids in split()]
+        truncated = sum(token_count > max_token_count for token_count in token_counts)
+        underfilled = sum(token_count < max_token_count / 4 for token_count in token_counts)
+        print(f"{name:<12} {seconds:>9.3f} {len(token_counts):>7} {statistics.mean(token_counts or [0]):>13.1f}"
+              f" {truncated:>10} {underfilled:>11}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+Compares the embedding backends on texts: throughput, and parity of the vectors with the ones of the torch backend
+(cosine similarity, 1.0 being identical).
+
+    PYTHONPATH=src python benchmarks/embedding_backends.py chunks.txt [--threads 4] [--repeat 3] [--limit 512]
+
+The texts are the lines of the files, prefixed with `Settings.CHUNK_PREFIX`. The ONNX models are exported to
+`Settings.EMBEDDING_ONNX_DIR` on first run, which isn't measured.
+"""
+import argparse
+import resource
+import time
+
+import numpy as np
+
+from config import Settings
+from embeddings.backends import OnnxBackend, SentenceTransformerBackend
+
+BACKENDS = {
+    'torch': lambda threads: SentenceTransformerBackend(Settings.EMBEDDING_MODEL, threads),
+    'onnx': lambda threads: OnnxBackend(Settings.EMBEDDING_MODEL, threads),
+    'onnx-int8': lambda threads: OnnxBackend(Settings.EMBEDDING_MODEL, threads, quantize=True),
+}
+
+
+def _best_time(repeat: int, function) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def _max_rss_mib() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('text', nargs='+', help='paths of the text files, one text per line')
+    parser.add_argument('--backends', nargs='+', default=list(BACKENDS), choices=list(BACKENDS))
+    parser.add_argument('--threads', type=int, default=Settings.EMBEDDING_THREADS)
+    parser.add_argument('--repeat', type=int, default=3, help='runs per measure, the best one is reported')
+    parser.add_argument('--limit', type=int, default=512, help='max number of texts')
+    args = parser.parse_args()
+
+    texts = []
+    for path in args.text:
+        with open(path, encoding='utf-8', errors='replace') as file:
+            texts.extend(Settings.CHUNK_PREFIX + line.strip() for line in file if line.strip())
+    texts = texts[:args.limit]
+
+    reference = None
+    print(f"{len(texts)} texts, {args.threads or 'all'} threads")
+    print(f"{'backend':<10} {'texts/s':>9} {'min cosine':>11} {'mean cosine':>12} {'max RSS (MiB)':>14}")
+    for name in args.backends:
+        backend = BACKENDS[name](args.threads)
+        embeddings = np.array(backend.embed_texts(texts))
+        seconds = _best_time(args.repeat, lambda backend=backend: backend.embed_texts(texts))
+        if reference is None:
+            reference = embeddings
+        # the vectors are normalized: their dot product is their cosine similarity
+        similarities = (embeddings * reference).sum(axis=1)
+        # the max RSS only grows: it is the one of the backends measured so far
+        print(f"{name:<10} {len(texts) / seconds:>9.1f} {similarities.min():>11.4f} {similarities.mean():>12.4f}"
+              f" {_max_rss_mib():>14.0f}")
+        del backend
+
+
+if __name__ == '__main__':
+    main()
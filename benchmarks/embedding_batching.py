@@ -0,0 +1,69 @@
+"""
+Compares the batching of the texts to embed: fixed batches of 32 texts, as by `SentenceTransformer.encode()`, and
+batches within token budgets (see `embeddings.backends.plan_batches()`). Reports the throughput, the number of
+batches and the share of padding tokens.
+
+    PYTHONPATH=src python benchmarks/embedding_batching.py chunks.txt [--backend onnx] [--budgets 4096 8192 16384]
+
+The texts are the lines of the files, prefixed with `Settings.CHUNK_PREFIX`, and should be sampled from the chunks of
+the datasources for the figures to be meaningful.
+"""
+import argparse
+import time
+
+from config import Settings
+from embeddings.backends import create_embedding_backend, plan_batches
+
+FIXED_BATCH_SIZE = 32
+
+
+def _best_time(repeat: int, function) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('text', nargs='+', help='paths of the text files, one text per line')
+    parser.add_argument('--backend', default=Settings.EMBEDDING_BACKEND)
+    parser.add_argument('--budgets', type=int, nargs='+', default=[4096, 8192, 16384], help='tokens per batch')
+    parser.add_argument('--max-batch-size', type=int, default=Settings.EMBEDDING_MAX_BATCH_SIZE)
+    parser.add_argument('--repeat', type=int, default=3, help='runs per measure, the best one is reported')
+    parser.add_argument('--limit', type=int, default=1024, help='max number of texts')
+    args = parser.parse_args()
+
+    texts = []
+    for path in args.text:
+        with open(path, encoding='utf-8', errors='replace') as file:
+            texts.extend(Settings.CHUNK_PREFIX + line.strip() for line in file if line.strip())
+    texts = texts[:args.limit]
+
+    backend = create_embedding_backend(args.backend)
+    special_token_count = backend.tokenizer.num_special_tokens_to_add(pair=False)
+    token_ids = backend.tokenizer(texts, add_special_tokens=False, truncation=True,
+                                  max_length=backend.max_token_count, verbose=False)['input_ids']
+    lengths = [len(ids) + special_token_count for ids in token_ids]
+
+    # (budget, max batch size): the fixed batches are sorted by length too, but not limited in tokens
+    configurations = [('fixed', len(texts) * backend.max_seq_length, FIXED_BATCH_SIZE)]
+    configurations += [(str(budget), budget, args.max_batch_size) for budget in args.budgets]
+    print(f"{len(texts)} texts, {sum(lengths)} tokens, {args.backend} backend")
+    print(f"{'budget':<8} {'batches':>8} {'padding':>8} {'texts/s':>9} {'tokens/s':>9}")
+    for name, budget, max_batch_size in configurations:
+        batches = plan_batches(lengths, budget, max_batch_size)
+        padded_token_count = sum(len(batch) * lengths[batch[0]] for batch in batches)
+        Settings.EMBEDDING_BATCH_TOKEN_BUDGET = budget
+        Settings.EMBEDDING_MAX_BATCH_SIZE = max_batch_size
+        backend.embed_token_ids(token_ids)  # warm-up
+        seconds = _best_time(args.repeat, lambda: backend.embed_token_ids(token_ids))
+        padding = 1 - sum(lengths) / padded_token_count
+        print(f"{name:<8} {len(batches):>8} {padding:>8.1%} {len(texts) / seconds:>9.1f}"
+              f" {sum(lengths) / seconds:>9.0f}")
+
+
+if __name__ == '__main__':
+    main()
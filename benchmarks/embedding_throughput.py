@@ -0,0 +1,172 @@
+"""
+Measures the throughput of the embedding backends over a grid of thread counts, batch sizes and max sequence
+lengths, and writes the results as JSON, to be compared across commits:
+
+    PYTHONPATH=src python benchmarks/embedding_throughput.py --backends torch onnx --threads 1 4 \\
+        --batch-sizes 16 64 --seq-lengths 128 512 --corpus kb --output results.json [--compare baseline.json]
+
+Each configuration runs in a new process, for its peak RSS to be its own. The corpora are:
+
+- `synthetic`: texts of exactly the max sequence length, made of random tokens, the worst case;
+- `kb`: knowledge articles like the RKM/HKM ones (generated from templates, without customer data), chunked by the
+  token chunker, whose chunk lengths are the ones of the actual indexing;
+- text files (`--text`), one text per line, e.g., redacted exports of articles.
+
+The texts are prefixed with `Settings.CHUNK_PREFIX`. Reported: chunks per second (best of `--repeat` runs), p50
+and p99 latencies of the batches, and peak RSS.
+"""
+import argparse
+import itertools
+import json
+import multiprocessing
+import platform
+import random
+import resource
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from benchmark_utils import generate_article, get_commit
+from config import Settings
+
+def _load_corpus(corpus: str, paths, tokenizer, seq_length: int, count: int):
+    """ Returns the token ids of the texts of the corpus, without the special tokens. """
+    max_token_count = seq_length - tokenizer.num_special_tokens_to_add(pair=False)
+    prefix_token_ids = tokenizer(Settings.CHUNK_PREFIX.rstrip(), add_special_tokens=False)['input_ids'] \
+        if Settings.CHUNK_PREFIX.strip() else []
+    if corpus == 'synthetic':
+        rng = np.random.default_rng(seed=1)
+        return [rng.integers(1000, tokenizer.vocab_size, size=max_token_count).tolist() for _ in range(count)]
+    if corpus == 'kb':
+        from chunking.service import TokenChunker
+        from langchain.schema import Document
+        rng = random.Random(1)
+        chunker = TokenChunker(tokenizer, min(Settings.CHUNK_SIZE_TOKENS, max_token_count - len(prefix_token_ids)),
+                               Settings.CHUNK_OVERLAP_TOKENS, prefix=Settings.CHUNK_PREFIX)
+        token_ids = []
+        while len(token_ids) < count:
+            chunks = chunker.split_documents([Document(page_content=generate_article(rng))])
+            token_ids.extend(prefix_token_ids + chunk.token_ids for chunk in chunks)
+        return token_ids[:count]
+
+    texts = []
+    for path in paths:
+        with open(path, encoding='utf-8', errors='replace') as file:
+            texts.extend(Settings.CHUNK_PREFIX + line.strip() for line in file if line.strip())
+    return tokenizer(texts[:count], add_special_tokens=False, truncation=True, max_length=max_token_count,
+                     verbose=False)['input_ids']
+
+
+def _run_configuration(configuration: dict, args, results):
+    from embeddings.backends import OnnxBackend, create_embedding_backend
+
+    Settings.EMBEDDING_THREADS = configuration['threads']
+    Settings.EMBEDDING_MAX_SEQ_LENGTH = configuration['seq_length']
+    Settings.EMBEDDING_MAX_BATCH_SIZE = configuration['batch_size']
+    # the batches are limited by their number of texts, unless a token budget is specified
+    Settings.EMBEDDING_BATCH_TOKEN_BUDGET = args.token_budget or configuration['batch_size'] * configuration[
+        'seq_length']
+    backend_name = configuration['backend']
+    Settings.EMBEDDING_ONNX_QUANTIZE = backend_name == 'onnx-int8'
+    backend = create_embedding_backend(OnnxBackend.name if backend_name == 'onnx-int8' else backend_name)
+    token_ids = _load_corpus(args.corpus, args.text, backend.tokenizer,
+                             min(configuration['seq_length'], backend.max_seq_length), args.count)
+
+    latencies = []
+    embed_batch = backend.embed_batch
+
+    def timed_embed_batch(input_ids, attention_mask):
+        start = time.perf_counter()
+        embeddings = embed_batch(input_ids, attention_mask)
+        latencies.append(time.perf_counter() - start)
+        return embeddings
+
+    backend.embed_batch = timed_embed_batch
+    backend.embed_token_ids(token_ids[:configuration['batch_size']])  # warm-up
+    latencies.clear()
+    timings = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        backend.embed_token_ids(token_ids)
+        timings.append(time.perf_counter() - start)
+
+    results.put(dict(
+        configuration,
+        chunks=len(token_ids),
+        mean_tokens=float(np.mean([len(ids) for ids in token_ids])),
+        chunks_per_second=len(token_ids) / min(timings),
+        p50_batch_seconds=float(np.percentile(latencies, 50)),
+        p99_batch_seconds=float(np.percentile(latencies, 99)),
+        peak_rss_mib=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    ))
+
+
+def _configuration_key(result: dict) -> tuple:
+    return result['backend'], result['threads'], result['batch_size'], result['seq_length']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backends', nargs='+', default=[Settings.EMBEDDING_BACKEND],
+                        choices=['torch', 'onnx', 'onnx-int8'])
+    parser.add_argument('--threads', type=int, nargs='+', default=[Settings.EMBEDDING_THREADS])
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[Settings.EMBEDDING_MAX_BATCH_SIZE])
+    parser.add_argument('--seq-lengths', type=int, nargs='+', default=[Settings.EMBEDDING_MAX_SEQ_LENGTH])
+    parser.add_argument('--token-budget', type=int, help='tokens per batch, batch size × sequence length by default')
+    parser.add_argument('--corpus', default='kb', choices=['synthetic', 'kb', 'files'])
+    parser.add_argument('--text', nargs='*', default=[], help='paths of the text files of the `files` corpus')
+    parser.add_argument('--count', type=int, default=512, help='number of texts')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per measure, the best one is reported')
+    parser.add_argument('--output', help='path of the JSON results')
+    parser.add_argument('--compare', help='path of JSON results to compare with e.g., of the previous commit')
+    args = parser.parse_args()
+    if args.corpus == 'files' and not args.text:
+        parser.error('--text is required by the `files` corpus')
+
+    context = multiprocessing.get_context('spawn')
+    results = []
+    print(f"{args.corpus} corpus, {args.count} texts")
+    print(f"{'backend':<10} {'threads':>7} {'batch':>6} {'seq len':>7} {'chunks/s':>9} {'p50 (ms)':>9}"
+          f" {'p99 (ms)':>9} {'peak RSS (MiB)':>15}")
+    for backend, threads, batch_size, seq_length in itertools.product(args.backends, args.threads, args.batch_sizes,
+                                                                     args.seq_lengths):
+        configuration = {'backend': backend, 'threads': threads, 'batch_size': batch_size, 'seq_length': seq_length}
+        queue = context.Queue()
+        process = context.Process(target=_run_configuration, args=(configuration, args, queue))
+        process.start()
+        process.join()
+        if process.exitcode:
+            print(f"{backend:<10} {threads:>7} {batch_size:>6} {seq_length:>7} failed ({process.exitcode})")
+            continue
+        result = queue.get()
+        results.append(result)
+        print(f"{backend:<10} {threads:>7} {batch_size:>6} {seq_length:>7} {result['chunks_per_second']:>9.1f}"
+              f" {result['p50_batch_seconds'] * 1000:>9.1f} {result['p99_batch_seconds'] * 1000:>9.1f}"
+              f" {result['peak_rss_mib']:>15.0f}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as file:
+            baseline = {_configuration_key(result): result for result in json.load(file)['results']}
+        print(f"\nchunks/s compared with {args.compare}:")
+        for result in results:
+            if previous := baseline.get(_configuration_key(result)):
+                change = result['chunks_per_second'] / previous['chunks_per_second'] - 1
+                print(f"{' '.join(map(str, _configuration_key(result))):<30} {change:>+8.1%}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump({
+                'commit': get_commit(),
+                'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                'machine': {'platform': platform.platform(), 'processor': platform.processor(),
+                            'cpus': multiprocessing.cpu_count(), 'python': platform.python_version()},
+                'model': Settings.EMBEDDING_MODEL,
+                'corpus': args.corpus,
+                'count': args.count,
+                'results': results,
+            }, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
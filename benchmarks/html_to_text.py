@@ -0,0 +1,70 @@
+"""
+Compares the HTML to text converters of `clean_text()` on HTML files, e.g. exported knowledge articles, and checks
+that they produce the same words as html2text, the reference.
+
+    PYTHONPATH=src python benchmarks/html_to_text.py article1.html article2.html [--repeat 3] [--fields 5]
+
+Each file is also split into `--fields` parts cleaned with one `clean_texts()` call, the way the loaders clean the
+fields of an article.
+"""
+import argparse
+import re
+import time
+
+from config import Settings
+from utils.html_utils import HTML_TO_TEXT_CONVERTERS, Html2textConverter, LxmlHtmlToTextConverter
+from utils.text_utils import clean_text, clean_texts, normalize_unicode
+
+
+def _best_time(repeat: int, function) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def _words(text: str):
+    return re.findall(r'\w+', text.replace('\\', ''))
+
+
+def _split(html: str, parts: int):
+    size = max(1, len(html) // parts)
+    return [html[start:start + size] for start in range(0, len(html), size)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('html', nargs='+', help='paths of the HTML files to convert')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per measure, the best one is reported')
+    parser.add_argument('--fields', type=int, default=5, help='number of fields each file is split into')
+    args = parser.parse_args()
+
+    htmls = []
+    for path in args.html:
+        with open(path, encoding='utf-8', errors='replace') as file:
+            htmls.append(file.read())
+    fields = [_split(html, args.fields) for html in htmls]
+    reference = [_words(normalize_unicode(Html2textConverter().convert(html)) or '') for html in htmls]
+
+    baseline = None
+    print(f"{'backend':<10} {'mode':<12} {'ms':>9} {'speedup':>8} {'same words':>11}")
+    for name in HTML_TO_TEXT_CONVERTERS:
+        if name == LxmlHtmlToTextConverter.name and not LxmlHtmlToTextConverter.is_available():
+            print(f"{name:<10} skipped, not installed")
+            continue
+        Settings.HTML_TO_TEXT_BACKEND = name
+        same_words = sum(_words(clean_text(html) or '') == words for html, words in zip(htmls, reference))
+
+        measures = [
+            ('clean_text', _best_time(args.repeat, lambda: [clean_text(html) for html in htmls])),
+            ('clean_texts', _best_time(args.repeat, lambda: [clean_texts(*parts) for parts in fields])),
+        ]
+        for mode, seconds in measures:
+            baseline = baseline or seconds
+            print(f"{name:<10} {mode:<12} {seconds * 1000:>9.2f} {baseline / seconds:>7.1f}x {same_words:>5}/{len(htmls)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,756 @@
+"""
+Measures the ingestion end to end: a job per datasource runs through `JobQueue`, the connectors and
+`IndexingJobChain` (CRAWL, LOAD, SYNC_DELETIONS and DELETE steps) against an in-memory stand-in of Innovation Suite
+and OpenSearch, so that no server is needed:
+
+    PYTHONPATH=src python benchmarks/ingest.py --articles 500 [--datasources RKM HKM BWF] [--latency 5] \\
+        [--opensearch-latency 2] [--error-rate 0.01] [--embedding-backend onnx] [--output results.json]
+
+The stand-in serves, on a local port:
+
+- Innovation Suite: the JWT login, the record instances and data pages (jobs, job steps and BWF articles), the AR
+  form entries (RKM articles) and the knowledge APIs of HKM and BWF, with articles generated like the ones of
+  `embedding_throughput.py`;
+- OpenSearch: the application index, `_bulk`, `_search` (with scrolls and collapse), `_delete_by_query` and
+  `_refresh`, as far as `opensearch.client` and `IndexingJobChain` use them.
+
+Each request waits `--latency` ms (`--opensearch-latency` for OpenSearch), and fails with a 503 with a probability of
+`--error-rate`, the logins excepted. `--stale` documents of each datasource are indexed beforehand, for the
+SYNC_DELETIONS steps to find documents that are no longer in the source. The chunks are embedded by the `hashing`
+backend, which takes no model, unless another `--embedding-backend` is specified. The stand-in runs in the process
+of the jobs: the figures are meant to be compared across commits rather than with a production deployment.
+
+Reported per datasource: documents loaded per second, job steps by status and chunks stored; the time spent in the
+job step handlers and in the indexing stages; the HTTP calls by endpoint, along with the injected errors.
+"""
+import argparse
+import functools
+import gzip
+import itertools
+import json
+import math
+import multiprocessing
+import platform
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+import zlib
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Tuple
+from urllib.parse import parse_qsl, unquote_plus, urlsplit
+
+import jwt
+import numpy as np
+from loguru import logger
+
+from benchmark_utils import generate_article, get_commit
+from config import Settings
+from embeddings.backends import EMBEDDING_BACKENDS, EmbeddingBackend
+
+# (status, JSON payload or text, headers) of a stand-in response
+Response = Tuple[int, Any, Dict[str, str]]
+
+CONDITION_PATTERN = re.compile(r"'(\d+)'\s*(>=|<=|=|>|<)\s*(?:\"([^\"]*)\"|([^\s()]+))")
+OPERATORS: Dict[str, Callable[[Any, Any], bool]] = {
+    '=': lambda a, b: a == b, '>': lambda a, b: a > b, '<': lambda a, b: a < b,
+    '>=': lambda a, b: a >= b, '<=': lambda a, b: a <= b,
+}
+COMPANY = 'Calbro Services'
+
+
+def _json_response(payload: Any, status: int = 200, headers: Dict[str, str] | None = None) -> Response:
+    return status, payload, headers or {}
+
+
+def _parse_qualification(qualification: str | None) -> Dict[str, List[Tuple[str, str]]]:
+    """
+    Returns the conditions of an AR qualification, by field ID. The qualification is matched as a conjunction of its
+    fields, the conditions of a field being alternatives, which is enough for the queries of the connectors.
+    """
+    conditions = defaultdict(list)
+    for field_id, operator, quoted_value, value in CONDITION_PATTERN.findall(qualification or ''):
+        conditions[field_id].append((operator, quoted_value if quoted_value or not value else value))
+    return conditions
+
+
+def _matches_qualification(values: Dict[str, Any], conditions: Dict[str, List[Tuple[str, str]]]) -> bool:
+    def compare(actual, operator, expected) -> bool:
+        if actual is None:
+            return False
+        try:  # as numbers when both are
+            return OPERATORS[operator](float(actual), float(expected))
+        except ValueError:
+            return OPERATORS[operator](str(actual), expected)
+
+    return all(any(compare(values.get(field_id), operator, value) for operator, value in alternatives)
+               for field_id, alternatives in conditions.items())
+
+
+class InnovationSuiteStandIn:
+    """ Keeps the records and the articles in memory and serves them as the Innovation Suite REST API does. """
+
+    ENTRY_PAGE_SIZE = 500  # max entries per AR query
+    DATA_PAGE_SIZE = 2000  # default size of the data pages
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.records: Dict[str, Dict[str, Dict[str, Any]]] = defaultdict(dict)  # form → ID → field ID → value
+        self.entries: Dict[str, List[Dict[str, Any]]] = defaultdict(list)  # AR form → entries, by field ID
+        self.entry_field_names: Dict[str, Dict[str, str]] = {}  # AR form → field ID → field name
+        self.hkm_articles: Dict[str, dict] = {}
+        self.bwf_articles: Dict[str, dict] = {}
+        self.ids = itertools.count(1)
+        record_instance = r'/api/rx/application/record/recordinstance/([^/]+)/([^/]+)'
+        self.routes = [
+            ('POST', r'/api/jwt/login', 'jwt login', self.login),
+            ('POST', r'/api/jwt/logout', 'jwt logout', lambda query, body: _json_response(None, 204)),
+            ('POST', r'/api/rx/application/record/recordinstance', 'create record', self.create_record),
+            ('GET', record_instance, 'get record', self.get_record),
+            ('PUT', record_instance, 'update record', self.update_record),
+            ('GET', r'/api/rx/application/datapage', 'data page', self.get_data_page),
+            ('GET', r'/api/arsys/v1/entry/([^/]+)', 'AR entries', self.get_entries),
+            ('GET', r'/api/rx/application/knowledge/search', 'HKM search', self.search_hkm_articles),
+            ('GET', r'/api/rx/application/knowledge/article/([^/]+)', 'HKM article', self.get_hkm_article),
+            ('GET', r'/api/com.bmc.dsm.knowledge/rx/application/knowledge/([^/]+)', 'BWF article',
+             self.get_bwf_article),
+        ]
+
+    @staticmethod
+    def login(query: Dict[str, str], body: bytes) -> Response:
+        now = datetime.now(timezone.utc)
+        token = jwt.encode({'exp': now + timedelta(hours=1), '_absoluteExpirationTime': int(
+            (now + timedelta(hours=8)).timestamp())}, 'stand-in', algorithm='HS256')
+        return 200, token, {'Content-Type': 'text/plain'}
+
+    def create_record(self, query: Dict[str, str], body: bytes) -> Response:
+        record = json.loads(body)
+        form = record['recordDefinitionName']
+        with self.lock:
+            number = next(self.ids)
+            record_id = f'IDGAA{number:025d}'
+            values = {field_id: field['value'] for field_id, field in (record.get('fieldInstances') or {}).items()}
+            values.update({'379': record_id, '1': f'{number:015d}'})
+            self.records[form][record_id] = values
+        return _json_response(None, 201, {'Location': f'/api/rx/application/record/recordinstance/{form}/{record_id}'})
+
+    def get_record(self, query: Dict[str, str], body: bytes, form: str, record_id: str) -> Response:
+        values = self.records[form].get(record_id)
+        if values is None:
+            return _json_response([{'messageType': 'ERROR', 'messageNumber': 302,
+                                    'messageText': 'Entry does not exist in database'}], 404)
+        return _json_response({
+            'recordDefinitionName': form,
+            'id': record_id,
+            'displayId': values.get('1'),
+            'fieldInstances': {field_id: {'id': int(field_id), 'value': value} for field_id, value in values.items()},
+        })
+
+    def update_record(self, query: Dict[str, str], body: bytes, form: str, record_id: str) -> Response:
+        record = json.loads(body)
+        with self.lock:
+            values = self.records[form].get(record_id)
+            if values is None:
+                return _json_response([{'messageType': 'ERROR', 'messageNumber': 302,
+                                        'messageText': 'Entry does not exist in database'}], 404)
+            values.update((field_id, field['value']) for field_id, field in record['fieldInstances'].items())
+        return _json_response(None, 204)
+
+    def get_data_page(self, query: Dict[str, str], body: bytes) -> Response:
+        conditions = _parse_qualification(query.get('queryExpression'))
+        with self.lock:
+            records = [values for values in self.records[query['recorddefinition']].values()
+                       if _matches_qualification(values, conditions)]
+        for field_id in reversed([int(field_id) for field_id in query.get('sortBy', '').split(',') if field_id]):
+            records.sort(key=lambda values: str(values.get(str(abs(field_id)), '')), reverse=field_id < 0)
+        start_index = int(query.get('startIndex', 0))
+        page_size = int(query.get('pageSize', -1))
+        page = records[start_index:start_index + (page_size if page_size > 0 else self.DATA_PAGE_SIZE)]
+        if fields := [field_id for field_id in query.get('propertySelection', '').split(',') if field_id]:
+            page = [{field_id: values.get(field_id) for field_id in fields} for values in page]
+        total_size = len(records) if query.get('shouldIncludeTotalSize') == 'true' else None
+        return _json_response({'totalSize': total_size, 'data': page})
+
+    def get_entries(self, query: Dict[str, str], body: bytes, form: str) -> Response:
+        conditions = _parse_qualification(query.get('q'))
+        field_names = self.entry_field_names.get(form, {})
+        fields = re.findall(r'\d+', query.get('fields', '')) or list(field_names)
+        offset = int(query.get('offset', 0))
+        matched = [values for values in self.entries[form] if _matches_qualification(values, conditions)]
+        page = matched[offset:offset + int(query.get('limit', self.ENTRY_PAGE_SIZE))]
+        return _json_response({'entries': [
+            {'values': {field_names.get(field_id, field_id): values.get(field_id) for field_id in fields}}
+            for values in page]})
+
+    def search_hkm_articles(self, query: Dict[str, str], body: bytes) -> Response:
+        page_size = int(query['pageSize'])
+        content_ids = sorted(self.hkm_articles, key=int)
+        start = (int(query['pageNumber']) - 1) * page_size
+        return _json_response({'totalPages': math.ceil(len(content_ids) / page_size),
+                               'result': [{'contentId': int(content_id)}
+                                          for content_id in content_ids[start:start + page_size]]})
+
+    def get_hkm_article(self, query: Dict[str, str], body: bytes, content_id: str) -> Response:
+        if article := self.hkm_articles.get(content_id):
+            return _json_response(article)
+        # what the platform returns when ComAround answers with a 404
+        return _json_response([{'messageType': 'ERROR', 'messageNumber': 234010,
+                                'appendedText': 'Failed to get the knowledge article: 404 Not Found'}], 500)
+
+    def get_bwf_article(self, query: Dict[str, str], body: bytes, article_uuid: str) -> Response:
+        if article := self.bwf_articles.get(article_uuid):
+            return _json_response(article)
+        return _json_response([{'messageType': 'ERROR', 'messageNumber': 302,
+                                'messageText': 'Entry does not exist in database'}], 404)
+
+    def add_articles(self, datasource: str, count: int, rng: random.Random):
+        """ Adds `count` published articles of the datasource, generated from templates. """
+        from connections.bwf.schemas import BwfArticle
+        from connections.rkm.service import Rkm
+
+        for number in range(1, count + 1):
+            title, _, problem, _, cause, _, steps = generate_article(rng).strip().split('\n\n')
+            resolution = '<ol>' + ''.join(f'<li>{step.split(". ", 1)[1]}</li>' for step in steps.split('\n')) + '</ol>'
+            problem, cause = f'<p>{problem}</p>', f'<p>{cause}</p>'
+            match datasource:
+                case 'RKM':
+                    self.__add_rkm_article(Rkm, number, title, problem, cause, resolution)
+                case 'HKM':
+                    self.hkm_articles[str(number)] = {'contentId': number, 'translations': [{
+                        'knowledgeState': 'Published', 'culture': 'en-US', 'title': title, 'issue': problem,
+                        'environment': None, 'resolution': resolution, 'cause': cause, 'tags': ['benchmark']}]}
+                case 'BWF':
+                    article_uuid = str(uuid.UUID(int=number))
+                    content_id = f'KA-{number:012d}'
+                    self.records[BwfArticle.FORM_KNOWLEDGE_ARTICLE_TEMPLATE][article_uuid] = {
+                        '379': article_uuid,
+                        str(BwfArticle.FIELD_CONTENT_ID): content_id,
+                        str(BwfArticle.FIELD_ARTICLE_STATUS): BwfArticle.ARTICLE_STATUS_PUBLISHED,
+                        str(BwfArticle.FIELD_COMPANY): COMPANY,
+                    }
+                    self.bwf_articles[article_uuid] = {
+                        'uuid': article_uuid, 'contentId': content_id, 'templateName': 'KCS', 'title': title,
+                        'external': False, 'locale': 'en_US', 'content': [
+                            {'label': 'Problem', 'content': problem}, {'label': 'Cause', 'content': cause},
+                            {'label': 'Resolution', 'content': resolution}]}
+                case _:
+                    raise ValueError(f'unsupported datasource: {datasource}')
+
+    def __add_rkm_article(self, rkm, number: int, title: str, problem: str, cause: str, resolution: str):
+        guid = f'GUID{number:026d}'
+        template_form, template = [
+            (rkm.FORM_HOW_TO_TEMPLATE, {rkm.FIELD_HTT_QUESTION: ('RKMTemplateQuestion', problem),
+                                        rkm.FIELD_HTT_ANSWER: ('RKMTemplateAnswer', resolution),
+                                        rkm.FIELD_HTT_TECHNICAL_NOTES: ('RKMTemplateTechnicianNotes', cause)}),
+            (rkm.FORM_PROBLEM_SOLUTION_TEMPLATE, {rkm.FIELD_PST_PROBLEM: ('RKMTemplateProblem', problem),
+                                                  rkm.FIELD_PST_SOLUTION: ('RKMTemplateSolution', resolution),
+                                                  rkm.FIELD_PST_TECHNICAL_NOTES: ('RKMTemplateTechnicianNotes',
+                                                                                  cause)}),
+            (rkm.FORM_KCS, {rkm.FIELD_KCS_PROBLEM: ('RKMTemplateKCSProblem', problem),
+                            rkm.FIELD_KCS_ENVIRONMENT: ('RKMTemplateEnvironment', ''),
+                            rkm.FIELD_KCS_RESOLUTION: ('RKMTemplateResolution', resolution),
+                            rkm.FIELD_KCS_CAUSE: ('RKMTemplateCause', cause)}),
+        ][number % 3]
+        self.__add_entry(template_form, {rkm.FIELD_GUID: ('GUID', guid), **template})
+        self.__add_entry(rkm.FORM_KNOWLEDGE_ARTICLE_MANAGER, {
+            rkm.FIELD_KAM_INSTANCE_ID: ('InstanceId', f'KAM{number:027d}'),
+            rkm.FIELD_KAM_ARTICLE_DISPLAY_ID: ('DocID', f'KBA{number:011d}'),
+            rkm.FIELD_KAM_ARTICLE_TITLE: ('ArticleTitle', title),
+            rkm.FIELD_KAM_ARTICLE_FORM: ('ArticleForm', template_form),
+            rkm.FIELD_KAM_FK_GUID: ('FK_GUID', guid),
+            rkm.FIELD_KAM_ARTICLE_STATUS: ('StatusSelectionField', rkm.ARTICLE_STATUS_PUBLISHED),
+            rkm.FIELD_KAM_INTERNAL_ARTICLE_INDICATION: ('InternalArticleIndication', 'No'),
+            rkm.FIELD_KAM_COMPANY: ('Company', COMPANY),
+            rkm.FIELD_LANGUAGE: ('Language', 'English'),
+        })
+
+    def __add_entry(self, form: str, fields: Dict[int, Tuple[str, Any]]):
+        field_names = self.entry_field_names.setdefault(form, {})
+        field_names.update((str(field_id), name) for field_id, (name, _) in fields.items())
+        self.entries[form].append({str(field_id): value for field_id, (_, value) in fields.items()})
+
+
+def _get_field(source: dict, path: str):
+    value = source
+    for name in path.split('.'):
+        value = value.get(name) if isinstance(value, dict) else None
+    return value
+
+
+def _matches_query(source: dict, query: dict | None) -> bool:
+    """ Matches the `bool`, `term`, `terms` and `exists` queries. Like OpenSearch, missing fields match no term. """
+    if not query or 'match_all' in query:
+        return True
+    (kind, clause), = query.items()
+    match kind:
+        case 'bool':
+            clauses = [clause.get('must', []), clause.get('filter', [])]
+            return all(_matches_query(source, sub_query)
+                       for sub_queries in clauses
+                       for sub_query in (sub_queries if isinstance(sub_queries, list) else [sub_queries]))
+        case 'term':
+            (field, value), = clause.items()
+            return _get_field(source, field) == (value['value'] if isinstance(value, dict) else value)
+        case 'terms':
+            (field, values), = clause.items()
+            return _get_field(source, field) in values
+        case 'exists':
+            return _get_field(source, clause['field']) is not None
+    raise ValueError(f'unsupported query: {kind}')
+
+
+def _filter_source(source: dict, includes: List[str]) -> dict:
+    if not includes:
+        return source
+    filtered = {}
+    for path in includes:
+        value = _get_field(source, path)
+        if value is not None:
+            *parents, name = path.split('.')
+            target = filtered
+            for parent in parents:
+                target = target.setdefault(parent, {})
+            target[name] = value
+    return filtered
+
+
+class OpenSearchStandIn:
+    """ Keeps the documents in memory and serves the OpenSearch requests of the application. """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.indices: Dict[str, Dict[str, dict]] = {}  # index → document ID → source
+        self.scrolls: Dict[str, Tuple[List[dict], int, List[str]]] = {}  # ID → remaining hits, size, includes
+        self.deleted = Counter()  # deleted documents by datasource
+        self.routes = [
+            ('POST', r'/_bulk', 'bulk', self.bulk),
+            ('POST', r'/_search/scroll', 'scroll', self.scroll),
+            ('DELETE', r'/_search/scroll', 'clear scroll', lambda query, body: _json_response({'succeeded': True})),
+            ('GET', r'/([^/_][^/]*)', 'get index', self.get_index),
+            ('PUT', r'/([^/_][^/]*)', 'create index', self.create_index),
+            ('PUT', r'/([^/]+)/_mapping', 'put mapping', lambda query, body, index: self.__acknowledge(index)),
+            ('POST', r'/([^/]+)/_refresh', 'refresh', lambda query, body, index: self.__acknowledge(index)),
+            ('POST', r'/([^/]+)/_search', 'search', self.search),
+            ('POST', r'/([^/]+)/_delete_by_query', 'delete by query', self.delete_by_query),
+        ]
+
+    @staticmethod
+    def __index_not_found(index: str) -> Response:
+        return _json_response({'error': {'type': 'index_not_found_exception', 'reason': f'no such index [{index}]',
+                                          'index': index}, 'status': 404}, 404)
+
+    def __acknowledge(self, index: str) -> Response:
+        return _json_response({'acknowledged': True}) if index in self.indices else self.__index_not_found(index)
+
+    def get_index(self, query: Dict[str, str], body: bytes, index: str) -> Response:
+        return _json_response({index: {}}) if index in self.indices else self.__index_not_found(index)
+
+    def create_index(self, query: Dict[str, str], body: bytes, index: str) -> Response:
+        with self.lock:
+            if index in self.indices:
+                return _json_response({'error': {'type': 'resource_already_exists_exception',
+                                                  'reason': f'index [{index}] already exists'}, 'status': 400}, 400)
+            self.indices[index] = {}
+        return _json_response({'acknowledged': True, 'index': index})
+
+    def bulk(self, query: Dict[str, str], body: bytes) -> Response:
+        lines = iter(line for line in body.decode('utf-8').split('\n') if line.strip())
+        items = []
+        with self.lock:
+            for line in lines:
+                (operation, action), = json.loads(line).items()
+                documents = self.indices.setdefault(action['_index'], {})
+                document_id = action.get('_id') or str(uuid.uuid4())
+                if operation == 'delete':
+                    documents.pop(document_id, None)
+                else:
+                    documents[document_id] = json.loads(next(lines))
+                items.append({operation: {'_index': action['_index'], '_id': document_id, 'status': 201}})
+        return _json_response({'took': 1, 'errors': False, 'items': items})
+
+    def search(self, query: Dict[str, str], body: bytes, index: str) -> Response:
+        if index not in self.indices:
+            return self.__index_not_found(index)
+        request = json.loads(body) if body else {}
+        with self.lock:
+            hits = [{'_index': index, '_id': document_id, '_source': source}
+                    for document_id, source in self.indices[index].items()
+                    if _matches_query(source, request.get('query'))]
+        if collapse := request.get('collapse'):
+            collapsed = {}
+            for hit in hits:
+                collapsed.setdefault(_get_field(hit['_source'], collapse['field']), hit)
+            hits = list(collapsed.values())
+        size = int(query.get('size', request.get('size', 10)))
+        includes = [path for path in query.get('_source_includes', '').split(',') if path]
+        scroll_id = None
+        if query.get('scroll'):
+            scroll_id = str(uuid.uuid4())
+            self.scrolls[scroll_id] = (hits[size:], size, includes)
+        return self.__hits_response(hits[:size], len(hits), includes, scroll_id)
+
+    def scroll(self, query: Dict[str, str], body: bytes) -> Response:
+        scroll_id = json.loads(body)['scroll_id'] if body else query['scroll_id']
+        hits, size, includes = self.scrolls.get(scroll_id, ([], 0, []))
+        self.scrolls[scroll_id] = (hits[size:], size, includes)
+        return self.__hits_response(hits[:size], len(hits), includes, scroll_id)
+
+    @staticmethod
+    def __hits_response(hits: List[dict], total: int, includes: List[str], scroll_id: str | None) -> Response:
+        response = {'took': 1, 'timed_out': False, 'hits': {
+            'total': {'value': total, 'relation': 'eq'},
+            'hits': [dict(hit, _source=_filter_source(hit['_source'], includes)) for hit in hits]}}
+        if scroll_id:
+            response['_scroll_id'] = scroll_id
+        return _json_response(response)
+
+    def delete_by_query(self, query: Dict[str, str], body: bytes, index: str) -> Response:
+        if index not in self.indices:
+            return self.__index_not_found(index)
+        request = json.loads(body)
+        with self.lock:
+            documents = self.indices[index]
+            deleted = [document_id for document_id, source in documents.items()
+                       if _matches_query(source, request.get('query'))]
+            for document_id in deleted:
+                self.deleted[_get_field(documents.pop(document_id), 'metadata.datasource')] += 1
+        return _json_response({'took': 1, 'deleted': len(deleted), 'failures': []})
+
+    def count_documents(self, datasource: str) -> int:
+        with self.lock:
+            return sum(1 for documents in self.indices.values() for source in documents.values()
+                       if _get_field(source, 'metadata.datasource') == datasource)
+
+
+class StandInServer(ThreadingHTTPServer):
+    """
+    Serves the stand-ins on a local port: the paths starting with `/api/` are Innovation Suite ones, the others are
+    OpenSearch ones. Counts the calls by endpoint, and injects the latencies and the errors.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, latency: float, open_search_latency: float, error_rate: float, seed: int = 1):
+        super().__init__(('127.0.0.1', 0), _StandInRequestHandler)
+        self.innovation_suite = InnovationSuiteStandIn()
+        self.open_search = OpenSearchStandIn()
+        self.latency = latency
+        self.open_search_latency = open_search_latency
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.calls = Counter()  # by endpoint
+        self.injected_errors = Counter()  # by endpoint
+        self.counters_lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self.server_port}'
+
+    def dispatch(self, method: str, url: str, body: bytes) -> Tuple[str, Response]:
+        """ Returns the endpoint of the request and the response. """
+        split_url = urlsplit(url)
+        query = dict(parse_qsl(split_url.query, keep_blank_values=True))
+        is_innovation_suite = split_url.path.startswith('/api/')
+        stand_in = self.innovation_suite if is_innovation_suite else self.open_search
+        for route_method, pattern, name, handler in stand_in.routes:
+            if method == route_method and (match := re.fullmatch(pattern, split_url.path)):
+                endpoint = f"{'IS' if is_innovation_suite else 'OpenSearch'} {name}"
+                with self.counters_lock:
+                    self.calls[endpoint] += 1
+                    inject_error = name != 'jwt login' and self.random.random() < self.error_rate
+                    if inject_error:
+                        self.injected_errors[endpoint] += 1
+                time.sleep(self.latency if is_innovation_suite else self.open_search_latency)
+                if inject_error and is_innovation_suite:
+                    return endpoint, _json_response([{'messageType': 'ERROR', 'messageNumber': 9999,
+                                                      'messageText': 'Injected error'}], 503)
+                if inject_error:
+                    return endpoint, _json_response({'error': {'type': 'injected_error', 'reason': 'Injected error'},
+                                                     'status': 503}, 503)
+                return endpoint, handler(query, body, *(unquote_plus(group) for group in match.groups()))
+        return f'{method} {split_url.path}', _json_response({'error': 'no such endpoint in the stand-in'}, 404)
+
+    def reset_counters(self):
+        with self.counters_lock:
+            self.calls.clear()
+            self.injected_errors.clear()
+
+
+class _StandInRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keeps the connections alive, as the pools of the clients do
+    disable_nagle_algorithm = True  # or else the small responses wait for the delayed ACKs of the clients
+
+    def do_GET(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        if self.headers.get('Content-Encoding') == 'gzip':  # `IndexingJobChain` compresses its requests
+            body = gzip.decompress(body)
+        try:
+            _, (status, payload, headers) = self.server.dispatch(self.command, self.path, body)
+        except Exception as e:
+            logger.exception(f'stand-in failure on {self.command} {self.path}')
+            status, payload, headers = 500, {'error': {'type': 'stand_in_exception', 'reason': str(e)}}, {}
+        content = b''
+        if payload is not None:
+            content = payload.encode('utf-8') if isinstance(payload, str) else json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', headers.pop('Content-Type', 'application/json'))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    do_POST = do_PUT = do_DELETE = do_GET
+
+    def log_message(self, format, *args):
+        pass
+
+
+class HashingBackend(EmbeddingBackend):
+    """ Embeds the texts as random vectors seeded by their hash, without a model, for the model not to dominate. """
+
+    name = 'hashing'
+    DIMENSION = 384
+
+    def __init__(self, model_name: str, threads: int, **kwargs):
+        super().__init__(model_name)
+
+    @property
+    def tokenizer(self):
+        return None
+
+    @property
+    def max_seq_length(self) -> int:
+        return 512
+
+    def embed_texts(self, texts: List[str]) -> List[List[float]]:
+        return self.__embed_bytes([text.encode('utf-8') for text in texts])
+
+    def embed_token_ids(self, token_ids: List[List[int]]) -> List[List[float]]:
+        return self.__embed_bytes([np.asarray(ids, dtype=np.int64).tobytes() for ids in token_ids])
+
+    def __embed_bytes(self, contents: List[bytes]) -> List[List[float]]:
+        vectors = np.array([np.random.default_rng(zlib.crc32(content)).standard_normal(self.DIMENSION)
+                            for content in contents], dtype=np.float32)
+        return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).tolist()
+
+
+class StageTimer:
+    """ Sums the time spent in the wrapped functions, by stage. """
+
+    def __init__(self):
+        self.seconds = defaultdict(float)
+        self.calls = Counter()
+        self.lock = threading.Lock()
+
+    def wrap(self, stage: str, function: Callable) -> Callable:
+        @functools.wraps(function)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                with self.lock:
+                    self.seconds[stage] += time.perf_counter() - start
+                    self.calls[stage] += 1
+
+        return timed
+
+    def reset(self):
+        with self.lock:
+            self.seconds.clear()
+            self.calls.clear()
+
+
+def _create_tracking_worker_group(do_work: Callable):
+    from workers.service import WorkerGroup
+
+    class TrackingWorkerGroup(WorkerGroup):
+        """ Counts the works not done yet, to tell when the jobs are over. """
+
+        def __init__(self):
+            super().__init__(do_work)
+            self.pending = 0
+            self.condition = threading.Condition()
+
+        def submit_work(self, work):
+            with self.condition:
+                self.pending += 1
+            self.executor.submit(self.__run, work)
+
+        def __run(self, work):
+            try:
+                self.do_work(work)
+            finally:
+                with self.condition:
+                    self.pending -= 1
+                    self.condition.notify_all()
+
+        def wait_idle(self):
+            with self.condition:
+                self.condition.wait_for(lambda: self.pending == 0)
+
+    return TrackingWorkerGroup()
+
+
+def _configure(args, server: StandInServer):
+    Settings.INNOVATION_SUITE_URL = Settings.RKM_URL = Settings.HKM_URL = Settings.BWF_URL = server.url
+    Settings.OPENSEARCH_HOST = '127.0.0.1'
+    Settings.OPENSEARCH_PORT = server.server_port
+    Settings.OPENSEARCH_SECURE = False
+    Settings.OPENSEARCH_USER = Settings.OPENSEARCH_USER_PASSWORD = None
+    Settings.MAX_JOB_WORKERS = args.workers
+    Settings.EMBEDDING_SERVER_ADDRESS = None
+    Settings.EMBEDDING_WARM_UP = False
+    Settings.EMBEDDING_BACKEND = args.embedding_backend
+    if args.embedding_backend == HashingBackend.name:
+        EMBEDDING_BACKENDS[HashingBackend.name] = HashingBackend
+        Settings.CHUNK_SIZE_TOKENS = 0  # no tokenizer: the chunks are sized in characters
+
+
+def _index_stale_documents(server: StandInServer, datasource: str, count: int):
+    """ Indexes documents, which aren't in the source anymore, as `IndexingJobChain` would have. """
+    documents = server.open_search.indices.setdefault(Settings.OPENSEARCH_INDEX, {})
+    for number in range(count):
+        key = f'STALE-{number:06d}'
+        documents[str(uuid.uuid4())] = {'text': f'stale document {number}', 'vector_field': [0.0], 'metadata': {
+            'doc_id': key, 'doc_display_id': key, 'source': f'{datasource}/{key}', 'datasource': datasource,
+            'chunk_id': 0}}
+
+
+def _instrument(timer: StageTimer, feature_service):
+    import indexing.service
+    from indexing.service import IndexingJobChain
+
+    indexing.service.split_document = timer.wrap('split', indexing.service.split_document)
+    IndexingJobChain.delete_chunks_documents = timer.wrap('delete previous chunks',
+                                                          IndexingJobChain.delete_chunks_documents)
+    IndexingJobChain.embed_chunks = timer.wrap('embed', IndexingJobChain.embed_chunks)
+    IndexingJobChain.store_chunks = timer.wrap('store (writer thread)', IndexingJobChain.store_chunks)
+    get_handler = feature_service.get_handler
+
+    def get_timed_handler(job, job_step):
+        handler = get_handler(job, job_step)
+        return handler and timer.wrap(f'{job_step.type.name} step', handler)
+
+    feature_service.get_handler = get_timed_handler
+
+
+def _count_job_steps(server: StandInServer, job_id: str) -> Counter:
+    """ Returns the numbers of job steps of the job, by type and status e.g., `LOAD DONE`. """
+    from helixplatform import ar_core_fields, data_connection_job_step
+    from jobs.constants import JobStepStatus, JobType
+
+    job_steps = server.innovation_suite.records[data_connection_job_step.FORM].values()
+    return Counter(f"{JobType(int(values[str(data_connection_job_step.FIELD_TYPE)])).name}"
+                   f" {JobStepStatus(int(values[str(ar_core_fields.FIELD_STATUS)])).name}"
+                   for values in job_steps if values.get(str(data_connection_job_step.FIELD_JOB_ID)) == job_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--datasources', nargs='+', default=['RKM', 'HKM', 'BWF'], choices=['RKM', 'HKM', 'BWF'])
+    parser.add_argument('--articles', type=int, default=200, help='published articles per datasource')
+    parser.add_argument('--stale', type=int, default=20, help='indexed documents no longer in the source')
+    parser.add_argument('--latency', type=float, default=0, help='latency of Innovation Suite, in ms')
+    parser.add_argument('--opensearch-latency', type=float, default=0, help='latency of OpenSearch, in ms')
+    parser.add_argument('--error-rate', type=float, default=0, help='share of the requests failing with a 503')
+    parser.add_argument('--workers', type=int, default=Settings.MAX_JOB_WORKERS, help='job worker threads')
+    parser.add_argument('--embedding-backend', default=HashingBackend.name,
+                        help=f'`{HashingBackend.name}` (no model) or one of the application backends')
+    parser.add_argument('--log-level', default='WARNING', help='level of the application logs')
+    parser.add_argument('--output', help='path of the JSON results')
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr, level=args.log_level)
+    server = StandInServer(args.latency / 1000, args.opensearch_latency / 1000, args.error_rate)
+    threading.Thread(target=server.serve_forever, name='stand-in', daemon=True).start()
+    _configure(args, server)
+
+    from chunking.service import get_token_chunker
+    from embeddings.backends import get_embedding_backend
+    from indexing.service import IndexingJobChain
+    from connections.bwf.feature import BwfFeature
+    from connections.hkm.feature import HkmFeature
+    from connections.rkm.feature import RkmFeature
+    from jobs.schemas import JobRequest
+    from jobs.service import FeatureService, JobQueue
+
+    get_embedding_backend()  # loads the model before the measures
+    get_token_chunker()
+    feature_service = FeatureService([RkmFeature(), HkmFeature(), BwfFeature()])
+    timer = StageTimer()
+    _instrument(timer, feature_service)
+    job_queue = None
+    worker_group = _create_tracking_worker_group(lambda work: job_queue.handle_work(work))
+    job_queue = JobQueue(feature_service, worker_group=worker_group,
+                         job_chain_factory=lambda queue: IndexingJobChain(queue, feature_service))
+
+    rng = random.Random(1)
+    results = []
+    print(f"{args.articles} articles per datasource, {args.stale} stale documents, {args.workers} workers,"
+          f" {args.embedding_backend} embeddings, latency {args.latency:g}/{args.opensearch_latency:g} ms,"
+          f" error rate {args.error_rate:g}")
+    print(f"{'datasource':<10} {'seconds':>8} {'docs/s':>8} {'chunks':>7} {'deleted':>8} {'HTTP calls':>10}"
+          f"  job steps")
+    for datasource in args.datasources:
+        server.innovation_suite.add_articles(datasource, args.articles, rng)
+        _index_stale_documents(server, datasource, args.stale)
+        server.reset_counters()
+        timer.reset()
+
+        start = time.perf_counter()
+        job, job_step = feature_service.convert_to_job_and_first_step(JobRequest(datasource=datasource))
+        job_queue.queue_job_step(job, job_step, None, execute_now=True)
+        worker_group.wait_idle()
+        seconds = time.perf_counter() - start
+
+        job_steps = _count_job_steps(server, job.id)
+        loaded = job_steps['LOAD DONE']
+        result = {
+            'datasource': datasource,
+            'seconds': seconds,
+            'documents_per_second': loaded / seconds,
+            'loaded_documents': loaded,
+            'stored_chunks': server.open_search.count_documents(datasource),
+            'deleted_documents': server.open_search.deleted[datasource],
+            'job_steps': dict(job_steps),
+            'stages': {stage: {'calls': timer.calls[stage], 'seconds': timer.seconds[stage]}
+                       for stage in timer.seconds},
+            'http_calls': {endpoint: {'calls': calls, 'injected_errors': server.injected_errors[endpoint]}
+                           for endpoint, calls in sorted(server.calls.items())},
+        }
+        results.append(result)
+        steps = ', '.join(f'{count} {type_and_status}' for type_and_status, count in sorted(job_steps.items()))
+        print(f"{datasource:<10} {seconds:>8.2f} {result['documents_per_second']:>8.1f} {result['stored_chunks']:>7}"
+              f" {result['deleted_documents']:>8} {sum(server.calls.values()):>10}  {steps}")
+
+    print(f"\n{'datasource':<10} {'stage':<24} {'calls':>6} {'total (s)':>10} {'mean (ms)':>10}")
+    for result in results:
+        for stage, timing in sorted(result['stages'].items()):
+            print(f"{result['datasource']:<10} {stage:<24} {timing['calls']:>6} {timing['seconds']:>10.2f}"
+                  f" {timing['seconds'] / timing['calls'] * 1000:>10.1f}")
+    print(f"\n{'datasource':<10} {'endpoint':<28} {'calls':>6} {'errors':>6}")
+    for result in results:
+        for endpoint, calls in result['http_calls'].items():
+            print(f"{result['datasource']:<10} {endpoint:<28} {calls['calls']:>6} {calls['injected_errors']:>6}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump({
+                'commit': get_commit(),
+                'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                'machine': {'platform': platform.platform(), 'processor': platform.processor(),
+                            'cpus': multiprocessing.cpu_count(), 'python': platform.python_version()},
+                'arguments': vars(args),
+                'results': results,
+            }, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
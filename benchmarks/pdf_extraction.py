@@ -0,0 +1,64 @@
+"""
+Compares the PDF text extraction backends, extracting every page in the calling thread and in parallel on the
+parser sandbox processes.
+
+    PYTHONPATH=src python benchmarks/pdf_extraction.py manual.pdf [--repeat 3] [--processes 4] [--pages-per-task 32]
+"""
+import argparse
+import time
+
+from config import Settings
+from utils.parser_sandbox import shutdown_parser_sandbox
+from utils.pdf_utils import PDF_TEXT_EXTRACTORS, PymupdfTextExtractor, extract_pdf_pages
+
+
+def _best_time(repeat: int, function) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('pdf', help='path of the PDF to extract')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per measure, the best one is reported')
+    parser.add_argument('--processes', type=int, default=Settings.PARSER_PROCESSES)
+    parser.add_argument('--pages-per-task', type=int, default=Settings.PDF_PAGES_PER_TASK)
+    args = parser.parse_args()
+
+    with open(args.pdf, mode='rb') as file:
+        data = file.read()
+
+    Settings.PARSER_PROCESSES = args.processes
+    Settings.PDF_PAGES_PER_TASK = args.pages_per_task
+    Settings.PDF_PARALLEL_MIN_PAGES = 1
+
+    baseline = None
+    print(f"{'backend':<10} {'mode':<10} {'pages':>6} {'chars':>10} {'seconds':>9} {'speedup':>8}")
+    for name, extractor_class in PDF_TEXT_EXTRACTORS.items():
+        if extractor_class is PymupdfTextExtractor and not PymupdfTextExtractor.is_available():
+            print(f"{name:<10} skipped, not installed")
+            continue
+        extractor = extractor_class()
+        page_count = extractor.get_page_count(data)
+        characters = sum(len(page) for page in extractor.extract_pages(data, 0, page_count))
+
+        # warms the parser sandbox up so that spawning its processes isn't measured
+        extract_pdf_pages(data, extractor)
+
+        measures = [
+            ('thread', _best_time(args.repeat, lambda: extractor.extract_pages(data, 0, page_count))),
+            ('parallel', _best_time(args.repeat, lambda: extract_pdf_pages(data, extractor))),
+        ]
+        for mode, seconds in measures:
+            baseline = baseline or seconds
+            print(f"{name:<10} {mode:<10} {page_count:>6} {characters:>10} {seconds:>9.3f} {baseline / seconds:>7.1f}x")
+
+    shutdown_parser_sandbox()
+
+
+if __name__ == '__main__':
+    main()
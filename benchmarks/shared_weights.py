@@ -0,0 +1,66 @@
+"""
+Measures the memory of several processes loading the embedding model, as uvicorn workers do, with and without
+shared (memory-mapped) weights: the sum of their RSS counts the shared pages once per process, the sum of their PSS
+is the memory actually used. Also reports the throughput of a process, as the shared weights aren't prepacked by the
+onnx backend.
+
+    PYTHONPATH=src python benchmarks/shared_weights.py chunks.txt [--backend onnx] [--processes 4] [--limit 256]
+"""
+import argparse
+import multiprocessing
+import time
+
+from config import Settings
+
+
+def _load_and_embed(backend_name: str, shared_weights: bool, texts, barrier, results):
+    from embeddings.backends import create_embedding_backend
+    from utils.memory_utils import get_memory_usage
+
+    Settings.EMBEDDING_SHARED_WEIGHTS = shared_weights
+    backend = create_embedding_backend(backend_name)
+    backend.embed_texts(texts[:8])  # warm-up
+    start = time.perf_counter()
+    backend.embed_texts(texts)
+    seconds = time.perf_counter() - start
+    barrier.wait()  # all the processes have loaded the model
+    results.put((get_memory_usage(), len(texts) / seconds))
+    barrier.wait()  # all the processes have measured their memory
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('text', nargs='+', help='paths of the text files, one text per line')
+    parser.add_argument('--backend', default=Settings.EMBEDDING_BACKEND)
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--limit', type=int, default=256, help='max number of texts')
+    args = parser.parse_args()
+
+    texts = []
+    for path in args.text:
+        with open(path, encoding='utf-8', errors='replace') as file:
+            texts.extend(Settings.CHUNK_PREFIX + line.strip() for line in file if line.strip())
+    texts = texts[:args.limit]
+
+    context = multiprocessing.get_context('spawn')
+    print(f"{args.processes} processes, {args.backend} backend, {len(texts)} texts")
+    print(f"{'weights':<8} {'sum RSS (MiB)':>14} {'sum PSS (MiB)':>14} {'texts/s':>9}")
+    for shared_weights in (False, True):
+        barrier = context.Barrier(args.processes)
+        results = context.Queue()
+        processes = [context.Process(target=_load_and_embed,
+                                     args=(args.backend, shared_weights, texts, barrier, results))
+                     for _ in range(args.processes)]
+        for process in processes:
+            process.start()
+        measures = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+        rss = sum(memory.rss for memory, _ in measures) / (1024 * 1024)
+        pss = sum(memory.pss or 0 for memory, _ in measures) / (1024 * 1024)
+        throughput = sum(texts_per_second for _, texts_per_second in measures) / len(measures)
+        print(f"{'shared' if shared_weights else 'private':<8} {rss:>14.0f} {pss:>14.0f} {throughput:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+Breaks the job steps traced with `TRACING_EXPORTER=file` down by stage, to find where they wait:
+
+    PYTHONPATH=src python benchmarks/trace_breakdown.py traces.jsonl [--min-share 0.01]
+
+For each kind of job step (e.g., `LOAD RKM`), reported: the number of steps, their mean duration, and the mean time
+of their stages and direct HTTP calls along with their share of the step duration. Stages running concurrently with
+others (e.g., `bulk_store` in the writer thread) can add up to more than 100%: `overlap` is the time they ran
+alongside another stage, `untraced` the time of the step outside of any stage (e.g., parsing).
+"""
+import argparse
+import json
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+
+def read_spans(path: str) -> List[dict]:
+    spans = []
+    with open(path, encoding='utf-8') as file:
+        for line in file:
+            if line.strip():
+                for resource_spans in json.loads(line)['resourceSpans']:
+                    for scope_spans in resource_spans['scopeSpans']:
+                        spans.extend(scope_spans['spans'])
+    return spans
+
+
+def covered_time(intervals: List[Tuple[int, int]]) -> int:
+    """ Returns the time covered by the union of the intervals. """
+    covered, end = 0, None
+    for interval_start, interval_end in sorted(intervals):
+        if end is None or interval_start > end:
+            covered += interval_end - interval_start
+            end = interval_end
+        elif interval_end > end:
+            covered += interval_end - end
+            end = interval_end
+    return covered
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('traces', help='file of the traces, an OTLP JSON export request per line')
+    parser.add_argument('--min-share', type=float, default=0.0, help='hides the stages taking less of the steps')
+    args = parser.parse_args()
+
+    spans = read_spans(args.traces)
+    children: Dict[str, List[dict]] = defaultdict(list)
+    for span in spans:
+        if span.get('parentSpanId'):
+            children[span['parentSpanId']].append(span)
+
+    step_count: Dict[str, int] = defaultdict(int)
+    step_time: Dict[str, int] = defaultdict(int)
+    stage_time: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+    for span in spans:
+        if span.get('parentSpanId'):
+            continue
+        name = span['name']
+        duration = int(span['endTimeUnixNano']) - int(span['startTimeUnixNano'])
+        step_count[name] += 1
+        step_time[name] += duration
+        intervals = []
+        for child in children[span['spanId']]:
+            interval = (int(child['startTimeUnixNano']), int(child['endTimeUnixNano']))
+            intervals.append(interval)
+            stage_time[name][child['name']] += interval[1] - interval[0]
+        covered = covered_time(intervals)
+        stage_time[name]['overlap'] += sum(end - start for start, end in intervals) - covered
+        stage_time[name]['untraced'] += duration - covered
+
+    print(f"{'job step':<24} {'steps':>6} {'mean (ms)':>10}   {'stage':<24} {'mean (ms)':>10} {'share':>7}")
+    for name in sorted(step_count, key=lambda step_name: -step_time[step_name]):
+        count = step_count[name]
+        first = True
+        for stage, time in sorted(stage_time[name].items(), key=lambda item: -item[1]):
+            share = time / step_time[name] if step_time[name] else 0
+            if share < args.min_share:
+                continue
+            step_columns = f'{name:<24} {count:>6} {step_time[name] / count / 1e6:>10.1f}' if first else ' ' * 42
+            print(f'{step_columns}   {stage:<24} {time / count / 1e6:>10.1f} {share:>7.1%}')
+            first = False
+
+
+if __name__ == '__main__':
+    main()
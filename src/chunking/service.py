@@ -1,9 +1,155 @@
-from typing import Iterable, List
+import threading
+from functools import lru_cache
+from typing import Iterable, List, Tuple
 
 from langchain.schema import Document
 from langchain.text_splitter import RecursiveCharacterTextSplitter
+from loguru import logger
+
+from config import Settings
+
+
+class TokenizedChunk(Document):
+    """ A chunk along with the ids of its model tokens (without the special tokens), so that it isn't tokenized again
+    to be embedded. """
+
+    token_ids: List[int] = []
+
+
+@lru_cache
+def get_text_splitter(chunk_size: int, chunk_overlap: int) -> RecursiveCharacterTextSplitter:
+    return RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
 
 
 def generate_chunks(document: Iterable[Document], chunk_size: int = 500, chunk_overlap: int = 100) -> List[Document]:
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
-    return text_splitter.split_documents(document)
+    return get_text_splitter(chunk_size, chunk_overlap).split_documents(document)
+
+
+class TokenChunker:
+    """
+    Splits texts into chunks of at most `chunk_size` model tokens, overlapping by about `chunk_overlap` tokens.
+
+    Each text is tokenized once with a fast (Rust) Hugging Face tokenizer, whose offsets map the tokens back to the
+    text. The chunks end at the best boundary in the second half of their token window: a paragraph, a line, a
+    sentence, or else a word. Their token ids are kept for the embedding.
+    """
+
+    def __init__(self, tokenizer, chunk_size: int, chunk_overlap: int, prefix: str = ''):
+        if chunk_overlap >= chunk_size:
+            raise ValueError(f'the chunk overlap ({chunk_overlap}) must be smaller than the chunk size ({chunk_size})')
+        self.tokenizer = tokenizer
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        # ids of the tokens of the prefix of the chunks (see `Settings.CHUNK_PREFIX`), whose trailing space merely
+        # separates it from the first word of the chunk
+        self.prefix_token_ids: List[int] = self.tokenize(prefix.rstrip())[0] if prefix.strip() else []
+
+    def tokenize(self, text: str) -> Tuple[List[int], List[Tuple[int, int]]]:
+        encoding = self.tokenizer(text, add_special_tokens=False, return_offsets_mapping=True, verbose=False)
+        return encoding['input_ids'], encoding['offset_mapping']
+
+    def split_text(self, text: str) -> List[Tuple[str, List[int]]]:
+        """ Returns the text and the token ids of each chunk of the text. """
+        token_ids, offsets = self.tokenize(text)
+        token_count = len(token_ids)
+        chunks = []
+        start = 0
+        while start < token_count:
+            stop = min(start + self.chunk_size, token_count)
+            if stop < token_count:
+                stop = self.__find_boundary(text, offsets, start + self.chunk_size // 2, stop)
+            chunk_text = text[offsets[start][0]:offsets[stop - 1][1]].strip()
+            if chunk_text:
+                chunks.append((chunk_text, token_ids[start:stop]))
+            if stop >= token_count:
+                break
+            start = self.__find_word_start(text, offsets, max(stop - self.chunk_overlap, start + 1), stop)
+        return chunks
+
+    def split_documents(self, documents: Iterable[Document]) -> List[TokenizedChunk]:
+        return [
+            TokenizedChunk(page_content=chunk_text, metadata=dict(document.metadata), token_ids=token_ids)
+            for document in documents
+            for chunk_text, token_ids in self.split_text(document.page_content)
+        ]
+
+    @staticmethod
+    def __boundary_score(text: str, offsets: List[Tuple[int, int]], index: int) -> int:
+        """ Scores the boundary between the tokens `index - 1` and `index`: the higher, the better a chunk end. """
+        gap = text[offsets[index - 1][1]:offsets[index][0]]
+        if not gap:
+            return 0  # within a word
+        if '\n\n' in gap:
+            return 4
+        if '\n' in gap:
+            return 3
+        if text[offsets[index - 1][1] - 1:offsets[index - 1][1]] in ('.', '!', '?', ';', ':'):
+            return 2
+        return 1
+
+    def __find_boundary(self, text: str, offsets: List[Tuple[int, int]], lowest: int, highest: int) -> int:
+        """ Returns the best chunk end in `[lowest, highest]`, the latest one among the best. """
+        best_index, best_score = highest, -1
+        for index in range(highest, max(lowest, 1) - 1, -1):
+            score = self.__boundary_score(text, offsets, index)
+            if score > best_score:
+                best_index, best_score = index, score
+                if score == 4:
+                    break
+        return best_index
+
+    def __find_word_start(self, text: str, offsets: List[Tuple[int, int]], lowest: int, highest: int) -> int:
+        """ Returns the first token of a word in `[lowest, highest]`, so that the overlap doesn't start mid-word. """
+        for index in range(lowest, highest + 1):
+            if index >= len(offsets) or self.__boundary_score(text, offsets, index):
+                return index
+        return lowest
+
+
+_token_chunker: TokenChunker | None = None
+_token_chunker_built = False
+_token_chunker_lock = threading.Lock()
+
+
+def get_token_chunker() -> TokenChunker | None:
+    """
+    Returns the chunker sizing the chunks in tokens of the embedding model, built once per process, or `None` when
+    `Settings.CHUNK_SIZE_TOKENS` is 0 or the model has no fast tokenizer.
+    """
+    global _token_chunker, _token_chunker_built
+    with _token_chunker_lock:
+        if not _token_chunker_built:
+            _token_chunker = _build_token_chunker()
+            _token_chunker_built = True
+        return _token_chunker
+
+
+def _build_token_chunker() -> TokenChunker | None:
+    if not Settings.CHUNK_SIZE_TOKENS:
+        return None
+    from embeddings.backends import get_embedding_backend
+    embedding_backend = get_embedding_backend()
+    tokenizer = embedding_backend.tokenizer
+    if not getattr(tokenizer, 'is_fast', False):
+        logger.warning("The embedding model has no fast tokenizer: chunks are sized in characters")
+        return None
+
+    token_chunker = TokenChunker(tokenizer, Settings.CHUNK_SIZE_TOKENS, Settings.CHUNK_OVERLAP_TOKENS,
+                                 prefix=Settings.CHUNK_PREFIX)
+    # the prefixed chunks must fit in the model input, which would be truncated otherwise
+    max_chunk_size = embedding_backend.max_token_count - len(token_chunker.prefix_token_ids)
+    token_chunker.chunk_size = min(token_chunker.chunk_size, max_chunk_size)
+    logger.info(f"Chunks are sized in model tokens: {token_chunker.chunk_size} tokens overlapping by"
+                f" {token_chunker.chunk_overlap}")
+    return token_chunker
+
+
+def split_document(document: Document) -> List[Document]:
+    """
+    Splits a document into the chunks to index, sized in model tokens when possible (see `get_token_chunker()`) or
+    else in characters.
+    """
+    token_chunker = get_token_chunker()
+    if token_chunker:
+        return token_chunker.split_documents([document])
+    return generate_chunks([document], 500, 100)
@@ -1,3 +1,5 @@
+import os
+
 from pydantic import BaseSettings
 
 
@@ -38,9 +40,60 @@ class Settings(BaseSettings):
     FS_DATA_SOURCE_DIR: str = "data"
     # Comma-separated list of case-sensitive glob patterns used by the file system crawler.
     FS_DATA_SOURCE_PATTERN: str = "**/*.pdf,**/*.PDF"
+    # File, where the file system crawler keeps the size, modification time and hash of the files it crawled, in
+    # order to only load the new or changed files on the next crawl.
+    FS_MANIFEST_FILE: str = "fs_manifest.json"
+
+    # Model computing the embeddings of the chunks, and max number of tokens of its input.
+    EMBEDDING_MODEL: str = 'intfloat/multilingual-e5-base'
+    EMBEDDING_MAX_SEQ_LENGTH: int = 512
+    # Backend running the embedding model: `torch` (sentence-transformers) or `onnx` (ONNX Runtime, the model being
+    # exported to `EMBEDDING_ONNX_DIR` on first use).
+    EMBEDDING_BACKEND: str = 'torch'
+    # Quantizes the weights of the ONNX model to int8: faster and smaller, but slightly less accurate.
+    EMBEDDING_ONNX_QUANTIZE: bool = False
+    # Folder of the ONNX models, `<SCRATCH_DIR or temp dir>/onnx` by default.
+    EMBEDDING_ONNX_DIR: str | None = None
+    # Memory-maps the weights of the embedding model read-only, so that the processes of the node (e.g., the uvicorn
+    # workers) share them rather than each having its own copy. Slower with the onnx backend (no weights prepacking).
+    EMBEDDING_SHARED_WEIGHTS: bool = False
+    # Number of threads computing the embeddings, 0 letting the backend use all the cores.
+    EMBEDDING_THREADS: int = 0
+    # The texts are embedded by batches of similar lengths, of at most EMBEDDING_MAX_BATCH_SIZE texts and at most
+    # EMBEDDING_BATCH_TOKEN_BUDGET tokens once padded to the longest text of the batch.
+    EMBEDDING_BATCH_TOKEN_BUDGET: int = 8192
+    EMBEDDING_MAX_BATCH_SIZE: int = 64
+    # Loads the embedding model in the background at startup, the application being ready (`/health/readiness`) once
+    # it is loaded. Otherwise, the model is loaded by the first job.
+    EMBEDDING_WARM_UP: bool = True
+    # Address (Unix socket path or localhost:port) of the embedding server, a process owning the model shared by all the
+    # API workers of the node (see `embeddings.server`). The workers load the model themselves when not set.
+    EMBEDDING_SERVER_ADDRESS: str | None = None
+    # Key authenticating the workers to the embedding server, which is required when it listens on TCP.
+    EMBEDDING_SERVER_AUTHKEY: str | None = None
+    # Time the embedding server waits for the texts of other callers to embed them together, in seconds.
+    EMBEDDING_SERVER_MAX_BATCH_WAIT: float = 0.01
+    # Time a worker waits for the embedding server to listen (e.g., while it loads the model), in seconds.
+    EMBEDDING_SERVER_CONNECT_TIMEOUT: float = 120
+    # Time a worker waits for the embedding server to respond to a request, in seconds.
+    EMBEDDING_SERVER_REQUEST_TIMEOUT: float = 300
 
     # Prefix applied to every chunk prior to embeddings computation
     CHUNK_PREFIX: str = 'passage: '
+    # Max number of tokens of the embedding model per chunk (capped to what the model accepts with the prefix), and
+    # number of tokens shared by consecutive chunks. 0 sizes the chunks in characters (500 overlapping by 100).
+    CHUNK_SIZE_TOKENS: int = 256
+    CHUNK_OVERLAP_TOKENS: int = 32
+    # Handling of the duplicate chunks of a datasource (same text, but for whitespace): `off`, `reuse` (their vector is
+    # reused rather than computed) or `skip` (the duplicates of chunks of the documents of the same job step aren't
+    # stored, the other duplicates reuse the vector of their original).
+    CHUNK_DEDUPLICATION: str = 'reuse'
+    # Min estimated Jaccard similarity of the word 3-grams of near duplicate chunks, which are then handled as
+    # duplicates too e.g., 0.9. Only exact duplicates are when not set, as near duplicates may differ in meaning (a
+    # version number, a value, a negation) and would be indexed with the vector of another text.
+    CHUNK_NEAR_DUPLICATE_THRESHOLD: float | None = None
+    # Number of chunks per datasource whose vector is remembered by the process to reuse it for their duplicates.
+    CHUNK_DEDUPLICATION_CACHE_SIZE: int = 10_000
 
     OPENSEARCH_HOST: str = 'clm-pun-vc2jwy.bmc.com'
     OPENSEARCH_PORT: int = 9200
@@ -77,9 +130,91 @@ class Settings(BaseSettings):
     BWF_USER: str = None
     BWF_PASSWORD: str = None
 
+    # Max number of SharePoint folders listed concurrently while crawling a site.
+    SHAREPOINT_CRAWL_WORKERS: int = 8
+
+    # Max number of attachments of a Confluence page downloaded and parsed concurrently.
+    CONFLUENCE_ATTACHMENT_WORKERS: int = 4
+
+    # Downloaded or uploaded files are parsed in memory up to this size (in bytes) and spilled to disk above it.
+    SPOOL_MAX_MEMORY_SIZE: int = 16 * 1024 * 1024
+    # Directory of the files spilled to disk. Defaults to the system's temporary directory.
+    SCRATCH_DIR: str | None = None
+    # Max number of bytes all the files spilled to disk may use at a time.
+    SCRATCH_SPACE_QUOTA: int = 1024 * 1024 * 1024
+
+    # Number of sandboxed processes parsing the downloaded or uploaded files, shared by all the job workers. 0 parses
+    # the files in the job worker threads, without limits. Defaults to the number of CPUs minus one, between 1 and 4.
+    PARSER_PROCESSES: int = max(1, min(4, (os.cpu_count() or 1) - 1))
+    # Limits of the parsing of a file (or of a range of PDF pages). A file exceeding them fails its job step.
+    PARSER_CPU_TIME_LIMIT: int = 120  # seconds
+    PARSER_WALL_TIME_LIMIT: float = 300  # seconds
+    PARSER_RSS_LIMIT: int = 1024 * 1024 * 1024  # bytes
+    # Parser processes are replaced after that many tasks to release the memory they hoard.
+    PARSER_MAX_TASKS_PER_PROCESS: int = 100
+
+    # Backend converting the HTML of the articles to text: `html2text`, `lxml` or `auto` (`lxml` when installed,
+    # `html2text` otherwise).
+    HTML_TO_TEXT_BACKEND: str = 'auto'
+
+    # Backend extracting the text of PDFs: `pypdf` or `pymupdf`, which is faster but requires `pymupdf` to be
+    # installed separately (it is licensed under the AGPL, and its text differs slightly from pypdf's).
+    PDF_EXTRACTION_BACKEND: str = 'pypdf'
+    # PDFs with fewer pages are extracted by a single parser process rather than split into page ranges.
+    PDF_PARALLEL_MIN_PAGES: int = 64
+    # Number of pages of each range extracted by a process.
+    PDF_PAGES_PER_TASK: int = 32
+
+    # Number of chunks embedded and written to OpenSearch at a time while indexing documents.
+    INDEXING_BATCH_SIZE: int = 64
+    # Max number of batches of chunks being written to OpenSearch while the next batch is embedded.
+    INDEXING_MAX_IN_FLIGHT_BATCHES: int = 2
+    # Max size (in bytes) of the uploaded files. Indexing streams the chunks, and the parser processes read the PDFs from
+    # a copy in the scratch space rather than each receiving their content.
+    MAX_UPLOAD_FILE_SIZE: int = 50 * 1024 * 1024
+
     # Amount of job steps a node will submit for execution at a time.
     JOB_STEP_BATCH_SIZE: int = 100
 
+    # Bearer token of the admin endpoints (e.g., `/admin/profiling`), which are disabled when it isn't set.
+    ADMIN_TOKEN: str | None = None
+    # Max duration (in seconds) and max number of job steps of a profiling session.
+    PROFILING_MAX_DURATION: float = 600
+    PROFILING_MAX_JOB_STEPS: int = 1000
+    # Measures the RSS growth of the process during each job step (`job_step_rss_growth_bytes` metric).
+    JOB_STEP_MEMORY_TRACKING: bool = False
+    # Fraction (0 to 1) of the job steps measured, during which the Python allocations are also traced by tracemalloc,
+    # which slows them down: their peak heap and top allocations are recorded. The concurrent job steps are included.
+    JOB_STEP_TRACEMALLOC_RATE: float = 0.0
+    # Number of lines allocating the most memory reported by tracemalloc.
+    TRACEMALLOC_TOP_ALLOCATIONS: int = 10
+    # Job steps taking longer (in seconds) are logged as warnings, along with their memory accounting.
+    SLOW_JOB_STEP_SECONDS: float = 300
+
+    # Max number of retries of the calls to Innovation Suite, RKM, HKM and BWF failing transiently (429, 502, 503 and
+    # 504 statuses, connection errors), and exponential backoff between them: a random delay up to HTTP_RETRY_BACKOFF
+    # seconds doubled at each retry, at most HTTP_RETRY_MAX_BACKOFF seconds, unless the server sends `Retry-After`.
+    HTTP_MAX_RETRIES: int = 3
+    HTTP_RETRY_BACKOFF: float = 0.5
+    HTTP_RETRY_MAX_BACKOFF: float = 30
+    # Retry budget of each client of the process: its retries may add up to HTTP_RETRY_BUDGET_RATIO of its calls, plus
+    # HTTP_RETRY_BUDGET_MIN_PER_SECOND retries per second, so that they don't overload a struggling server.
+    HTTP_RETRY_BUDGET_RATIO: float = 0.2
+    HTTP_RETRY_BUDGET_MIN_PER_SECOND: float = 1
+
+    # Exporter of the traces of the job steps (job step, stages, HTTP calls), all the steps of a job sharing a trace:
+    # `off`, `file` (OTLP JSON lines appended to TRACING_FILE) or `otlp` (OTLP/HTTP JSON posted to a collector at
+    # TRACING_OTLP_ENDPOINT).
+    TRACING_EXPORTER: str = 'off'
+    TRACING_FILE: str = 'traces.jsonl'
+    TRACING_OTLP_ENDPOINT: str = 'http://localhost:4318/v1/traces'
+    # Name of the application in the exported traces.
+    TRACING_SERVICE_NAME: str = 'data-connection'
+    # The spans are exported by batches every TRACING_EXPORT_INTERVAL seconds, and dropped when more than
+    # TRACING_MAX_QUEUE_SIZE are waiting.
+    TRACING_EXPORT_INTERVAL: float = 5
+    TRACING_MAX_QUEUE_SIZE: int = 10_000
+
     class Config:
         env_file = ".env"  # relative to the uvicorn execution folder (not to the --app-dir option)
         env_file_encoding = 'utf-8'
@@ -0,0 +1,2 @@
+CQL_PAGE_SIZE: int = 100  # max number of search results Confluence returns per page
+DOWNLOAD_CHUNK_SIZE: int = 1024 * 1024  # size of the chunks read from the streamed attachment downloads
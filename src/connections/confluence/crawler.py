@@ -1,3 +1,5 @@
+import itertools
+
 from loguru import logger
 
 from connections.confluence.models import ConfluenceConnection
@@ -16,8 +18,16 @@ def crawl_confluence(job: Job, job_step: JobStep, chain: JobChain, connection: C
             logger.warning("Confluence page id not defined")
             return
 
-    for current_page_id in confluenceService.get_page_with_all_child_ids([page_id]):
-        logger.info(f"Scheduling a LOAD job for page with id {current_page_id}")
-        load_job_step = JobStep(JobType.LOAD, job.datasource, job_id=job.id, doc_id=current_page_id)
-        chain.queue_job_step(job, load_job_step, connection, execute_now=False)
+        root_page = confluenceService.get_page_summary(page_id)
+        # pages whose content didn't change still need loading when their attachments did
+        attachment_page_ids = confluenceService.get_attachment_page_ids_modified_since(
+            root_page.space_key, job.modified_since) if job.modified_since else set()
+
+        for page in itertools.chain([root_page], confluenceService.get_page_descendants(page_id)):
+            if not page.is_modified_since(job.modified_since) and page.id_ not in attachment_page_ids:
+                logger.debug(f"Skip Confluence page_id:{page.id_}, it is not updated after:{job.modified_since}")
+                continue
+            logger.info(f"Scheduling a LOAD job for page with id {page.id_}")
+            load_job_step = JobStep(JobType.LOAD, job.datasource, job_id=job.id, doc_id=page.id_)
+            chain.queue_job_step(job, load_job_step, connection, execute_now=False)
     chain.execute_job_steps(job)
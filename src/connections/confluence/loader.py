@@ -1,27 +1,36 @@
-import tempfile
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from pathlib import Path
+from typing import List
 
 from langchain.schema import Document
 from loguru import logger
 
+from config import Settings
 from connections.confluence.models import ConfluenceConnection
 from connections.confluence.schemas import AttachmentMetaData, ConfluencePage
 from connections.confluence.service import ConfluenceService
 from indexing.models import DocumentMetadata
 from indexing.service import IndexingJobChain
 from jobs.models import Job, JobStep
+from opensearch.client import get_open_search_client
 from utils.file_types_utils import SUPPORTED_CONTENT_TYPES
-from utils.langchain_utils import get_langchain_loader
+from utils.io_utils import spooled_temporary_file
+from utils.langchain_utils import load_documents
+from utils.metrics_utils import measure_stage
 
 
 def load_confluence_page(job: Job, job_step: JobStep, chain: IndexingJobChain, connection: ConfluenceConnection):
     logger.info(f"Loading Confluence page {job_step.doc_id}")
 
     with ConfluenceService(connection) as confluence_service:
-        page = confluence_service.get_page(job_step.doc_id)
-        if is_page_indexable(page, job.modified_since):
-            index_page(job, job_step, chain, page, connection.id)
+        with measure_stage('source_fetch'):
+            page = confluence_service.get_page(job_step.doc_id)
+        if is_page_indexable(page):
+            if is_page_modified(page, job.modified_since):
+                index_page(job, job_step, chain, page, connection.id)
+            # the crawler also queues unmodified pages when some of their attachments were modified
             load_page_attachments(job, job_step, chain, page, confluence_service, connection.id)
 
 
@@ -47,11 +56,49 @@ def load_page_attachments(job: Job,
                           connection_id: str):
     logger.info(f"Loading attachments for Confluence page_id:{job_step.doc_id}")
     with confluence_service:
-        attachments_metadata = confluence_service.get_page_attachments_metadata(page)
-        with tempfile.TemporaryDirectory() as temp_dir_name:
-            for attachment in attachments_metadata:
-                if is_attachment_indexable(page.id_, attachment, job.modified_since):
-                    load_attachment(job, job_step, chain, attachment, confluence_service, temp_dir_name, connection_id)
+        with measure_stage('source_fetch'):
+            attachments_metadata = confluence_service.get_page_attachments_metadata(page)
+        attachments = [attachment for attachment in attachments_metadata
+                       if is_attachment_indexable(page.id_, attachment, job.modified_since)]
+        # full jobs reindex all the attachments e.g., after changing how they are chunked or embedded
+        if attachments and job.modified_since:
+            attachments = skip_already_indexed_attachments(job, page, attachments, connection_id)
+        if not attachments:
+            return
+
+        # Attachments are downloaded and parsed concurrently while the parsed ones are indexed by this thread, in
+        # order. At most CONFLUENCE_ATTACHMENT_WORKERS attachments are in flight, so that the memory held by their
+        # documents doesn't grow with the number of attachments of the page.
+        max_in_flight = min(len(attachments), Settings.CONFLUENCE_ATTACHMENT_WORKERS)
+        pending_attachments = deque()
+        with ThreadPoolExecutor(max_in_flight, thread_name_prefix='confluence_attachment') as executor:
+            for attachment in attachments:
+                if len(pending_attachments) >= max_in_flight:
+                    chain.index_documents(job, job_step, pending_attachments.popleft().result())
+                pending_attachments.append(executor.submit(
+                    contextvars.copy_context().run,
+                    get_attachment_documents, job_step, attachment, confluence_service, connection_id))
+            while pending_attachments:
+                chain.index_documents(job, job_step, pending_attachments.popleft().result())
+
+
+def skip_already_indexed_attachments(job: Job,
+                                     page: ConfluencePage,
+                                     attachments: List[AttachmentMetaData],
+                                     connection_id: str) -> List[AttachmentMetaData]:
+    """ Filters out the attachments whose current version is the one already indexed. """
+    with get_open_search_client() as open_search_client:
+        indexed_versions = open_search_client.get_indexed_versions(
+            job.datasource, [attachment.id_ for attachment in attachments], connection_id)
+
+    indexable_attachments = []
+    for attachment in attachments:
+        if attachment.version is not None and indexed_versions.get(attachment.id_) == str(attachment.version):
+            logger.info(f"Skip Confluence attachment_id:{attachment.id_} page_id:{page.id_},"
+                        f" version {attachment.version} is already indexed")
+        else:
+            indexable_attachments.append(attachment)
+    return indexable_attachments
 
 
 def load_attachment(job: Job,
@@ -59,31 +106,45 @@ def load_attachment(job: Job,
                     chain: IndexingJobChain,
                     attachment: AttachmentMetaData,
                     confluence_service: ConfluenceService,
-                    temp_dir_name: str,
                     connection_id: str):
+    documents = get_attachment_documents(job_step, attachment, confluence_service, connection_id)
+    chain.index_documents(job, job_step, documents)
+
+
+def get_attachment_documents(job_step: JobStep,
+                             attachment: AttachmentMetaData,
+                             confluence_service: ConfluenceService,
+                             connection_id: str) -> List[Document]:
+    """ Downloads and parses the specified attachment into documents ready to be indexed. """
     logger.info(f"Loading attachment_id {attachment.id_} with page_id:{job_step.doc_id}")
-    temp_file_path = Path(temp_dir_name) / attachment.id_
-    confluence_service.download_attachment(attachment, str(temp_file_path))
-    loader = get_langchain_loader(attachment.mime_type, str(temp_file_path))
-    langchain_document = loader.load()
+    with spooled_temporary_file() as spooled_file:
+        with measure_stage('source_fetch'):
+            confluence_service.download_attachment(attachment, spooled_file)
+        spooled_file.seek(0)
+        langchain_document = load_documents(attachment.mime_type, spooled_file, source=attachment.title)
     for document in langchain_document:
         DocumentMetadata(
             doc_id=attachment.id_,
             title=attachment.title,
             source=f"{job_step.datasource}{attachment.source}",
             connection_id=connection_id,
-            web_url=f"{attachment.web_url}"
+            web_url=f"{attachment.web_url}",
+            version=str(attachment.version) if attachment.version is not None else None
         ).apply_to(document)
-    chain.index_documents(job, job_step, langchain_document)
+    return langchain_document
 
 
-def is_page_indexable(page: ConfluencePage, modified_since: datetime) -> bool:
+def is_page_indexable(page: ConfluencePage) -> bool:
     if not page.title:
         logger.info(f"Skip Confluence page_id:{page.id_} title is empty")
         return False
     if not page.content:
         logger.info(f"Skip Confluence page_id:{page.id_} content is empty")
         return False
+    return True
+
+
+def is_page_modified(page: ConfluencePage, modified_since: datetime) -> bool:
     if modified_since and modified_since >= page.last_modified:
         logger.info(f"Skip Confluence page_id:{page.id_}, it is not updated after:{modified_since}")
         return False
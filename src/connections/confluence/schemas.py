@@ -11,6 +11,38 @@ def convert_confluence_date(input_date: str) -> datetime | None:
     return datetime.strptime(str(input_date), '%Y-%m-%dT%H:%M:%S.%f%z')
 
 
+@dataclass
+class ConfluencePageSummary:
+    """ Lightweight description of a page, as returned by the page enumeration (no body). """
+    id_: str
+    title: str
+    version: int | None
+    last_modified: datetime | None
+    space_key: str | None = None
+
+    def is_modified_since(self, modified_since: datetime | None) -> bool:
+        """ Lenient check: content without a known modification date is considered modified. """
+        return not modified_since or not self.last_modified or self.last_modified > modified_since
+
+    @staticmethod
+    def from_json_dict(json_dict: Dict[str, Any]) -> 'ConfluencePageSummary':
+        """ Parses a content object, expanded with its `version` (and optionally its `space`). """
+        json_version = json_dict.get('version') or {}
+        json_space = json_dict.get('space') or {}
+        return ConfluencePageSummary(
+            id_=json_dict.get('id'),
+            title=json_dict.get('title'),
+            version=json_version.get('number'),
+            last_modified=convert_confluence_date(json_version.get('when')),
+            space_key=json_space.get('key')
+        )
+
+    @staticmethod
+    def from_search_result_dict(json_dict: Dict[str, Any]) -> 'ConfluencePageSummary':
+        """ Parses a CQL search result, expanded with its `content.version`. """
+        return ConfluencePageSummary.from_json_dict(json_dict.get('content'))
+
+
 @dataclass
 class ConfluencePage:
     id_: str
@@ -57,6 +89,7 @@ class AttachmentMetaData:
     download_link: str
     web_url: str
     last_modified: datetime
+    version: int | None = None
 
     @staticmethod
     def from_json_dict(json_dict: Dict[str, Any], page: ConfluencePage) -> 'AttachmentMetaData':
@@ -72,6 +105,7 @@ class AttachmentMetaData:
         version_link = json_dict.get('version')
         str_page_last_modified = version_link.get('when')
         last_modified = convert_confluence_date(str_page_last_modified)
+        version = version_link.get('number')
         return AttachmentMetaData(
             id_=id_,
             title=title,
@@ -81,4 +115,5 @@ class AttachmentMetaData:
             download_link=download_link,
             web_url=web_url,
             last_modified=last_modified,
+            version=version,
         )
@@ -1,9 +1,9 @@
-from typing import List
-
-from atlassian import Confluence
+from datetime import datetime, timedelta
+from typing import Any, BinaryIO, Dict, Iterator, List, Set
 
 from connections.confluence.models import ConfluenceConnection
-from connections.confluence.schemas import AttachmentMetaData, ConfluencePage
+from connections.confluence.constants import CQL_PAGE_SIZE, DOWNLOAD_CHUNK_SIZE
+from connections.confluence.schemas import AttachmentMetaData, ConfluencePage, ConfluencePageSummary
 from connections.models import Connection
 from connections.service import ConnectionLoader
 from helixplatform import ar_core_fields
@@ -32,14 +32,54 @@ class ConfluenceConnectionLoader(ConnectionLoader):
 class ConfluenceService:
 
     def __init__(self, connection: ConfluenceConnection):
+        # atlassian (and BeautifulSoup) are slow to import: they are imported when first needed
+        from atlassian import Confluence
         self.confluence = Confluence(url=connection.url, token=connection.access_token)
 
-    def get_page_with_all_child_ids(self, page_ids: [str]):
-        for page_id in page_ids:
-            yield page_id
-            child_ids = self.confluence.get_child_id_list(page_id)
-            if child_ids:
-                yield from self.get_page_with_all_child_ids(child_ids)
+    def get_page_summary(self, page_id: str) -> ConfluencePageSummary:
+        page = self.confluence.get_page_by_id(page_id, expand='version,space')
+        return ConfluencePageSummary.from_json_dict(page)
+
+    def get_page_descendants(self, page_id: str) -> Iterator[ConfluencePageSummary]:
+        """
+        Yields all the pages of the subtree of the specified page (excluded), whatever their depth.
+        The whole subtree is enumerated with paginated CQL searches rather than one request per page.
+        """
+        for result in self.search(f'type = page AND ancestor = {page_id}', expand='content.version'):
+            yield ConfluencePageSummary.from_search_result_dict(result)
+
+    def get_page_with_all_descendants(self, page_id: str) -> Iterator[ConfluencePageSummary]:
+        """ Yields the specified page and then all the pages of its subtree. """
+        yield self.get_page_summary(page_id)
+        yield from self.get_page_descendants(page_id)
+
+    def get_attachment_page_ids_modified_since(self, space_key: str, modified_since: datetime) -> Set[str]:
+        """
+        Returns the IDs of the pages of the specified space, which hold attachments modified after `modified_since`.
+        """
+        # CQL dates are interpreted in the timezone of the Confluence user: the search is widened by a day and the
+        # precise filtering is done on the version dates.
+        cql_date = (modified_since - timedelta(days=1)).strftime('%Y-%m-%d')
+        cql = f'type = attachment AND space = "{space_key}" AND lastmodified >= "{cql_date}"'
+        page_ids = set()
+        for result in self.search(cql, expand='content.version,content.container'):
+            attachment = ConfluencePageSummary.from_search_result_dict(result)
+            container = result.get('content').get('container') or {}
+            if container.get('id') and attachment.is_modified_since(modified_since):
+                page_ids.add(container.get('id'))
+        return page_ids
+
+    def search(self, cql: str, expand: str | None = None) -> Iterator[Dict[str, Any]]:
+        """ Yields the results of the specified CQL query, fetching the result pages as they are consumed. """
+        start = 0
+        while True:
+            response = self.confluence.cql(f'{cql} ORDER BY created', start=start, limit=CQL_PAGE_SIZE, expand=expand)
+            results = response.get('results') or []
+            yield from results
+
+            if not results or 'next' not in (response.get('_links') or {}):
+                break
+            start += len(results)
 
     def get_page(self, page_id: str) -> ConfluencePage:
         confluence_data_dict = self.confluence.get_page_by_id(page_id, expand='space,body.storage,version')
@@ -52,12 +92,15 @@ class ConfluenceService:
         return [AttachmentMetaData.from_json_dict(attachment, page)
                 for attachment in page_attachments_data["results"]]
 
-    def download_attachment(self, attachment_meta_data: AttachmentMetaData, file_path: str):
+    def download_attachment(self, attachment_meta_data: AttachmentMetaData, output: BinaryIO):
+        """
+        Downloads the attachment content and writes it to the `output` binary file-like object as it is received.
+        """
         download_url = self.confluence.url + attachment_meta_data.download_link
-        response = self.confluence._session.get(f"{download_url}")
-        response.raise_for_status()
-        with open(file_path, "wb") as f:
-            f.write(response.content)
+        with self.confluence._session.get(f"{download_url}", stream=True) as response:
+            response.raise_for_status()
+            for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                output.write(chunk)
 
     def __enter__(self):
         return self
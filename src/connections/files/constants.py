@@ -1,2 +1,7 @@
-MB_SIZE = 1048576
-MAX_FILE_SIZE = 5 * MB_SIZE
\ No newline at end of file
+# Size of the blocks read while hashing the content of a file.
+HASH_CHUNK_SIZE: int = 1024 * 1024
+# Version of the format of the file manifest, written in the manifest itself.
+MANIFEST_FORMAT_VERSION: int = 1
+# Uploaded files spooled locally are removed after that many seconds if no step loaded them (e.g., because another
+# node handled the step).
+SPOOLED_UPLOAD_TTL: int = 24 * 60 * 60
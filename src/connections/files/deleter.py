@@ -0,0 +1,31 @@
+from typing import Collection
+
+from config import Settings
+from indexing.service import IndexingJobChain
+from jobs.models import Job, JobStep
+from .feature import DirectoryFeature
+from .service import compile_patterns, scan_directory
+from ..deleter import BaseDeleter
+from ..models import Connection
+
+
+class DirectoryDeleter(BaseDeleter):
+    def __init__(self):
+        super().__init__(DirectoryFeature(), source_document_label='file')
+
+    def get_source_published_keys(self, source_client, job: Job, job_step: JobStep, connection: Connection) \
+            -> Collection[str]:
+        pattern = compile_patterns(Settings.FS_DATA_SOURCE_PATTERN.split(','))
+        return {relative_path for relative_path, _, _ in scan_directory(Settings.FS_DATA_SOURCE_DIR, pattern)}
+
+
+def delete_file_documents(job: Job, job_step: JobStep, chain: IndexingJobChain, connection: Connection) -> None:
+    """
+    Deletes the OpenSearch documents of the removed file specified by ``job_step``.
+
+    :param job: parent job of `job_step`
+    :param job_step: specifies the relative path of the removed file as `doc_id`
+    :param chain: leveraged to delete the OpenSearch documents
+    :param connection: configuration details of the integration, if any
+    """
+    DirectoryDeleter().delete_open_search_document(job, job_step, chain, connection)
@@ -1,27 +1,68 @@
-import glob
 import os
 
 from loguru import logger
 
 from config import Settings
+from connections.models import Connection
 from jobs.constants import JobType
 from jobs.models import Job, JobStep
 from jobs.service import JobChain
+from .manifest import FileManifest, ManifestEntry
+from .service import compile_patterns, hash_file, scan_directory
 
 
-def crawl_directory(job: Job, job_step: JobStep, chain: JobChain):
-    for file in _find_all_files(Settings.FS_DATA_SOURCE_DIR, Settings.FS_DATA_SOURCE_PATTERN.split(',')):
-        logger.info(f"scheduling a LOAD job for file {file}")
-        load_job = JobStep(JobType.LOAD, job.datasource, job_id=job.id, file=file)
-        chain.queue_job_step(job, load_job, execute_now=False)
-    chain.execute_job_steps(job)
+def crawl_directory(job: Job, job_step: JobStep, chain: JobChain, connection: Connection):
+    """
+    Compares the files of `Settings.FS_DATA_SOURCE_DIR` with the manifest of the previous crawl, then queues a LOAD
+    step for each new or changed file and a DELETE step for each removed file. The step `doc_id` is the path of the
+    file relative to the crawled directory.
+
+    In incremental jobs (`modified_since` set), files whose size and modification time didn't change aren't read at
+    all. Others are hashed, so that a file merely touched isn't loaded again. Full jobs load all the files e.g., to
+    fill the index again once wiped.
 
+    The files to load are only recorded in the manifest once their LOAD step succeeds (see `load_file()`), so that a
+    file failing to load is loaded again by the next crawl.
+    """
+    root_dir = Settings.FS_DATA_SOURCE_DIR
+    pattern = compile_patterns(Settings.FS_DATA_SOURCE_PATTERN.split(','))
+    previous_manifest = FileManifest.load(Settings.FS_MANIFEST_FILE)
+    incremental = job.modified_since is not None
+    manifest = FileManifest()
+    file_count = 0
 
-def _find_all_files(dir_path: str, patterns: [str]):
-    logger.info(f"find all files in {dir_path}")
-    for filename_pattern in patterns:
-        for filepath in glob.iglob(filename_pattern, root_dir=dir_path, recursive=True):
-            full_path = os.path.join(dir_path, filepath)
-            yield full_path
+    logger.info(f"crawling directory {root_dir} ({'incremental' if incremental else 'full'})")
+    loaded_count = 0
+    for relative_path, size, mtime_ns in scan_directory(root_dir, pattern):
+        file_count += 1
+        previous_entry = previous_manifest.entries.get(relative_path)
+        if previous_entry:
+            manifest.entries[relative_path] = previous_entry  # until loaded again
+        if incremental and previous_entry:
+            if previous_entry.has_same_stat(size, mtime_ns):
+                continue
+            try:
+                content_hash = hash_file(os.path.join(root_dir, relative_path))
+            except OSError as e:
+                logger.warning("unable to read file {path}, skipping: {cause}", path=relative_path, cause=e)
+                continue
+            if previous_entry.content_hash == content_hash:
+                manifest.entries[relative_path] = ManifestEntry(size, mtime_ns, content_hash)
+                continue
 
+        logger.info(f"scheduling a LOAD job step for file {relative_path}")
+        load_job_step = JobStep(JobType.LOAD, job.datasource, job_id=job.id, doc_id=relative_path)
+        chain.queue_job_step(job, load_job_step, connection)
+        loaded_count += 1
 
+    removed_paths = sorted(previous_manifest.entries.keys() - manifest.entries.keys())
+    for relative_path in removed_paths:
+        logger.info(f"scheduling a DELETE job step for removed file {relative_path}")
+        delete_job_step = JobStep(JobType.DELETE, job.datasource, job_id=job.id, doc_id=relative_path)
+        chain.queue_job_step(job, delete_job_step, connection)
+
+    manifest.save(Settings.FS_MANIFEST_FILE)
+    logger.info(
+        "crawled {file_count} files in {directory}: {loaded} to load, {removed} to delete",
+        file_count=file_count, directory=root_dir, loaded=loaded_count, removed=len(removed_paths))
+    chain.execute_job_steps(job)
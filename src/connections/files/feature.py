@@ -1,5 +1,5 @@
 import connections.files.file_loader
-from jobs.constants import JobType
+from jobs.constants import Datasource, JobType
 from jobs.models import Job, JobStep
 from jobs.schemas import JobRequest
 from jobs.service import DeleteDocBy, Feature
@@ -32,3 +32,37 @@ class UploadFileFeature(Feature):
 
     def get_delete_doc_by(self, job: Job, job_step: JobStep) -> DeleteDocBy:
         return DeleteDocBy.BY_DOC_ID
+
+
+class DirectoryFeature(Feature):
+    """ Indexes the files of `Settings.FS_DATA_SOURCE_DIR`, which is crawled incrementally. """
+
+    def accept_job_request(self, job_request: JobRequest) -> bool:
+        return job_request.datasource == Datasource.FILE_SYSTEM
+
+    def create_job(self, job_request: JobRequest) -> Job:
+        return Job(datasource=job_request.datasource, load_directory=True, modified_since=job_request.modifiedSince,
+                   connection_id=job_request.connectionId)
+
+    def accept_job(self, job: Job) -> bool:
+        return job.datasource == Datasource.FILE_SYSTEM
+
+    def create_first_job_step(self, job: Job) -> JobStep:
+        return JobStep(JobType.CRAWL, datasource=job.datasource)
+
+    def get_handler(self, job: Job, job_step: JobStep):
+        match job_step.type:
+            case JobType.CRAWL:
+                import connections.files.directory_crawler
+                return connections.files.directory_crawler.crawl_directory
+            case JobType.LOAD:
+                import connections.files.file_loader
+                return connections.files.file_loader.load_file
+            case JobType.DELETE:
+                import connections.files.deleter
+                return connections.files.deleter.delete_file_documents
+            case _:
+                return None
+
+    def get_delete_doc_by(self, job: Job, job_step: JobStep) -> DeleteDocBy:
+        return DeleteDocBy.BY_DOC_ID
@@ -1,30 +1,46 @@
-import tempfile
-from os.path import relpath
-from pathlib import Path
+import os
+from io import BytesIO
 
-from langchain.document_loaders import PyPDFLoader
 from loguru import logger
 
 from config import Settings
+from connections.files.manifest import FileManifest, ManifestEntry
+from connections.files.service import hash_file
+from connections.files.upload_spool import remove_spooled_file
 from connections.models import Connection
 from helixplatform import data_connection_job
 from helixplatform.service import InnovationSuite
 from indexing.models import DocumentMetadata
 from indexing.service import IndexingJobChain
 from jobs.models import Job, JobStep
-from utils.langchain_utils import get_langchain_loader
-
-
-def load_file(job: Job, job_step: JobStep, chain: IndexingJobChain) -> None:
-    logger.info(f"file loading: {job}")
-    loader = PyPDFLoader(job.file)
-    documents = loader.load()
+from utils.file_types_utils import get_content_type_from_filename
+from utils.langchain_utils import load_documents
+
+
+def load_file(job: Job, job_step: JobStep, chain: IndexingJobChain, connection: Connection) -> None:
+    """
+    Loads the file of `Settings.FS_DATA_SOURCE_DIR`, whose relative path is the `doc_id` of the job step, and records
+    it in the file manifest once indexed (see `crawl_directory()`).
+    """
+    relative_path = job_step.doc_id
+    logger.info(f"file loading: {relative_path}")
+    content_type = get_content_type_from_filename(relative_path)
+    path = os.path.join(Settings.FS_DATA_SOURCE_DIR, relative_path)
+    # the file is recorded as it was before being read: if it changes meanwhile, the next crawl loads it again
+    stat = os.stat(path)
+    manifest_entry = ManifestEntry(stat.st_size, stat.st_mtime_ns, hash_file(path))
+    with open(path, mode='rb') as file:
+        documents = load_documents(content_type, file, source=relative_path)
 
     for document in documents:
-        relative_path = relpath(document.metadata['source'], Settings.FS_DATA_SOURCE_DIR)
-        DocumentMetadata(source=relative_path, doc_id=relative_path).apply_to(document)
+        DocumentMetadata(
+            source=relative_path,
+            doc_id=relative_path,
+            title=os.path.basename(relative_path)
+        ).apply_to(document)
 
     chain.index_documents(job, job_step, documents)
+    FileManifest.record_loaded_file(Settings.FS_MANIFEST_FILE, relative_path, manifest_entry)
 
 
 # Currently, both methods could be doing the same but
@@ -34,6 +50,7 @@ def load_uri(job: Job, job_step: JobStep, chain: IndexingJobChain) -> None:
         raise ValueError(f"`doc_id` must be specified when loading from URI ({job.uri})")
 
     logger.info(f"URI loading: {job}")
+    from langchain.document_loaders import PyPDFLoader
     loader = PyPDFLoader(job.uri)
     documents = loader.load()
 
@@ -46,29 +63,33 @@ def load_uri(job: Job, job_step: JobStep, chain: IndexingJobChain) -> None:
 def load_upload_file(job: Job, job_step: JobStep, chain: IndexingJobChain, connection: Connection) -> None:
     logger.info(f"file upload loading {job_step}")
 
-    with InnovationSuite() as is_client:
-        attachment_file = is_client.get_attachment(data_connection_job.FORM, job.id, data_connection_job.FIELD_FILE)
+    if job.local_upload_path and os.path.exists(job.local_upload_path):
+        # this node received the upload: no need to download the job attachment
+        logger.debug(f"loading local copy of the uploaded file {job.upload_filename}")
+        filename = job.upload_filename
+        try:
+            with open(job.local_upload_path, mode='rb') as file:
+                documents = load_documents(job.upload_file.content_type, file, source=filename)
+        finally:
+            remove_spooled_file(job.local_upload_path)
+    else:
+        with InnovationSuite() as is_client:
+            attachment_file = is_client.get_attachment(
+                data_connection_job.FORM, job.id, data_connection_job.FIELD_FILE)
+
+        filename = attachment_file.filename
+        if not filename:
+            logger.warning(
+                'skipping loading upload file: no filename specified (job step: {job_step})', job_step=job_step)
+            return
+        documents = load_documents(attachment_file.content_type, BytesIO(attachment_file.content), source=filename)
 
-    if not attachment_file.filename:
-        logger.warning('skipping loading upload file: no filename specified (job step: {job_step})', job_step=job_step)
-        return
-
-    temporary_directory = tempfile.TemporaryDirectory()
-    temporary_file = Path(temporary_directory.name) / attachment_file.filename
-
-    with open(temporary_file, mode="wb") as file:
-        file.write(attachment_file.content)
-
-    loader = get_langchain_loader(attachment_file.content_type, str(temporary_file))
-    documents = loader.load()
     for document in documents:
-        doc_id = job_step.doc_id or attachment_file.filename
+        doc_id = job_step.doc_id or filename
         DocumentMetadata(
             source=f"{job_step.datasource}/{doc_id}",
             doc_id=doc_id,
             doc_display_id=job_step.doc_display_id if job_step.doc_display_id else None,
-            title=attachment_file.filename
+            title=filename
         ).apply_to(document)
     chain.index_documents(job, job_step, documents)
-
-    temporary_file.unlink(missing_ok=True)
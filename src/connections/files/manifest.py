@@ -0,0 +1,105 @@
+import json
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import Dict
+
+from loguru import logger
+
+from .constants import MANIFEST_FORMAT_VERSION
+
+_journal_lock = threading.Lock()
+
+
+@dataclass
+class ManifestEntry:
+    size: int
+    mtime_ns: int
+    content_hash: str
+
+    def has_same_stat(self, size: int, mtime_ns: int) -> bool:
+        return self.size == size and self.mtime_ns == mtime_ns
+
+
+@dataclass
+class FileManifest:
+    """
+    The files indexed by the last directory crawl, keyed by their path relative to the crawled directory.
+    Persisted as JSON, with entries stored as compact `[size, mtime_ns, content_hash]` arrays.
+
+    The files loaded since the manifest was saved are appended to its journal (`<path>.loaded`) by their LOAD step,
+    a `[relative_path, size, mtime_ns, content_hash]` array per line: the journal is replayed when the manifest is
+    loaded, and removed once it is saved again.
+    """
+    entries: Dict[str, ManifestEntry] = field(default_factory=dict)
+
+    @staticmethod
+    def load(path: str) -> 'FileManifest':
+        """ Loads the manifest at `path`, along with its journal. A missing or unreadable manifest is empty. """
+        manifest = FileManifest._load_files(path)
+        try:
+            with open(FileManifest._journal_path(path), mode='r', encoding='utf-8') as journal:
+                for line in journal:
+                    try:
+                        relative_path, *entry = json.loads(line)
+                        manifest.entries[relative_path] = ManifestEntry(*entry)
+                    except (ValueError, TypeError):
+                        pass  # a line truncated by a crash: the file is loaded again
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning("ignoring unreadable file manifest journal {path}: {cause}", path=path, cause=e)
+        return manifest
+
+    @staticmethod
+    def _load_files(path: str) -> 'FileManifest':
+        try:
+            with open(path, mode='r', encoding='utf-8') as file:
+                manifest_dict = json.load(file)
+        except FileNotFoundError:
+            return FileManifest()
+        except (OSError, ValueError) as e:
+            logger.warning("ignoring unreadable file manifest {path}: {cause}", path=path, cause=e)
+            return FileManifest()
+
+        if manifest_dict.get('version') != MANIFEST_FORMAT_VERSION:
+            logger.warning("ignoring file manifest {path} of unsupported version", path=path)
+            return FileManifest()
+        return FileManifest({
+            relative_path: ManifestEntry(*entry) for relative_path, entry in manifest_dict.get('files', {}).items()
+        })
+
+    @staticmethod
+    def record_loaded_file(path: str, relative_path: str, entry: ManifestEntry):
+        """ Appends the file, which was loaded successfully, to the journal of the manifest at `path`. """
+        line = json.dumps([relative_path, entry.size, entry.mtime_ns, entry.content_hash], separators=(',', ':'))
+        with _journal_lock:
+            with open(FileManifest._journal_path(path), mode='a', encoding='utf-8') as journal:
+                journal.write(line + '\n')
+
+    @staticmethod
+    def _journal_path(path: str) -> str:
+        return f'{path}.loaded'
+
+    def save(self, path: str):
+        """
+        Writes the manifest to `path` atomically, so that a crash can't leave a truncated manifest behind, and removes
+        its journal, which the manifest was loaded with: the files loaded in between are loaded again by the next crawl.
+        """
+        manifest_dict = {
+            'version': MANIFEST_FORMAT_VERSION,
+            'files': {
+                relative_path: [entry.size, entry.mtime_ns, entry.content_hash]
+                for relative_path, entry in self.entries.items()
+            }
+        }
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        temporary_path = f'{path}.tmp'
+        with open(temporary_path, mode='w', encoding='utf-8') as file:
+            json.dump(manifest_dict, file, separators=(',', ':'))
+        os.replace(temporary_path, path)
+        try:
+            os.remove(self._journal_path(path))
+        except FileNotFoundError:
+            pass
@@ -3,7 +3,8 @@ from typing import Annotated
 from fastapi import APIRouter, File, Form, HTTPException, UploadFile, status
 from starlette.requests import Request
 
-from connections.files.constants import MAX_FILE_SIZE
+from config import Settings
+from connections.files.upload_spool import remove_spooled_file, spool_upload_file
 from jobs.schemas import JobRequest, JobResponse
 from utils.file_types_utils import ContentType
 
@@ -27,7 +28,7 @@ def uploading_file(request: Request,
             status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
             detail=f"File type of {upload_file.content_type} is not supported",
         )
-    if upload_file.size > MAX_FILE_SIZE:
+    if upload_file.size > Settings.MAX_UPLOAD_FILE_SIZE:
         raise HTTPException(
             status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
             detail=f"Weight not supported",
@@ -37,7 +38,13 @@ def uploading_file(request: Request,
     job_request._upload_file = upload_file
     job, job_step = request.app.feature_service.convert_to_job_and_first_step(job_request)
     if job and job_step:
-        request.app.job_queue.queue_job_step(job, job_step, execute_now=True)
+        # When this node executes the step, it loads the local copy rather than downloading the job attachment.
+        job.local_upload_path = spool_upload_file(upload_file)
+        try:
+            request.app.job_queue.queue_job_step(job, job_step, None, execute_now=True)
+        except Exception:
+            remove_spooled_file(job.local_upload_path)
+            raise
         return JobResponse(id=job.id)
     else:
         raise ValueError(f"unsupported job request")
@@ -0,0 +1,72 @@
+import hashlib
+import os
+import re
+from typing import Iterable, Iterator, Pattern, Tuple
+
+from loguru import logger
+
+from .constants import HASH_CHUNK_SIZE
+
+
+def compile_patterns(patterns: Iterable[str]) -> Pattern:
+    """
+    Compiles case-sensitive glob patterns into a single regular expression matching relative paths using `/`
+    separators. `**/` matches any number of directories (including none), `*` and `?` don't match `/`.
+    """
+    regexes = []
+    for pattern in patterns:
+        pattern = pattern.strip()
+        if not pattern:
+            continue
+        regex = ''
+        i = 0
+        while i < len(pattern):
+            if pattern.startswith('**/', i):
+                regex += '(?:.*/)?'
+                i += 3
+            elif pattern.startswith('**', i):
+                regex += '.*'
+                i += 2
+            elif pattern[i] == '*':
+                regex += '[^/]*'
+                i += 1
+            elif pattern[i] == '?':
+                regex += '[^/]'
+                i += 1
+            else:
+                regex += re.escape(pattern[i])
+                i += 1
+        regexes.append(regex)
+    if not regexes:
+        return re.compile(r'(?!)')  # matches nothing
+    return re.compile('(?:' + '|'.join(regexes) + r')\Z')
+
+
+def scan_directory(root_dir: str, pattern: Pattern) -> Iterator[Tuple[str, int, int]]:
+    """
+    Walks `root_dir` with `os.scandir()` and yields the `(relative_path, size, mtime_ns)` of the regular files whose
+    relative path (with `/` separators) matches `pattern`. Unreadable directories are logged and skipped.
+    """
+    pending_dirs = ['']
+    while pending_dirs:
+        relative_dir = pending_dirs.pop()
+        try:
+            with os.scandir(os.path.join(root_dir, relative_dir)) as entries:
+                for entry in entries:
+                    relative_path = f'{relative_dir}/{entry.name}' if relative_dir else entry.name
+                    if entry.is_dir(follow_symlinks=False):
+                        pending_dirs.append(relative_path)
+                    elif entry.is_file() and pattern.match(relative_path):
+                        stat = entry.stat()
+                        yield relative_path, stat.st_size, stat.st_mtime_ns
+        except OSError as e:
+            logger.warning("unable to list directory {directory}: {cause}", directory=relative_dir or root_dir, cause=e)
+
+
+def hash_file(path: str) -> str:
+    """ Returns the SHA-256 digest of the content of the file. """
+    digest = hashlib.sha256()
+    with open(path, mode='rb') as file:
+        while chunk := file.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
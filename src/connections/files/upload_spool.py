@@ -0,0 +1,51 @@
+import os
+import shutil
+import tempfile
+import time
+
+from loguru import logger
+from starlette.datastructures import UploadFile
+
+from config import Settings
+from .constants import SPOOLED_UPLOAD_TTL
+
+
+def get_upload_spool_dir() -> str:
+    return os.path.join(Settings.SCRATCH_DIR or tempfile.gettempdir(), 'uploads')
+
+
+def spool_upload_file(upload_file: UploadFile) -> str:
+    """
+    Copies the uploaded file to the local spool directory and returns the path of the copy. The upload file is
+    rewound, so that it can still be stored as a job attachment.
+    """
+    spool_dir = get_upload_spool_dir()
+    os.makedirs(spool_dir, exist_ok=True)
+    remove_stale_spooled_files(spool_dir)
+
+    upload_file.file.seek(0)
+    file_descriptor, path = tempfile.mkstemp(prefix='upload_', dir=spool_dir)
+    with os.fdopen(file_descriptor, mode='wb') as spooled_file:
+        shutil.copyfileobj(upload_file.file, spooled_file)
+    upload_file.file.seek(0)
+    return path
+
+
+def remove_spooled_file(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def remove_stale_spooled_files(spool_dir: str):
+    """ Removes the spooled files, which weren't loaded by this node within `SPOOLED_UPLOAD_TTL`. """
+    expiration_time = time.time() - SPOOLED_UPLOAD_TTL
+    try:
+        with os.scandir(spool_dir) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.stat().st_mtime < expiration_time:
+                    logger.info("removing stale spooled upload file {path}", path=entry.path)
+                    remove_spooled_file(entry.path)
+    except OSError as e:
+        logger.warning("unable to remove stale spooled upload files: {cause}", cause=e)
@@ -9,7 +9,7 @@ from indexing.models import DocumentMetadata
 from indexing.service import IndexingJobChain
 from jobs.models import Job, JobStep
 from utils import i18n_utils
-from utils.text_utils import clean_text
+from utils.text_utils import clean_texts
 
 
 def create_hkm_document(datasource: str,
@@ -51,11 +51,8 @@ def load_hkm_article(job: Job, job_step: JobStep, chain: IndexingJobChain, conne
                     content_id=job_step.doc_id)
 
     for translation in article.translations:
-        title = clean_text(translation.title)
-        issue = clean_text(translation.issue)
-        environment = clean_text(translation.environment)
-        resolution = clean_text(translation.resolution)
-        cause = clean_text(translation.cause)
+        title, issue, environment, resolution, cause = clean_texts(
+            translation.title, translation.issue, translation.environment, translation.resolution, translation.cause)
         language = i18n_utils.standardize_language_tag(translation.culture, default_language_tag=None)
         content = f"Title={title} Issue={issue} Environment={environment} Resolution={resolution} Cause={cause}"
         connection_id = connection.id if connection else None
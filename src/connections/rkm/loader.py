@@ -7,7 +7,7 @@ from connections.rkm.service import Rkm
 from indexing.models import DocumentMetadata
 from indexing.service import IndexingJobChain
 from jobs.models import Job, JobStep
-from utils.text_utils import clean_text
+from utils.text_utils import clean_text, clean_texts
 
 
 def load_rkm_how_to(job: Job,
@@ -23,19 +23,15 @@ def load_rkm_how_to(job: Job,
 
     how_to_details = rkm.get_how_to(article.fk_guid)
 
-    question = how_to_details['RKMTemplateQuestion']
-    question = clean_text(question)
-    answer = how_to_details['RKMTemplateAnswer']
-    answer = clean_text(answer)
+    question, answer, technical_notes = clean_texts(how_to_details['RKMTemplateQuestion'],
+                                                    how_to_details['RKMTemplateAnswer'],
+                                                    how_to_details['RKMTemplateTechnicianNotes'])
 
     if not answer:
         logger.info(f"skipping loading RKM how-to '{job_step.doc_id}' ({article.form}, {article.display_id}):"
                     f" empty answer after cleanup")
         return
 
-    technical_notes = how_to_details['RKMTemplateTechnicianNotes']
-    technical_notes = clean_text(technical_notes)
-
     content = f'Title={article.title} Question={question} doc_display_id={article.display_id} {answer}' \
               f' Technical Notes={technical_notes}'
 
@@ -56,19 +52,15 @@ def load_rkm_problem_solution(job: Job,
 
     problem_solution_details = rkm.get_problem_solution(article.fk_guid)
 
-    problem = problem_solution_details['RKMTemplateProblem']
-    problem = clean_text(problem)
-    solution = problem_solution_details['RKMTemplateSolution']
-    solution = clean_text(solution)
+    problem, solution, technical_notes = clean_texts(problem_solution_details['RKMTemplateProblem'],
+                                                     problem_solution_details['RKMTemplateSolution'],
+                                                     problem_solution_details['RKMTemplateTechnicianNotes'])
 
     if not solution:
         logger.info(f"skipping loading RKM problem-solution '{job_step.doc_id}' ({article.form}, {article.display_id}):"
                     f" empty solution after cleanup")
         return
 
-    technical_notes = problem_solution_details['RKMTemplateTechnicianNotes']
-    technical_notes = clean_text(technical_notes)
-
     content = f'Title={article.title} Question={problem} doc_display_id={article.display_id} {solution}' \
               f' Technical Notes={technical_notes}'
 
@@ -89,21 +81,16 @@ def load_rkm_known_error(job: Job,
 
     known_error_details = rkm.get_known_error(article.fk_guid)
 
-    fix = known_error_details['RKMTemplateFix']
-    fix = clean_text(fix)
+    fix, error, root_cause, technical_notes = clean_texts(known_error_details['RKMTemplateFix'],
+                                                          known_error_details['RKMTemplateError'],
+                                                          known_error_details['RKMTemplateRootCause'],
+                                                          known_error_details['RKMTemplateTechnicianNotes'])
 
     if not fix:
         logger.info(f"skipping loading RKM known error '{job_step.doc_id}' ({article.form}, {article.display_id}):"
                     f" empty fix after cleanup")
         return
 
-    error = known_error_details['RKMTemplateError']
-    error = clean_text(error)
-    root_cause = known_error_details['RKMTemplateRootCause']
-    root_cause = clean_text(root_cause)
-    technical_notes = known_error_details['RKMTemplateTechnicianNotes']
-    technical_notes = clean_text(technical_notes)
-
     content = f'Title={article.title} Error={error} doc_display_id={article.display_id} Root Cause={root_cause}' \
               f' Fix={fix} Technical Notes={technical_notes}'
 
@@ -152,14 +139,10 @@ def load_rkm_kcs(job: Job,
 
     kcs_details = rkm.get_kcs(article.fk_guid)
 
-    problem = kcs_details['RKMTemplateKCSProblem']
-    problem = clean_text(problem)
-    environment = kcs_details['RKMTemplateEnvironment']
-    environment = clean_text(environment)
-    resolution = kcs_details['RKMTemplateResolution']
-    resolution = clean_text(resolution)
-    cause = kcs_details['RKMTemplateCause']
-    cause = clean_text(cause)
+    problem, environment, resolution, cause = clean_texts(kcs_details['RKMTemplateKCSProblem'],
+                                                          kcs_details['RKMTemplateEnvironment'],
+                                                          kcs_details['RKMTemplateResolution'],
+                                                          kcs_details['RKMTemplateCause'])
 
     if not problem:
         logger.info(f"skipping loading RKM KCS '{job_step.doc_id}' ({article.form}, {article.display_id}):"
@@ -1,4 +1,4 @@
 from utils.file_types_utils import ContentType
 
-CHUNK_SIZE: int = 1024  # this is the max that we can use following the advice from o365 library
+CHUNK_SIZE: int = 1024 * 1024  # size of the chunks read from the streamed download response
 SUPPORTED_FILES = [ContentType.WORD, ContentType.PDF]
@@ -10,17 +10,19 @@ from jobs.service import JobChain
 
 def crawl_sharepoint(job: Job, job_step: JobStep, chain: JobChain, connection: SharePointConnection):
     sharepoint = SharePoint()
-    files = sharepoint.get_files(connection, SUPPORTED_FILES, modified_since=job.modified_since)
-    if not files:
-        logger.warning(
-            f"no Sharepoint articles found (doc_id={job_step.doc_id})"
-        )
-        return
-
-    for file in files:
+    # LOAD steps are queued while the site is still being walked
+    queued_count = 0
+    for file in sharepoint.iter_files(connection, SUPPORTED_FILES, modified_since=job.modified_since):
         file_id = file.object_id
         library_id = file.drive_id
         logger.info(f"scheduling a LOAD job for Sharepoint file {file_id} with Library id {library_id}")
         load_job_step = JobStep(JobType.LOAD, job_step.datasource, job_id=job.id, doc_id=f"{library_id}/{file_id}")
         chain.queue_job_step(job, load_job_step, connection, execute_now=False)
+        queued_count += 1
+
+    if not queued_count:
+        logger.warning(
+            f"no Sharepoint articles found (doc_id={job_step.doc_id})"
+        )
+        return
     chain.execute_job_steps(job)
@@ -1,8 +1,5 @@
-import tempfile
-from pathlib import Path
-from typing import List
+from typing import TYPE_CHECKING, List
 
-from O365.drive import DriveItem
 from langchain.schema import Document
 from loguru import logger
 
@@ -12,9 +9,14 @@ from connections.sharepoint.service import SharePoint
 from indexing.models import DocumentMetadata
 from indexing.service import IndexingJobChain
 from jobs.models import Job, JobStep
-from utils.langchain_utils import get_langchain_loader
+from utils.io_utils import spooled_temporary_file
+from utils.langchain_utils import load_documents
+from utils.metrics_utils import measure_stage
 from utils.text_utils import clean_text
 
+if TYPE_CHECKING:
+    from O365.drive import DriveItem
+
 
 def _parse_library_id_and_file_id_from_doc_id(doc_id: str) -> (str, str):
     details = doc_id.split('/')
@@ -25,17 +27,14 @@ def _parse_library_id_and_file_id_from_doc_id(doc_id: str) -> (str, str):
     return library_id, file_id
 
 
-def get_documents_from_file(file: DriveItem) -> List[Document]:
-    temporary_directory = tempfile.TemporaryDirectory()
-    temporary_file = Path(temporary_directory.name) / file.name
-    try:
-        with open(temporary_file, mode="wb") as output:
-            file.download(output=output, chunk_size=CHUNK_SIZE)
-        loader = get_langchain_loader(file.mime_type, str(temporary_file))
-        documents = loader.load()
-        return documents
-    finally:
-        temporary_file.unlink(missing_ok=True)
+def get_documents_from_file(file: 'DriveItem') -> List[Document]:
+    with spooled_temporary_file() as spooled_file:
+        with measure_stage('source_fetch'):
+            downloaded = file.download(output=spooled_file, chunk_size=CHUNK_SIZE)
+        if not downloaded:
+            raise RuntimeError(f"failed downloading Sharepoint file {file.object_id}")
+        spooled_file.seek(0)
+        return load_documents(file.mime_type, spooled_file, source=file.name)
 
 
 def load_sharepoint_article(job: Job, job_step: JobStep, chain: IndexingJobChain,
@@ -43,7 +42,8 @@ def load_sharepoint_article(job: Job, job_step: JobStep, chain: IndexingJobChain
     logger.info("loading Sharepoint file with {id}", id=job_step.doc_id)
     sharepoint = SharePoint()
     library_id, file_id = _parse_library_id_and_file_id_from_doc_id(job_step.doc_id)
-    file = sharepoint.get_file(connection, library_id, file_id)
+    with measure_stage('source_fetch'):
+        file = sharepoint.get_file(connection, library_id, file_id)
     if not file:
         logger.info(f"skipping loading Sharepoint file with id '{job_step.doc_id}', file not found.")
         return
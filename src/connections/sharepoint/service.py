@@ -1,16 +1,18 @@
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from datetime import datetime
-from typing import List
-
-from O365 import Account
-from O365.drive import Drive, File, DriveItem
-from O365.sharepoint import Site
+from typing import TYPE_CHECKING, Iterable, Iterator, List
 
+from config import Settings
 from connections.models import Connection
 from connections.service import ConnectionLoader
 from connections.sharepoint.models import SharePointConnection
 from helixplatform import ar_core_fields
 from helixplatform.models import Record
 
+if TYPE_CHECKING:
+    from O365.drive import Drive, DriveItem, Folder
+    from O365.sharepoint import Site
+
 
 class SharePointConnectionLoader(ConnectionLoader):
     FIELD_CLIENT_ID = 490000250
@@ -37,7 +39,9 @@ class SharePointConnectionLoader(ConnectionLoader):
 
 class SharePoint:
 
-    def _get_site(self, connection: SharePointConnection) -> Site:
+    def _get_site(self, connection: SharePointConnection) -> 'Site':
+        # O365 is slow to import: it is imported when first needed
+        from O365 import Account
         credentials = (connection.client_id, connection.client_secret)
         account = Account(credentials, auth_flow_type='credentials', tenant_id=connection.tenant_id)
         if not account.authenticate(store_token=False):
@@ -55,25 +59,57 @@ class SharePoint:
         path = f'{details[1]}/{details[2]}'
         return hostname, path
 
-    def get_all_files_from_folder(self, library: Drive, files: List[File], supported_files: List[str],
-                                  modified_since: datetime | None = None):
-        for file in library.get_items():
-            if file.is_folder:
-                self.get_all_files_from_folder(file, files, supported_files, modified_since)
-            else:
-                if file.mime_type in supported_files and (not modified_since or file.modified >= modified_since):
-                    files.append(file)
+    @staticmethod
+    def _is_crawlable(item: 'DriveItem', supported_files: List[str], modified_since: datetime | None = None) -> bool:
+        return item.mime_type in supported_files and (not modified_since or item.modified >= modified_since)
+
+    def walk_files(self, folders: Iterable['Drive | Folder'], supported_files: List[str],
+                   modified_since: datetime | None = None, max_workers: int | None = None) -> Iterator['DriveItem']:
+        """
+        Walks the specified libraries or folders and all their sub-folders, and yields the supported files as soon as
+        they are found.
 
-    def get_files(self, connection: SharePointConnection, supported_files: List[str],
-                  modified_since: datetime | None = None) -> List[str]:
+        Folders are listed concurrently by a bounded pool of threads, each listing feeding the sub-folders it finds
+        back into the pool. The order of the yielded files is therefore not deterministic.
+
+        :param folders: libraries (``Drive``) or folders to walk
+        :param supported_files: MIME types of the files to yield
+        :param modified_since: if specified, only the files modified since then are yielded
+        :param max_workers: max number of folders listed at a time. Defaults to `Settings.SHAREPOINT_CRAWL_WORKERS`.
+        """
+        executor = ThreadPoolExecutor(max_workers or Settings.SHAREPOINT_CRAWL_WORKERS,
+                                      thread_name_prefix='sharepoint_crawler')
+        try:
+            pending: set[Future] = {executor.submit(self._list_folder, folder) for folder in folders}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    for item in future.result():
+                        if item.is_folder:
+                            pending.add(executor.submit(self._list_folder, item))
+                        elif self._is_crawlable(item, supported_files, modified_since):
+                            yield item
+        finally:
+            # the generator may be closed early (by the consumer or on error): don't list any more folders
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    @staticmethod
+    def _list_folder(folder: 'Drive | Folder') -> List['DriveItem']:
+        # consumes the paging of the Graph API within the worker thread
+        return list(folder.get_items())
+
+    def iter_files(self, connection: SharePointConnection, supported_files: List[str],
+                   modified_since: datetime | None = None) -> Iterator['DriveItem']:
+        """ Yields the supported files of all the document libraries of the connection's site as they are found. """
         site = self._get_site(connection)
         libraries = site.list_document_libraries()
-        files = []
-        for library in libraries:
-            self.get_all_files_from_folder(library, files, supported_files, modified_since)
-        return files
+        yield from self.walk_files(libraries, supported_files, modified_since)
+
+    def get_files(self, connection: SharePointConnection, supported_files: List[str],
+                  modified_since: datetime | None = None) -> List['DriveItem']:
+        return list(self.iter_files(connection, supported_files, modified_since))
 
-    def get_file(self, connection: SharePointConnection, library_id: str, file_id: str, ) -> DriveItem:
+    def get_file(self, connection: SharePointConnection, library_id: str, file_id: str, ) -> 'DriveItem':
         site = self._get_site(connection)
         library = site.get_document_library(library_id)
         file = library.get_item(file_id)
@@ -0,0 +1,363 @@
+import os
+import re
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, List, Type
+
+import numpy as np
+from loguru import logger
+from prometheus_client import Counter, Histogram
+
+from config import Settings
+
+embedding_batch_seconds = Histogram('embedding_batch_seconds', 'Time spent embedding a batch of texts')
+embedding_batch_texts = Histogram('embedding_batch_texts', 'Number of texts embedded per batch',
+                                  buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256))
+embedding_tokens = Counter('embedding_tokens', 'Tokens embedded, special tokens included', ['kind'])
+
+
+def plan_batches(lengths: List[int], token_budget: int, max_batch_size: int) -> List[List[int]]:
+    """
+    Groups the texts of the specified lengths into batches of similar lengths, and returns the indexes of the texts
+    of each batch. A batch holds at most `max_batch_size` texts, and its padded size (number of texts times the
+    longest length) doesn't exceed `token_budget` unless it is made of a single text.
+    """
+    order = sorted(range(len(lengths)), key=lambda index: lengths[index], reverse=True)
+    batches = []
+    batch = []
+    for index in order:
+        # the texts come longest first: the first text of the batch sets its padded length
+        if batch and (len(batch) >= max_batch_size or (len(batch) + 1) * lengths[batch[0]] > token_budget):
+            batches.append(batch)
+            batch = []
+        batch.append(index)
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+class EmbeddingBackend(ABC):
+    """
+    Embeds texts with the embedding model, whose vectors are normalized, either in the process (see
+    `LocalEmbeddingBackend`) or with the embedding server (see `embeddings.server.RemoteEmbeddingBackend`).
+
+    The texts can be embedded from the ids of their tokens (see `chunking.service.TokenizedChunk`), without the
+    special tokens, which the backend adds.
+    """
+
+    name: str
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+
+    @property
+    @abstractmethod
+    def tokenizer(self):
+        """ The (fast) Hugging Face tokenizer of the model. """
+        pass
+
+    @property
+    @abstractmethod
+    def max_seq_length(self) -> int:
+        """ Max number of tokens of the model input, special tokens included. """
+        pass
+
+    def embed_texts(self, texts: List[str]) -> List[List[float]]:
+        token_ids = self.tokenizer(texts, add_special_tokens=False, truncation=True,
+                                   max_length=self.max_token_count, verbose=False)['input_ids']
+        return self.embed_token_ids(token_ids)
+
+    @abstractmethod
+    def embed_token_ids(self, token_ids: List[List[int]]) -> List[List[float]]:
+        """ Returns the embeddings of the texts of the specified token ids, in their order. """
+        pass
+
+    @property
+    def max_token_count(self) -> int:
+        """ Max number of tokens of a text, special tokens excluded. """
+        return self.max_seq_length - self.tokenizer.num_special_tokens_to_add(pair=False)
+
+
+class LocalEmbeddingBackend(EmbeddingBackend):
+    """
+    Runs the embedding model in the process. Implementations are registered in `EMBEDDING_BACKENDS` and selected by
+    `Settings.EMBEDDING_BACKEND`.
+    """
+
+    def __init__(self, model_name: str, threads: int):
+        super().__init__(model_name)
+        self.threads = threads
+
+    @abstractmethod
+    def embed_batch(self, input_ids: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+        """ Returns the normalized embeddings of a padded batch of inputs, special tokens included. """
+        pass
+
+    def embed_token_ids(self, token_ids: List[List[int]]) -> List[List[float]]:
+        """
+        Embeds the texts by batches of similar lengths (see `plan_batches()`), which limits the padding: short texts
+        are embedded many at a time, long ones a few at a time. The embeddings are returned in the order of the texts.
+        """
+        special_token_count = self.tokenizer.num_special_tokens_to_add(pair=False)
+        token_ids = [ids[:self.max_seq_length - special_token_count] for ids in token_ids]
+        batches = plan_batches([len(ids) + special_token_count for ids in token_ids],
+                               Settings.EMBEDDING_BATCH_TOKEN_BUDGET, Settings.EMBEDDING_MAX_BATCH_SIZE)
+        embeddings: List[List[float] | None] = [None] * len(token_ids)
+        padded_token_count = 0
+        for batch in batches:
+            input_ids = [self.tokenizer.build_inputs_with_special_tokens(token_ids[index]) for index in batch]
+            features = self.tokenizer.pad({'input_ids': input_ids}, return_tensors='np')
+            start_time = time.perf_counter()
+            batch_embeddings = self.embed_batch(features['input_ids'], features['attention_mask'])
+            embedding_batch_seconds.observe(time.perf_counter() - start_time)
+            embedding_batch_texts.observe(len(batch))
+            padded_token_count += features['attention_mask'].size
+            for index, embedding in zip(batch, batch_embeddings.tolist()):
+                embeddings[index] = embedding
+
+        token_count = sum(len(ids) + special_token_count for ids in token_ids)
+        embedding_tokens.labels('text').inc(token_count)
+        embedding_tokens.labels('padding').inc(padded_token_count - token_count)
+        logger.trace(f"Embedded {len(token_ids)} texts in {len(batches)} batches,"
+                     f" {padded_token_count - token_count} padding tokens out of {padded_token_count}")
+        return embeddings
+
+
+class SentenceTransformerBackend(LocalEmbeddingBackend):
+    """
+    Runs the sentence-transformers (PyTorch) model, as `langchain.embeddings.SentenceTransformerEmbeddings`.
+
+    With `shared_weights`, the weights are saved to a file on first use, which is then memory-mapped read-only
+    (requires torch 2.1): the processes of the node loading the model share its pages rather than each having its
+    own copy of the weights.
+    """
+
+    name = 'torch'
+
+    def __init__(self, model_name: str, threads: int, shared_weights: bool = False):
+        super().__init__(model_name, threads)
+        import torch
+        from sentence_transformers import SentenceTransformer
+        if threads:
+            torch.set_num_threads(threads)
+        self.model = SentenceTransformer(model_name)
+        self.model.eval()  # `forward()` is called directly, without `encode()` disabling the dropout
+        if shared_weights:
+            self.__map_weights()
+
+    def __map_weights(self):
+        import torch
+        if tuple(int(part) for part in re.findall(r'\d+', torch.__version__)[:2]) < (2, 1):
+            raise RuntimeError(f'shared weights (EMBEDDING_SHARED_WEIGHTS) require torch 2.1 or later, not'
+                               f' {torch.__version__}')
+        weights_path = get_torch_weights_path(self.model_name)
+        if not os.path.exists(weights_path):
+            logger.info(f"Saving the weights of the embedding model {self.model_name} to {weights_path}")
+            os.makedirs(os.path.dirname(weights_path), exist_ok=True)
+            temporary_path = f'{weights_path}.{os.getpid()}.tmp'
+            torch.save(self.model.state_dict(), temporary_path)
+            _publish_file(temporary_path, weights_path)
+        # the weights loaded by the constructor are released as they are replaced by the memory-mapped ones
+        state_dict = torch.load(weights_path, mmap=True, weights_only=True)
+        self.model.load_state_dict(state_dict, assign=True)
+        logger.info(f"Memory-mapped the weights of the embedding model {weights_path}")
+
+    @property
+    def tokenizer(self):
+        return self.model.tokenizer
+
+    @property
+    def max_seq_length(self) -> int:
+        return self.model.max_seq_length
+
+    def embed_batch(self, input_ids: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+        import torch
+        features = {'input_ids': torch.from_numpy(input_ids).to(self.model.device),
+                    'attention_mask': torch.from_numpy(attention_mask).to(self.model.device)}
+        with torch.no_grad():
+            embeddings = self.model.forward(features)['sentence_embedding']
+            return torch.nn.functional.normalize(embeddings, p=2, dim=1).cpu().numpy()
+
+
+class OnnxBackend(LocalEmbeddingBackend):
+    """
+    Runs the model with ONNX Runtime, which is faster than PyTorch on CPU and uses less memory, especially once the
+    weights are quantized to int8 (`Settings.EMBEDDING_ONNX_QUANTIZE`). Requires `onnxruntime`.
+
+    The transformer of the model is exported to ONNX on first use, which requires `torch` and `transformers`, and
+    kept in `Settings.EMBEDDING_ONNX_DIR`. The token embeddings are mean pooled, as by the e5 models.
+
+    With `shared_weights`, the weights are stored in a separate file, which ONNX Runtime memory-maps: the processes
+    of the node loading the model share its pages. The weights then can't be prepacked for the matrix
+    multiplications, which makes the inference slower (see `benchmarks/shared_weights.py`).
+    """
+
+    name = 'onnx'
+
+    def __init__(self, model_name: str, threads: int, quantize: bool = False, model_dir: str | None = None,
+                 shared_weights: bool = False):
+        super().__init__(model_name, threads)
+        import onnxruntime
+        from transformers import AutoTokenizer
+        self.__tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.__max_seq_length = min(self.__tokenizer.model_max_length, Settings.EMBEDDING_MAX_SEQ_LENGTH)
+        model_path = get_onnx_model_path(model_name, quantize, model_dir)
+        if not os.path.exists(model_path):
+            export_onnx_model(model_name, self.__tokenizer, model_path, quantize)
+
+        session_options = onnxruntime.SessionOptions()
+        session_options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        session_options.inter_op_num_threads = 1
+        if threads:
+            session_options.intra_op_num_threads = threads
+        if shared_weights:
+            shared_model_path = get_onnx_model_path(model_name, quantize, model_dir, shared_weights=True)
+            if not os.path.exists(shared_model_path):
+                save_onnx_model_with_external_weights(model_path, shared_model_path)
+            model_path = shared_model_path
+            # the prepacked weights would be private copies of the memory-mapped ones
+            session_options.add_session_config_entry('session.disable_prepacking', '1')
+        self.session = onnxruntime.InferenceSession(model_path, session_options,
+                                                    providers=['CPUExecutionProvider'])
+        logger.info(f"Loaded the ONNX embedding model {model_path}")
+
+    @property
+    def tokenizer(self):
+        return self.__tokenizer
+
+    @property
+    def max_seq_length(self) -> int:
+        return self.__max_seq_length
+
+    def embed_batch(self, input_ids: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+        input_ids = input_ids.astype(np.int64)
+        attention_mask = attention_mask.astype(np.int64)
+        token_embeddings = self.session.run(['last_hidden_state'],
+                                            {'input_ids': input_ids, 'attention_mask': attention_mask})[0]
+        mask = attention_mask[:, :, np.newaxis].astype(token_embeddings.dtype)
+        embeddings = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        return embeddings / np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+
+
+def get_onnx_model_path(model_name: str, quantize: bool, model_dir: str | None = None,
+                        shared_weights: bool = False) -> str:
+    model_dir = model_dir or Settings.EMBEDDING_ONNX_DIR or os.path.join(
+        Settings.SCRATCH_DIR or tempfile.gettempdir(), 'onnx')
+    filename = re.sub(r'[^\w.-]', '_', model_name) + ('.int8' if quantize else '') + (
+        '.shared' if shared_weights else '') + '.onnx'
+    return os.path.join(model_dir, filename)
+
+
+def get_torch_weights_path(model_name: str) -> str:
+    model_dir = os.path.join(Settings.SCRATCH_DIR or tempfile.gettempdir(), 'torch')
+    return os.path.join(model_dir, re.sub(r'[^\w.-]', '_', model_name) + '.pt')
+
+
+def _publish_file(temporary_path: str, path: str) -> bool:
+    """
+    Moves the file, written by this process, to `path` unless another process already did, in which case the file is
+    removed: all the processes then memory-map the same file. Returns whether the file was moved.
+    """
+    try:
+        os.link(temporary_path, path)  # unlike `os.replace()`, fails if the path exists
+        return True
+    except FileExistsError:
+        return False
+    finally:
+        os.remove(temporary_path)
+
+
+def save_onnx_model_with_external_weights(model_path: str, shared_model_path: str):
+    """ Saves the ONNX model with its weights in a separate file, which ONNX Runtime memory-maps. Requires `onnx`. """
+    import onnx
+    logger.info(f"Saving the ONNX embedding model {model_path} with external weights")
+    model = onnx.load(model_path)
+    # the weights file is specific to the process, as other processes may be saving the model too: the weights of the
+    # processes whose model wasn't the first one saved are removed
+    weights_filename = f'{os.path.basename(shared_model_path)}.{os.getpid()}.data'
+    temporary_path = f'{shared_model_path}.{os.getpid()}.tmp'
+    onnx.save_model(model, temporary_path, save_as_external_data=True, all_tensors_to_one_file=True,
+                    location=weights_filename)
+    if not _publish_file(temporary_path, shared_model_path):
+        os.remove(os.path.join(os.path.dirname(shared_model_path), weights_filename))
+
+
+def export_onnx_model(model_name: str, tokenizer, model_path: str, quantize: bool):
+    """ Exports the transformer of the model to ONNX, its weights optionally quantized to int8 (dynamically). """
+    if quantize:
+        fp32_model_path = get_onnx_model_path(model_name, quantize=False, model_dir=os.path.dirname(model_path))
+        if not os.path.exists(fp32_model_path):
+            export_onnx_model(model_name, tokenizer, fp32_model_path, quantize=False)
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        logger.info(f"Quantizing the ONNX embedding model {fp32_model_path} to int8")
+        temporary_path = f'{model_path}.{os.getpid()}.tmp'
+        quantize_dynamic(fp32_model_path, temporary_path, weight_type=QuantType.QInt8)
+        os.replace(temporary_path, model_path)
+        return
+
+    import torch
+    from transformers import AutoModel
+    logger.info(f"Exporting the embedding model {model_name} to ONNX")
+    os.makedirs(os.path.dirname(model_path), exist_ok=True)
+    model = AutoModel.from_pretrained(model_name)
+    model.eval()
+    sample = tokenizer(['passage: sample'], return_tensors='pt')
+    # exported to a temporary file first, as other processes may be loading the model
+    temporary_path = f'{model_path}.{os.getpid()}.tmp'
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            (sample['input_ids'], sample['attention_mask']),
+            temporary_path,
+            input_names=['input_ids', 'attention_mask'],
+            output_names=['last_hidden_state'],
+            dynamic_axes={
+                'input_ids': {0: 'batch', 1: 'sequence'},
+                'attention_mask': {0: 'batch', 1: 'sequence'},
+                'last_hidden_state': {0: 'batch', 1: 'sequence'},
+            },
+            opset_version=14)
+    os.replace(temporary_path, model_path)
+
+
+EMBEDDING_BACKENDS: Dict[str, Type[EmbeddingBackend]] = {
+    SentenceTransformerBackend.name: SentenceTransformerBackend,
+    OnnxBackend.name: OnnxBackend,
+}
+
+_embedding_backend: EmbeddingBackend | None = None
+_embedding_backend_lock = threading.Lock()
+
+
+def create_embedding_backend(name: str | None = None) -> EmbeddingBackend:
+    """ Creates the backend of the specified name, defaulting to `Settings.EMBEDDING_BACKEND`. """
+    name = name or Settings.EMBEDDING_BACKEND
+    if name not in EMBEDDING_BACKENDS:
+        raise ValueError(f'unsupported embedding backend: {name}')
+    logger.info(f"Loading the embedding model {Settings.EMBEDDING_MODEL} with the {name} backend")
+    if name == OnnxBackend.name:
+        return OnnxBackend(Settings.EMBEDDING_MODEL, Settings.EMBEDDING_THREADS,
+                           quantize=Settings.EMBEDDING_ONNX_QUANTIZE, shared_weights=Settings.EMBEDDING_SHARED_WEIGHTS)
+    return EMBEDDING_BACKENDS[name](Settings.EMBEDDING_MODEL, Settings.EMBEDDING_THREADS,
+                                    shared_weights=Settings.EMBEDDING_SHARED_WEIGHTS)
+
+
+def get_embedding_backend() -> EmbeddingBackend:
+    """
+    Returns the backend shared by the whole process, which loads the model on first call, or else connects to the
+    embedding server at `Settings.EMBEDDING_SERVER_ADDRESS` when it is set.
+    """
+    global _embedding_backend
+    with _embedding_backend_lock:
+        if _embedding_backend is None:
+            if Settings.EMBEDDING_SERVER_ADDRESS:
+                from embeddings.server import RemoteEmbeddingBackend
+                _embedding_backend = RemoteEmbeddingBackend(Settings.EMBEDDING_SERVER_ADDRESS,
+                                                            authkey=Settings.EMBEDDING_SERVER_AUTHKEY,
+                                                            connect_timeout=Settings.EMBEDDING_SERVER_CONNECT_TIMEOUT,
+                                                            request_timeout=Settings.EMBEDDING_SERVER_REQUEST_TIMEOUT)
+            else:
+                _embedding_backend = create_embedding_backend()
+        return _embedding_backend
@@ -0,0 +1,308 @@
+"""
+Embedding server: a process owning the embedding model, shared by all the API worker processes of the node, which
+then only load the tokenizer of the model (see `RemoteEmbeddingBackend`). The texts to embed by all the callers are
+batched together.
+
+    cd src && python -m embeddings.server [--address /tmp/embeddings.sock]
+
+The workers use the server listening at `Settings.EMBEDDING_SERVER_ADDRESS`, when it is set.
+"""
+import argparse
+import ipaddress
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing.connection import Client, Connection, Listener
+from typing import List, Tuple
+
+import numpy as np
+from loguru import logger
+
+from config import Settings
+from embeddings.backends import EmbeddingBackend, LocalEmbeddingBackend, create_embedding_backend
+
+# How often the connection is attempted again while the server isn't listening (e.g., still loading the model).
+CONNECT_RETRY_INTERVAL: float = 1
+
+
+class EmbeddingServerError(Exception):
+    """ Raised when the embedding server can't be reached or failed to embed texts. """
+
+
+def parse_address(address: str, authkey: str | None = None) -> Tuple[str | Tuple[str, int], str]:
+    """
+    Returns the address and the family of a `host:port` address or of a Unix socket path. As the requests and the
+    responses are pickled, the server only listens on the loopback interface, and only with an authkey on TCP (which
+    any local user can connect to): raises `ValueError` otherwise.
+    """
+    host, separator, port = address.rpartition(':')
+    if not separator or not port.isdigit() or address.startswith('/'):
+        return address, 'AF_UNIX'
+    host = host.strip('[]') or 'localhost'
+    if not _is_loopback(host):
+        raise ValueError(f'the embedding server only listens on the loopback interface, not on {host}')
+    if not authkey:
+        raise ValueError('an authkey is required for the embedding server to listen on TCP')
+    return (host, int(port)), 'AF_INET'
+
+
+def _is_loopback(host: str) -> bool:
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def _get_authkey(authkey: str | None) -> bytes | None:
+    return authkey.encode('utf-8') if authkey else None
+
+
+def _check_token_ids(token_ids) -> List[List[int]]:
+    """ Returns the token ids of an embed request, checked to be lists of ints: raises `ValueError` otherwise. """
+    if not isinstance(token_ids, list) or not all(
+            isinstance(ids, list) and all(type(token_id) is int for token_id in ids) for ids in token_ids):
+        raise ValueError(f'the token ids must be lists of ints, not {token_ids!r:.100}')
+    return token_ids
+
+
+class EmbeddingServer:
+    """
+    Serves the embeddings computed by the backend. Each client connection is handled by a thread, which queues the
+    texts received; a single thread embeds the texts queued by all the connections within `max_batch_wait` seconds
+    at once, so that the backend forms its batches (see `embeddings.backends.plan_batches()`) across the callers.
+
+    Requests are tuples: `('info',)` returns the model name and max input length, `('embed', token_ids)` returns
+    the embeddings, as a float32 array. Responses are `(True, result)` or `(False, error message)`. The token ids are
+    checked before being batched with the ones of the other callers, and when a batch fails, its requests are
+    embedded one by one so that a request only fails the callers having sent it.
+    """
+
+    def __init__(self, backend: LocalEmbeddingBackend, address: str, authkey: str | None = None,
+                 max_batch_wait: float = 0.01):
+        self.backend = backend
+        self.address = address
+        self.max_batch_wait = max_batch_wait
+        listener_address, family = self.__listener_address = parse_address(address, authkey)
+        self.__authkey = _get_authkey(authkey)
+        if family == 'AF_UNIX':
+            if os.path.exists(listener_address):
+                os.remove(listener_address)  # left by a previous server
+            # only the user running the server can connect to the socket, which is created readable by it only
+            umask = os.umask(0o177)
+            try:
+                self.__listener = Listener(listener_address, family, authkey=self.__authkey)
+            finally:
+                os.umask(umask)
+            os.chmod(listener_address, 0o600)
+        else:
+            self.__listener = Listener(listener_address, family, authkey=self.__authkey)
+        self.__requests: queue.Queue[Tuple[List[List[int]], Future] | None] = queue.Queue()
+        self.__closed = threading.Event()
+        self.__serving = False
+
+    def serve_forever(self):
+        threading.Thread(target=self.__embed_requests, name='embedder', daemon=True).start()
+        logger.info(f"Embedding server listening at {self.address}")
+        self.__serving = True
+        try:
+            while not self.__closed.is_set():
+                try:
+                    connection = self.__listener.accept()
+                except OSError:
+                    if self.__closed.is_set():
+                        break
+                    logger.exception("Failed to accept an embedding client")
+                    continue
+                if self.__closed.is_set():
+                    connection.close()
+                    break
+                threading.Thread(target=self.__serve_connection, args=(connection,), name='embedding-client',
+                                 daemon=True).start()
+        finally:
+            self.__serving = False
+
+    def shutdown(self):
+        self.__closed.set()
+        self.__requests.put(None)
+        # closing the listener doesn't interrupt `accept()`, which a last connection does
+        if self.__serving:
+            try:
+                Client(*self.__listener_address, authkey=self.__authkey).close()
+            except OSError:
+                pass
+        self.__listener.close()
+
+    def embed(self, token_ids: List[List[int]]) -> List[List[float]]:
+        """ Embeds the texts along with the ones of the other callers. """
+        future = Future()
+        self.__requests.put((token_ids, future))
+        return future.result()
+
+    def __serve_connection(self, connection: Connection):
+        with connection:
+            while True:
+                try:
+                    request = connection.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    match request:
+                        case ('info',):
+                            result = {'model_name': self.backend.model_name,
+                                      'max_seq_length': self.backend.max_seq_length}
+                        case ('embed', token_ids):
+                            result = np.asarray(self.embed(_check_token_ids(token_ids)), dtype=np.float32)
+                        case _:
+                            raise ValueError(f'unsupported request: {request!r:.100}')
+                    response = (True, result)
+                except Exception as e:
+                    logger.exception("Failed to serve an embedding request")
+                    response = (False, f'{type(e).__name__}: {e}')
+                try:
+                    connection.send(response)
+                except OSError:
+                    return
+
+    def __embed_requests(self):
+        while (request := self.__requests.get()) is not None:
+            requests = [request]
+            deadline = time.monotonic() + self.max_batch_wait
+            while (timeout := deadline - time.monotonic()) > 0:
+                try:
+                    request = self.__requests.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if request is None:
+                    self.__requests.put(None)
+                    break
+                requests.append(request)
+
+            # the callers wait for their future: it must be resolved whatever happens
+            try:
+                self.__embed_batch(requests)
+            except Exception as e:
+                logger.exception("Failed to embed a batch of requests")
+                for _, future in requests:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def __embed_batch(self, requests: List[Tuple[List[List[int]], Future]]):
+        token_ids = [ids for request_token_ids, _ in requests for ids in request_token_ids]
+        try:
+            embeddings = self.backend.embed_token_ids(token_ids)
+        except Exception as e:
+            if len(requests) == 1:
+                requests[0][1].set_exception(e)
+                return
+            logger.warning(f"Failed to embed a batch of {len(requests)} requests, embedding them one by one: {e}")
+            for request in requests:
+                self.__embed_batch([request])
+            return
+        start = 0
+        for request_token_ids, future in requests:
+            future.set_result(embeddings[start:start + len(request_token_ids)])
+            start += len(request_token_ids)
+
+
+class RemoteEmbeddingBackend(EmbeddingBackend):
+    """
+    Embeds the texts with the embedding server at `address`. Only the tokenizer of the model is loaded, to tokenize
+    the texts and size the chunks. Each thread has its own connection to the server, reconnected when it breaks, and
+    closed when the server doesn't respond within `request_timeout` seconds.
+    """
+
+    name = 'remote'
+
+    def __init__(self, address: str, authkey: str | None = None, tokenizer=None, connect_timeout: float = 120,
+                 request_timeout: float = 300):
+        self.address = address
+        self.authkey = authkey
+        self.connect_timeout = connect_timeout
+        self.request_timeout = request_timeout
+        self.__local = threading.local()
+        info = self.__request('info')
+        super().__init__(info['model_name'])
+        self.__max_seq_length = info['max_seq_length']
+        if tokenizer is None:
+            from transformers import AutoTokenizer
+            tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+        self.__tokenizer = tokenizer
+        logger.info(f"Using the embedding server at {address}, serving the model {self.model_name}")
+
+    @property
+    def tokenizer(self):
+        return self.__tokenizer
+
+    @property
+    def max_seq_length(self) -> int:
+        return self.__max_seq_length
+
+    def embed_token_ids(self, token_ids: List[List[int]]) -> List[List[float]]:
+        if not token_ids:
+            return []
+        special_token_count = self.tokenizer.num_special_tokens_to_add(pair=False)
+        token_ids = [ids[:self.max_seq_length - special_token_count] for ids in token_ids]
+        return self.__request('embed', token_ids).tolist()
+
+    def __connect(self) -> Connection:
+        address, family = parse_address(self.address, self.authkey)
+        deadline = time.monotonic() + self.connect_timeout
+        while True:
+            try:
+                return Client(address, family, authkey=_get_authkey(self.authkey))
+            except (FileNotFoundError, ConnectionRefusedError) as e:
+                if time.monotonic() > deadline:
+                    raise EmbeddingServerError(f'the embedding server at {self.address} is unreachable: {e}') from e
+                time.sleep(CONNECT_RETRY_INTERVAL)
+
+    def __request(self, *request):
+        # a broken connection (e.g., the server restarted) is reconnected once
+        for attempt in range(2):
+            connection = getattr(self.__local, 'connection', None)
+            if connection is None:
+                connection = self.__local.connection = self.__connect()
+            try:
+                connection.send(request)
+                if not connection.poll(self.request_timeout):
+                    # the response, if it ever comes, mustn't be read as the one of the next request
+                    connection.close()
+                    self.__local.connection = None
+                    raise EmbeddingServerError(f'the embedding server at {self.address} did not respond within'
+                                               f' {self.request_timeout}s')
+                succeeded, result = connection.recv()
+                break
+            except (EOFError, OSError) as e:
+                connection.close()
+                self.__local.connection = None
+                if attempt:
+                    raise EmbeddingServerError(f'lost the connection to the embedding server: {e}') from e
+        if not succeeded:
+            raise EmbeddingServerError(f'the embedding server failed: {result}')
+        return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--address', default=Settings.EMBEDDING_SERVER_ADDRESS,
+                        help='Unix socket path or localhost:port to listen at')
+    args = parser.parse_args()
+    if not args.address:
+        parser.error('the address is required when EMBEDDING_SERVER_ADDRESS is not set')
+
+    server = EmbeddingServer(create_embedding_backend(), args.address, authkey=Settings.EMBEDDING_SERVER_AUTHKEY,
+                             max_batch_wait=Settings.EMBEDDING_SERVER_MAX_BATCH_WAIT)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    from utils.logging_utils import setup_logging
+
+    setup_logging()
+    main()
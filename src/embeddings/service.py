@@ -1,4 +1,97 @@
-from langchain.embeddings import SentenceTransformerEmbeddings
+import threading
+import time
+from typing import List
 
-embeddings_function = SentenceTransformerEmbeddings(model_name='intfloat/multilingual-e5-base',
-                                                    encode_kwargs={'normalize_embeddings': True})
+from langchain.schema import Document
+from loguru import logger
+
+from config import Settings
+from embeddings.backends import get_embedding_backend
+from health.constants import HealthStatus
+from health.models import Health, HealthIndicator
+from utils.memory_utils import get_memory_usage
+
+_embedding_model_ready = threading.Event()
+
+# Time waited before warming the model up again after a failure (e.g., while downloading the model or connecting to the
+# embedding server), in seconds, doubled after each failure up to WARM_UP_MAX_RETRY_BACKOFF.
+WARM_UP_RETRY_BACKOFF: float = 1
+WARM_UP_MAX_RETRY_BACKOFF: float = 300
+
+
+def embed_chunks(chunks: List[Document]) -> List[List[float]]:
+    """
+    Returns the normalized embeddings of the chunks. Chunks that were tokenized by the token chunker (see
+    `chunking.service.TokenizedChunk`) aren't tokenized again.
+    """
+    if chunks and all(getattr(chunk, 'token_ids', None) for chunk in chunks):
+        return embed_token_ids([chunk.token_ids for chunk in chunks])
+    return embed_texts([chunk.page_content for chunk in chunks])
+
+
+def embed_texts(texts: List[str]) -> List[List[float]]:
+    return get_embedding_backend().embed_texts(texts)
+
+
+def embed_token_ids(token_ids: List[List[int]]) -> List[List[float]]:
+    """ Returns the normalized embeddings of texts already tokenized by the model tokenizer, without the special
+    tokens. """
+    return get_embedding_backend().embed_token_ids(token_ids)
+
+
+def get_embedding_model_id() -> str:
+    """
+    Returns the identity of the vectors computed by the configured model and backend e.g.,
+    `intfloat/multilingual-e5-base onnx-int8`: vectors of different identities must not be mixed up.
+    """
+    backend = Settings.EMBEDDING_BACKEND
+    if backend == 'onnx' and Settings.EMBEDDING_ONNX_QUANTIZE:
+        backend += '-int8'
+    return f'{Settings.EMBEDDING_MODEL} {backend}'
+
+
+def warm_up_embedding_model():
+    """
+    Loads the embedding model and the token chunker built from its tokenizer, and embeds a text, so that the first
+    job doesn't wait for them. The application is ready once it is done (see `EmbeddingModelHealthIndicator`).
+    """
+    from chunking.service import get_token_chunker
+    start_time = time.perf_counter()
+    get_embedding_backend()
+    loaded_time = time.perf_counter()
+    get_token_chunker()
+    embed_texts([Settings.CHUNK_PREFIX + 'warm-up'])
+    _embedding_model_ready.set()
+    logger.info(f"Embedding model loaded in {loaded_time - start_time:.2f}s,"
+                f" warmed up in {time.perf_counter() - loaded_time:.2f}s. Process memory: {get_memory_usage()}")
+
+
+def start_embedding_model_warm_up() -> threading.Thread:
+    """
+    Warms the embedding model up in a background thread, so that the application starts without waiting. The warm-up
+    is retried with an exponential backoff until it succeeds, so that a transient failure doesn't leave the
+    application unready.
+    """
+
+    def warm_up():
+        backoff = WARM_UP_RETRY_BACKOFF
+        while True:
+            try:
+                warm_up_embedding_model()
+                return
+            except Exception:
+                logger.exception(f"Failed to load the embedding model, retrying in {backoff:g}s")
+            time.sleep(backoff)
+            backoff = min(backoff * 2, WARM_UP_MAX_RETRY_BACKOFF)
+
+    thread = threading.Thread(target=warm_up, name='embedding-warm-up', daemon=True)
+    thread.start()
+    return thread
+
+
+class EmbeddingModelHealthIndicator(HealthIndicator):
+    """ Down until the embedding model is warmed up, when `Settings.EMBEDDING_WARM_UP` is enabled. """
+
+    def get_health(self) -> Health:
+        ready = not Settings.EMBEDDING_WARM_UP or _embedding_model_ready.is_set()
+        return Health(name='embeddingModel', status=HealthStatus.UP if ready else HealthStatus.DOWN)
@@ -5,6 +5,7 @@ from fastapi.encoders import jsonable_encoder
 from fastapi.responses import JSONResponse
 from loguru import logger
 
+from embeddings.service import EmbeddingModelHealthIndicator
 from helixplatform.service import HelixPlatformHealthIndicator
 from opensearch.client import IndexHealthIndicator
 
@@ -22,7 +23,8 @@ health_router = APIRouter(
 def readiness_components() -> Sequence[HealthIndicator]:
     return [
         HelixPlatformHealthIndicator(),
-        IndexHealthIndicator()
+        IndexHealthIndicator(),
+        EmbeddingModelHealthIndicator()
     ]
 
 
@@ -23,7 +23,8 @@ from helixplatform.models import Record, record_to_request_files, record_to_json
 from utils.collections_utils import copy_dict_without_none_values, join_int_iterable
 from utils.file_types_utils import ContentType
 from utils.http_utils import get_content_disposition_filename, parse_rfc_5322_datetime
-from utils.requests_utils import FilteringAdapter, LoggingFilter, AdapterFilter, AdapterFilterChain
+from utils.requests_utils import FilteringAdapter, LoggingFilter, AdapterFilter, AdapterFilterChain, \
+    RetryFilter, StageMetricsFilter, TracingFilter
 
 
 class NoArJwtCookiePolicy(cookiejar.DefaultCookiePolicy):
@@ -191,6 +192,8 @@ class ArErrorFilter(AdapterFilter):
 #   `display_id`: field "Request ID" (1)
 #   `guid`: field "GUID" (179), which is not the same as field 379 (when both exists)
 class ArRestClient:
+    # retries the calls failing transiently (see `RetryFilter`)
+    retry_transient_errors = True
 
     def __init__(self, base_url: str, username: str, password: str, impersonated_user: str = None):
         """
@@ -210,7 +213,10 @@ class ArRestClient:
         self.session = requests.Session()
         self.session.cookies.set_policy(NoArJwtCookiePolicy())
 
-        adapter_filters = [ArErrorFilter(), self.ar_auth_filter, LoggingFilter()]
+        adapter_filters = [StageMetricsFilter('source_fetch')]
+        if self.retry_transient_errors:
+            adapter_filters.append(RetryFilter(type(self).__name__))
+        adapter_filters += [TracingFilter(), ArErrorFilter(), self.ar_auth_filter, LoggingFilter()]
         if self.impersonated_user:
             logger.info(
                 '{client} session will impersonate user "{user}"',
@@ -503,6 +509,8 @@ class InnovationSuite(ArRestClient):
 
 
 class HelixPlatformHealthIndicator(ArRestClient, HealthIndicator):
+    # the health is checked periodically, it is reported as it is
+    retry_transient_errors = False
 
     def __init__(self, ):
         super().__init__(
@@ -0,0 +1,197 @@
+import hashlib
+import re
+import threading
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+import numpy as np
+from langchain.schema import Document
+from loguru import logger
+from prometheus_client import Counter
+
+from config import Settings
+from embeddings.service import embed_chunks, get_embedding_model_id
+from opensearch.client import OpenSearchClient
+
+# MinHash signatures of the word 3-grams of the chunks, split into LSH bands: two chunks sharing a band are
+# candidate near duplicates, which is likely above a Jaccard similarity of about (1 / BANDS) ** (1 / ROWS) = 0.7.
+SHINGLE_SIZE = 3
+LSH_BANDS = 16
+LSH_ROWS = 8
+MINHASH_PERMUTATIONS = LSH_BANDS * LSH_ROWS
+_MERSENNE_PRIME = (1 << 61) - 1
+_random = np.random.RandomState(seed=1)  # the signatures must be the same in every process
+_PERMUTATION_A = _random.randint(1, 1 << 31, size=(MINHASH_PERMUTATIONS, 1), dtype=np.uint64)
+_PERMUTATION_B = _random.randint(0, 1 << 31, size=(MINHASH_PERMUTATIONS, 1), dtype=np.uint64)
+
+WORD_PATTERN = re.compile(r'\w+')
+
+deduplicated_chunks = Counter(
+    'deduplicated_chunks', 'Duplicate chunks whose vector was reused or which were not stored', ['kind', 'action'])
+
+
+@dataclass(frozen=True)
+class ChunkFingerprint:
+    content_hash: str
+    signature: np.ndarray  # MinHash signature, of MINHASH_PERMUTATIONS values
+
+    def band_keys(self) -> List[bytes]:
+        bands = self.signature.reshape(LSH_BANDS, LSH_ROWS)
+        return [band.tobytes() + bytes([index]) for index, band in enumerate(bands)]
+
+    def similarity(self, other: 'ChunkFingerprint') -> float:
+        """ Estimates the Jaccard similarity of the word 3-grams of both chunks. """
+        return float(np.count_nonzero(self.signature == other.signature)) / MINHASH_PERMUTATIONS
+
+
+def fingerprint_text(text: str) -> ChunkFingerprint:
+    content_hash = hashlib.blake2b(' '.join(text.split()).encode('utf-8'), digest_size=16).hexdigest()
+    words = WORD_PATTERN.findall(text.lower())
+    shingles = {' '.join(words[index:index + SHINGLE_SIZE]) for index in range(max(1, len(words) - SHINGLE_SIZE + 1))}
+    shingle_hashes = np.fromiter((zlib.crc32(shingle.encode('utf-8')) for shingle in shingles),
+                                 dtype=np.uint64, count=len(shingles))
+    signature = ((_PERMUTATION_A * shingle_hashes + _PERMUTATION_B) % _MERSENNE_PRIME).min(axis=1)
+    return ChunkFingerprint(content_hash, signature)
+
+
+class DuplicateIndex:
+    """
+    Finds the chunks, which are the same as or similar to chunks added before, and returns the value (e.g., vector)
+    added along with them. Only the same chunks are found when `near_duplicate_threshold` is `None`. When
+    `max_entries` is specified, the least recently used chunks are forgotten beyond it.
+    """
+
+    def __init__(self, near_duplicate_threshold: float | None, max_entries: int | None = None):
+        self.near_duplicate_threshold = near_duplicate_threshold
+        self.max_entries = max_entries
+        self.__entries: OrderedDict[str, Tuple[ChunkFingerprint, object]] = OrderedDict()
+        self.__bands: Dict[bytes, str] = {}
+        self.__lock = threading.Lock()
+
+    def find(self, fingerprint: ChunkFingerprint) -> Tuple[str, object] | None:
+        """ Returns the kind of duplicate found (`exact` or `near`) and the value of the original, or else `None`. """
+        with self.__lock:
+            if entry := self.__entries.get(fingerprint.content_hash):
+                self.__entries.move_to_end(fingerprint.content_hash)
+                return 'exact', entry[1]
+            if self.near_duplicate_threshold is None:
+                return None
+            for band_key in fingerprint.band_keys():
+                content_hash = self.__bands.get(band_key)
+                if content_hash and (entry := self.__entries.get(content_hash)) \
+                        and fingerprint.similarity(entry[0]) >= self.near_duplicate_threshold:
+                    self.__entries.move_to_end(content_hash)
+                    return 'near', entry[1]
+            return None
+
+    def add(self, fingerprint: ChunkFingerprint, value):
+        with self.__lock:
+            self.__entries[fingerprint.content_hash] = (fingerprint, value)
+            self.__entries.move_to_end(fingerprint.content_hash)
+            if self.near_duplicate_threshold is not None:
+                for band_key in fingerprint.band_keys():
+                    self.__bands[band_key] = fingerprint.content_hash
+            while self.max_entries is not None and len(self.__entries) > self.max_entries:
+                _, (evicted, _) = self.__entries.popitem(last=False)
+                for band_key in evicted.band_keys() if self.near_duplicate_threshold is not None else ():
+                    if self.__bands.get(band_key) == evicted.content_hash:
+                        del self.__bands[band_key]
+
+    def __len__(self):
+        return len(self.__entries)
+
+
+_vector_caches: Dict[str, DuplicateIndex] = {}
+_vector_caches_lock = threading.Lock()
+
+
+def get_vector_cache(datasource: str) -> DuplicateIndex:
+    """ Returns the vectors of the chunks of the datasource recently indexed by this process. """
+    with _vector_caches_lock:
+        if datasource not in _vector_caches:
+            _vector_caches[datasource] = DuplicateIndex(Settings.CHUNK_NEAR_DUPLICATE_THRESHOLD,
+                                                        max_entries=Settings.CHUNK_DEDUPLICATION_CACHE_SIZE)
+        return _vector_caches[datasource]
+
+
+def clear_vector_caches():
+    with _vector_caches_lock:
+        _vector_caches.clear()
+
+
+class ChunkDeduplicator:
+    """
+    Embeds the batches of chunks of an `IndexingJobChain.index_documents()` call, but for the duplicates of the
+    chunks already embedded, exact or also near (MinHash) when `Settings.CHUNK_NEAR_DUPLICATE_THRESHOLD` is set:
+
+    - the duplicates of chunks of the same call are not stored when `Settings.CHUNK_DEDUPLICATION` is `skip`, as
+      they are deleted and indexed again along with their original. Otherwise, they reuse its vector.
+    - the duplicates of chunks indexed before in the datasource reuse their vector, which comes from the vectors
+      recently computed by the process, or else from the application index for the exact duplicates.
+
+    The content hash of the chunks is added to their metadata (`content_hash`), along with the identity of the model
+    and of the backend computing their vector (`embedding_model`), so that the vectors computed by another model, or
+    another backend, aren't reused e.g., after changing `Settings.EMBEDDING_MODEL` and reindexing.
+    """
+
+    def __init__(self, open_search_client: OpenSearchClient, datasource: str):
+        self.open_search_client = open_search_client
+        self.datasource = datasource
+        self.skip_duplicates = Settings.CHUNK_DEDUPLICATION == 'skip'
+        self.embedding_model = get_embedding_model_id()
+        self.vector_cache = get_vector_cache(datasource)
+        # chunks stored by this call, along with their vector or the index of their original in the current batch
+        self.__stored_chunks = DuplicateIndex(Settings.CHUNK_NEAR_DUPLICATE_THRESHOLD)
+
+    def embed(self, chunks: List[Document]) -> Tuple[List[Document], List[List[float]]]:
+        """ Returns the chunks to store and their vectors. """
+        fingerprints = [fingerprint_text(chunk.page_content) for chunk in chunks]
+        embeddings: List[List[float] | None] = [None] * len(chunks)
+        originals: Dict[int, int] = {}  # indexes of the duplicates of chunks of this batch, and of their originals
+        skipped = set()
+        to_embed = []
+        for index, (chunk, fingerprint) in enumerate(zip(chunks, fingerprints)):
+            chunk.metadata['content_hash'] = fingerprint.content_hash
+            chunk.metadata['embedding_model'] = self.embedding_model
+            if duplicate := self.__stored_chunks.find(fingerprint):
+                kind, value = duplicate
+                if self.skip_duplicates:
+                    skipped.add(index)
+                    deduplicated_chunks.labels(kind, 'skipped').inc()
+                    continue
+                deduplicated_chunks.labels(kind, 'reused').inc()
+                if isinstance(value, int):
+                    originals[index] = value
+                else:
+                    embeddings[index] = value
+            elif duplicate := self.vector_cache.find(fingerprint):
+                kind, embeddings[index] = duplicate
+                deduplicated_chunks.labels(kind, 'reused').inc()
+                self.__stored_chunks.add(fingerprint, embeddings[index])
+            else:
+                to_embed.append(index)
+                self.__stored_chunks.add(fingerprint, index)
+
+        if to_embed:
+            indexed_embeddings = self.open_search_client.get_embeddings_by_content_hash(
+                self.datasource, {fingerprints[index].content_hash for index in to_embed}, self.embedding_model)
+            for index in list(to_embed):
+                if embedding := indexed_embeddings.get(fingerprints[index].content_hash):
+                    embeddings[index] = embedding
+                    to_embed.remove(index)
+                    deduplicated_chunks.labels('exact', 'reused').inc()
+            for index, embedding in zip(to_embed, embed_chunks([chunks[index] for index in to_embed])):
+                embeddings[index] = embedding
+        for index, original_index in originals.items():
+            embeddings[index] = embeddings[original_index]
+        for index, fingerprint in enumerate(fingerprints):
+            if index not in skipped and index not in originals:
+                self.__stored_chunks.add(fingerprint, embeddings[index])
+                self.vector_cache.add(fingerprint, embeddings[index])
+
+        if skipped or originals or len(to_embed) < len(chunks):
+            logger.debug(f"Embedded {len(to_embed)} chunks out of {len(chunks)}, {len(skipped)} duplicates skipped")
+        return ([chunk for index, chunk in enumerate(chunks) if index not in skipped],
+                [embedding for index, embedding in enumerate(embeddings) if index not in skipped])
@@ -31,7 +31,8 @@ class DocumentMetadata:
                  tags: List[str] = None,
                  web_url: str = None,
                  internal: bool = None,
-                 company: str = None):
+                 company: str = None,
+                 version: str = None):
         self.connection_id = connection_id
         self.doc_id = doc_id
         self.doc_display_id = doc_display_id
@@ -43,6 +44,7 @@ class DocumentMetadata:
         self.tags = tags
         self.company = company
         self.web_url = web_url
+        self.version = version  # version of the source document, when the source tracks them
 
     def to_dict(self) -> Dict[str, Any]:
         """ Returns a representation of the metadata ready to be passed to OpenSearch. """
@@ -1,21 +1,27 @@
+import contextvars
 import time
-from typing import List
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator, List, Set, Tuple
 
 from langchain.docstore.document import Document
-from langchain.vectorstores import OpenSearchVectorSearch
 from loguru import logger
 from opensearchpy.exceptions import OpenSearchException, NotFoundError
-from prometheus_client import Summary
+from prometheus_client import Histogram, Summary
 
-from chunking.service import generate_chunks
+from chunking.service import TokenizedChunk, get_token_chunker, split_document
 from config import Settings
-from embeddings.service import embeddings_function
+from embeddings.service import embed_chunks
+from indexing.deduplication import ChunkDeduplicator
 from jobs.models import Job, JobStep
 from jobs.service import JobChain, JobQueue, FeatureService
-from opensearch.client \
-    import OpenSearchClient, get_open_search_client, get_open_search_url, ERROR_INDEX_NOT_FOUND_EXCEPTION
+from opensearch.client import OpenSearchClient, get_open_search_client, ERROR_INDEX_NOT_FOUND_EXCEPTION
+from utils.metrics_utils import count_stage_items, get_job_step_labels, measure_stage
 
 indexed_documents = Summary('indexed_documents', 'Summary of indexed documents')
+embedded_batch_chunks = Histogram(
+    'embedded_batch_chunks', 'Number of chunks of the batches embedded by the job steps', ['datasource', 'job_type'],
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512))
 
 
 class IndexingJobChain(JobChain):
@@ -25,44 +31,107 @@ class IndexingJobChain(JobChain):
         self.__feature_service = feature_service
 
     @indexed_documents.time()
-    def index_documents(self, job: Job, job_step: JobStep, documents: List[Document]) -> None:
-        chunks = generate_chunks(documents, 500, 100)
-        self.amend_chunks_metadata(job, chunks)
-        with get_open_search_client() as open_search_client:
+    def index_documents(self, job: Job, job_step: JobStep, documents: Iterable[Document]) -> None:
+        """
+        Indexes the documents as a stream: they are split into chunks, which are embedded and written by batches of
+        `Settings.INDEXING_BATCH_SIZE` as they come, so that the memory used doesn't depend on the size of the
+        documents. At most `Settings.INDEXING_MAX_IN_FLIGHT_BATCHES` batches are being written while the next one is
+        embedded.
+
+        The chunks previously indexed for a document are deleted before its first new chunk is written. The duplicate
+        chunks are handled as `Settings.CHUNK_DEDUPLICATION` specifies (see `ChunkDeduplicator`).
+        """
+        with get_open_search_client(http_compress=True) as open_search_client:
             open_search_client.ensure_application_index_created()
-            self.delete_chunks_documents(open_search_client, job, job_step, chunks)
-        self.store_chunks(job, chunks)
+            already_deleted_keys = set()
+            pending_writes = deque()
+            chunk_count = 0
+            deduplicator = ChunkDeduplicator(open_search_client, job.datasource) \
+                if Settings.CHUNK_DEDUPLICATION != 'off' else None
+            with ThreadPoolExecutor(1, thread_name_prefix='chunk_writer') as writer:
+                for chunks in self.generate_chunk_batches(job, documents):
+                    chunk_count += len(chunks)
+                    self.delete_chunks_documents(open_search_client, job, job_step, chunks, already_deleted_keys)
+                    chunks, embeddings = self.embed_chunks(chunks, deduplicator)
+                    if not chunks:
+                        continue
+                    while len(pending_writes) >= Settings.INDEXING_MAX_IN_FLIGHT_BATCHES:
+                        pending_writes.popleft().result()
+                    # the writer thread runs in a copy of the context to keep the metrics labels of the job step
+                    pending_writes.append(writer.submit(
+                        contextvars.copy_context().run, self.store_chunks, open_search_client, job, chunks, embeddings))
+                while pending_writes:
+                    pending_writes.popleft().result()
+            if chunk_count:
+                # makes the new chunks searchable right away, as they used to be
+                open_search_client.indices.refresh(index=Settings.OPENSEARCH_INDEX)
 
-    def amend_chunks_metadata(self, job: Job, chunks):
-        for chunk_id, chunk in enumerate(chunks):
+    def generate_chunk_batches(self, job: Job, documents: Iterable[Document]) -> Iterator[List[Document]]:
+        """ Splits the documents one at a time with `split_document()` and yields their amended chunks by batches. """
+        chunk_id = 0
+        batch = []
+        for document in documents:
+            with measure_stage('chunking'):
+                chunks = split_document(document)
+            count_stage_items('chunking', len(chunks))
+            self.amend_chunks_metadata(job, chunks, first_chunk_id=chunk_id)
+            chunk_id += len(chunks)
+            for chunk in chunks:
+                batch.append(chunk)
+                if len(batch) >= Settings.INDEXING_BATCH_SIZE:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+
+    def embed_chunks(
+            self,
+            chunks: List[Document],
+            deduplicator: ChunkDeduplicator | None = None) -> Tuple[List[Document], List[List[float]]]:
+        """ Returns the chunks to store and their embeddings, which are reused for duplicate chunks if possible. """
+        embedded_batch_chunks.labels(*get_job_step_labels()).observe(len(chunks))
+        count_stage_items('embedding', len(chunks))
+        with measure_stage('embedding'):
+            if deduplicator:
+                return deduplicator.embed(chunks)
+            return chunks, embed_chunks(chunks)
+
+    def amend_chunks_metadata(self, job: Job, chunks, first_chunk_id: int = 0):
+        for chunk_id, chunk in enumerate(chunks, start=first_chunk_id):
             # Some models require prefixing the indexed documents/chunks in a certain manner (related to the way the
             # model was trained).
             if Settings.CHUNK_PREFIX:
                 chunk.page_content = Settings.CHUNK_PREFIX + chunk.page_content
+                if isinstance(chunk, TokenizedChunk):
+                    chunk.token_ids = get_token_chunker().prefix_token_ids + chunk.token_ids
 
             chunk.metadata['datasource'] = job.datasource
             chunk.metadata['chunk_id'] = chunk_id
 
-    def store_chunks(self, job: Job, chunks: List[Document]):
-        logger.debug("Storing chunks for datasource: '{datasource}'", datasource=job.datasource)
-        texts = [chunk.page_content for chunk in chunks]
-        metadatas = [chunk.metadata for chunk in chunks]
-        embeddings = embeddings_function.embed_documents(texts)
-        OpenSearchVectorSearch.from_embeddings(
-            embeddings,
-            texts,
-            embeddings_function,
-            metadatas=metadatas,
-            bulk_size=len(embeddings)+1,  # it ensures that embeddings are greater thank bulk_size otherwise it'll fail
-            opensearch_url=get_open_search_url(),
-            http_compress=True,  # enables gzip compression for request bodies
-            index_name=Settings.OPENSEARCH_INDEX,
-            verify_certs=Settings.OPENSEARCH_VERIFY_CERTIFICATES
-        )
+    def store_chunks(
+            self,
+            open_search_client: OpenSearchClient,
+            job: Job,
+            chunks: List[Document],
+            embeddings: List[List[float]]):
+        logger.debug("Storing {count} chunks for datasource: '{datasource}'", count=len(chunks), datasource=job.datasource)
+        with measure_stage('bulk_store'):
+            open_search_client.bulk_index_chunks(
+                [chunk.page_content for chunk in chunks], embeddings, [chunk.metadata for chunk in chunks])
+        count_stage_items('bulk_store', len(chunks))
 
     def delete_chunks_documents(
-            self, open_search_client: OpenSearchClient,  job: Job, job_step: JobStep, chunks: List[Document]):
-        already_deleted_keys = set()
+            self,
+            open_search_client: OpenSearchClient,
+            job: Job,
+            job_step: JobStep,
+            chunks: List[Document],
+            already_deleted_keys: Set[Tuple[str, str]] | None = None):
+        """
+        Deletes the indexed chunks of the documents of the specified chunks, unless their keys are part of
+        `already_deleted_keys`, which is updated with the keys deleted.
+        """
+        already_deleted_keys = already_deleted_keys if already_deleted_keys is not None else set()
         delete_doc_by = self.__feature_service.get_delete_doc_by(job, job_step)
 
         for chunk_id, chunk in enumerate(chunks):
@@ -101,20 +170,22 @@ class IndexingJobChain(JobChain):
         try:
             start_time = time.time()
 
-            response = open_search_client.delete_by_query(
-                index=Settings.OPENSEARCH_INDEX,
-                body={
-                    'query': {
-                        'bool': {
-                            'must': [
-                                {'term': {'metadata.datasource': {'value': datasource}}},
-                                {'term': {delete_by_key_field: {'value': delete_by_key_value}}},
-                                {'terms': {'metadata.connection_id': connection_ids}},
-                            ]
+            with measure_stage('delete_by_query'):
+                response = open_search_client.delete_by_query(
+                    index=Settings.OPENSEARCH_INDEX,
+                    body={
+                        'query': {
+                            'bool': {
+                                'must': [
+                                    {'term': {'metadata.datasource': {'value': datasource}}},
+                                    {'term': {delete_by_key_field: {'value': delete_by_key_value}}},
+                                    {'terms': {'metadata.connection_id': connection_ids}},
+                                ]
+                            }
                         }
                     }
-                }
-            )
+                )
+            count_stage_items('delete_by_query', response['deleted'])
             logger.debug(
                 "deleted {deleted} OpenSearch documents"
                 " for datasource '{datasource}' and {key_field} '{key_value}' and connection {connection} ({time}s)",
@@ -23,3 +23,4 @@ Datasource.HKM = 'HKM'
 Datasource.BWF = 'BWF'
 Datasource.SHAREPOINT = 'SPT'
 Datasource.CONFLUENCE = 'CNF'
+Datasource.FILE_SYSTEM = 'FS'
@@ -35,6 +35,8 @@ class Job:
     uri: str | None = None
     file: str | None = None  # file name or path; determines the file type and, when applicable, where to load from
     upload_file: UploadFile | None = None
+    # local copy of the uploaded file, only known to the node that received the upload (not persisted)
+    local_upload_path: str | None = None
     __upload_filename: str | None = None  # valued when loaded from the IS record API
     modified_since: datetime | None = None
     connection_id: str | None = None
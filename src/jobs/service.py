@@ -5,6 +5,8 @@ from enum import Enum
 
 from loguru import logger
 import platform
+from prometheus_client import Gauge
+import time
 from requests.exceptions import RequestException
 import traceback
 from typing import Callable, TypeAlias, Tuple
@@ -14,12 +16,20 @@ from connections.models import Connection
 from connections.service import ConnectionLoader, ConnectionRepository
 from helixplatform import ar_core_fields, data_connection_job_step, data_connection_job
 from helixplatform.service import InnovationSuite
+from profiling.memory import track_job_step_memory
+from profiling.service import profile_job_step
+from utils.metrics_utils import job_step_labels, measure_stage
+from utils.parser_sandbox import ParserSandboxError
+from utils.tracing_utils import start_span, trace_id_of
 from utils.text_utils import is_blank
 from workers.service import WorkerGroup
 from .constants import JobStepStatus, JobType
 from .models import Job, JobStep, JobStepWork, Work, PollMoreWork
 from .schemas import JobRequest
 
+job_steps_in_flight = Gauge(
+    'job_steps_in_flight', 'Number of job steps being handled', ['datasource', 'job_type'])
+
 
 class DeleteDocBy(Enum):
     BY_DOC_ID = 1
@@ -187,7 +197,8 @@ class JobRepository:
         elif not job_step.job_id:  # no specified job and no specified job reference
             raise ValueError('cannot store a JobStep without a parent Job reference')
 
-        job_step_id = self.__is_client.create_record(record=job_step.to_record())
+        with measure_stage('queue_step'):
+            job_step_id = self.__is_client.create_record(record=job_step.to_record())
         job_step.id = job_step_id
 
     def __store_job_step_status(
@@ -249,6 +260,7 @@ class JobRepository:
         )
         return [JobStep.from_data_page_dict(record) for record in data_page.data]
 
+    @measure_stage('claim')
     def claim_job_step(self, job_step: JobStep):
         """
         Ensures that the specified JobStep still is available for execution and then set its status to IN_PROGRESS.
@@ -274,9 +286,11 @@ class JobRepository:
         job_step.status = JobStepStatus.IN_PROGRESS
         job_step.executing_node = node
 
+    @measure_stage('status_update')
     def mark_job_step_as_done(self, job_step_id: str):
         self.__store_job_step_status(job_step_id, JobStepStatus.DONE)
 
+    @measure_stage('status_update')
     def mark_job_step_as_error(self, job_step_id: str, error_details: str):
         self.__store_job_step_status(job_step_id, JobStepStatus.ERROR, error_details=error_details)
 
@@ -383,6 +397,16 @@ class JobQueue(JobQueuing):
         work.execute(self)
 
     def handle_job_step(self, work: JobStepWork):
+        job_step = work.job_step
+        # labels the metrics of the stages of the job step (see `utils.metrics_utils.measure_stage()`), which are also
+        # traced as spans of the job step, in the trace of its job
+        with job_step_labels(job_step.datasource, job_step.type.name), \
+                start_span(f'{job_step.type.name} {job_step.datasource}', trace_id=trace_id_of(job_step.job_id),
+                           **{'job.id': job_step.job_id, 'job_step.id': job_step.id,
+                              'job_step.doc_id': job_step.doc_id}):
+            self.__handle_job_step(work)
+
+    def __handle_job_step(self, work: JobStepWork):
         job = work.job
         job_step = work.job_step
         connection = work.connection
@@ -400,13 +424,31 @@ class JobQueue(JobQueuing):
 
         # Execute the job step
         try:
-            handler(job, job_step, self.__job_chain_factory(self), connection)
+            self.__run_handler(handler, job, job_step, connection)
             self.__job_repository.mark_job_step_as_done(job_step.id)
+        except ParserSandboxError as e:
+            # the reason is more telling than the traceback, which ends in the parser sandbox
+            logger.error("could not parse the document of {job_step}: {reason}", job_step=job_step, reason=e)
+            self.__job_repository.mark_job_step_as_error(job_step.id, f'{type(e).__name__}: {e}')
         except Exception:
             logger.exception("error while handling {job_step}:", job_step=job_step)
             error_details = traceback.format_exc()
             self.__job_repository.mark_job_step_as_error(job_step.id, error_details)
 
+    def __run_handler(self, handler: JobHandler, job: Job, job_step: JobStep, connection: Connection):
+        """ Runs the handler of the job step, profiled and measured if enabled, and logs it if it is slow. """
+        start_time = time.perf_counter()
+        memory = None
+        try:
+            with job_steps_in_flight.labels(job_step.datasource, job_step.type.name).track_inprogress(), \
+                    profile_job_step(job_step), track_job_step_memory(job_step) as memory:
+                handler(job, job_step, self.__job_chain_factory(self), connection)
+        finally:
+            duration = time.perf_counter() - start_time
+            if duration >= Settings.SLOW_JOB_STEP_SECONDS:
+                logger.warning("slow job step {job_step}: {duration:.1f}s, memory: {memory}",
+                               job_step=job_step, duration=duration, memory=memory or 'not tracked')
+
     def execute_job_steps(self, job: Job):
         self.poll_more(job.id, job.datasource)
 
@@ -1,3 +1,10 @@
+import time
+
+# the startup time includes the import of the application modules
+_start_time = time.perf_counter()
+
+import threading
+
 import urllib3
 from fastapi import FastAPI
 from fastapi.exceptions import RequestValidationError
@@ -5,13 +12,15 @@ from fastapi.middleware.gzip import GZipMiddleware
 from loguru import logger
 from prometheus_fastapi_instrumentator import Instrumentator
 
+from config import Settings
 from connections.bwf.feature import BwfFeature
 from connections.confluence.feature import ConfluenceFeature
-from connections.files.feature import UploadFileFeature
+from connections.files.feature import DirectoryFeature, UploadFileFeature
 from connections.files.router import files_router
 from connections.hkm.feature import HkmFeature
 from connections.rkm.feature import RkmFeature
 from connections.sharepoint.feature import SharePointFeature
+from embeddings.service import start_embedding_model_warm_up
 from exceptions import custom_exception_handler
 from health.router import health_router
 from indexing.service import IndexingJobChain
@@ -22,10 +31,14 @@ from middleware.content_security_policy import ContentSecurityPolicy
 from middleware.content_type_options import XContentTypeOptions
 from middleware.frame_options import XFrameOptions
 from middleware.strict_transport import StrictTransportSecurity
+from profiling.router import memory_router, profiling_router
 from utils.logging_utils import setup_logging
+from utils.parser_sandbox import shutdown_parser_sandbox
 
 setup_logging()
 
+_import_time = time.perf_counter() - _start_time
+
 # getting rid of the "InsecureRequestWarning: Unverified HTTPS request is being made to host…" warnings.
 urllib3.disable_warnings()
 
@@ -55,14 +68,16 @@ app.include_router(health_router)
 app.include_router(jobs_router, prefix=prefix)
 app.include_router(files_router, prefix=prefix)
 app.include_router(job_executions_router, prefix=prefix)
+app.include_router(profiling_router)
+app.include_router(memory_router)
 
-app.feature_service = FeatureService([RkmFeature(), HkmFeature(), UploadFileFeature(), BwfFeature(), SharePointFeature(), ConfluenceFeature()])
+app.feature_service = FeatureService([RkmFeature(), HkmFeature(), UploadFileFeature(), BwfFeature(), SharePointFeature(),
+                                      ConfluenceFeature(), DirectoryFeature()])
 app.job_queue = JobQueue(
     feature_service=app.feature_service,
     job_chain_factory=lambda job_queue: IndexingJobChain(job_queue, app.feature_service))
 
 
-@app.on_event('startup')
 def create_application_index():
     """
     Attempts to verify and possibly create the OpenSearch index.
@@ -70,8 +85,21 @@ def create_application_index():
     yet.
     """
     from opensearch.client import get_open_search_client
+    start_time = time.perf_counter()
     with get_open_search_client() as open_search_client:
         open_search_client.ensure_application_index_created_no_rethrow()
+    logger.info(f"Application index checked in {time.perf_counter() - start_time:.2f}s")
+
+
+@app.on_event('startup')
+def _start_background_initialization():
+    """
+    Checks the OpenSearch index and loads the embedding model in the background, so that the application is live
+    right away. It is ready once they are done (see `/health/readiness`).
+    """
+    threading.Thread(target=create_application_index, name='index-check', daemon=True).start()
+    if Settings.EMBEDDING_WARM_UP:
+        start_embedding_model_warm_up()
 
 
 @app.on_event('startup')
@@ -79,6 +107,17 @@ def _enable_metrics():
     instrumentator.expose(endpoint="/metrics", app=app, include_in_schema=False)
 
 
+@app.on_event('startup')
+def _log_startup_time():
+    logger.info(f"Application started in {time.perf_counter() - _start_time:.2f}s"
+                f" (modules imported in {_import_time:.2f}s)")
+
+
+@app.on_event('shutdown')
+def _shutdown_parser_sandbox():
+    shutdown_parser_sandbox()
+
+
 if __name__ == "__main__":
     logger.critical("** Running in development mode. Do not run like this in production. **")
     import uvicorn
@@ -1,21 +1,25 @@
 import os
+import uuid
 from threading import Lock
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Collection
 from urllib.parse import quote
 
 from loguru import logger
-from opensearchpy import OpenSearch
+from opensearchpy import OpenSearch, Urllib3HttpConnection
+from opensearchpy.helpers import bulk
 from opensearchpy.exceptions import OpenSearchException, NotFoundError, ConnectionError, RequestError
 
 from config import Settings
 from health.constants import HealthStatus
 from health.models import Health, HealthIndicator
 from utils.io_utils import read_json_dict
+from utils.tracing_utils import SpanKind, inject_trace_context, start_span
 
 ERROR_INDEX_NOT_FOUND_EXCEPTION = 'index_not_found_exception'
 RESOURCE_ALREADY_EXISTS_EXCEPTION = 'resource_already_exists_exception'
 INDEX_CREATION_LOCK = Lock()
 INDEX_CREATION_LOCK_TIMEOUT = 30.0  # secs
+BULK_MAX_CHUNK_BYTES = 1024 * 1024
 
 
 def _load_index_definition() -> dict:
@@ -184,6 +188,101 @@ class OpenSearchClient(OpenSearch):
             }
         )
 
+    def get_indexed_versions(
+            self,
+            datasource: str,
+            doc_ids: Collection[str],
+            connection_id: str | None = None) -> Dict[str, str]:
+        """
+        Returns the `version` metadata of the specified documents, as currently indexed, keyed by `doc_id`.
+        Documents, which aren't indexed or were indexed without a version, are absent from the returned dict.
+        """
+        if not doc_ids:
+            return {}
+        connection_ids = ['NONE', connection_id] if connection_id else ['NONE']
+        try:
+            response = self.search(
+                index=Settings.OPENSEARCH_INDEX,
+                size=len(doc_ids),
+                _source_includes='metadata.doc_id,metadata.version',
+                body={
+                    'query': {
+                        'bool': {
+                            'must': [
+                                {'term': {'metadata.datasource': {'value': datasource}}},
+                                {'terms': {'metadata.doc_id': list(doc_ids)}},
+                                {'terms': {'metadata.connection_id': connection_ids}},
+                                {'exists': {'field': 'metadata.version'}},
+                            ]
+                        }
+                    },
+                    'collapse': {'field': 'metadata.doc_id'}  # one hit per document rather than per chunk
+                }
+            )
+        except NotFoundError as e:
+            if e.error == ERROR_INDEX_NOT_FOUND_EXCEPTION:
+                return {}
+            raise e
+
+        return {metadata['doc_id']: metadata['version']
+                for metadata in self.__convert_search_response_to_metadata_array(response)}
+
+    def get_embeddings_by_content_hash(
+            self,
+            datasource: str,
+            content_hashes: Collection[str],
+            embedding_model: str) -> Dict[str, List[float]]:
+        """
+        Returns the vectors of the chunks of the datasource, which are indexed with the specified `content_hash`
+        metadata and were embedded by the specified `embedding_model`, keyed by content hash. Content hashes, which
+        aren't indexed, are absent from the returned dict.
+        """
+        if not content_hashes:
+            return {}
+        try:
+            response = self.search(
+                index=Settings.OPENSEARCH_INDEX,
+                size=len(content_hashes),
+                _source_includes='metadata.content_hash,vector_field',
+                body={
+                    'query': {
+                        'bool': {
+                            'must': [
+                                {'term': {'metadata.datasource': {'value': datasource}}},
+                                {'terms': {'metadata.content_hash': list(content_hashes)}},
+                                {'term': {'metadata.embedding_model': {'value': embedding_model}}},
+                            ]
+                        }
+                    },
+                    'collapse': {'field': 'metadata.content_hash'}  # one hit per content hash
+                }
+            )
+        except NotFoundError as e:
+            if e.error == ERROR_INDEX_NOT_FOUND_EXCEPTION:
+                return {}
+            raise e
+
+        return {hit['_source']['metadata']['content_hash']: hit['_source']['vector_field']
+                for hit in response.get('hits', {}).get('hits', []) if '_source' in hit}
+
+    def bulk_index_chunks(self, texts: List[str], embeddings: List[List[float]], metadatas: List[Dict]):
+        """
+        Writes the chunks to the application index, in the format of langchain's `OpenSearchVectorSearch`.
+        Unlike `OpenSearchVectorSearch.from_embeddings()`, the index isn't refreshed after each call.
+        """
+        actions = (
+            {
+                '_op_type': 'index',
+                '_index': Settings.OPENSEARCH_INDEX,
+                '_id': str(uuid.uuid4()),
+                'vector_field': embedding,
+                'text': text,
+                'metadata': metadata,
+            }
+            for text, embedding, metadata in zip(texts, embeddings, metadatas)
+        )
+        bulk(self, actions, max_chunk_bytes=BULK_MAX_CHUNK_BYTES)
+
     @staticmethod
     def __convert_search_response_to_metadata_array(response) -> List[Dict]:
         """
@@ -194,10 +293,29 @@ class OpenSearchClient(OpenSearch):
         return []
 
 
-def get_open_search_client() -> OpenSearchClient:
+class TracingConnection(Urllib3HttpConnection):
+    """ Traces the OpenSearch requests as spans of the current trace (see `utils.tracing_utils`). """
+
+    def perform_request(self, method, url, params=None, body=None, timeout=None, ignore=(), headers=None):
+        with start_span(f'OpenSearch {method}', SpanKind.CLIENT, **{
+                'http.method': method, 'http.url': url, 'db.system': 'opensearch'}) as span:
+            if span is not None:
+                headers = dict(headers or {})
+                inject_trace_context(headers)
+            status, response_headers, data = super().perform_request(
+                method, url, params=params, body=body, timeout=timeout, ignore=ignore, headers=headers)
+            if span is not None:
+                span.set_attribute('http.status_code', status)
+            return status, response_headers, data
+
+
+def get_open_search_client(**kwargs) -> OpenSearchClient:
+    """ :param kwargs: additional options of the client e.g., `http_compress` """
     return OpenSearchClient(
         get_open_search_url(),
-        verify_certs=Settings.OPENSEARCH_VERIFY_CERTIFICATES
+        verify_certs=Settings.OPENSEARCH_VERIFY_CERTIFICATES,
+        connection_class=TracingConnection,
+        **kwargs
     )
 
 
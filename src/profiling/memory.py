@@ -0,0 +1,167 @@
+import os
+import random
+import tempfile
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Iterator, List
+
+from prometheus_client import Histogram
+
+from config import Settings
+from jobs.models import JobStep
+from utils.io_utils import scratch_space
+from utils.memory_utils import get_rss
+
+_MIB = 1024 * 1024
+_MEMORY_BUCKETS = (_MIB, 4 * _MIB, 16 * _MIB, 64 * _MIB, 256 * _MIB, 1024 * _MIB, 4096 * _MIB, float('inf'))
+
+job_step_rss_growth = Histogram(
+    'job_step_rss_growth_bytes', 'Growth of the RSS of the process during the job steps', ['datasource', 'job_type'],
+    buckets=_MEMORY_BUCKETS)
+job_step_peak_heap = Histogram(
+    'job_step_peak_heap_bytes', 'Peak Python heap traced by tracemalloc during the sampled job steps',
+    ['datasource', 'job_type'], buckets=_MEMORY_BUCKETS)
+
+# tracemalloc frames excluded from the top allocations
+_TRACEMALLOC_FILTERS = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, '<unknown>')]
+
+
+@dataclass
+class JobStepMemory:
+    """
+    Memory accounting of a job step, see `track_job_step_memory()`. The deltas include the concurrent steps, and so
+    does the peak heap, which is the one since the step started, or since a concurrent traced step started after it.
+    """
+    rss_delta: int | None = None
+    scratch_delta: int | None = None
+    # only for the job steps traced by tracemalloc
+    peak_heap: int | None = None
+    top_allocations: List[str] = field(default_factory=list)
+
+    def __str__(self):
+        def mib(size: int | None, sign: str = '') -> str:
+            return '?' if size is None else f'{size / _MIB:{sign}.1f} MiB'
+
+        text = f'RSS {mib(self.rss_delta, "+")}, scratch space {mib(self.scratch_delta, "+")}'
+        if self.peak_heap is not None:
+            text += f', peak heap {mib(self.peak_heap)}, top allocations: {"; ".join(self.top_allocations)}'
+        return text
+
+
+class _Tracemalloc:
+    """ Traces the Python allocations while job steps are sampled, or while requested by an admin. """
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__traced_job_steps = 0
+        self.__requested = False
+
+    def start_job_step(self) -> tracemalloc.Snapshot | None:
+        """
+        Starts tracing, unless already tracing, in which case the current snapshot is returned and the peak is reset:
+        the peak traced is otherwise the one since tracing started e.g., by an admin.
+        """
+        with self.__lock:
+            self.__traced_job_steps += 1
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                return None
+            tracemalloc.reset_peak()
+            return tracemalloc.take_snapshot()
+
+    def end_job_step(self):
+        with self.__lock:
+            self.__traced_job_steps -= 1
+            if not self.__traced_job_steps and not self.__requested:
+                tracemalloc.stop()
+
+    def start(self, frames: int = 1):
+        with self.__lock:
+            self.__requested = True
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(frames)
+
+    def stop(self):
+        with self.__lock:
+            self.__requested = False
+            if not self.__traced_job_steps:
+                tracemalloc.stop()
+
+
+_tracemalloc = _Tracemalloc()
+
+
+@contextmanager
+def track_job_step_memory(job_step: JobStep) -> Iterator[JobStepMemory | None]:
+    """
+    Measures the growth of the RSS of the process during the job step when `Settings.JOB_STEP_MEMORY_TRACKING` is
+    enabled. A fraction of the job steps (`Settings.JOB_STEP_TRACEMALLOC_RATE`) is also traced by tracemalloc to get
+    the peak Python heap and the top allocations. The peak heap is since the step started, and includes the memory
+    allocated by the other threads meanwhile, e.g., concurrent job steps. Yields `None` when disabled, and the
+    accounting filled once the block ends otherwise.
+    """
+    if not Settings.JOB_STEP_MEMORY_TRACKING:
+        yield None
+        return
+
+    memory = JobStepMemory()
+    traced = random.random() < Settings.JOB_STEP_TRACEMALLOC_RATE
+    start_snapshot = _tracemalloc.start_job_step() if traced else None
+    start_rss = get_rss()
+    start_scratch = scratch_space.used
+    try:
+        yield memory
+    finally:
+        end_rss = get_rss()
+        if start_rss is not None and end_rss is not None:
+            memory.rss_delta = end_rss - start_rss
+            job_step_rss_growth.labels(job_step.datasource, job_step.type.name).observe(max(0, memory.rss_delta))
+        memory.scratch_delta = scratch_space.used - start_scratch
+        if traced:
+            try:
+                memory.peak_heap = tracemalloc.get_traced_memory()[1]
+                memory.top_allocations = get_top_allocations(start_snapshot)
+                job_step_peak_heap.labels(job_step.datasource, job_step.type.name).observe(memory.peak_heap)
+            finally:
+                _tracemalloc.end_job_step()
+
+
+def get_top_allocations(since: tracemalloc.Snapshot | None = None) -> List[str]:
+    """
+    Returns the `Settings.TRACEMALLOC_TOP_ALLOCATIONS` lines allocating the most memory still in use, or that
+    allocated the most memory since the specified snapshot. Empty when tracemalloc isn't tracing.
+    """
+    if not tracemalloc.is_tracing():
+        return []
+    snapshot = tracemalloc.take_snapshot().filter_traces(_TRACEMALLOC_FILTERS)
+    if since:
+        statistics = snapshot.compare_to(since.filter_traces(_TRACEMALLOC_FILTERS), 'lineno')
+    else:
+        statistics = snapshot.statistics('lineno')
+    return [str(statistic) for statistic in statistics[:Settings.TRACEMALLOC_TOP_ALLOCATIONS]]
+
+
+def start_tracing(frames: int = 1):
+    """ Traces the Python allocations until `stop_tracing()`, e.g., to dump snapshots with `dump_snapshot()`. """
+    _tracemalloc.start(frames)
+
+
+def stop_tracing():
+    _tracemalloc.stop()
+
+
+def dump_snapshot() -> bytes | None:
+    """ Returns the current tracemalloc snapshot as loaded by `tracemalloc.Snapshot.load()`, `None` if not tracing. """
+    if not tracemalloc.is_tracing():
+        return None
+    snapshot = tracemalloc.take_snapshot()
+    file_descriptor, path = tempfile.mkstemp(suffix='.tracemalloc', dir=Settings.SCRATCH_DIR)
+    try:
+        os.close(file_descriptor)
+        snapshot.dump(path)
+        with open(path, 'rb') as file:
+            return file.read()
+    finally:
+        os.remove(path)
@@ -0,0 +1,139 @@
+import tracemalloc
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import PlainTextResponse, Response
+
+from utils.io_utils import scratch_space
+from utils.memory_utils import get_max_rss, get_memory_usage
+from utils.security_utils import verify_admin_token
+from .memory import dump_snapshot, get_top_allocations, start_tracing, stop_tracing
+from .schemas import MemoryResponse, ProfilingRequest, ProfilingResponse, TracingRequest
+from .service import ProfilingMode, ProfilingSession, ProfilingSessionError, get_profiling_session, start_profiling, \
+    stop_profiling
+
+profiling_router = APIRouter(
+    prefix='/admin/profiling',
+    include_in_schema=False,
+    tags=['admin'],
+    dependencies=[Depends(verify_admin_token)]
+)
+
+memory_router = APIRouter(
+    prefix='/admin/memory',
+    include_in_schema=False,
+    tags=['admin'],
+    dependencies=[Depends(verify_admin_token)]
+)
+
+
+@profiling_router.post('/', status_code=status.HTTP_201_CREATED, response_model=ProfilingResponse)
+def start(profiling_request: ProfilingRequest) -> ProfilingResponse:
+    """
+    Profiles the next job steps handled by this process, until the specified number of job steps were profiled or
+    until the specified duration elapsed.
+    """
+    if not profiling_request.jobSteps and not profiling_request.durationSeconds:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                            detail='jobSteps or durationSeconds must be specified')
+    try:
+        session = start_profiling(
+            profiling_request.mode,
+            max_job_steps=profiling_request.jobSteps,
+            duration=profiling_request.durationSeconds,
+            datasource=profiling_request.datasource,
+            interval=profiling_request.intervalMilliseconds / 1000)
+    except ProfilingSessionError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    return to_profiling_response(session)
+
+
+@profiling_router.get('/', response_model=ProfilingResponse)
+def get_status() -> ProfilingResponse:
+    return to_profiling_response(get_session())
+
+
+@profiling_router.delete('/', response_model=ProfilingResponse)
+def stop() -> ProfilingResponse:
+    session = stop_profiling()
+    if not session:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='No profiling session')
+    return to_profiling_response(session)
+
+
+@profiling_router.get('/result')
+def get_result(format: str | None = None) -> Response:
+    """
+    Returns the profile of the last session, so far if it is still active: the collapsed stacks (`collapsed`) in
+    sampling mode, the statistics dumped by pstats (`pstats`) or printed (`text`) in cProfile mode.
+    """
+    session = get_session()
+    if session.mode == ProfilingMode.SAMPLING:
+        if format not in (None, 'collapsed'):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f'Unsupported format: {format}')
+        return PlainTextResponse(session.get_collapsed_stacks())
+    if format in (None, 'pstats'):
+        return Response(session.get_pstats(), media_type='application/octet-stream',
+                        headers={'Content-Disposition': 'attachment; filename="job_steps.pstats"'})
+    if format == 'text':
+        return PlainTextResponse(session.get_pstats_text())
+    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f'Unsupported format: {format}')
+
+
+def get_session() -> ProfilingSession:
+    session = get_profiling_session()
+    if not session:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='No profiling session')
+    return session
+
+
+def to_profiling_response(session: ProfilingSession) -> ProfilingResponse:
+    return ProfilingResponse(
+        mode=session.mode,
+        active=session.active,
+        datasource=session.datasource,
+        maxJobSteps=session.max_job_steps,
+        durationSeconds=session.duration,
+        profiledJobSteps=session.profiled_job_steps,
+        samples=session.sample_count,
+        startTime=session.start_time,
+        endTime=session.end_time)
+
+
+@memory_router.get('/', response_model=MemoryResponse)
+def get_memory() -> MemoryResponse:
+    """ Returns the memory of this process and, when tracemalloc is tracing, the lines allocating the most. """
+    memory_usage = get_memory_usage()
+    tracing = tracemalloc.is_tracing()
+    traced_heap, traced_peak_heap = tracemalloc.get_traced_memory() if tracing else (None, None)
+    return MemoryResponse(
+        rss=memory_usage and memory_usage.rss,
+        pss=memory_usage and memory_usage.pss,
+        shared=memory_usage and memory_usage.shared,
+        private=memory_usage and memory_usage.private,
+        maxRss=get_max_rss(),
+        scratchSpaceUsed=scratch_space.used,
+        tracing=tracing,
+        tracedHeap=traced_heap,
+        tracedPeakHeap=traced_peak_heap,
+        topAllocations=get_top_allocations())
+
+
+@memory_router.put('/tracing', status_code=status.HTTP_204_NO_CONTENT)
+def start_memory_tracing(tracing_request: TracingRequest):
+    """ Traces the Python allocations of this process with tracemalloc, which slows it down, until stopped. """
+    start_tracing(tracing_request.frames)
+
+
+@memory_router.delete('/tracing', status_code=status.HTTP_204_NO_CONTENT)
+def stop_memory_tracing():
+    stop_tracing()
+
+
+@memory_router.get('/snapshot')
+def get_memory_snapshot() -> Response:
+    """ Returns the tracemalloc snapshot of this process, to load with `tracemalloc.Snapshot.load()` and compare. """
+    snapshot = dump_snapshot()
+    if snapshot is None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail='Memory tracing is not started')
+    return Response(snapshot, media_type='application/octet-stream',
+                    headers={'Content-Disposition': 'attachment; filename="memory.tracemalloc"'})
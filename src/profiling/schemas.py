@@ -0,0 +1,48 @@
+from datetime import datetime
+from typing import List
+
+from pydantic import BaseModel, Field
+
+from .service import ProfilingMode
+
+
+class ProfilingRequest(BaseModel):
+    mode: ProfilingMode = ProfilingMode.SAMPLING
+    # profiles the next job steps, the session ending after that many job steps or that duration, whichever first
+    jobSteps: int | None = Field(None, gt=0)
+    durationSeconds: float | None = Field(None, gt=0)
+    # only profiles the job steps of this datasource
+    datasource: str | None
+    # sampling mode only
+    intervalMilliseconds: float = Field(10, ge=1)
+
+
+class ProfilingResponse(BaseModel):
+    mode: ProfilingMode
+    active: bool
+    datasource: str | None
+    maxJobSteps: int | None
+    durationSeconds: float | None
+    profiledJobSteps: int
+    samples: int
+    startTime: datetime
+    endTime: datetime | None
+
+
+class TracingRequest(BaseModel):
+    # number of frames of the allocation tracebacks
+    frames: int = Field(1, ge=1, le=100)
+
+
+class MemoryResponse(BaseModel):
+    rss: int | None
+    pss: int | None
+    shared: int | None
+    private: int | None
+    maxRss: int
+    # bytes of the spooled temporary files spilled to disk (see `utils.io_utils.ScratchSpace`)
+    scratchSpaceUsed: int
+    tracing: bool
+    tracedHeap: int | None
+    tracedPeakHeap: int | None
+    topAllocations: List[str]
@@ -0,0 +1,241 @@
+import cProfile
+import io
+import marshal
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from enum import Enum
+from types import FrameType
+from typing import Dict
+
+from loguru import logger
+
+from config import Settings
+from jobs.models import JobStep
+
+
+class ProfilingMode(str, Enum):
+    SAMPLING = 'sampling'  # statistical: the stacks of the job steps are sampled by a thread
+    CPROFILE = 'cprofile'  # deterministic: every call of the job steps is timed by cProfile
+
+
+class ProfilingSessionError(Exception):
+    """ Raised when a profiling session is started while another one is active. """
+
+
+class ProfilingSession:
+    """
+    Profiles the job steps of the node, of a datasource if specified, until `max_job_steps` steps were profiled or
+    until `duration` seconds elapsed, whichever comes first. The job steps started meanwhile are profiled until they
+    end.
+
+    In sampling mode, a thread samples the stacks of the threads handling the profiled job steps every `interval`
+    seconds and counts them as collapsed stacks (the input of flamegraph.pl, speedscope, etc.). In cProfile mode, the
+    job steps are profiled deterministically, which costs more but counts every call, and their statistics are
+    merged.
+    """
+
+    def __init__(self,
+                 mode: ProfilingMode,
+                 max_job_steps: int | None = None,
+                 duration: float | None = None,
+                 datasource: str | None = None,
+                 interval: float = 0.01):
+        self.mode = mode
+        self.max_job_steps = max_job_steps
+        self.duration = duration
+        self.datasource = datasource
+        self.interval = interval
+        self.start_time = time.time()
+        self.end_time: float | None = None
+        self.profiled_job_steps = 0
+        self.stack_counts: Counter = Counter()
+        self.sample_count = 0
+        self.stats: pstats.Stats | None = None
+        self.__deadline = time.monotonic() + duration if duration else None
+        self.__accepting = True
+        self.__lock = threading.Lock()
+        # threads handling a profiled job step, with the root frame of their stacks, e.g., 'RKM LOAD'
+        self.__profiled_threads: Dict[int, str] = {}
+        self.__stopped = threading.Event()
+        self.__sampler: threading.Thread | None = None
+        if mode == ProfilingMode.SAMPLING:
+            self.__sampler = threading.Thread(target=self.__sample, name='profiling_sampler', daemon=True)
+            self.__sampler.start()
+
+    @property
+    def active(self) -> bool:
+        return self.end_time is None
+
+    def acquire(self, job_step: JobStep) -> bool:
+        """ Returns whether the job step is to be profiled, in which case `release()` must be called once it ends. """
+        if self.datasource and job_step.datasource != self.datasource:
+            return False
+        with self.__lock:
+            if self.__accepting and self.__deadline and time.monotonic() >= self.__deadline:
+                self.__stop_accepting()
+            if not self.__accepting:
+                return False
+            self.profiled_job_steps += 1
+            self.__profiled_threads[threading.get_ident()] = f'{job_step.datasource} {job_step.type.name}'
+            if self.max_job_steps and self.profiled_job_steps >= self.max_job_steps:
+                self.__stop_accepting()
+            return True
+
+    def release(self, profile: cProfile.Profile | None = None):
+        stats = pstats.Stats(profile) if profile else None
+        with self.__lock:
+            self.__profiled_threads.pop(threading.get_ident(), None)
+            if stats:
+                if self.stats:
+                    self.stats.add(stats)
+                else:
+                    self.stats = stats
+            if not self.__accepting and not self.__profiled_threads:
+                self.__end()
+
+    def stop(self):
+        """ Stops profiling the job steps: the ones being profiled are no longer profiled (in sampling mode) or they
+        are until they end (in cProfile mode). """
+        with self.__lock:
+            self.__stop_accepting()
+            if self.mode == ProfilingMode.SAMPLING:
+                self.__end()
+
+    def check_deadline(self):
+        """ Ends the session if its duration elapsed while no job step was profiled. """
+        with self.__lock:
+            if self.__accepting and self.__deadline and time.monotonic() >= self.__deadline:
+                self.__stop_accepting()
+
+    def get_collapsed_stacks(self) -> str:
+        """ Returns the sampled stacks in the collapsed format: a line per stack, e.g., 'a;b;c 12'. """
+        with self.__lock:
+            return ''.join(f'{stack} {count}\n' for stack, count in self.stack_counts.most_common())
+
+    def get_pstats(self) -> bytes:
+        """ Returns the statistics in the format of `pstats.Stats.dump_stats()`, which snakeviz, etc. read. """
+        with self.__lock:
+            return marshal.dumps(self.stats.stats if self.stats else {})
+
+    def get_pstats_text(self, sort: str = 'cumulative', limit: int = 100) -> str:
+        stream = io.StringIO()
+        with self.__lock:
+            if self.stats:
+                self.stats.stream = stream
+                self.stats.sort_stats(sort).print_stats(limit)
+        return stream.getvalue()
+
+    def __stop_accepting(self):
+        """ Stops profiling the next job steps, the session ending once the profiled ones end. """
+        self.__accepting = False
+        _clear_active_session(self)
+        if not self.__profiled_threads:
+            self.__end()
+
+    def __end(self):
+        if self.end_time is None:
+            self.end_time = time.time()
+            self.__stopped.set()
+            logger.info("Profiled {count} job steps in {mode} mode in {duration:.1f}s",
+                        count=self.profiled_job_steps, mode=self.mode.value, duration=self.end_time - self.start_time)
+
+    def __sample(self):
+        sampler_ident = threading.get_ident()
+        while not self.__stopped.wait(self.interval):
+            frames = sys._current_frames()
+            with self.__lock:
+                for ident, root in self.__profiled_threads.items():
+                    frame = frames.get(ident)
+                    if frame is not None and ident != sampler_ident:
+                        self.stack_counts[_collapse_stack(root, frame)] += 1
+                self.sample_count += 1
+            if self.__accepting and self.__deadline and time.monotonic() >= self.__deadline:
+                self.stop()
+
+
+def _collapse_stack(root: str, frame: FrameType) -> str:
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f'{code.co_name} ({code.co_filename}:{code.co_firstlineno})'.replace(';', ':'))
+        frame = frame.f_back
+    names.append(root)
+    return ';'.join(reversed(names))
+
+
+# session profiling the job steps, which is checked by every job step: when `None`, profiling costs a global lookup
+_active_session: ProfilingSession | None = None
+# last session started, kept for its results
+_last_session: ProfilingSession | None = None
+_sessions_lock = threading.Lock()
+
+
+def _clear_active_session(session: ProfilingSession):
+    global _active_session
+    if _active_session is session:
+        _active_session = None
+
+
+def start_profiling(mode: ProfilingMode,
+                    max_job_steps: int | None = None,
+                    duration: float | None = None,
+                    datasource: str | None = None,
+                    interval: float = 0.01) -> ProfilingSession:
+    """
+    Starts profiling the next job steps (see `ProfilingSession`). The duration is capped to
+    `Settings.PROFILING_MAX_DURATION` and the number of job steps to `Settings.PROFILING_MAX_JOB_STEPS`.
+    """
+    global _active_session, _last_session
+    if not max_job_steps and not duration:
+        raise ValueError('either the number of job steps or the duration to profile must be specified')
+    duration = min(duration or Settings.PROFILING_MAX_DURATION, Settings.PROFILING_MAX_DURATION)
+    max_job_steps = min(max_job_steps or Settings.PROFILING_MAX_JOB_STEPS, Settings.PROFILING_MAX_JOB_STEPS)
+    with _sessions_lock:
+        if _last_session and _last_session.active:
+            _last_session.check_deadline()
+            if _last_session.active:
+                raise ProfilingSessionError('a profiling session is already active')
+        session = ProfilingSession(mode, max_job_steps, duration, datasource, interval)
+        _last_session = _active_session = session
+    logger.info("Profiling at most {count} job steps ({datasource}) in {mode} mode for at most {duration}s",
+                count=max_job_steps, datasource=datasource or 'all datasources', mode=mode.value, duration=duration)
+    return session
+
+
+def stop_profiling() -> ProfilingSession | None:
+    """ Stops the active profiling session and returns the last session, if any. """
+    session = _last_session
+    if session:
+        session.stop()
+    return session
+
+
+def get_profiling_session() -> ProfilingSession | None:
+    """ Returns the last profiling session, active or not. """
+    session = _last_session
+    if session and session.active:
+        session.check_deadline()
+    return session
+
+
+@contextmanager
+def profile_job_step(job_step: JobStep):
+    """ Profiles the block, which handles the job step, if a profiling session is active and accepts it. """
+    session = _active_session
+    if session is None or not session.acquire(job_step):
+        yield
+        return
+
+    profile = cProfile.Profile() if session.mode == ProfilingMode.CPROFILE else None
+    if profile:
+        profile.enable()
+    try:
+        yield
+    finally:
+        if profile:
+            profile.disable()
+        session.release(profile)
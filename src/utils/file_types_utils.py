@@ -1,3 +1,4 @@
+import mimetypes
 from types import SimpleNamespace
 
 ContentType = SimpleNamespace()
@@ -8,3 +9,9 @@ ContentType.APPLICATION_JSON = 'application/json'
 
 
 SUPPORTED_CONTENT_TYPES = [ContentType.WORD, ContentType.PDF, ContentType.TEXT_PLAIN]
+
+
+def get_content_type_from_filename(filename: str) -> str | None:
+    """ Guesses the content type of a file from its extension e.g., `application/pdf` for `manual.PDF`. """
+    content_type, _ = mimetypes.guess_type(filename, strict=False)
+    return content_type
@@ -0,0 +1,265 @@
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, List, Type
+
+import html2text
+
+from config import Settings
+
+# Elements whose content isn't text of the document.
+SKIPPED_TAGS = frozenset(['head', 'title', 'script', 'style', 'template', 'noscript'])
+# Elements separated from the surrounding content by a blank line, or by a line break.
+PARAGRAPH_TAGS = frozenset(['p', 'blockquote', 'pre', 'ul', 'ol', 'table', 'dl', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6'])
+LINE_TAGS = frozenset(['div', 'section', 'article', 'header', 'footer', 'aside', 'nav', 'main', 'figure', 'li',
+                       'tr', 'dt', 'dd', 'caption', 'address', 'center'])
+HEADING_TAGS = {'h1': '# ', 'h2': '## ', 'h3': '### ', 'h4': '#### ', 'h5': '##### ', 'h6': '###### '}
+EMPHASIS_TAGS = {'strong': '**', 'b': '**', 'em': '_', 'i': '_', 'code': '`', 'tt': '`'}
+
+
+class HtmlToTextConverter(ABC):
+    """
+    Converts HTML into markdown-ish plain text, for it to be chunked and embedded. Implementations are registered in
+    `HTML_TO_TEXT_CONVERTERS` and shared by all the threads.
+    """
+
+    name: str
+
+    @abstractmethod
+    def convert(self, html: str) -> str:
+        pass
+
+    def convert_all(self, htmls: Iterable[str]) -> List[str]:
+        return [self.convert(html) for html in htmls]
+
+
+class Html2textConverter(HtmlToTextConverter):
+    """
+    Pure-Python converter, always available, whose output is the reference of the other converters.
+    An `HTML2Text` instance accumulates the text it handles, so a new one is needed for each conversion.
+    """
+
+    name = 'html2text'
+
+    def convert(self, html: str) -> str:
+        return html2text.HTML2Text().handle(html)
+
+
+class _MarkdownWriter:
+    """
+    Target of the lxml HTML parser, which writes the markdown text of the elements it is notified of.
+    Like `html2text`, it collapses the whitespaces outside of `<pre>`, renders the links, images, emphasis, headings
+    and lists in markdown, but it doesn't wrap the lines nor escape the markdown characters of the text.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.parts: List[str] = []
+        self.pending_newlines = 0  # line breaks to write before the next text
+        self.pending_space = False
+        self.at_line_start = True
+        self.skip_depth = 0
+        self.pre_depth = 0
+        self.quote_depth = 0
+        self.lists: List[List] = []  # [tag, number of the last item] of the enclosing lists
+        self.links: List[str | None] = []
+        self.cell_index = 0
+
+    def start(self, tag, attrib):
+        if not isinstance(tag, str):  # comments and processing instructions
+            return
+        if self.skip_depth or tag in SKIPPED_TAGS:
+            self.skip_depth += 1
+            return
+
+        if tag in PARAGRAPH_TAGS and not (self.lists and tag in ('ul', 'ol')):  # nested lists aren't paragraphs
+            self._break(2)
+        elif tag in LINE_TAGS or tag in ('ul', 'ol'):
+            self._break(1)
+
+        match tag:
+            case 'br':
+                self._newline()
+            case 'hr':
+                self._break(2)
+                self._write('* * *')
+                self._break(2)
+            case 'blockquote':
+                self.quote_depth += 1
+            case 'pre':
+                self.pre_depth += 1
+            case 'ul' | 'ol':
+                self.lists.append([tag, 0])
+            case 'li':
+                if self.lists:
+                    self.lists[-1][1] += 1
+                    list_tag, number = self.lists[-1]
+                    indent = '  ' * len(self.lists)
+                    self._write(f'{indent}{number}. ' if list_tag == 'ol' else f'{indent}* ', markup=True)
+                else:
+                    self._write('  * ', markup=True)
+            case 'tr':
+                self.cell_index = 0
+            case 'td' | 'th':
+                if self.cell_index:
+                    self._write(' | ', markup=True)
+                self.cell_index += 1
+            case 'a':
+                href = attrib.get('href')
+                # like html2text, the internal links are written as their sole text
+                href = href if href and not href.startswith('#') else None
+                self.links.append(href)
+                if href:
+                    self._write('[', markup=True)
+            case 'img':
+                src = attrib.get('src')
+                if src:
+                    self._write(f"![{attrib.get('alt') or ''}]({src})", markup=True)
+            case _ if tag in HEADING_TAGS:
+                self._write(HEADING_TAGS[tag], markup=True)
+            case _ if tag in EMPHASIS_TAGS and not self.pre_depth:
+                self._write(EMPHASIS_TAGS[tag], markup=True)
+
+    def end(self, tag):
+        if not isinstance(tag, str):
+            return
+        if self.skip_depth:
+            self.skip_depth -= 1
+            return
+
+        match tag:
+            case 'blockquote':
+                self.quote_depth = max(0, self.quote_depth - 1)
+            case 'pre':
+                self.pre_depth = max(0, self.pre_depth - 1)
+            case 'ul' | 'ol':
+                if self.lists:
+                    self.lists.pop()
+                if self.lists:
+                    self._break(1)
+                    return
+            case 'a':
+                href = self.links.pop() if self.links else None
+                if href:
+                    self.pending_space = False
+                    self._write(f']({href})', markup=True)
+            case _ if tag in EMPHASIS_TAGS and not self.pre_depth:
+                self.pending_space = False
+                self._write(EMPHASIS_TAGS[tag], markup=True)
+
+        if tag in PARAGRAPH_TAGS:
+            self._break(2)
+        elif tag in LINE_TAGS:
+            self._break(1)
+
+    def data(self, text):
+        if self.skip_depth:
+            return
+        if self.pre_depth:
+            for index, line in enumerate(text.split('\n')):
+                if index:
+                    self._newline()
+                if line:
+                    self._write(line, indent='    ')
+            return
+
+        words = text.split()
+        if not words:
+            self.pending_space = self.pending_space or bool(text)
+            return
+        if text[0].isspace():
+            self.pending_space = True
+        self._write(' '.join(words))
+        self.pending_space = text[-1].isspace()
+
+    def close(self) -> str:
+        text = ''.join(self.parts)
+        self.reset()
+        return text + '\n\n' if text else text
+
+    def _break(self, newlines: int):
+        if self.parts:
+            self.pending_newlines = max(self.pending_newlines, newlines)
+        self.pending_space = False
+
+    def _newline(self):
+        self.pending_newlines += 1
+        self.pending_space = False
+
+    def _write(self, text: str, markup: bool = False, indent: str = ''):
+        if self.pending_newlines:
+            self.parts.append('\n' * self.pending_newlines)
+            self.pending_newlines = 0
+            self.at_line_start = True
+        if self.at_line_start:
+            prefix = '> ' * self.quote_depth + indent
+            if prefix:
+                self.parts.append(prefix)
+        elif self.pending_space and not (markup and text.startswith(']')):
+            self.parts.append(' ')
+        self.parts.append(text)
+        self.pending_space = False
+        self.at_line_start = False
+
+
+class LxmlHtmlToTextConverter(HtmlToTextConverter):
+    """
+    Converter backed by the libxml2 HTML parser, more than ten times faster than html2text. Requires `lxml`.
+    Each thread reuses its parser, and the text without markup isn't parsed at all.
+    """
+
+    name = 'lxml'
+
+    def __init__(self):
+        self.__local = threading.local()
+
+    def convert(self, html: str) -> str:
+        if '<' not in html and '&' not in html:
+            text = ' '.join(html.split())
+            return text + '\n\n' if text else text
+
+        from lxml import etree
+        if getattr(self.__local, 'parser', None) is None:
+            self.__local.writer = _MarkdownWriter()
+            self.__local.parser = etree.HTMLParser(target=self.__local.writer, remove_comments=True)
+        self.__local.writer.reset()  # in case the previous conversion failed
+        try:
+            return etree.fromstring(html, self.__local.parser)
+        except ValueError:  # an XML declaration specifying the encoding, which a `str` has no use of
+            return etree.fromstring(html.encode('utf-8'), self.__local.parser)
+        except etree.XMLSyntaxError:  # e.g., nothing but a comment or a doctype
+            return ''
+
+    @staticmethod
+    def is_available() -> bool:
+        try:
+            import lxml.etree  # noqa: F401
+            return True
+        except ImportError:
+            return False
+
+
+HTML_TO_TEXT_CONVERTERS: Dict[str, Type[HtmlToTextConverter]] = {
+    Html2textConverter.name: Html2textConverter,
+    LxmlHtmlToTextConverter.name: LxmlHtmlToTextConverter,
+}
+
+_converters: Dict[str, HtmlToTextConverter] = {}
+_converters_lock = threading.Lock()
+
+
+def get_html_to_text_converter(name: str | None = None) -> HtmlToTextConverter:
+    """
+    Returns the converter of the specified name, defaulting to `Settings.HTML_TO_TEXT_BACKEND`.
+    `auto` selects `lxml` when it is installed and `html2text` otherwise. Each converter is built once per process.
+    """
+    name = name or Settings.HTML_TO_TEXT_BACKEND
+    if name == 'auto':
+        name = LxmlHtmlToTextConverter.name if LxmlHtmlToTextConverter.is_available() else Html2textConverter.name
+    if name not in HTML_TO_TEXT_CONVERTERS:
+        raise ValueError(f'unsupported HTML to text backend: {name}')
+    with _converters_lock:
+        if name not in _converters:
+            _converters[name] = HTML_TO_TEXT_CONVERTERS[name]()
+        return _converters[name]
@@ -1,7 +1,10 @@
 import json
 import os
+import tempfile
+import threading
 from typing import Dict, AnyStr
 
+from config import Settings
 from .object_utils import has_callable_attr
 
 
@@ -30,3 +33,86 @@ def read_json_dict(dirname, file) -> Dict:
 def is_file_like(o) -> bool:
     """ Indicates whether `o` is a file-like object. """
     return has_callable_attr(o, 'read')
+
+
+class ScratchSpaceQuotaExceededError(Exception):
+    """ Raised when spilling more data to disk would exceed the quota of a ``ScratchSpace``. """
+
+
+class ScratchSpace:
+    """
+    Bounds the disk space that a process uses for its spooled temporary files.
+    Space is reserved as the files spill to disk and released as they are closed.
+    """
+
+    def __init__(self, directory: str | None, quota: int):
+        """
+        :param directory: where the temporary files are created. `None` means the system's temporary directory.
+        :param quota: max number of bytes the temporary files may use on disk at a time
+        """
+        self.directory = directory
+        self.quota = quota
+        self.used = 0
+        self.__lock = threading.Lock()
+
+    def reserve(self, size: int):
+        with self.__lock:
+            if self.used + size > self.quota:
+                raise ScratchSpaceQuotaExceededError(
+                    f'cannot spool {size} more bytes to disk: {self.used} of the {self.quota} bytes quota are in use')
+            self.used += size
+
+    def release(self, size: int):
+        with self.__lock:
+            self.used = max(0, self.used - size)
+
+
+class ScratchSpooledTemporaryFile(tempfile.SpooledTemporaryFile):
+    """
+    A ``SpooledTemporaryFile`` whose disk usage, once rolled over, is accounted against a ``ScratchSpace``.
+    The file is deleted and its reservation released when it is closed.
+    """
+
+    def __init__(self, scratch_space: ScratchSpace, max_size: int):
+        super().__init__(max_size=max_size, mode='w+b', dir=scratch_space.directory)
+        self.scratch_space = scratch_space
+        self.reserved = 0
+
+    def write(self, s) -> int:
+        end = self.tell() + len(s)
+        if end > self._max_size and end > self.reserved:
+            self.scratch_space.reserve(end - self.reserved)
+            self.reserved = end
+        return super().write(s)
+
+    def writelines(self, iterable):
+        for line in iterable:
+            self.write(line)
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            self.scratch_space.release(self.reserved)
+            self.reserved = 0
+
+    def __exit__(self, exc, value, tb):
+        self.close()  # the base implementation doesn't go through close()
+
+
+scratch_space = ScratchSpace(Settings.SCRATCH_DIR, Settings.SCRATCH_SPACE_QUOTA)
+
+
+def spooled_temporary_file(max_size: int | None = None) -> ScratchSpooledTemporaryFile:
+    """
+    Returns a new binary temporary file, which is kept in memory until it grows bigger than `max_size` bytes and is
+    then spilled to the process scratch space.
+
+        with spooled_temporary_file() as file:
+            file.write(...)
+
+    :param max_size: defaults to `Settings.SPOOL_MAX_MEMORY_SIZE`
+    """
+    if max_size is None:
+        max_size = Settings.SPOOL_MAX_MEMORY_SIZE
+    return ScratchSpooledTemporaryFile(scratch_space, max_size)
@@ -1,10 +1,20 @@
-from langchain.document_loaders import PyPDFLoader, Docx2txtLoader, TextLoader
-from langchain.document_loaders.base import BaseLoader
+from io import BytesIO
+from typing import TYPE_CHECKING, BinaryIO, List
+
+import docx2txt
+from langchain.schema import Document
 
 from utils.file_types_utils import ContentType
+from utils.parser_sandbox import run_parser
+from utils.pdf_utils import extract_pdf_pages
+
+if TYPE_CHECKING:
+    from langchain.document_loaders.base import BaseLoader
 
 
-def get_langchain_loader(content_type: str, file_path: str) -> BaseLoader:
+def get_langchain_loader(content_type: str, file_path: str) -> 'BaseLoader':
+    # the langchain loaders are slow to import: they are imported when first needed
+    from langchain.document_loaders import Docx2txtLoader, PyPDFLoader, TextLoader
     match content_type:
         case ContentType.PDF:
             return PyPDFLoader(file_path)
@@ -13,4 +23,38 @@ def get_langchain_loader(content_type: str, file_path: str) -> BaseLoader:
         case ContentType.TEXT_PLAIN:
             return TextLoader(file_path)
         case _:
-            raise ValueError(f'unsupported file content type: {content_type}')
\ No newline at end of file
+            raise ValueError(f'unsupported file content type: {content_type}')
+
+
+def load_documents(content_type: str, file: BinaryIO, source: str | None = None) -> List[Document]:
+    """
+    Parses the content of a binary file-like object into langchain documents, without going through a file path.
+    PDF and Word files are parsed in the parser sandbox (see `utils.parser_sandbox`).
+    The documents are the same as the ones the loaders of `get_langchain_loader()` return (one per PDF page, etc.).
+
+    :param content_type: MIME type of the content
+    :param file: seekable binary file-like object e.g., ``BytesIO`` or ``spooled_temporary_file()``, positioned at the
+                 beginning of the content
+    :param source: value of the `source` metadata of the documents
+    """
+    match content_type:
+        case ContentType.PDF:
+            return load_pdf_documents(file, source)
+        case ContentType.WORD:
+            return [Document(page_content=run_parser(_extract_word_text, file.read()), metadata={'source': source})]
+        case ContentType.TEXT_PLAIN:
+            return [Document(page_content=file.read().decode('utf-8'), metadata={'source': source})]
+        case _:
+            raise ValueError(f'unsupported file content type: {content_type}')
+
+
+def _extract_word_text(data: bytes) -> str:
+    return docx2txt.process(BytesIO(data))
+
+
+def load_pdf_documents(file: BinaryIO, source: str | None = None) -> List[Document]:
+    """ Returns one document per page of the PDF, as `PyPDFLoader` does. See `extract_pdf_pages()`. """
+    return [
+        Document(page_content=page_content, metadata={'source': source, 'page': page_number})
+        for page_number, page_content in enumerate(extract_pdf_pages(file))
+    ]
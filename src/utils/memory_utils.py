@@ -0,0 +1,63 @@
+import os
+import resource
+from dataclasses import dataclass
+
+# Fields of /proc/<pid>/smaps_rollup, in KiB.
+_SMAPS_FIELDS = {'Rss': 'rss', 'Pss': 'pss', 'Shared_Clean': 'shared', 'Shared_Dirty': 'shared',
+                 'Private_Clean': 'private', 'Private_Dirty': 'private'}
+
+
+@dataclass
+class MemoryUsage:
+    """
+    Memory of a process, in bytes. The proportional set size (PSS) counts the pages shared with other processes
+    (e.g., memory-mapped model weights) divided by the number of processes sharing them: the PSS of the processes of
+    a node add up to the memory they actually use, unlike their RSS.
+    """
+    rss: int
+    pss: int | None = None
+    shared: int | None = None
+    private: int | None = None
+
+    def __str__(self):
+        def mib(size: int | None) -> str:
+            return '?' if size is None else f'{size / (1024 * 1024):.0f} MiB'
+
+        return f'RSS {mib(self.rss)}, PSS {mib(self.pss)}, shared {mib(self.shared)}, private {mib(self.private)}'
+
+
+def get_memory_usage(pid: int | str = 'self') -> MemoryUsage | None:
+    """ Returns the memory usage of the process (Linux only), `None` when it isn't available. """
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as smaps_rollup:
+            return parse_smaps_rollup(smaps_rollup.read())
+    except OSError:
+        pass
+    try:  # kernels older than 4.14, without the PSS
+        with open(f'/proc/{pid}/statm') as statm:
+            return MemoryUsage(rss=int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE'))
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def get_rss() -> int | None:
+    """ Returns the resident set size of this process (Linux only), cheaper to get than `get_memory_usage()`. """
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def get_max_rss() -> int:
+    """ Returns the peak resident set size of this process so far. """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # in KiB on Linux
+
+
+def parse_smaps_rollup(text: str) -> MemoryUsage:
+    sizes = {'rss': 0, 'pss': 0, 'shared': 0, 'private': 0}
+    for line in text.splitlines():
+        fields = line.split()
+        if len(fields) == 3 and (name := _SMAPS_FIELDS.get(fields[0].rstrip(':'))):
+            sizes[name] += int(fields[1]) * 1024
+    return MemoryUsage(**sizes)
@@ -0,0 +1,70 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Tuple
+
+from prometheus_client import Counter, Histogram
+
+from utils.tracing_utils import start_span
+
+NO_LABEL = 'none'
+STAGE_LABELS = ['datasource', 'job_type', 'stage']
+
+job_step_stage_seconds = Histogram(
+    'job_step_stage_seconds', 'Time spent in a stage of the job steps e.g., source fetch or embedding', STAGE_LABELS)
+job_step_stage_items = Counter(
+    'job_step_stage_items', 'Items handled by a stage of the job steps e.g., chunks embedded', STAGE_LABELS)
+job_step_stage_errors = Counter('job_step_stage_errors', 'Failures of a stage of the job steps', STAGE_LABELS)
+
+# (datasource, job type) of the job step handled by the current thread, see `job_step_labels()`
+_job_step_labels: ContextVar[Tuple[str, str]] = ContextVar('job_step_labels', default=(NO_LABEL, NO_LABEL))
+_current_stage: ContextVar[str | None] = ContextVar('current_stage', default=None)
+
+
+@contextmanager
+def job_step_labels(datasource: str | None, job_type: str | None):
+    """
+    Labels the stages measured within the block (see `measure_stage()`) with the datasource and the job type of the
+    job step being handled. Threads started by the block only get them if they run in a copy of the context, e.g.,
+    ``executor.submit(contextvars.copy_context().run, function, ...)``.
+    """
+    token = _job_step_labels.set((datasource or NO_LABEL, job_type or NO_LABEL))
+    try:
+        yield
+    finally:
+        _job_step_labels.reset(token)
+
+
+def get_job_step_labels() -> Tuple[str, str]:
+    """ Returns the datasource and the job type of the job step being handled, `NO_LABEL` outside of job steps. """
+    return _job_step_labels.get()
+
+
+def get_current_stage() -> str | None:
+    """ Returns the innermost stage being measured by the current thread, if any. """
+    return _current_stage.get()
+
+
+@contextmanager
+def measure_stage(stage: str):
+    """
+    Observes the time spent in the block, or in the decorated function, in `job_step_stage_seconds`, and counts its
+    failures, with the labels of the current job step. The block is also traced as a span of the job step.
+    """
+    labels = (*_job_step_labels.get(), stage)
+    token = _current_stage.set(stage)
+    start_time = time.perf_counter()
+    try:
+        with start_span(stage):
+            yield
+    except Exception:
+        job_step_stage_errors.labels(*labels).inc()
+        raise
+    finally:
+        _current_stage.reset(token)
+        job_step_stage_seconds.labels(*labels).observe(time.perf_counter() - start_time)
+
+
+def count_stage_items(stage: str, count: int):
+    """ Counts the items (documents, chunks, etc.) handled by a stage of the current job step. """
+    job_step_stage_items.labels(*_job_step_labels.get(), stage).inc(count)
@@ -0,0 +1,239 @@
+import math
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from multiprocessing.connection import Connection
+from typing import Callable, Set
+
+from loguru import logger
+
+from config import Settings
+
+try:
+    import resource  # POSIX only
+except ImportError:  # pragma: no cover
+    resource = None
+
+# How often the memory usage and the wall time of a parser process are checked, in seconds.
+POLL_INTERVAL: float = 0.1
+
+
+class ParserSandboxError(Exception):
+    """ Raised when a parser process can't return the result of a parsing e.g., because it crashed. """
+
+
+class ParserLimitExceededError(ParserSandboxError):
+    """ Raised when parsing a file exceeded one of the CPU time, wall time or memory limits of the sandbox. """
+
+
+def _limit_cpu_time(cpu_time_limit: int):
+    """ Lets the current process use `cpu_time_limit` more seconds of CPU before it is killed with SIGXCPU. """
+    if resource is None or not cpu_time_limit:
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    used = math.ceil(usage.ru_utime + usage.ru_stime)
+    _, hard_limit = resource.getrlimit(resource.RLIMIT_CPU)
+    soft_limit = used + cpu_time_limit
+    if hard_limit != resource.RLIM_INFINITY:
+        soft_limit = min(soft_limit, hard_limit)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft_limit, hard_limit))
+
+
+def _parser_process_main(connection: Connection, cpu_time_limit: int):
+    """ Runs the tasks received from `connection` one at a time, until `None` is received or the pipe is closed. """
+    while True:
+        try:
+            task = connection.recv()
+        except EOFError:
+            return
+        if task is None:
+            return
+        function, args = task
+        _limit_cpu_time(cpu_time_limit)
+        try:
+            result = (True, function(*args))
+        except BaseException as e:
+            result = (False, e)
+        try:
+            connection.send(result)
+        except Exception as e:  # the exception or the result can't be pickled
+            connection.send((False, ParserSandboxError(f'{type(e).__name__}: {e}')))
+
+
+class _ParserProcess:
+    """ A parser subprocess and the pipe to send it tasks. """
+
+    def __init__(self, context, cpu_time_limit: int):
+        self.connection, child_connection = context.Pipe()
+        self.process = context.Process(target=_parser_process_main, args=(child_connection, cpu_time_limit),
+                                       name='parser', daemon=True)
+        self.process.start()
+        child_connection.close()
+        self.task_count = 0
+
+    def get_rss(self) -> int | None:
+        """ Returns the resident set size of the process in bytes, `None` when it isn't available. """
+        try:
+            with open(f'/proc/{self.process.pid}/statm') as statm:
+                return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        except (OSError, ValueError, IndexError):
+            return None
+
+    def close(self):
+        try:
+            self.connection.send(None)
+        except OSError:
+            pass
+        self.process.join(timeout=1)
+        self.kill()
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join()
+        self.connection.close()
+
+
+class ParserSandbox:
+    """
+    Runs parsing functions in a pool of subprocesses, so that a malformed or huge file can neither pin a job worker
+    nor push the application toward OOM. Each task gets CPU time, wall time and RSS limits; a process exceeding them
+    is killed and replaced. Processes are also recycled after a number of tasks to release the memory they hoard.
+
+    The functions, their arguments and their results must be picklable, and the functions importable by the
+    subprocesses (i.e., module-level functions). Keep the results compact e.g., the extracted text.
+    """
+
+    def __init__(self,
+                 processes: int,
+                 cpu_time_limit: int,
+                 wall_time_limit: float,
+                 rss_limit: int,
+                 max_tasks_per_process: int):
+        self.cpu_time_limit = cpu_time_limit
+        self.wall_time_limit = wall_time_limit
+        self.rss_limit = rss_limit
+        self.max_tasks_per_process = max_tasks_per_process
+        # processes are spawned rather than forked as the application is multithreaded
+        self.__context = multiprocessing.get_context('spawn')
+        # each thread drives its own parser process, so there are never more tasks running than processes
+        self.__executor = ThreadPoolExecutor(processes, thread_name_prefix='parser')
+        self.__local = threading.local()
+        self.__processes: Set[_ParserProcess] = set()
+        self.__lock = threading.Lock()
+
+    def submit(self, function: Callable, *args) -> Future:
+        return self.__executor.submit(self.__execute, function, args)
+
+    def run(self, function: Callable, *args):
+        """ Runs `function(*args)` in a parser process and returns its result. """
+        return self.submit(function, *args).result()
+
+    def shutdown(self):
+        self.__executor.shutdown(wait=False, cancel_futures=True)
+        with self.__lock:
+            processes = list(self.__processes)
+            self.__processes.clear()
+        for process in processes:
+            process.kill()
+
+    def __get_process(self) -> _ParserProcess:
+        process = getattr(self.__local, 'process', None)
+        if process is None:
+            process = _ParserProcess(self.__context, self.cpu_time_limit)
+            self.__local.process = process
+            with self.__lock:
+                self.__processes.add(process)
+        return process
+
+    def __discard_process(self, process: _ParserProcess, kill: bool = True):
+        self.__local.process = None
+        with self.__lock:
+            self.__processes.discard(process)
+        if kill:
+            process.kill()
+        else:
+            process.close()
+
+    def __send_task(self, function: Callable, args: tuple) -> _ParserProcess:
+        """ Sends the task to the parser process of the thread, replaced once if it died while idle. """
+        for attempt in range(2):
+            process = self.__get_process()
+            try:
+                process.connection.send((function, args))
+                return process
+            except OSError as e:  # e.g., the process was killed by the OOM killer between two tasks
+                self.__discard_process(process)
+                if attempt:
+                    raise ParserSandboxError(f'failed to send the task to a parser process: {e}') from e
+                logger.warning(f"Replacing the parser process {process.process.pid}, which died: {e}")
+
+    def __execute(self, function: Callable, args: tuple):
+        process = self.__send_task(function, args)
+        deadline = time.monotonic() + self.wall_time_limit
+        while not process.connection.poll(POLL_INTERVAL):
+            if time.monotonic() > deadline:
+                self.__discard_process(process)
+                raise ParserLimitExceededError(f'parsing exceeded the wall time limit of {self.wall_time_limit}s')
+            if self.rss_limit and (rss := process.get_rss()) and rss > self.rss_limit:
+                self.__discard_process(process)
+                raise ParserLimitExceededError(
+                    f'parsing exceeded the memory limit of {self.rss_limit // (1024 * 1024)} MiB'
+                    f' ({rss // (1024 * 1024)} MiB used)')
+
+        try:
+            succeeded, result = process.connection.recv()
+        except EOFError:
+            self.__discard_process(process)
+            if process.process.exitcode == -signal.SIGXCPU:
+                raise ParserLimitExceededError(
+                    f'parsing exceeded the CPU time limit of {self.cpu_time_limit}s') from None
+            raise ParserSandboxError(
+                f'parser process died with exit code {process.process.exitcode}') from None
+
+        process.task_count += 1
+        if process.task_count >= self.max_tasks_per_process:
+            self.__discard_process(process, kill=False)
+        if not succeeded:
+            raise result
+        return result
+
+
+_parser_sandbox: ParserSandbox | None = None
+_parser_sandbox_lock = threading.Lock()
+
+
+def get_parser_sandbox() -> ParserSandbox:
+    """ Returns the sandbox shared by all the job workers, configured by the `PARSER_*` settings. """
+    global _parser_sandbox
+    with _parser_sandbox_lock:
+        if _parser_sandbox is None:
+            logger.info(f"Starting the parser sandbox with {Settings.PARSER_PROCESSES} processes")
+            _parser_sandbox = ParserSandbox(processes=Settings.PARSER_PROCESSES,
+                                            cpu_time_limit=Settings.PARSER_CPU_TIME_LIMIT,
+                                            wall_time_limit=Settings.PARSER_WALL_TIME_LIMIT,
+                                            rss_limit=Settings.PARSER_RSS_LIMIT,
+                                            max_tasks_per_process=Settings.PARSER_MAX_TASKS_PER_PROCESS)
+        return _parser_sandbox
+
+
+def shutdown_parser_sandbox():
+    global _parser_sandbox
+    with _parser_sandbox_lock:
+        if _parser_sandbox is not None:
+            _parser_sandbox.shutdown()
+            _parser_sandbox = None
+
+
+def is_parser_sandbox_enabled() -> bool:
+    return Settings.PARSER_PROCESSES > 0
+
+
+def run_parser(function: Callable, *args):
+    """ Runs `function(*args)` in the parser sandbox, or in the current thread when the sandbox is disabled. """
+    if is_parser_sandbox_enabled():
+        return get_parser_sandbox().run(function, *args)
+    return function(*args)
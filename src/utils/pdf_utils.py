@@ -0,0 +1,161 @@
+import io
+import itertools
+import os
+import shutil
+import tempfile
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import BinaryIO, Dict, Iterator, List, Tuple, Type
+
+from loguru import logger
+
+from config import Settings
+from utils.io_utils import scratch_space
+from utils.parser_sandbox import get_parser_sandbox, is_parser_sandbox_enabled
+
+
+class PdfTextExtractor(ABC):
+    """
+    Extracts the text of the pages of a PDF, given its content or the path of its file. Implementations are registered
+    in `PDF_TEXT_EXTRACTORS`.
+    """
+
+    name: str
+
+    @abstractmethod
+    def get_page_count(self, pdf: bytes | str) -> int:
+        pass
+
+    @abstractmethod
+    def extract_pages(self, pdf: bytes | str, start: int, stop: int) -> List[str]:
+        """ Returns the text of the pages in the `[start, stop)` range, one string per page. """
+        pass
+
+
+class PypdfTextExtractor(PdfTextExtractor):
+    """ Pure-Python extractor, always available. Its output is the one of langchain's `PyPDFLoader`. """
+
+    name = 'pypdf'
+
+    def get_page_count(self, pdf: bytes | str) -> int:
+        import pypdf
+        return len(pypdf.PdfReader(io.BytesIO(pdf) if isinstance(pdf, bytes) else pdf).pages)
+
+    def extract_pages(self, pdf: bytes | str, start: int, stop: int) -> List[str]:
+        import pypdf
+        pdf_reader = pypdf.PdfReader(io.BytesIO(pdf) if isinstance(pdf, bytes) else pdf)
+        return [pdf_reader.pages[page_number].extract_text() for page_number in range(start, stop)]
+
+
+class PymupdfTextExtractor(PdfTextExtractor):
+    """
+    Extractor backed by the MuPDF native library, several times faster than pypdf. Requires `pymupdf`, which isn't
+    among the requirements as it is licensed under the AGPL: it is only used when explicitly selected.
+    """
+
+    name = 'pymupdf'
+
+    def get_page_count(self, pdf: bytes | str) -> int:
+        with self.__open(pdf) as pdf_document:
+            return pdf_document.page_count
+
+    def extract_pages(self, pdf: bytes | str, start: int, stop: int) -> List[str]:
+        with self.__open(pdf) as pdf_document:
+            return [pdf_document[page_number].get_text() for page_number in range(start, stop)]
+
+    @staticmethod
+    def __open(pdf: bytes | str):
+        import fitz
+        if isinstance(pdf, bytes):
+            return fitz.open(stream=pdf, filetype='pdf')
+        return fitz.open(pdf, filetype='pdf')
+
+    @staticmethod
+    def is_available() -> bool:
+        try:
+            import fitz  # noqa: F401
+            return True
+        except ImportError:
+            return False
+
+
+PDF_TEXT_EXTRACTORS: Dict[str, Type[PdfTextExtractor]] = {
+    PypdfTextExtractor.name: PypdfTextExtractor,
+    PymupdfTextExtractor.name: PymupdfTextExtractor,
+}
+
+
+def get_pdf_text_extractor(name: str | None = None) -> PdfTextExtractor:
+    """ Returns the extractor of the specified name, defaulting to `Settings.PDF_EXTRACTION_BACKEND`. """
+    name = name or Settings.PDF_EXTRACTION_BACKEND
+    if name not in PDF_TEXT_EXTRACTORS:
+        raise ValueError(f'unsupported PDF extraction backend: {name}')
+    return PDF_TEXT_EXTRACTORS[name]()
+
+
+def _extract_page_range(extractor_name: str, path: str, start: int, stop: int) -> List[str]:
+    return get_pdf_text_extractor(extractor_name).extract_pages(path, start, stop)
+
+
+def _extract_small_pdf(extractor_name: str, path: str, max_page_count: int) -> Tuple[int, List[str] | None]:
+    """ Returns the page count of the PDF, along with the text of its pages if there are fewer than `max_page_count`. """
+    extractor = get_pdf_text_extractor(extractor_name)
+    page_count = extractor.get_page_count(path)
+    if page_count >= max_page_count:
+        return page_count, None
+    return page_count, extractor.extract_pages(path, 0, page_count)
+
+
+@contextmanager
+def _scratch_pdf_file(data: bytes | BinaryIO) -> Iterator[str]:
+    """ Writes the PDF to a file of the scratch space, accounted against its quota, and yields its path. """
+    file_descriptor, path = tempfile.mkstemp(suffix='.pdf', dir=scratch_space.directory)
+    reserved = 0
+    try:
+        with os.fdopen(file_descriptor, mode='wb') as file:
+            if isinstance(data, bytes):
+                file.write(data)
+            else:
+                shutil.copyfileobj(data, file)
+            size = file.tell()
+        scratch_space.reserve(size)
+        reserved = size
+        yield path
+    finally:
+        scratch_space.release(reserved)
+        os.remove(path)
+
+
+def extract_pdf_pages(data: bytes | BinaryIO, extractor: PdfTextExtractor | None = None) -> List[str]:
+    """
+    Returns the text of every page of the PDF, given its content or its file.
+
+    The extraction runs in the parser sandbox (see `utils.parser_sandbox`), from a copy of the PDF in the scratch
+    space, which the sandbox processes read rather than receiving the content. PDFs of at least
+    `Settings.PDF_PARALLEL_MIN_PAGES` pages are split into ranges of `Settings.PDF_PAGES_PER_TASK` pages extracted
+    in parallel by the sandbox processes. The calling thread merely waits for them, which leaves the GIL to the other
+    job workers.
+    """
+    extractor = extractor or get_pdf_text_extractor()
+    if not is_parser_sandbox_enabled():
+        data = data if isinstance(data, bytes) else data.read()
+        return extractor.extract_pages(data, 0, extractor.get_page_count(data))
+
+    parser_sandbox = get_parser_sandbox()
+    with _scratch_pdf_file(data) as path:
+        page_count, pages = parser_sandbox.run(_extract_small_pdf, extractor.name, path,
+                                               Settings.PDF_PARALLEL_MIN_PAGES)
+        if pages is not None:
+            return pages
+
+        logger.debug(f"Extracting {page_count} PDF pages with {extractor.name} in parallel")
+        futures = [
+            parser_sandbox.submit(_extract_page_range, extractor.name, path, start,
+                                  min(start + Settings.PDF_PAGES_PER_TASK, page_count))
+            for start in range(0, page_count, Settings.PDF_PAGES_PER_TASK)
+        ]
+        try:
+            return list(itertools.chain.from_iterable(future.result() for future in futures))
+        finally:
+            for future in futures:
+                future.cancel()
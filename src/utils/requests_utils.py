@@ -1,14 +1,24 @@
 import copy
+import random
+import threading
 from abc import ABC, abstractmethod
+from datetime import datetime
 
 from loguru import logger
+from prometheus_client import Counter
 import requests.exceptions
 import time
-from typing import Mapping
+from typing import Dict, Mapping
 
 from requests import PreparedRequest, Response
 from requests.adapters import BaseAdapter
 from requests.cookies import extract_cookies_to_jar
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+
+from config import Settings
+from utils.http_utils import parse_rfc_5322_datetime
+from utils.metrics_utils import NO_LABEL, get_current_stage, get_job_step_labels, measure_stage
+from utils.tracing_utils import SpanKind, inject_trace_context, start_span
 
 
 class BaseAdapterWrapper(BaseAdapter):
@@ -160,3 +170,199 @@ class LoggingFilter(AdapterFilter):
             raise exception
 
         return response
+
+
+class StageMetricsFilter(AdapterFilter):
+    """
+    A request filter, which measures the HTTP calls of the job steps as a stage of theirs (see
+    `utils.metrics_utils.measure_stage()`), unless they are made within another stage, e.g., claiming the job step.
+    """
+
+    def __init__(self, stage: str):
+        super().__init__()
+        self.stage = stage
+
+    def send(self, chain: AdapterFilterChain) -> Response:
+        if get_current_stage() is not None or get_job_step_labels() == (NO_LABEL, NO_LABEL):
+            return chain.send()
+        with measure_stage(self.stage):
+            return chain.send()
+
+
+class TracingFilter(AdapterFilter):
+    """
+    A request filter, which traces the HTTP calls as spans of the current trace (see `utils.tracing_utils`) and
+    propagates it to the callee with the `traceparent` header.
+    """
+
+    def send(self, chain: AdapterFilterChain) -> Response:
+        request = chain.request
+        with start_span(f'HTTP {request.method}', SpanKind.CLIENT, **{
+                'http.method': request.method, 'http.url': request.url}) as span:
+            if span is None:
+                return chain.send()
+            inject_trace_context(request.headers)
+            response = chain.send()
+            span.set_attribute('http.status_code', response.status_code)
+            return response
+
+
+http_retries = Counter('http_retries', 'Retries of HTTP calls after transient failures', ['client', 'reason'])
+http_retries_given_up = Counter(
+    'http_retries_given_up', 'HTTP calls failing after transient failures without being retried (anymore)',
+    ['client', 'reason'])
+
+
+class RetryBudget:
+    """
+    Bounds the retries of a client, shared by all its threads, so that they don't overload a struggling server: each
+    call adds `ratio` retry to the budget, and `min_per_second` retries are added every second, up to `max_retries`.
+    """
+
+    def __init__(self, ratio: float, min_per_second: float, max_retries: float | None = None):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_retries = max_retries if max_retries is not None else max(10 * min_per_second, 10.0)
+        self.__retries = self.max_retries
+        self.__last_refill = time.monotonic()
+        self.__lock = threading.Lock()
+
+    def record_call(self):
+        with self.__lock:
+            self.__retries = min(self.max_retries, self.__retries + self.ratio)
+
+    def try_spend(self) -> bool:
+        """ Returns whether a retry is allowed, in which case it is spent. """
+        with self.__lock:
+            now = time.monotonic()
+            self.__retries = min(self.max_retries, self.__retries + (now - self.__last_refill) * self.min_per_second)
+            self.__last_refill = now
+            if self.__retries < 1:
+                return False
+            self.__retries -= 1
+            return True
+
+
+_retry_budgets: Dict[str, RetryBudget] = {}
+_retry_budgets_lock = threading.Lock()
+
+
+def get_retry_budget(client: str) -> RetryBudget:
+    """ Returns the retry budget of the client, shared by all its instances, as configured by the `Settings`. """
+    with _retry_budgets_lock:
+        if client not in _retry_budgets:
+            _retry_budgets[client] = RetryBudget(Settings.HTTP_RETRY_BUDGET_RATIO,
+                                                 Settings.HTTP_RETRY_BUDGET_MIN_PER_SECOND)
+        return _retry_budgets[client]
+
+
+class RetryFilter(AdapterFilter):
+    """
+    A request filter, which retries the calls failing transiently (429, 502, 503 and 504 statuses, connection
+    errors), up to `max_retries` times, as long as the retry budget of the client allows it.
+
+    The retries wait for an exponential backoff with full jitter (a random delay up to `backoff * 2^retry`, at most
+    `max_backoff`), or for the delay of the `Retry-After` header when the server specifies it. A call isn't retried
+    when the server asks to wait more than `max_backoff`.
+
+    The calls whose method isn't idempotent (POST, PATCH) are only retried when the server didn't process them: on
+    429 and 503 statuses, and on failures to connect.
+    """
+
+    RETRYABLE_STATUS_CODES = frozenset({429, 502, 503, 504})
+    # statuses meaning that the server refused the call without processing it
+    UNPROCESSED_STATUS_CODES = frozenset({429, 503})
+    IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS', 'TRACE', 'PUT', 'DELETE'})
+
+    def __init__(self,
+                 client: str,
+                 max_retries: int | None = None,
+                 backoff: float | None = None,
+                 max_backoff: float | None = None,
+                 retry_budget: RetryBudget | None = None):
+        """
+        :param client: name of the client in the metrics and the logs, whose retry budget is shared by default
+        :param max_retries: defaults to `Settings.HTTP_MAX_RETRIES`
+        :param backoff: base delay of the backoff, in seconds, defaults to `Settings.HTTP_RETRY_BACKOFF`
+        :param max_backoff: max delay between retries, in seconds, defaults to `Settings.HTTP_RETRY_MAX_BACKOFF`
+        :param retry_budget: defaults to `get_retry_budget(client)`
+        """
+        super().__init__()
+        self.client = client
+        self.max_retries = max_retries if max_retries is not None else Settings.HTTP_MAX_RETRIES
+        self.backoff = backoff if backoff is not None else Settings.HTTP_RETRY_BACKOFF
+        self.max_backoff = max_backoff if max_backoff is not None else Settings.HTTP_RETRY_MAX_BACKOFF
+        self.retry_budget = retry_budget or get_retry_budget(client)
+
+    def send(self, chain: AdapterFilterChain) -> Response:
+        self.retry_budget.record_call()
+        retry = 0
+        while True:
+            response = None
+            try:
+                response = chain.send()
+                if response.status_code not in self.RETRYABLE_STATUS_CODES:
+                    return response
+                reason = str(response.status_code)
+                retryable = self.is_idempotent(chain.request) or response.status_code in self.UNPROCESSED_STATUS_CODES
+                delay = self.get_retry_after(response)
+            except requests.exceptions.ConnectionError as e:
+                reason = type(e).__name__
+                retryable = self.is_idempotent(chain.request) or self.is_connection_failure(e)
+                delay = None
+                if not self.__should_retry(chain, retry, reason, retryable, delay):
+                    raise
+            else:
+                if not self.__should_retry(chain, retry, reason, retryable, delay):
+                    return response
+
+            if delay is None:
+                delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** retry))
+            retry += 1
+            http_retries.labels(self.client, reason).inc()
+            logger.warning("retrying {method} {url} in {delay:.2f}s after {reason} ({retry}/{max_retries})",
+                           method=chain.request.method, url=chain.request.url, delay=delay, reason=reason,
+                           retry=retry, max_retries=self.max_retries)
+            if response is not None:
+                chain.reset()  # releases the connection
+            time.sleep(delay)
+
+    def __should_retry(self, chain: AdapterFilterChain, retry: int, reason: str, retryable: bool, delay: float | None):
+        if not retryable or not self.is_body_replayable(chain.request):
+            return False
+        if retry >= self.max_retries or (delay is not None and delay > self.max_backoff) \
+                or not self.retry_budget.try_spend():
+            http_retries_given_up.labels(self.client, reason).inc()
+            return False
+        return True
+
+    def is_idempotent(self, request: PreparedRequest) -> bool:
+        return request.method in self.IDEMPOTENT_METHODS
+
+    @staticmethod
+    def is_connection_failure(error: requests.exceptions.ConnectionError) -> bool:
+        """ Returns whether the call failed to connect, in which case the server didn't receive it. """
+        if isinstance(error, requests.exceptions.ConnectTimeout):
+            return True
+        cause = error.args[0] if error.args else None
+        return isinstance(cause, MaxRetryError) and isinstance(cause.reason, NewConnectionError)
+
+    @staticmethod
+    def is_body_replayable(request: PreparedRequest) -> bool:
+        return request.body is None or isinstance(request.body, (bytes, str))
+
+    @staticmethod
+    def get_retry_after(response: Response) -> float | None:
+        """ Returns the delay of the `Retry-After` header in seconds, if any. """
+        retry_after = response.headers.get('Retry-After')
+        if not retry_after:
+            return None
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            pass
+        try:
+            retry_at = parse_rfc_5322_datetime(retry_after, offset_naive=True)
+        except (TypeError, ValueError):
+            return None
+        return max(0.0, (retry_at - datetime.utcnow()).total_seconds()) if retry_at else None
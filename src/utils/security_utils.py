@@ -0,0 +1,18 @@
+import secrets
+
+from fastapi import Header, HTTPException, status
+
+from config import Settings
+
+
+def verify_admin_token(authorization: str | None = Header(None)):
+    """
+    Restricts the admin endpoints (e.g., profiling) to the callers passing `Settings.ADMIN_TOKEN` as a bearer token.
+    They are not found when no admin token is configured.
+    """
+    if not Settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Not Found')
+    scheme, _, token = (authorization or '').partition(' ')
+    if scheme.lower() != 'bearer' or not secrets.compare_digest(token.encode(), Settings.ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Invalid admin token',
+                            headers={'WWW-Authenticate': 'Bearer'})
@@ -1,7 +1,11 @@
 import unicodedata
-import html2text
+from typing import List, Tuple
+
 from loguru import logger
 
+from utils.html_utils import Html2textConverter, get_html_to_text_converter
+from utils.metrics_utils import count_stage_items, measure_stage
+
 
 
 def normalize_unicode(text: str | None) -> str | None:
@@ -26,10 +30,34 @@ def trim_plain_text(text: str | None) -> str | None:
 
 
 def clean_text(text: str | None) -> str | None:
-    markdown_text = html_to_markdown(text)
-    trimmed_plain_text = trim_plain_text(markdown_text)
-    unicode_normalized_plain_text = normalize_unicode(trimmed_plain_text)
-    return unicode_normalized_plain_text
+    """
+    Converts the HTML text into trimmed and normalized markdown-ish plain text, using the converter selected by
+    `Settings.HTML_TO_TEXT_BACKEND`. Returns `None` if there is no text left.
+    """
+    return clean_texts(text)[0]
+
+
+def clean_texts(*texts: str | None) -> List[str | None]:
+    """
+    Cleans all the fields of a document in one call (see `clean_text()`), which spares looking the converter up and
+    lets it reuse its parser from a field to the next.
+
+    | title, content = clean_texts(article.title, article.content)
+    """
+    with measure_stage('clean_text'):
+        cleaned_texts = _clean_texts(texts)
+    count_stage_items('clean_text', len(texts))
+    return cleaned_texts
+
+
+def _clean_texts(texts: Tuple[str | None, ...]) -> List[str | None]:
+    converter = get_html_to_text_converter()
+    markdown_texts = iter(converter.convert_all(text for text in texts if text is not None))
+    cleaned_texts = []
+    for text in texts:
+        markdown_text = next(markdown_texts) if text is not None else None
+        cleaned_texts.append(normalize_unicode(trim_plain_text(markdown_text)))
+    return cleaned_texts
 
 
 def is_blank(text: str | None) -> bool:
@@ -51,7 +79,7 @@ def is_blank(text: str | None) -> bool:
 
 
 def html_to_markdown(input_str: str):
+    """ Converts the HTML into markdown with html2text, the reference of the converters of `clean_text()`. """
     if input_str is None:
         return None
-    html_to_text = html2text.HTML2Text()
-    return html_to_text.handle(input_str)
+    return Html2textConverter().convert(input_str)
@@ -0,0 +1,251 @@
+import atexit
+import hashlib
+import json
+import os
+import platform
+import secrets
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Any, Dict, Iterator, List, MutableMapping, Type
+
+import requests
+from loguru import logger
+
+from config import Settings
+
+
+class SpanKind(IntEnum):
+    """ Kinds of spans, valued as in OTLP. """
+    INTERNAL = 1
+    CLIENT = 3
+
+
+@dataclass
+class Span:
+    """ A timed operation of a trace, e.g., a job step, one of its stages or an HTTP call. Times are in ns. """
+    name: str
+    trace_id: str
+    span_id: str
+    parent_span_id: str | None = None
+    kind: SpanKind = SpanKind.INTERNAL
+    start_time: int = field(default_factory=time.time_ns)
+    end_time: int | None = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    error: str | None = None
+
+    @property
+    def traceparent(self) -> str:
+        """ The W3C trace context (https://www.w3.org/TR/trace-context/) of the span, propagated to the callees. """
+        return f'00-{self.trace_id}-{self.span_id}-01'
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """ Returns the span in the JSON encoding of OTLP. """
+        otlp_span = {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': int(self.kind),
+            'startTimeUnixNano': str(self.start_time),
+            'endTimeUnixNano': str(self.end_time or self.start_time),
+            'attributes': _to_otlp_attributes(self.attributes),
+            'status': {'code': 2, 'message': self.error} if self.error else {'code': 1},
+        }
+        if self.parent_span_id:
+            otlp_span['parentSpanId'] = self.parent_span_id
+        return otlp_span
+
+
+def _to_otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    otlp_attributes = []
+    for key, value in attributes.items():
+        if value is None:
+            continue
+        if isinstance(value, bool):
+            otlp_value = {'boolValue': value}
+        elif isinstance(value, int):
+            otlp_value = {'intValue': str(value)}
+        elif isinstance(value, float):
+            otlp_value = {'doubleValue': value}
+        else:
+            otlp_value = {'stringValue': str(value)}
+        otlp_attributes.append({'key': key, 'value': otlp_value})
+    return otlp_attributes
+
+
+class SpanExporter(ABC):
+    """ Exports the ended spans by batches. Implementations are registered in `SPAN_EXPORTERS` and selected by
+    `Settings.TRACING_EXPORTER`. """
+
+    name: str
+
+    @abstractmethod
+    def export(self, spans: List[Span]):
+        pass
+
+    @staticmethod
+    def to_otlp_request(spans: List[Span]) -> Dict[str, Any]:
+        """ Returns the OTLP export request of the spans. """
+        resource_attributes = {'service.name': Settings.TRACING_SERVICE_NAME, 'host.name': platform.node(),
+                               'process.pid': os.getpid()}
+        return {
+            'resourceSpans': [{
+                'resource': {'attributes': _to_otlp_attributes(resource_attributes)},
+                'scopeSpans': [{
+                    'scope': {'name': __name__},
+                    'spans': [span.to_otlp() for span in spans],
+                }],
+            }]
+        }
+
+
+class FileSpanExporter(SpanExporter):
+    """ Appends the spans to `Settings.TRACING_FILE`, an OTLP export request per line (as the file exporter of the
+    OpenTelemetry collector writes them). """
+
+    name = 'file'
+
+    def export(self, spans: List[Span]):
+        with open(Settings.TRACING_FILE, 'a', encoding='utf-8') as file:
+            file.write(json.dumps(self.to_otlp_request(spans), separators=(',', ':')) + '\n')
+
+
+class OtlpSpanExporter(SpanExporter):
+    """ Posts the spans to the OTLP/HTTP endpoint of a collector (`Settings.TRACING_OTLP_ENDPOINT`), JSON encoded. """
+
+    name = 'otlp'
+
+    def __init__(self):
+        self.session = requests.Session()
+
+    def export(self, spans: List[Span]):
+        response = self.session.post(Settings.TRACING_OTLP_ENDPOINT, json=self.to_otlp_request(spans), timeout=10)
+        response.raise_for_status()
+
+
+SPAN_EXPORTERS: Dict[str, Type[SpanExporter]] = {
+    FileSpanExporter.name: FileSpanExporter,
+    OtlpSpanExporter.name: OtlpSpanExporter,
+}
+
+
+class SpanProcessor:
+    """
+    Queues the ended spans and exports them by batches from a background thread, every
+    `Settings.TRACING_EXPORT_INTERVAL` seconds, so that tracing doesn't wait for the exporter. Spans are dropped when
+    more than `Settings.TRACING_MAX_QUEUE_SIZE` are waiting.
+    """
+
+    def __init__(self, exporter: SpanExporter):
+        self.exporter = exporter
+        self.dropped_spans = 0
+        self.__spans = deque()
+        self.__lock = threading.Lock()
+        self.__wake_up = threading.Event()
+        self.__thread = threading.Thread(target=self.__run, name='span_exporter', daemon=True)
+        self.__thread.start()
+
+    def on_end(self, span: Span):
+        with self.__lock:
+            if len(self.__spans) >= Settings.TRACING_MAX_QUEUE_SIZE:
+                self.dropped_spans += 1
+                return
+            self.__spans.append(span)
+
+    def flush(self):
+        """ Exports the queued spans. """
+        with self.__lock:
+            spans = list(self.__spans)
+            self.__spans.clear()
+        if spans:
+            try:
+                self.exporter.export(spans)
+            except Exception as e:
+                logger.warning("failed exporting {count} spans: {cause}", count=len(spans), cause=e)
+
+    def __run(self):
+        while True:
+            self.__wake_up.wait(Settings.TRACING_EXPORT_INTERVAL)
+            self.flush()
+
+
+_current_span: ContextVar[Span | None] = ContextVar('current_span', default=None)
+_span_processors: Dict[str, SpanProcessor] = {}
+_span_processors_lock = threading.Lock()
+
+
+def get_span_processor() -> SpanProcessor | None:
+    """ Returns the span processor of the exporter selected by `Settings.TRACING_EXPORTER`, `None` when `off`. """
+    name = Settings.TRACING_EXPORTER
+    if name == 'off':
+        return None
+    if name not in SPAN_EXPORTERS:
+        raise ValueError(f'unsupported tracing exporter: {name}')
+    with _span_processors_lock:
+        if name not in _span_processors:
+            _span_processors[name] = SpanProcessor(SPAN_EXPORTERS[name]())
+            atexit.register(_span_processors[name].flush)
+        return _span_processors[name]
+
+
+def get_current_span() -> Span | None:
+    return _current_span.get()
+
+
+def trace_id_of(key: str | None) -> str:
+    """ Returns a trace id derived from the key, e.g., so that all the job steps of a job belong to the same trace, or
+    a random one without key. """
+    return hashlib.md5(key.encode()).hexdigest() if key else secrets.token_hex(16)
+
+
+@contextmanager
+def start_span(name: str,
+               kind: SpanKind = SpanKind.INTERNAL,
+               trace_id: str | None = None,
+               **attributes) -> Iterator[Span | None]:
+    """
+    Traces the block as a span, child of the current span of the context. Without a current span, a new trace is
+    only started when `trace_id` is specified (e.g., for the job steps): the other spans aren't traced on their own.
+    Yields `None` when the block isn't traced, in particular when `Settings.TRACING_EXPORTER` is `off`.
+
+    Threads only get the current span if they run in a copy of the context, e.g.,
+    ``executor.submit(contextvars.copy_context().run, function, ...)``.
+    """
+    span_processor = get_span_processor()
+    parent = _current_span.get() if span_processor else None
+    if span_processor is None or (parent is None and trace_id is None):
+        yield None
+        return
+
+    span = Span(
+        name=name,
+        trace_id=parent.trace_id if parent else trace_id,
+        span_id=secrets.token_hex(8),
+        parent_span_id=parent.span_id if parent else None,
+        kind=kind,
+        attributes=attributes)
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.error = f'{type(e).__name__}: {e}'
+        raise
+    finally:
+        _current_span.reset(token)
+        span.end_time = time.time_ns()
+        span_processor.on_end(span)
+
+
+def inject_trace_context(headers: MutableMapping[str, str]):
+    """ Adds the `traceparent` header of the current span to the headers of an outbound request, if any. """
+    span = _current_span.get()
+    if span:
+        headers['traceparent'] = span.traceparent
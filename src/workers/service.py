@@ -1,8 +1,12 @@
 from concurrent.futures import ThreadPoolExecutor
 from loguru import logger
+from prometheus_client import Gauge
 
 from config import Settings
 
+job_worker_queue_depth = Gauge('job_worker_queue_depth', 'Number of works waiting for a worker thread')
+job_workers_busy = Gauge('job_workers_busy', 'Number of worker threads performing a work')
+
 
 class WorkerGroup:
     """
@@ -20,11 +24,14 @@ class WorkerGroup:
         self.executor = ThreadPoolExecutor(Settings.MAX_JOB_WORKERS, thread_name_prefix='job_worker')
 
     def submit_work(self, work):
+        job_worker_queue_depth.inc()
         self.executor.submit(self.__worker, work)
 
     def __worker(self, work):
+        job_worker_queue_depth.dec()
         try:
-            self.do_work(work)
+            with job_workers_busy.track_inprogress():
+                self.do_work(work)
         except Exception:
             logger.exception('unhandled exception in __worker()')
 
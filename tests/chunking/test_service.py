@@ -0,0 +1,92 @@
+import re
+
+import pytest
+from langchain.schema import Document
+from pytest_mock import MockerFixture
+
+from chunking.service import TokenChunker, TokenizedChunk, generate_chunks, get_text_splitter, split_document
+
+
+class WordTokenizer:
+    """ Tokenizes the words and the punctuation, like a fast Hugging Face tokenizer without special tokens. """
+
+    is_fast = True
+
+    def __init__(self):
+        self.vocabulary = {}
+
+    def __call__(self, text, add_special_tokens=False, return_offsets_mapping=False, verbose=False):
+        matches = list(re.finditer(r'\w+|[^\w\s]', text))
+        encoding = {'input_ids': [self.vocabulary.setdefault(match.group(), len(self.vocabulary)) for match in matches]}
+        if return_offsets_mapping:
+            encoding['offset_mapping'] = [match.span() for match in matches]
+        return encoding
+
+
+def test_generate_chunks_reuses_the_text_splitter():
+    chunks = generate_chunks([Document(page_content='some text', metadata={'doc_id': '1'})])
+
+    assert [chunk.page_content for chunk in chunks] == ['some text']
+    assert get_text_splitter(500, 100) is get_text_splitter(500, 100)
+
+
+def test_token_chunker_sizes_chunks_in_tokens():
+    tokenizer = WordTokenizer()
+    chunker = TokenChunker(tokenizer, chunk_size=10, chunk_overlap=2)
+    text = ' '.join(f'word{index}' for index in range(25))
+
+    chunks = chunker.split_text(text)
+
+    assert [len(token_ids) for _, token_ids in chunks] == [10, 10, 9]
+    assert chunks[0][0] == ' '.join(f'word{index}' for index in range(10))
+    assert chunks[1][0].startswith('word8 word9 word10')  # overlap of 2 tokens
+    for chunk_text, token_ids in chunks:
+        assert tokenizer(chunk_text)['input_ids'] == token_ids
+
+
+def test_token_chunker_ends_chunks_at_paragraphs_and_sentences():
+    chunker = TokenChunker(WordTokenizer(), chunk_size=12, chunk_overlap=0)
+    text = 'One two three four five six.\n\nSeven eight nine ten eleven twelve thirteen. Fourteen fifteen sixteen seventeen.'
+
+    chunks = [chunk_text for chunk_text, _ in chunker.split_text(text)]
+
+    assert chunks == ['One two three four five six.', 'Seven eight nine ten eleven twelve thirteen.',
+                      'Fourteen fifteen sixteen seventeen.']
+
+
+def test_token_chunker_without_word_boundaries():
+    chunker = TokenChunker(WordTokenizer(), chunk_size=4, chunk_overlap=1)
+
+    chunks = chunker.split_text('a.b.c.d.e')
+
+    assert [chunk_text for chunk_text, _ in chunks] == ['a.b.', '.c.d', 'd.e']
+
+
+def test_token_chunker_split_documents():
+    chunker = TokenChunker(WordTokenizer(), chunk_size=4, chunk_overlap=1, prefix='passage: ')
+    documents = [Document(page_content='one two three four five', metadata={'doc_id': 'A'}),
+                 Document(page_content='   ', metadata={'doc_id': 'B'})]
+
+    chunks = chunker.split_documents(documents)
+
+    assert len(chunker.prefix_token_ids) == 2
+    assert all(isinstance(chunk, TokenizedChunk) for chunk in chunks)
+    assert [chunk.page_content for chunk in chunks] == ['one two three four', 'four five']
+    assert [chunk.metadata for chunk in chunks] == [{'doc_id': 'A'}, {'doc_id': 'A'}]
+    chunks[0].metadata['chunk_id'] = 0
+    assert 'chunk_id' not in documents[0].metadata
+
+
+def test_token_chunker_rejects_overlap_larger_than_chunks():
+    with pytest.raises(ValueError):
+        TokenChunker(WordTokenizer(), chunk_size=10, chunk_overlap=10)
+
+
+def test_split_document(mocker: MockerFixture):
+    document = Document(page_content='one two three', metadata={})
+
+    mocker.patch('chunking.service.get_token_chunker', return_value=None)
+    assert [type(chunk) for chunk in split_document(document)] == [Document]
+
+    mocker.patch('chunking.service.get_token_chunker', return_value=TokenChunker(WordTokenizer(), 2, 0))
+    assert [chunk.token_ids for chunk in split_document(document)] == [[0, 1], [2]]
@@ -1,13 +1,30 @@
+from datetime import datetime
+
 import pytest
 from pytest_mock import MockerFixture
 
 from connections.confluence.crawler import crawl_confluence
+from connections.confluence.schemas import ConfluencePageSummary
 from connections.confluence.service import ConfluenceConnection
 from indexing.service import IndexingJobChain
 from jobs.constants import JobType, Datasource
 from jobs.models import JobStep, Job
 
 
+def _page_summary(page_id: str, last_modified: str | None = None) -> ConfluencePageSummary:
+    return ConfluencePageSummary(
+        id_=page_id, title=page_id, version=1, space_key='SPACE',
+        last_modified=last_modified and datetime.strptime(last_modified, '%Y-%m-%dT%H:%M:%S.%f%z'))
+
+
+def _mock_pages(mocker: MockerFixture, root_page: ConfluencePageSummary, descendants: [ConfluencePageSummary]):
+    get_page_summary_mock = mocker.patch(
+        'connections.confluence.crawler.ConfluenceService.get_page_summary', return_value=root_page)
+    get_page_descendants_mock = mocker.patch(
+        'connections.confluence.crawler.ConfluenceService.get_page_descendants', return_value=descendants)
+    return get_page_summary_mock, get_page_descendants_mock
+
+
 def test_crawl_confluence(mocker: MockerFixture):
     confluence_connection = ConfluenceConnection(id="test_id", page_id="page_id", url="test_url",
                                                  access_token="")
@@ -15,11 +32,15 @@ def test_crawl_confluence(mocker: MockerFixture):
     job = Job(Datasource.CONFLUENCE, id='JOB_ID')
     job_step = JobStep(JobType.CRAWL, datasource=job.datasource)
     job_chain = mocker.Mock(IndexingJobChain)
-    get_page_with_all_child_ids_mock = mocker.patch(
-        'connections.confluence.crawler.ConfluenceService.get_page_with_all_child_ids', return_value=['page_id','child_page_id'])
+    get_page_summary_mock, get_page_descendants_mock = _mock_pages(
+        mocker, _page_summary('page_id'), [_page_summary('child_page_id')])
+    get_attachment_page_ids_mock = mocker.patch(
+        'connections.confluence.crawler.ConfluenceService.get_attachment_page_ids_modified_since')
     crawl_confluence(job, job_step, job_chain, confluence_connection)
 
-    get_page_with_all_child_ids_mock.assert_called_once()
+    get_page_summary_mock.assert_called_once_with('page_id')
+    get_page_descendants_mock.assert_called_once_with('page_id')
+    get_attachment_page_ids_mock.assert_not_called()
     assert len(job_chain.queue_job_step.mock_calls) == 2
     assert (set([mock_call.args[1].doc_id for mock_call in job_chain.queue_job_step.mock_calls]) ==
             {'child_page_id', 'page_id'})
@@ -35,16 +56,35 @@ def test_crawl_confluence_with_empty_child_pages(mocker: MockerFixture):
     job = Job(Datasource.CONFLUENCE, id='JOB_ID')
     job_step = JobStep(JobType.CRAWL, datasource=job.datasource)
     job_chain = mocker.Mock(IndexingJobChain)
-    get_page_with_all_child_ids_mock = mocker.patch(
-        'connections.confluence.crawler.ConfluenceService.get_page_with_all_child_ids', return_value=[])
+    _, get_page_descendants_mock = _mock_pages(mocker, _page_summary('page_id'), [])
     crawl_confluence(job, job_step, job_chain, confluence_connection)
 
-    get_page_with_all_child_ids_mock.assert_called_once()
-    assert len(job_chain.queue_job_step.mock_calls) == 0
-    job_chain.assert_not_called()
-    for mock_call in job_chain.queue_job_step.mock_calls:
-        assert mock_call.args[1].job_id == job.id
-        assert mock_call.args[1].datasource == job.datasource
+    get_page_descendants_mock.assert_called_once()
+    assert len(job_chain.queue_job_step.mock_calls) == 1
+    assert job_chain.queue_job_step.mock_calls[0].args[1].doc_id == 'page_id'
+
+
+def test_crawl_confluence_with_modified_since(mocker: MockerFixture):
+    confluence_connection = ConfluenceConnection(id="test_id", page_id="page_id", url="test_url",
+                                                 access_token="")
+
+    job = Job(Datasource.CONFLUENCE, id='JOB_ID',
+              modified_since=datetime.strptime('2024-01-30T13:20:00.000Z', '%Y-%m-%dT%H:%M:%S.%f%z'))
+    job_step = JobStep(JobType.CRAWL, datasource=job.datasource)
+    job_chain = mocker.Mock(IndexingJobChain)
+    _mock_pages(mocker, _page_summary('page_id', '2024-01-26T17:31:36.287-06:00'), [
+        _page_summary('unchanged_page_id', '2024-01-26T17:31:36.287-06:00'),
+        _page_summary('changed_page_id', '2024-02-26T17:31:36.287-06:00'),
+        _page_summary('changed_attachment_page_id', '2024-01-26T17:31:36.287-06:00'),
+    ])
+    get_attachment_page_ids_mock = mocker.patch(
+        'connections.confluence.crawler.ConfluenceService.get_attachment_page_ids_modified_since',
+        return_value={'changed_attachment_page_id'})
+    crawl_confluence(job, job_step, job_chain, confluence_connection)
+
+    get_attachment_page_ids_mock.assert_called_once_with('SPACE', job.modified_since)
+    assert ([mock_call.args[1].doc_id for mock_call in job_chain.queue_job_step.mock_calls] ==
+            ['changed_page_id', 'changed_attachment_page_id'])
 
 
 def test_crawl_confluence_with_no_page_and_sync_delete(mocker: MockerFixture):
@@ -54,11 +94,11 @@ def test_crawl_confluence_with_no_page_and_sync_delete(mocker: MockerFixture):
     job = Job(Datasource.CONFLUENCE, id='JOB_ID')
     job_step = JobStep(JobType.CRAWL, datasource=job.datasource)
     job_chain = mocker.Mock(IndexingJobChain)
-    get_page_with_all_child_ids_mock = mocker.patch(
-        'connections.confluence.crawler.ConfluenceService.get_page_with_all_child_ids', return_value=[])
+    get_page_summary_mock, get_page_descendants_mock = _mock_pages(mocker, _page_summary('page_id'), [])
     crawl_confluence(job, job_step, job_chain, confluence_connection)
 
-    get_page_with_all_child_ids_mock.assert_not_called()
+    get_page_summary_mock.assert_not_called()
+    get_page_descendants_mock.assert_not_called()
 
     assert job_step.datasource == job.datasource
     assert job_step.doc_id == job.doc_id
@@ -72,7 +112,7 @@ def test_crawl_confluence_api_throw_exception(mocker: MockerFixture):
     job = Job(Datasource.CONFLUENCE, id='JOB_ID')
     job_step = JobStep(JobType.CRAWL, datasource=job.datasource)
     job_chain = mocker.Mock(IndexingJobChain)
-    mocker.patch('connections.confluence.crawler.ConfluenceService.get_page_with_all_child_ids',
+    mocker.patch('connections.confluence.crawler.ConfluenceService.get_page_summary',
                  side_effect=Exception("Test exception"))
 
     with pytest.raises(Exception) as exc_info:
@@ -1,8 +1,8 @@
+import dataclasses
 from datetime import datetime
 from io import StringIO
 
 import pytest
-from langchain.document_loaders.base import BaseLoader
 from langchain.schema import Document
 from loguru import logger
 from pytest_mock import MockerFixture
@@ -73,6 +73,7 @@ def test_load_confluence_page_successful(mocker: MockerFixture, setup_test_envir
     assert indexed_document.metadata.get('web_url') == 'https://base_url_test/display/NameSpace/ConfluencePage'
     assert indexed_document.metadata.get('source') == 'CNF/ns/124'
     assert indexed_document.metadata.get('connection_id') == 'connection-1'
+    assert indexed_document.metadata.get('version') is None
 
 
 def test_load_confluence_page_modified_before_modified_since(mocker: MockerFixture, setup_test_environment):
@@ -89,7 +90,8 @@ def test_load_confluence_page_modified_before_modified_since(mocker: MockerFixtu
 
     load_confluence_page(job, job_step, job_chain, confluence_connection)
 
-    assert load_page_attachments_mock.call_count == 0
+    # attachments are still loaded: they are filtered on their own modification dates
+    assert load_page_attachments_mock.call_count == 1
     assert len(get_page_content_mock.mock_calls) == 1
     assert len(job_chain.index_documents.mock_calls) == 0
 
@@ -161,24 +163,103 @@ def test_load_page_attachments(mocker: MockerFixture, setup_test_environment):
     job, job_step, job_chain, confluence_connection, confluence_page, \
         attachment_meta_data, confluence_service_mock, = setup_test_environment
 
-    attachment_meta_data_2 = attachment_meta_data
-    attachment_meta_data_2.id_ = 'attachment_meta_data_id_2'
+    attachment_meta_data_2 = AttachmentMetaData(id_='457', title='title2.pdf', source="/source2",
+                                                mime_type='application/pdf', status='current', download_link='',
+                                                web_url='https://example.com/ns/title2.pdf',
+                                                last_modified=attachment_meta_data.last_modified)
+    documents = {'456': [Document(page_content='content 1')], '457': [Document(page_content='content 2')]}
 
-    load_attachment_mock = mocker.patch('connections.confluence.loader.load_attachment')
+    get_attachment_documents_mock = mocker.patch(
+        'connections.confluence.loader.get_attachment_documents',
+        side_effect=lambda step, attachment, service, connection_id: documents[attachment.id_])
+    open_search_client_mock = mocker.patch('connections.confluence.loader.get_open_search_client').return_value
+    open_search_client_mock.__enter__.return_value.get_indexed_versions.return_value = {}
 
-    mocker.patch('connections.confluence.service.ConfluenceService', return_value=confluence_service_mock)
     confluence_service_mock.get_page_attachments_metadata.return_value = [attachment_meta_data, attachment_meta_data_2]
 
     load_page_attachments(job, job_step, job_chain, confluence_page, confluence_service_mock, confluence_connection.id)
 
-    assert load_attachment_mock.call_count == 2
-    assert load_attachment_mock.call_args[0][0] == job
-    assert load_attachment_mock.call_args[0][1] == job_step
-    assert load_attachment_mock.call_args[0][2] == job_chain
-    assert load_attachment_mock.call_args[0][3] == attachment_meta_data_2
+    assert get_attachment_documents_mock.call_count == 2
+    get_attachment_documents_mock.assert_any_call(job_step, attachment_meta_data_2, confluence_service_mock,
+                                                  confluence_connection.id)
+    # documents are indexed in the order of the attachments whatever the order their download completes
+    assert job_chain.index_documents.call_args_list == [
+        mocker.call(job, job_step, documents['456']),
+        mocker.call(job, job_step, documents['457'])
+    ]
     confluence_service_mock.get_page_attachments_metadata.assert_called_once_with(confluence_page)
 
 
+def test_load_page_attachments_bounds_attachments_in_flight(mocker: MockerFixture, setup_test_environment):
+    job, job_step, job_chain, confluence_connection, confluence_page, \
+        attachment_meta_data, confluence_service_mock, = setup_test_environment
+    mocker.patch('config.Settings.CONFLUENCE_ATTACHMENT_WORKERS', 2)
+
+    attachments = [dataclasses.replace(attachment_meta_data, id_=str(index)) for index in range(5)]
+    downloaded = []
+    in_flight_when_downloaded = []
+
+    def get_attachment_documents(step, attachment, service, connection_id):
+        downloaded.append(attachment.id_)
+        in_flight_when_downloaded.append(len(downloaded) - job_chain.index_documents.call_count)
+        return [Document(page_content=attachment.id_)]
+
+    mocker.patch('connections.confluence.loader.get_attachment_documents', side_effect=get_attachment_documents)
+    confluence_service_mock.get_page_attachments_metadata.return_value = attachments
+
+    load_page_attachments(job, job_step, job_chain, confluence_page, confluence_service_mock, confluence_connection.id)
+
+    assert [call.args[2][0].page_content for call in job_chain.index_documents.call_args_list] == \
+           ['0', '1', '2', '3', '4']
+    # the parsed documents of at most 2 attachments are waiting to be indexed
+    assert max(in_flight_when_downloaded) <= 2
+
+
+def test_load_page_attachments_already_indexed_version(mocker: MockerFixture, setup_test_environment):
+    job, job_step, job_chain, confluence_connection, confluence_page, \
+        attachment_meta_data, confluence_service_mock, = setup_test_environment
+    log_buffer, handler_id = setup_loguru_memory_sink()
+
+    job.modified_since = datetime.strptime('2024-01-01T00:00:00.000-06:00', '%Y-%m-%dT%H:%M:%S.%f%z')
+    attachment_meta_data.version = 3
+    get_attachment_documents_mock = mocker.patch('connections.confluence.loader.get_attachment_documents')
+    open_search_client_mock = mocker.patch('connections.confluence.loader.get_open_search_client').return_value
+    get_indexed_versions_mock = open_search_client_mock.__enter__.return_value.get_indexed_versions
+    get_indexed_versions_mock.return_value = {'456': '3'}
+
+    confluence_service_mock.get_page_attachments_metadata.return_value = [attachment_meta_data]
+
+    load_page_attachments(job, job_step, job_chain, confluence_page, confluence_service_mock, confluence_connection.id)
+
+    get_indexed_versions_mock.assert_called_once_with(job.datasource, ['456'], confluence_connection.id)
+    assert get_attachment_documents_mock.call_count == 0
+    assert job_chain.index_documents.call_count == 0
+
+    log_buffer.seek(0)
+    log_contents = log_buffer.read()
+    assert 'Skip Confluence attachment_id:456 page_id:124, version 3 is already indexed' in log_contents
+    logger.remove(handler_id)
+
+
+def test_load_page_attachments_full_job_reindexes_indexed_versions(mocker: MockerFixture, setup_test_environment):
+    job, job_step, job_chain, confluence_connection, confluence_page, \
+        attachment_meta_data, confluence_service_mock, = setup_test_environment
+
+    attachment_meta_data.version = 3
+    documents = [Document(page_content='content 1')]
+    get_attachment_documents_mock = mocker.patch('connections.confluence.loader.get_attachment_documents',
+                                                 return_value=documents)
+    get_open_search_client_mock = mocker.patch('connections.confluence.loader.get_open_search_client')
+
+    confluence_service_mock.get_page_attachments_metadata.return_value = [attachment_meta_data]
+
+    load_page_attachments(job, job_step, job_chain, confluence_page, confluence_service_mock, confluence_connection.id)
+
+    get_open_search_client_mock.assert_not_called()
+    assert get_attachment_documents_mock.call_count == 1
+    job_chain.index_documents.assert_called_once_with(job, job_step, documents)
+
+
 def test_load_page_attachments_incorrect_mime_type(mocker: MockerFixture, setup_test_environment):
     log_buffer, handler_id = setup_loguru_memory_sink()
 
@@ -230,20 +311,16 @@ def test_load_page_attachments_incorrect_status(mocker: MockerFixture, setup_tes
 def test_load_attachment(mocker: MockerFixture, setup_test_environment):
     job, job_step, job_chain, confluence_connection, confluence_page, \
         attachment_meta_data, confluence_service_mock, = setup_test_environment
-    mock_temp_dir = '/mock/temp/dir'
-    base_loader = mocker.Mock(BaseLoader)
-    document = Document
-    base_loader.load.return_value = [document]
+    confluence_service_mock.download_attachment.side_effect = lambda attachment, output: output.write(b'%PDF')
 
-    get_langchain_loader_mock = mocker.patch('connections.confluence.loader.get_langchain_loader',
-                                             return_value=base_loader)
+    load_documents_mock = mocker.patch('connections.confluence.loader.load_documents',
+                                       return_value=[Document(page_content='content')])
 
-    load_attachment(job, job_step, job_chain, attachment_meta_data, confluence_service_mock, mock_temp_dir,
-                    confluence_connection.id)
+    load_attachment(job, job_step, job_chain, attachment_meta_data, confluence_service_mock, confluence_connection.id)
 
-    assert get_langchain_loader_mock.call_count == 1
-    confluence_service_mock.download_attachment.assert_called_once_with(attachment_meta_data,
-                                                                        mock_temp_dir + '/' + attachment_meta_data.id_)
+    assert load_documents_mock.call_count == 1
+    assert load_documents_mock.call_args[0][0] == 'application/pdf'
+    confluence_service_mock.download_attachment.assert_called_once_with(attachment_meta_data, mocker.ANY)
     assert len(job_chain.index_documents.mock_calls) == 1
 
     assert job_chain.index_documents.call_args[0][0] == job
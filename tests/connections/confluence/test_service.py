@@ -1,10 +1,11 @@
 from dataclasses import asdict
 from datetime import datetime
+from io import BytesIO
 
 import pytest
 from pytest_mock import MockerFixture
 
-from connections.confluence.schemas import AttachmentMetaData, ConfluencePage
+from connections.confluence.schemas import AttachmentMetaData, ConfluencePage, ConfluencePageSummary
 from connections.confluence.service import ConfluenceConnection
 from connections.confluence.service import ConfluenceService
 
@@ -17,58 +18,62 @@ def confluence_connection():
 @pytest.fixture
 def mock_confluence(mocker: MockerFixture):
     mock_confluence = mocker.Mock()
-    mocker.patch('connections.confluence.service.Confluence', return_value=mock_confluence)
+    mocker.patch('atlassian.Confluence', return_value=mock_confluence)
     return mock_confluence
 
 
-def test_get_child_pages_ids_success(confluence_connection, mock_confluence):
-    test_cases = [
-        {
-            "page_id": 'page1',
-            "mock_child_ids": {'page1': ['page2', 'page3'], 'page2': ['page4'], 'page3': [], 'page4': []},
-            "expected": ['page1', 'page2', 'page4', 'page3']
-        },
-    ]
-
-    confluence_service = ConfluenceService(confluence_connection)
+def _search_result(page_id: str, version: int = 1, when: str = '2024-01-26T17:31:36.287-06:00'):
+    return {'content': {'id': page_id, 'type': 'page', 'title': f'title {page_id}',
+                        'version': {'number': version, 'when': when}}}
 
-    for test_case in test_cases:
-        page_id = test_case["page_id"]
-        mock_child_ids = test_case["mock_child_ids"]
-        expected = test_case["expected"]
 
-        confluence_service.confluence.get_child_id_list.side_effect = lambda x: mock_child_ids.get(x, [])
+def test_get_page_with_all_descendants(confluence_connection, mock_confluence):
+    mock_confluence.get_page_by_id.return_value = {
+        'id': 'page1', 'title': 'title page1', 'version': {'number': 3, 'when': '2024-01-26T17:31:36.287-06:00'}}
+    mock_confluence.cql.side_effect = [
+        {'results': [_search_result('page2'), _search_result('page3')], '_links': {'next': '/next'}},
+        {'results': [_search_result('page4', version=2)], '_links': {}},
+    ]
 
-        result = confluence_service.get_page_with_all_child_ids([page_id])
+    confluence_service = ConfluenceService(confluence_connection)
 
-        assert sorted(list(result)) == sorted(expected)
+    result = list(confluence_service.get_page_with_all_descendants('page1'))
 
+    assert [page.id_ for page in result] == ['page1', 'page2', 'page3', 'page4']
+    assert result[0] == ConfluencePageSummary(
+        id_='page1', title='title page1', version=3,
+        last_modified=datetime.strptime('2024-01-26T17:31:36.287-06:00', '%Y-%m-%dT%H:%M:%S.%f%z'))
+    assert result[3].version == 2
+    mock_confluence.get_page_by_id.assert_called_once_with('page1', expand='version,space')
+    assert mock_confluence.cql.call_count == 2
+    assert 'ancestor = page1' in mock_confluence.cql.call_args_list[0].args[0]
+    assert mock_confluence.cql.call_args_list[0].kwargs['start'] == 0
+    assert mock_confluence.cql.call_args_list[1].kwargs['start'] == 2
 
-def test_get_child_for_pages_without_children(confluence_connection, mock_confluence):
-    parent_page_id = 'parent_id'
 
-    mock_child_pages_ids = []
-    mock_confluence.get_child_id_list.return_value = mock_child_pages_ids
+def test_get_page_with_all_descendants_without_descendants(confluence_connection, mock_confluence):
+    mock_confluence.get_page_by_id.return_value = {'id': 'page1', 'title': 'title page1'}
+    mock_confluence.cql.return_value = {'results': [], '_links': {}}
 
     confluence_service = ConfluenceService(confluence_connection)
 
-    result = list(confluence_service.get_page_with_all_child_ids([parent_page_id]))
-    assert result == [parent_page_id]
-    mock_confluence.get_child_id_list.assert_called_once_with(parent_page_id)
+    result = list(confluence_service.get_page_with_all_descendants('page1'))
 
+    assert [page.id_ for page in result] == ['page1']
+    assert result[0].last_modified is None
+    mock_confluence.cql.assert_called_once()
 
-def test_get_child_pages_ids_throw_exception(confluence_connection, mock_confluence):
-    parent_page_id = 'parent_id'
 
-    mock_confluence.get_child_id_list.side_effect = Exception("Test exception")
+def test_get_page_with_all_descendants_throw_exception(confluence_connection, mock_confluence):
+    mock_confluence.get_page_by_id.return_value = {'id': 'page1', 'title': 'title page1'}
+    mock_confluence.cql.side_effect = Exception("Test exception")
 
     confluence_service = ConfluenceService(confluence_connection)
 
     with pytest.raises(Exception) as excinfo:
-        list(confluence_service.get_page_with_all_child_ids([parent_page_id]))
+        list(confluence_service.get_page_with_all_descendants('page1'))
 
     assert "Test exception" in str(excinfo.value)
-    mock_confluence.get_child_id_list.assert_called_once_with(parent_page_id)
 
 
 def test_get_page_content_success(confluence_connection, mock_confluence):
@@ -121,7 +126,7 @@ def test_get_page_attachments_metadata(confluence_connection, mock_confluence):
 
                                          'metadata': {'mediaType': 'application/pdf', 'labels': {'_links': {'self': 'self_link'}}},
                                          '_links': {'webui': 'webui_url', 'download': 'download_url'},
-                                         'version': {'when': '2024-01-03T14:39:42.090-06:00'}}]}
+                                         'version': {'number': 2, 'when': '2024-01-03T14:39:42.090-06:00'}}]}
     mock_confluence.get_attachments_from_content.return_value = page_attachment_data
     confluence_service = ConfluenceService(confluence_connection)
 
@@ -131,4 +136,45 @@ def test_get_page_attachments_metadata(confluence_connection, mock_confluence):
         AttachmentMetaData(id_='page_attachment_data_id', title='test.pdf', source='ns/124/page_attachment_data_id',
                            mime_type='application/pdf', status='current', download_link='download_url',
                            web_url='https://base_url_testwebui_url',
-                           last_modified=datetime.strptime('2024-01-03T14:39:42.090-06:00', '%Y-%m-%dT%H:%M:%S.%f%z'))]
+                           last_modified=datetime.strptime('2024-01-03T14:39:42.090-06:00', '%Y-%m-%dT%H:%M:%S.%f%z'),
+                           version=2)]
+
+
+def test_download_attachment_streams_content(mocker: MockerFixture, confluence_connection, mock_confluence):
+    mock_confluence.url = 'https://confluence'
+    response = mocker.MagicMock()
+    response.__enter__.return_value = response
+    mock_confluence._session.get.return_value = response
+    response.iter_content.return_value = iter([b'chunk1', b'chunk2'])
+    attachment = AttachmentMetaData(id_='att1', title='test.pdf', source='', mime_type='application/pdf',
+                                    status='current', download_link='/download/att1', web_url='',
+                                    last_modified=datetime.now())
+    output = BytesIO()
+
+    ConfluenceService(confluence_connection).download_attachment(attachment, output)
+
+    mock_confluence._session.get.assert_called_once_with('https://confluence/download/att1', stream=True)
+    response.raise_for_status.assert_called_once()
+    assert output.getvalue() == b'chunk1chunk2'
+
+
+def test_get_attachment_page_ids_modified_since(confluence_connection, mock_confluence):
+    def attachment_result(attachment_id: str, page_id: str, when: str):
+        return {'content': {'id': attachment_id, 'type': 'attachment', 'title': f'{attachment_id}.pdf',
+                            'version': {'number': 1, 'when': when}, 'container': {'id': page_id}}}
+
+    mock_confluence.cql.return_value = {'results': [
+        attachment_result('att1', 'page1', '2024-01-29T23:00:00.000-06:00'),
+        attachment_result('att2', 'page2', '2024-01-29T01:00:00.000-06:00'),
+    ], '_links': {}}
+    modified_since = datetime.strptime('2024-01-30T00:00:00.000Z', '%Y-%m-%dT%H:%M:%S.%f%z')
+
+    confluence_service = ConfluenceService(confluence_connection)
+
+    result = confluence_service.get_attachment_page_ids_modified_since('SPACE', modified_since)
+
+    assert result == {'page1'}
+    cql = mock_confluence.cql.call_args.args[0]
+    assert 'type = attachment' in cql
+    assert 'space = "SPACE"' in cql
+    assert 'lastmodified >= "2024-01-29"' in cql
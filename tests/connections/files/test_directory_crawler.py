@@ -0,0 +1,153 @@
+import os
+from datetime import datetime
+
+import pytest
+from pytest_mock import MockerFixture
+
+from config import Settings
+from connections.files.directory_crawler import crawl_directory
+from connections.files.manifest import FileManifest, ManifestEntry
+from connections.files.service import hash_file
+from connections.models import Connection
+from jobs.constants import Datasource, JobType
+from jobs.models import Job, JobStep
+from jobs.service import JobChain
+
+
+@pytest.fixture
+def data_dir(tmp_path, mocker: MockerFixture):
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    mocker.patch('config.Settings.FS_DATA_SOURCE_DIR', str(data_dir))
+    mocker.patch('config.Settings.FS_DATA_SOURCE_PATTERN', '**/*.pdf')
+    mocker.patch('config.Settings.FS_MANIFEST_FILE', str(tmp_path / 'manifest.json'))
+    return data_dir
+
+
+def _crawl(mocker: MockerFixture, incremental: bool = True, loaded: bool = True):
+    """ Crawls the directory, and records the files to load as loaded unless `loaded` is `False`. """
+    job = Job(Datasource.FILE_SYSTEM, id='JOB_ID', modified_since=datetime(2024, 1, 1) if incremental else None)
+    job_step = JobStep(JobType.CRAWL, job.datasource, job_id=job.id)
+    chain = mocker.Mock(JobChain)
+    connection = mocker.Mock(Connection)
+
+    crawl_directory(job, job_step, chain, connection)
+
+    for call in chain.queue_job_step.mock_calls:
+        assert call.args[0] == job
+        assert call.args[2] == connection
+    chain.execute_job_steps.assert_called_once_with(job)
+    steps = sorted((call.args[1].type, call.args[1].doc_id) for call in chain.queue_job_step.mock_calls)
+    if loaded:
+        for step_type, relative_path in steps:
+            if step_type == JobType.LOAD:
+                _record_loaded_file(relative_path)
+    return steps
+
+
+def _record_loaded_file(relative_path: str):
+    path = os.path.join(Settings.FS_DATA_SOURCE_DIR, relative_path)
+    stat = os.stat(path)
+    FileManifest.record_loaded_file(Settings.FS_MANIFEST_FILE, relative_path,
+                                    ManifestEntry(stat.st_size, stat.st_mtime_ns, hash_file(path)))
+
+
+def test_crawl_directory_first_crawl(mocker: MockerFixture, data_dir):
+    (data_dir / 'sub').mkdir()
+    (data_dir / 'a.pdf').write_bytes(b'a')
+    (data_dir / 'sub' / 'b.pdf').write_bytes(b'b')
+    (data_dir / 'c.txt').write_bytes(b'c')
+
+    assert _crawl(mocker) == [(JobType.LOAD, 'a.pdf'), (JobType.LOAD, 'sub/b.pdf')]
+
+    manifest = FileManifest.load(str(data_dir.parent / 'manifest.json'))
+    assert sorted(manifest.entries.keys()) == ['a.pdf', 'sub/b.pdf']
+    assert manifest.entries['a.pdf'].size == 1
+
+
+def test_crawl_directory_unchanged_files(mocker: MockerFixture, data_dir):
+    (data_dir / 'a.pdf').write_bytes(b'a')
+    _crawl(mocker)
+    hash_file_mock = mocker.patch('connections.files.directory_crawler.hash_file')
+
+    assert _crawl(mocker) == []
+    # unchanged files aren't even read
+    hash_file_mock.assert_not_called()
+
+
+def test_crawl_directory_changed_added_and_removed_files(mocker: MockerFixture, data_dir):
+    (data_dir / 'changed.pdf').write_bytes(b'before')
+    (data_dir / 'removed.pdf').write_bytes(b'removed')
+    (data_dir / 'touched.pdf').write_bytes(b'touched')
+    _crawl(mocker)
+
+    (data_dir / 'changed.pdf').write_bytes(b'after')
+    (data_dir / 'removed.pdf').unlink()
+    (data_dir / 'added.pdf').write_bytes(b'added')
+    touched_stat = os.stat(data_dir / 'touched.pdf')
+    os.utime(data_dir / 'touched.pdf', ns=(touched_stat.st_atime_ns, touched_stat.st_mtime_ns + 1_000_000_000))
+
+    assert _crawl(mocker) == [(JobType.LOAD, 'added.pdf'), (JobType.LOAD, 'changed.pdf'), (JobType.DELETE, 'removed.pdf')]
+
+    manifest = FileManifest.load(str(data_dir.parent / 'manifest.json'))
+    assert sorted(manifest.entries.keys()) == ['added.pdf', 'changed.pdf', 'touched.pdf']
+    assert manifest.entries['touched.pdf'].mtime_ns == touched_stat.st_mtime_ns + 1_000_000_000
+
+
+def test_crawl_directory_full_job_loads_unchanged_files(mocker: MockerFixture, data_dir):
+    (data_dir / 'a.pdf').write_bytes(b'a')
+    (data_dir / 'removed.pdf').write_bytes(b'removed')
+    _crawl(mocker)
+    (data_dir / 'removed.pdf').unlink()
+
+    assert _crawl(mocker, incremental=False) == [(JobType.LOAD, 'a.pdf'), (JobType.DELETE, 'removed.pdf')]
+    assert _crawl(mocker) == []
+
+
+def test_crawl_directory_loads_again_files_failing_to_load(mocker: MockerFixture, data_dir):
+    (data_dir / 'a.pdf').write_bytes(b'a')
+    (data_dir / 'b.pdf').write_bytes(b'b')
+    _crawl(mocker)
+    (data_dir / 'a.pdf').write_bytes(b'changed')
+    (data_dir / 'b.pdf').write_bytes(b'changed')
+
+    # the LOAD steps fail
+    assert _crawl(mocker, loaded=False) == [(JobType.LOAD, 'a.pdf'), (JobType.LOAD, 'b.pdf')]
+    _record_loaded_file('b.pdf')  # the LOAD step of b.pdf is retried and succeeds
+
+    assert _crawl(mocker) == [(JobType.LOAD, 'a.pdf')]
+    assert _crawl(mocker) == []
+
+
+def test_file_manifest_round_trip(tmp_path):
+    path = str(tmp_path / 'manifest.json')
+    manifest = FileManifest({'a.pdf': ManifestEntry(1, 2, 'hash')})
+
+    manifest.save(path)
+
+    assert FileManifest.load(path) == manifest
+    assert not os.path.exists(f'{path}.tmp')
+
+
+def test_file_manifest_load_missing_or_corrupted(tmp_path):
+    assert FileManifest.load(str(tmp_path / 'missing.json')) == FileManifest()
+
+    (tmp_path / 'corrupted.json').write_text('{"version": 1, "files": ')
+    assert FileManifest.load(str(tmp_path / 'corrupted.json')) == FileManifest()
+
+
+def test_file_manifest_journal(tmp_path):
+    path = str(tmp_path / 'manifest.json')
+    FileManifest({'a.pdf': ManifestEntry(1, 2, 'hash')}).save(path)
+
+    FileManifest.record_loaded_file(path, 'b.pdf', ManifestEntry(3, 4, 'hash b'))
+    with open(f'{path}.loaded', mode='a', encoding='utf-8') as journal:
+        journal.write('["c.pdf", 5')  # truncated by a crash
+
+    manifest = FileManifest.load(path)
+    assert manifest == FileManifest({'a.pdf': ManifestEntry(1, 2, 'hash'), 'b.pdf': ManifestEntry(3, 4, 'hash b')})
+
+    # the journal is merged into the saved manifest
+    manifest.save(path)
+    assert not os.path.exists(f'{path}.loaded')
+    assert FileManifest.load(path) == manifest
@@ -1,5 +1,11 @@
-from connections.files.feature import UploadFileFeature
-from jobs.constants import JobType
+from datetime import datetime
+
+import connections.files.deleter
+import connections.files.directory_crawler
+import connections.files.file_loader
+from connections.files.feature import DirectoryFeature, UploadFileFeature
+from jobs.constants import Datasource, JobType
+from jobs.schemas import JobRequest
 from jobs.models import Job, JobStep
 from jobs.service import DeleteDocBy
 
@@ -8,3 +14,30 @@ def test_delete_doc_by():
     job = Job('test datasource')
     job_step = JobStep(JobType.LOAD, job.datasource, doc_id='DOC ID')
     assert UploadFileFeature().get_delete_doc_by(job, job_step) == DeleteDocBy.BY_DOC_ID
+
+
+def test_directory_feature():
+    feature = DirectoryFeature()
+    job_request = JobRequest(datasource=Datasource.FILE_SYSTEM)
+
+    assert feature.accept_job_request(job_request)
+    assert not feature.accept_job_request(JobRequest(datasource=Datasource.RKM))
+    job = feature.create_job(job_request)
+    assert feature.accept_job(job)
+    assert job.modified_since is None
+    # incremental crawls
+    modified_since = datetime(2024, 1, 1)
+    assert feature.create_job(JobRequest(datasource=Datasource.FILE_SYSTEM,
+                                         modifiedSince=modified_since)).modified_since == modified_since
+    assert feature.create_first_job_step(job).type == JobType.CRAWL
+
+    handlers = {
+        job_type: feature.get_handler(job, JobStep(job_type, job.datasource))
+        for job_type in [JobType.CRAWL, JobType.LOAD, JobType.SYNC_DELETIONS, JobType.DELETE]
+    }
+    assert handlers == {
+        JobType.CRAWL: connections.files.directory_crawler.crawl_directory,
+        JobType.LOAD: connections.files.file_loader.load_file,
+        JobType.SYNC_DELETIONS: None,
+        JobType.DELETE: connections.files.deleter.delete_file_documents,
+    }
@@ -1,6 +1,10 @@
+from io import BytesIO
+
 from pytest_mock import MockerFixture
+from starlette.datastructures import Headers, UploadFile
 
-from connections.files.file_loader import load_upload_file
+from connections.files.file_loader import load_file, load_upload_file
+from connections.files.manifest import FileManifest
 from connections.models import Connection
 from helixplatform import data_connection_job
 from helixplatform.models import Attachment
@@ -49,3 +53,60 @@ def test_load_upload_file_but_no_filename_with_attachment(mocker: MockerFixture)
     get_attachment_mock.assert_called_once()
     logger_warning_mock.assert_called_once()
     assert 'skipping' in logger_warning_mock.mock_calls[0].args[0]
+
+
+def test_load_upload_file_from_local_copy(mocker: MockerFixture, tmp_path):
+    local_upload_path = tmp_path / 'upload_1234'
+    local_upload_path.write_bytes(b'test file content')
+    job = Job('file_datasource', upload_file=UploadFile(filename='test_filename.txt', file=BytesIO(),
+                                                       headers=Headers({'content-type': 'text/plain'})))
+    job.local_upload_path = str(local_upload_path)
+    job_step = JobStep(JobType.LOAD, job.datasource)
+    job_chain = mocker.Mock(IndexingJobChain)
+    get_attachment_mock = mocker.patch('helixplatform.service.InnovationSuite.get_attachment')
+
+    load_upload_file(job, job_step, job_chain, mocker.Mock(Connection))
+
+    get_attachment_mock.assert_not_called()
+    assert not local_upload_path.exists()
+    documents_arg = job_chain.index_documents.mock_calls[0].args[2]
+    assert len(documents_arg) == 1
+    assert documents_arg[0].page_content == 'test file content'
+    assert documents_arg[0].metadata['doc_id'] == 'test_filename.txt'
+    assert documents_arg[0].metadata['title'] == 'test_filename.txt'
+
+
+def test_load_upload_file_falls_back_to_attachment_without_local_copy(mocker: MockerFixture, tmp_path):
+    job = Job('file_datasource')
+    job.local_upload_path = str(tmp_path / 'handled_by_another_node')
+    job_step = JobStep(JobType.LOAD, job.datasource, doc_id='TEST_DOC_ID')
+    job_chain = mocker.Mock(IndexingJobChain)
+    attachment = Attachment(b'test file content', 'test_filename.txt', 'text/plain')
+    get_attachment_mock = mocker.patch('helixplatform.service.InnovationSuite.get_attachment', return_value=attachment)
+
+    load_upload_file(job, job_step, job_chain, mocker.Mock(Connection))
+
+    get_attachment_mock.assert_called_once()
+    job_chain.index_documents.assert_called_once()
+
+
+def test_load_file(mocker: MockerFixture, tmp_path):
+    mocker.patch('config.Settings.FS_DATA_SOURCE_DIR', str(tmp_path))
+    mocker.patch('config.Settings.FS_MANIFEST_FILE', str(tmp_path / 'manifest.json'))
+    (tmp_path / 'docs').mkdir()
+    (tmp_path / 'docs' / 'notes.txt').write_bytes(b'test file content')
+    job = Job('FS')
+    job_step = JobStep(JobType.LOAD, job.datasource, doc_id='docs/notes.txt')
+    job_chain = mocker.Mock(IndexingJobChain)
+
+    load_file(job, job_step, job_chain, None)
+
+    job_chain.index_documents.assert_called_once()
+    documents_arg = job_chain.index_documents.mock_calls[0].args[2]
+    assert len(documents_arg) == 1
+    assert documents_arg[0].page_content == 'test file content'
+    assert documents_arg[0].metadata['doc_id'] == 'docs/notes.txt'
+    assert documents_arg[0].metadata['source'] == 'docs/notes.txt'
+    assert documents_arg[0].metadata['title'] == 'notes.txt'
+    # the file is recorded as loaded
+    assert FileManifest.load(str(tmp_path / 'manifest.json')).entries['docs/notes.txt'].size == 17
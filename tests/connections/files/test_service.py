@@ -0,0 +1,47 @@
+import os
+
+import pytest
+
+from connections.files.service import compile_patterns, hash_file, scan_directory
+
+
+@pytest.mark.parametrize('patterns,path,expected', [
+    (['**/*.pdf'], 'manual.pdf', True),
+    (['**/*.pdf'], 'a/b/manual.pdf', True),
+    (['**/*.pdf'], 'manual.pdf.txt', False),
+    (['**/*.pdf'], 'manual.PDF', False),
+    (['**/*.pdf', '**/*.PDF'], 'a/manual.PDF', True),
+    (['*.pdf'], 'a/manual.pdf', False),
+    (['docs/?.pdf'], 'docs/a.pdf', True),
+    (['docs/?.pdf'], 'docs/ab.pdf', False),
+    (['docs/**'], 'docs/a/b.txt', True),
+    (['a+b/*.pdf'], 'a+b/c.pdf', True),
+    ([''], 'manual.pdf', False),
+])
+def test_compile_patterns(patterns, path, expected):
+    assert bool(compile_patterns(patterns).match(path)) == expected
+
+
+def test_scan_directory(tmp_path):
+    (tmp_path / 'sub' / 'deeper').mkdir(parents=True)
+    (tmp_path / 'root.pdf').write_bytes(b'root')
+    (tmp_path / 'sub' / 'deeper' / 'deep.pdf').write_bytes(b'deep content')
+    (tmp_path / 'sub' / 'ignored.txt').write_bytes(b'ignored')
+
+    files = sorted(scan_directory(str(tmp_path), compile_patterns(['**/*.pdf'])))
+
+    assert [(path, size) for path, size, _ in files] == [('root.pdf', 4), ('sub/deeper/deep.pdf', 12)]
+    assert files[0][2] == os.stat(tmp_path / 'root.pdf').st_mtime_ns
+
+
+def test_scan_directory_missing(tmp_path):
+    assert list(scan_directory(str(tmp_path / 'missing'), compile_patterns(['**/*.pdf']))) == []
+
+
+def test_hash_file(tmp_path):
+    (tmp_path / 'a.pdf').write_bytes(b'content')
+    (tmp_path / 'b.pdf').write_bytes(b'content')
+    (tmp_path / 'c.pdf').write_bytes(b'other content')
+
+    assert hash_file(str(tmp_path / 'a.pdf')) == hash_file(str(tmp_path / 'b.pdf'))
+    assert hash_file(str(tmp_path / 'a.pdf')) != hash_file(str(tmp_path / 'c.pdf'))
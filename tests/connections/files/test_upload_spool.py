@@ -0,0 +1,42 @@
+import os
+import time
+from io import BytesIO
+
+from pytest_mock import MockerFixture
+from starlette.datastructures import UploadFile
+
+from connections.files.constants import SPOOLED_UPLOAD_TTL
+from connections.files.upload_spool import remove_spooled_file, spool_upload_file
+
+
+def test_spool_upload_file(mocker: MockerFixture, tmp_path):
+    mocker.patch('config.Settings.SCRATCH_DIR', str(tmp_path))
+    upload_file = UploadFile(filename='notes.txt', file=BytesIO(b'test file content'))
+
+    path = spool_upload_file(upload_file)
+
+    assert os.path.dirname(path) == str(tmp_path / 'uploads')
+    with open(path, mode='rb') as file:
+        assert file.read() == b'test file content'
+    # the upload file can still be stored as the job attachment
+    assert upload_file.file.read() == b'test file content'
+
+    remove_spooled_file(path)
+    assert not os.path.exists(path)
+    remove_spooled_file(path)  # no error when already removed
+
+
+def test_spool_upload_file_removes_stale_files(mocker: MockerFixture, tmp_path):
+    mocker.patch('config.Settings.SCRATCH_DIR', str(tmp_path))
+    (tmp_path / 'uploads').mkdir()
+    stale_file = tmp_path / 'uploads' / 'upload_stale'
+    stale_file.write_bytes(b'stale')
+    stale_time = time.time() - SPOOLED_UPLOAD_TTL - 60
+    os.utime(stale_file, (stale_time, stale_time))
+    recent_file = tmp_path / 'uploads' / 'upload_recent'
+    recent_file.write_bytes(b'recent')
+
+    spool_upload_file(UploadFile(filename='notes.txt', file=BytesIO(b'test file content')))
+
+    assert not stale_file.exists()
+    assert recent_file.exists()
@@ -188,3 +188,42 @@ def test_get_files_from_sharepoint_with_modified_since_field_and_no_match(mocker
     library.get_items.return_value = [file]
     files = sharepoint.get_files(connection, SUPPORTED_FILES, datetime.datetime.strptime(modified_since, date_format))
     assert len(files) == 0
+
+
+def test_walk_files_nested_folders(mocker: MockerFixture):
+    def mock_file(name: str, mime_type: str = "application/pdf"):
+        file = mocker.Mock(DriveItem)
+        file.is_folder = False
+        file.mime_type = mime_type
+        file.name = name
+        return file
+
+    def mock_folder(name: str, items: list):
+        folder = mocker.Mock(Folder)
+        folder.is_folder = True
+        folder.name = name
+        folder.get_items.return_value = items
+        return folder
+
+    sub_sub_folder = mock_folder("c", [mock_file("c.pdf")])
+    sub_folder = mock_folder("b", [mock_file("b.pdf"), mock_file("b.xlsx", "any_other_type"), sub_sub_folder])
+    library = mocker.Mock(Drive)
+    library.get_items.return_value = [mock_file("a.pdf"), sub_folder, mock_folder("empty", [])]
+
+    files = SharePoint().walk_files([library], SUPPORTED_FILES, max_workers=2)
+
+    assert sorted(file.name for file in files) == ["a.pdf", "b.pdf", "c.pdf"]
+
+
+def test_walk_files_yields_lazily(mocker: MockerFixture):
+    file = mocker.Mock(DriveItem)
+    file.is_folder = False
+    file.mime_type = "application/pdf"
+    library = mocker.Mock(Drive)
+    library.get_items.return_value = [file]
+
+    files = SharePoint().walk_files([library], SUPPORTED_FILES)
+
+    library.get_items.assert_not_called()
+    assert next(files) is file
+    files.close()
@@ -0,0 +1,175 @@
+import os
+
+import numpy as np
+import pytest
+from pytest_mock import MockerFixture
+
+from embeddings.backends import LocalEmbeddingBackend, OnnxBackend, create_embedding_backend, get_onnx_model_path, \
+    plan_batches, save_onnx_model_with_external_weights
+
+
+class FakeTokenizer:
+    """ Tokenizes the characters of the texts, adding a start (1) and an end (2) token. """
+
+    is_fast = True
+    model_max_length = 8
+
+    def __call__(self, texts, add_special_tokens=True, truncation=False, max_length=None, verbose=True):
+        input_ids = [[ord(character) for character in text][:max_length if truncation else None] for text in texts]
+        return {'input_ids': input_ids}
+
+    def build_inputs_with_special_tokens(self, token_ids):
+        return [1] + token_ids + [2]
+
+    def num_special_tokens_to_add(self, pair=False):
+        return 2
+
+    def pad(self, encoded_inputs, return_tensors=None):
+        input_ids = encoded_inputs['input_ids']
+        length = max(len(ids) for ids in input_ids)
+        return {'input_ids': np.array([ids + [0] * (length - len(ids)) for ids in input_ids]),
+                'attention_mask': np.array([[1] * len(ids) + [0] * (length - len(ids)) for ids in input_ids])}
+
+
+class LengthBackend(LocalEmbeddingBackend):
+    """ Embeds each input as [number of tokens, 0], normalized to [1, 0], and records the batches. """
+
+    name = 'length'
+
+    def __init__(self):
+        super().__init__('model', threads=0)
+        self.batches = []
+
+    @property
+    def tokenizer(self):
+        return FakeTokenizer()
+
+    @property
+    def max_seq_length(self) -> int:
+        return 8
+
+    def embed_batch(self, input_ids, attention_mask):
+        self.batches.append(attention_mask.sum(axis=1).tolist())
+        return np.array([[float(length), 0.0] for length in attention_mask.sum(axis=1)])
+
+
+def test_plan_batches_within_the_token_budget():
+    lengths = [3, 512, 10, 500, 4, 12, 3]
+
+    batches = plan_batches(lengths, token_budget=1024, max_batch_size=3)
+
+    # longest first, 2 long texts per batch, and at most 3 short ones
+    assert batches == [[1, 3], [5, 2, 4], [0, 6]]
+    assert sorted(index for batch in batches for index in batch) == list(range(len(lengths)))
+
+
+def test_plan_batches_longer_than_the_budget():
+    assert plan_batches([600, 700, 5], token_budget=512, max_batch_size=8) == [[1], [0], [2]]
+    assert plan_batches([], token_budget=512, max_batch_size=8) == []
+
+
+def test_embed_token_ids_keeps_the_order_of_the_texts(mocker: MockerFixture):
+    mocker.patch('config.Settings.EMBEDDING_BATCH_TOKEN_BUDGET', 16)
+    mocker.patch('config.Settings.EMBEDDING_MAX_BATCH_SIZE', 4)
+    backend = LengthBackend()
+
+    embeddings = backend.embed_token_ids([[5], [5, 6, 7], [5, 6], list(range(10)), [5]])
+
+    assert embeddings == [[3.0, 0.0], [5.0, 0.0], [4.0, 0.0], [8.0, 0.0], [3.0, 0.0]]
+    # the longest texts are batched together, and truncated to the max length of the model
+    assert backend.batches == [[8, 5], [4, 3, 3]]
+
+
+def test_embed_texts_truncates_the_texts():
+    backend = LengthBackend()
+
+    assert backend.embed_texts(['abc', 'abcdefghij']) == [[5.0, 0.0], [8.0, 0.0]]
+
+
+def test_onnx_backend_mean_pools_and_normalizes(mocker: MockerFixture, tmp_path):
+    pytest.importorskip('onnxruntime')
+    transformers = mocker.Mock()
+    transformers.AutoTokenizer.from_pretrained.return_value = FakeTokenizer()
+    mocker.patch.dict('sys.modules', {'transformers': transformers})
+    (tmp_path / 'my_model.onnx').touch()
+    session = mocker.patch('onnxruntime.InferenceSession').return_value
+    session.run.return_value = [np.array([[[1.0, 0.0], [3.0, 4.0], [9.0, 9.0]],
+                                          [[0.0, 2.0], [0.0, 2.0], [0.0, 2.0]]], dtype=np.float32)]
+
+    backend = OnnxBackend('my/model', threads=2, model_dir=str(tmp_path))
+    embeddings = backend.embed_batch(np.array([[1, 5, 0], [1, 5, 2]]), np.array([[1, 1, 0], [1, 1, 1]]))
+
+    # the padding token is ignored: mean of [1, 0] and [3, 4] is [2, 2]
+    np.testing.assert_allclose(embeddings, [[2 ** -0.5, 2 ** -0.5], [0.0, 1.0]], rtol=1e-6)
+    assert backend.max_seq_length == 8
+    assert session.run.call_args.args[1]['input_ids'].dtype == np.int64
+
+
+def test_onnx_backend_shared_weights(mocker: MockerFixture, tmp_path):
+    pytest.importorskip('onnxruntime')
+    transformers = mocker.Mock()
+    transformers.AutoTokenizer.from_pretrained.return_value = FakeTokenizer()
+    mocker.patch.dict('sys.modules', {'transformers': transformers})
+    (tmp_path / 'my_model.onnx').touch()
+    save_mock = mocker.patch('embeddings.backends.save_onnx_model_with_external_weights')
+    inference_session_mock = mocker.patch('onnxruntime.InferenceSession')
+
+    OnnxBackend('my/model', threads=2, model_dir=str(tmp_path), shared_weights=True)
+
+    save_mock.assert_called_once_with(str(tmp_path / 'my_model.onnx'), str(tmp_path / 'my_model.shared.onnx'))
+    model_path, session_options = inference_session_mock.call_args.args
+    assert model_path == str(tmp_path / 'my_model.shared.onnx')
+    assert session_options.get_session_config_entry('session.disable_prepacking') == '1'
+
+
+def test_save_onnx_model_with_external_weights(tmp_path):
+    onnx = pytest.importorskip('onnx')
+    onnxruntime = pytest.importorskip('onnxruntime')
+    from onnx import TensorProto, helper, numpy_helper
+    weights = numpy_helper.from_array(np.arange(4096, dtype=np.float32).reshape(64, 64), 'weights')
+    graph = helper.make_graph([helper.make_node('MatMul', ['x', 'weights'], ['y'])], 'graph',
+                              [helper.make_tensor_value_info('x', TensorProto.FLOAT, [None, 64])],
+                              [helper.make_tensor_value_info('y', TensorProto.FLOAT, [None, 64])], [weights])
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid('', 14)])
+    model.ir_version = 8
+    onnx.save(model, str(tmp_path / 'model.onnx'))
+
+    save_onnx_model_with_external_weights(str(tmp_path / 'model.onnx'), str(tmp_path / 'model.shared.onnx'))
+
+    assert (tmp_path / 'model.shared.onnx').stat().st_size < 1024
+    session = onnxruntime.InferenceSession(str(tmp_path / 'model.shared.onnx'), providers=['CPUExecutionProvider'])
+    x = np.ones((1, 64), dtype=np.float32)
+    np.testing.assert_allclose(session.run(None, {'x': x})[0], x @ numpy_helper.to_array(weights))
+
+
+def test_save_onnx_model_with_external_weights_saved_meanwhile(mocker: MockerFixture, tmp_path):
+    onnx = pytest.importorskip('onnx')
+    mocker.patch.object(onnx, 'load')
+    mocker.patch.object(onnx, 'save_model', side_effect=lambda model, path, location, **kwargs: [
+        (tmp_path / os.path.basename(path)).write_bytes(b'model'), (tmp_path / location).write_bytes(b'weights')])
+    # saved by another process meanwhile
+    (tmp_path / 'model.shared.onnx').write_bytes(b'other model')
+
+    save_onnx_model_with_external_weights(str(tmp_path / 'model.onnx'), str(tmp_path / 'model.shared.onnx'))
+
+    # the model of the other process is kept, and the weights saved by this one are removed
+    assert os.listdir(tmp_path) == ['model.shared.onnx']
+    assert (tmp_path / 'model.shared.onnx').read_bytes() == b'other model'
+
+
+def test_get_onnx_model_path(mocker: MockerFixture):
+    mocker.patch('config.Settings.EMBEDDING_ONNX_DIR', '/models')
+
+    assert get_onnx_model_path('intfloat/multilingual-e5-base', quantize=False) \
+           == '/models/intfloat_multilingual-e5-base.onnx'
+    assert get_onnx_model_path('intfloat/multilingual-e5-base', quantize=True) \
+           == '/models/intfloat_multilingual-e5-base.int8.onnx'
+    assert get_onnx_model_path('intfloat/multilingual-e5-base', quantize=True, shared_weights=True) \
+           == '/models/intfloat_multilingual-e5-base.int8.shared.onnx'
+
+
+def test_create_embedding_backend_unsupported(mocker: MockerFixture):
+    mocker.patch('config.Settings.EMBEDDING_BACKEND', 'unknown')
+
+    with pytest.raises(ValueError):
+        create_embedding_backend()
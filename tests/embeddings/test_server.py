@@ -0,0 +1,133 @@
+import os
+import stat
+import threading
+from multiprocessing.connection import Client
+
+import pytest
+from pytest_mock import MockerFixture
+
+from embeddings.server import EmbeddingServer, EmbeddingServerError, RemoteEmbeddingBackend, parse_address
+from tests.embeddings.test_backends import FakeTokenizer, LengthBackend
+
+
+@pytest.fixture()
+def server(tmp_path):
+    server = EmbeddingServer(LengthBackend(), str(tmp_path / 'embeddings.sock'), authkey='secret', max_batch_wait=0.1)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    thread.join(timeout=5)
+
+
+def test_parse_address():
+    assert parse_address('/tmp/embeddings.sock') == ('/tmp/embeddings.sock', 'AF_UNIX')
+    assert parse_address('localhost:9000', 'secret') == (('localhost', 9000), 'AF_INET')
+    assert parse_address(':9000', 'secret') == (('localhost', 9000), 'AF_INET')
+    assert parse_address('127.0.0.1:9000', 'secret') == (('127.0.0.1', 9000), 'AF_INET')
+    # the requests are pickled: TCP requires an authkey, and only on the loopback interface
+    with pytest.raises(ValueError, match='authkey'):
+        parse_address('localhost:9000')
+    with pytest.raises(ValueError, match='loopback'):
+        parse_address('0.0.0.0:9000', 'secret')
+    with pytest.raises(ValueError, match='loopback'):
+        parse_address('example.com:9000', 'secret')
+
+
+def test_server_socket_is_only_accessible_to_its_user(server: EmbeddingServer):
+    assert stat.S_IMODE(os.stat(server.address).st_mode) == 0o600
+
+
+def test_remote_backend_embeds_with_the_server(server: EmbeddingServer):
+    backend = RemoteEmbeddingBackend(server.address, authkey='secret', tokenizer=FakeTokenizer())
+
+    assert backend.model_name == 'model'
+    assert backend.max_seq_length == 8
+    # the texts are tokenized by the client, and truncated to the max length of the model
+    assert backend.embed_texts(['abc', 'abcdefghij']) == [[5.0, 0.0], [8.0, 0.0]]
+    assert backend.embed_token_ids([]) == []
+
+
+def test_server_batches_the_texts_of_all_the_callers(server: EmbeddingServer):
+    results = {}
+
+    def embed(name: str, token_ids):
+        backend = RemoteEmbeddingBackend(server.address, authkey='secret', tokenizer=FakeTokenizer())
+        results[name] = backend.embed_token_ids(token_ids)
+
+    threads = [threading.Thread(target=embed, args=('first', [[5], [5, 6]])),
+               threading.Thread(target=embed, args=('second', [[5, 6, 7]]))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+
+    assert results == {'first': [[3.0, 0.0], [4.0, 0.0]], 'second': [[5.0, 0.0]]}
+    # both requests were embedded at once
+    assert sorted(length for batch in server.backend.batches for length in batch) == [3, 4, 5]
+    assert len(server.backend.batches) == 1
+
+
+def test_server_errors_are_raised_by_the_client(server: EmbeddingServer, mocker: MockerFixture):
+    backend = RemoteEmbeddingBackend(server.address, authkey='secret', tokenizer=FakeTokenizer())
+    mocker.patch.object(server.backend, 'embed_batch', side_effect=RuntimeError('out of memory'))
+
+    with pytest.raises(EmbeddingServerError, match='out of memory'):
+        backend.embed_token_ids([[5]])
+
+
+def test_server_rejects_malformed_requests(server: EmbeddingServer):
+    address, family = parse_address(server.address, 'secret')
+    with Client(address, family, authkey=b'secret') as connection:
+        connection.send(('embed', None))
+        succeeded, error = connection.recv()
+
+    assert not succeeded
+    assert 'lists of ints' in error
+    # the server keeps serving
+    backend = RemoteEmbeddingBackend(server.address, authkey='secret', tokenizer=FakeTokenizer())
+    assert backend.embed_token_ids([[5]]) == [[3.0, 0.0]]
+
+
+def test_server_failure_only_fails_its_request(server: EmbeddingServer, mocker: MockerFixture):
+    embed_batch = server.backend.embed_batch
+
+    def fail_on_token_9(input_ids, attention_mask):
+        if (input_ids == 9).any():
+            raise IndexError('index out of range in self')
+        return embed_batch(input_ids, attention_mask)
+
+    mocker.patch.object(server.backend, 'embed_batch', side_effect=fail_on_token_9)
+    results = {}
+
+    def embed(name: str, token_ids):
+        backend = RemoteEmbeddingBackend(server.address, authkey='secret', tokenizer=FakeTokenizer())
+        try:
+            results[name] = backend.embed_token_ids(token_ids)
+        except EmbeddingServerError as e:
+            results[name] = e
+
+    threads = [threading.Thread(target=embed, args=('valid', [[5], [5, 6]])),
+               threading.Thread(target=embed, args=('invalid', [[9]]))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+
+    assert results['valid'] == [[3.0, 0.0], [4.0, 0.0]]
+    assert 'out of range' in str(results['invalid'])
+
+
+def test_remote_backend_request_timeout(server: EmbeddingServer, mocker: MockerFixture):
+    backend = RemoteEmbeddingBackend(server.address, authkey='secret', tokenizer=FakeTokenizer(), request_timeout=0.1)
+    embedded = threading.Event()
+    mocker.patch.object(server.backend, 'embed_batch', side_effect=lambda *args: embedded.wait(5))
+
+    with pytest.raises(EmbeddingServerError, match='did not respond'):
+        backend.embed_token_ids([[5]])
+    embedded.set()
+
+
+def test_remote_backend_unreachable_server(tmp_path):
+    with pytest.raises(EmbeddingServerError):
+        RemoteEmbeddingBackend(str(tmp_path / 'missing.sock'), tokenizer=FakeTokenizer(), connect_timeout=0)
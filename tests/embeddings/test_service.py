@@ -0,0 +1,76 @@
+import threading
+
+from langchain.schema import Document
+from pytest_mock import MockerFixture
+
+from chunking.service import TokenizedChunk
+from embeddings.server import EmbeddingServerError
+from embeddings.service import EmbeddingModelHealthIndicator, embed_chunks, start_embedding_model_warm_up
+from health.constants import HealthStatus
+
+
+def test_embed_chunks_reuses_token_ids(mocker: MockerFixture):
+    embed_token_ids_mock = mocker.patch('embeddings.service.embed_token_ids', return_value=[[1.0], [2.0]])
+    embed_texts_mock = mocker.patch('embeddings.service.embed_texts')
+    chunks = [TokenizedChunk(page_content='passage: one', token_ids=[5, 1]),
+              TokenizedChunk(page_content='passage: two', token_ids=[5, 2])]
+
+    assert embed_chunks(chunks) == [[1.0], [2.0]]
+
+    embed_token_ids_mock.assert_called_once_with([[5, 1], [5, 2]])
+    embed_texts_mock.assert_not_called()
+
+
+def test_embed_chunks_without_token_ids(mocker: MockerFixture):
+    embed_token_ids_mock = mocker.patch('embeddings.service.embed_token_ids')
+    embed_texts_mock = mocker.patch('embeddings.service.embed_texts', side_effect=lambda texts: [[1.0] for _ in texts])
+
+    assert embed_chunks([Document(page_content='passage: one'), TokenizedChunk(page_content='passage: two')]) \
+           == [[1.0], [1.0]]
+
+    embed_texts_mock.assert_called_once_with(['passage: one', 'passage: two'])
+    embed_token_ids_mock.assert_not_called()
+
+
+def test_embedding_model_not_ready_until_warmed_up(mocker: MockerFixture):
+    mocker.patch('embeddings.service._embedding_model_ready', new=threading.Event())
+    mocker.patch('embeddings.service.get_embedding_backend')
+    mocker.patch('chunking.service.get_token_chunker')
+    loading = threading.Event()
+    embed_texts_mock = mocker.patch('embeddings.service.embed_texts', side_effect=lambda texts: loading.wait(5))
+
+    thread = start_embedding_model_warm_up()
+    assert EmbeddingModelHealthIndicator().get_health().status is HealthStatus.DOWN
+    loading.set()
+    thread.join(timeout=5)
+
+    assert EmbeddingModelHealthIndicator().get_health().status is HealthStatus.UP
+    embed_texts_mock.assert_called_once()
+
+
+def test_embedding_model_ready_once_loading_failures_are_retried(mocker: MockerFixture):
+    mocker.patch('embeddings.service._embedding_model_ready', new=threading.Event())
+    mocker.patch('embeddings.service.WARM_UP_RETRY_BACKOFF', 0.01)
+    health_while_failing = []
+    sleep_mock = mocker.patch(
+        'embeddings.service.time.sleep',
+        side_effect=lambda backoff: health_while_failing.append(EmbeddingModelHealthIndicator().get_health().status))
+    mocker.patch('chunking.service.get_token_chunker')
+    mocker.patch('embeddings.service.embed_texts')
+    get_embedding_backend_mock = mocker.patch(
+        'embeddings.service.get_embedding_backend',
+        side_effect=[OSError('model download failed'), EmbeddingServerError('unreachable'), mocker.Mock()])
+
+    start_embedding_model_warm_up().join(timeout=5)
+
+    assert health_while_failing == [HealthStatus.DOWN, HealthStatus.DOWN]
+    assert EmbeddingModelHealthIndicator().get_health().status is HealthStatus.UP
+    assert get_embedding_backend_mock.call_count == 3
+    assert sleep_mock.call_args_list == [mocker.call(0.01), mocker.call(0.02)]
+
+
+def test_embedding_model_ready_without_warm_up(mocker: MockerFixture):
+    mocker.patch('embeddings.service._embedding_model_ready', new=threading.Event())
+    mocker.patch('config.Settings.EMBEDDING_WARM_UP', False)
+
+    assert EmbeddingModelHealthIndicator().get_health().status is HealthStatus.UP
@@ -0,0 +1,135 @@
+import pytest
+from langchain.schema import Document
+from pytest_mock import MockerFixture
+
+from indexing.deduplication import ChunkDeduplicator, DuplicateIndex, clear_vector_caches, fingerprint_text
+from opensearch.client import OpenSearchClient
+
+DISCLAIMER = ('passage: This knowledge article is provided as is without warranty of any kind. The company disclaims'
+              ' all warranties, either express or implied, including the warranties of merchantability and fitness'
+              ' for a particular purpose. In no event shall the company be liable for any damages whatsoever.')
+
+
+@pytest.fixture(autouse=True)
+def vector_caches():
+    clear_vector_caches()
+    yield
+    clear_vector_caches()
+
+
+@pytest.fixture
+def embed_texts_mock(mocker: MockerFixture):
+    return mocker.patch('embeddings.service.embed_texts',
+                        side_effect=lambda texts: [[float(len(text))] for text in texts])
+
+
+@pytest.fixture
+def open_search(mocker: MockerFixture):
+    open_search = mocker.Mock(OpenSearchClient)
+    open_search.get_embeddings_by_content_hash.return_value = {}
+    return open_search
+
+
+def chunk(text: str, doc_id: str = 'A') -> Document:
+    return Document(page_content=text, metadata={'doc_id': doc_id})
+
+
+def test_fingerprint_text():
+    fingerprint = fingerprint_text(DISCLAIMER)
+
+    assert fingerprint.content_hash == fingerprint_text(DISCLAIMER.replace(' ', '  \n')).content_hash
+    assert fingerprint.content_hash != fingerprint_text(DISCLAIMER.lower()).content_hash
+    assert fingerprint.similarity(fingerprint_text(DISCLAIMER.lower())) == 1.0
+    assert fingerprint.similarity(fingerprint_text(DISCLAIMER.replace('damages', 'losses'))) > 0.8
+    assert fingerprint.similarity(fingerprint_text('passage: How to reset the password of an account')) < 0.1
+    assert fingerprint_text('').signature.shape == fingerprint.signature.shape
+
+
+def test_duplicate_index():
+    index = DuplicateIndex(near_duplicate_threshold=0.8, max_entries=2)
+    index.add(fingerprint_text(DISCLAIMER), 'disclaimer')
+    index.add(fingerprint_text('passage: first article'), 'first')
+
+    assert index.find(fingerprint_text(DISCLAIMER)) == ('exact', 'disclaimer')
+    assert index.find(fingerprint_text(DISCLAIMER.replace('damages', 'losses'))) == ('near', 'disclaimer')
+    assert index.find(fingerprint_text('passage: unrelated text about printers')) is None
+
+    # the least recently used chunk is forgotten
+    index.add(fingerprint_text('passage: second article'), 'second')
+    assert len(index) == 2
+    assert index.find(fingerprint_text('passage: first article')) is None
+    assert index.find(fingerprint_text(DISCLAIMER)) == ('exact', 'disclaimer')
+
+
+def test_deduplicator_reuses_vectors(mocker: MockerFixture, embed_texts_mock, open_search):
+    mocker.patch('config.Settings.CHUNK_DEDUPLICATION', 'reuse')
+    mocker.patch('config.Settings.CHUNK_NEAR_DUPLICATE_THRESHOLD', 0.9)
+    deduplicator = ChunkDeduplicator(open_search, 'RKM')
+    chunks = [chunk('passage: first article'), chunk(DISCLAIMER), chunk(DISCLAIMER.replace('damages', 'losses'))]
+
+    stored_chunks, embeddings = deduplicator.embed(chunks)
+
+    assert stored_chunks == chunks
+    assert embeddings == [[22.0], [float(len(DISCLAIMER))], [float(len(DISCLAIMER))]]
+    embed_texts_mock.assert_called_once_with(['passage: first article', DISCLAIMER])
+    assert chunks[1].metadata['content_hash'] == fingerprint_text(DISCLAIMER).content_hash
+
+    # another document of the datasource, in another call
+    stored_chunks, embeddings = ChunkDeduplicator(open_search, 'RKM').embed([chunk(DISCLAIMER, doc_id='B')])
+
+    assert len(stored_chunks) == 1
+    assert embeddings == [[float(len(DISCLAIMER))]]
+    assert embed_texts_mock.call_count == 1
+
+
+def test_deduplicator_skips_duplicates_of_the_same_call(mocker: MockerFixture, embed_texts_mock, open_search):
+    mocker.patch('config.Settings.CHUNK_DEDUPLICATION', 'skip')
+    mocker.patch('config.Settings.CHUNK_NEAR_DUPLICATE_THRESHOLD', 0.9)
+    deduplicator = ChunkDeduplicator(open_search, 'RKM')
+
+    first_batch = deduplicator.embed([chunk(DISCLAIMER), chunk('passage: first article'), chunk(DISCLAIMER)])
+    second_batch = deduplicator.embed([chunk(DISCLAIMER.replace('damages', 'losses'))])
+
+    assert [stored_chunk.page_content for stored_chunk in first_batch[0]] == [DISCLAIMER, 'passage: first article']
+    assert len(first_batch[1]) == 2
+    assert second_batch == ([], [])
+
+    # the duplicates of the chunks of another call are stored, with the vector of their original
+    other_call = ChunkDeduplicator(open_search, 'RKM').embed([chunk(DISCLAIMER, doc_id='B')])
+    assert other_call[1] == [[float(len(DISCLAIMER))]]
+    assert embed_texts_mock.call_count == 1
+
+
+def test_deduplicator_only_reuses_vectors_of_exact_duplicates_by_default(embed_texts_mock, open_search):
+    near_duplicate = DISCLAIMER.replace('shall', 'shall not')
+
+    _, embeddings = ChunkDeduplicator(open_search, 'RKM').embed([chunk(DISCLAIMER), chunk(near_duplicate),
+                                                                 chunk(DISCLAIMER)])
+
+    assert embeddings == [[float(len(DISCLAIMER))], [float(len(near_duplicate))], [float(len(DISCLAIMER))]]
+    # the near duplicate (similarity above 0.9) may mean otherwise: it gets its own vector
+    embed_texts_mock.assert_called_once_with([DISCLAIMER, near_duplicate])
+
+
+def test_deduplicator_reuses_indexed_vectors(mocker: MockerFixture, embed_texts_mock, open_search):
+    mocker.patch('config.Settings.EMBEDDING_MODEL', 'model')
+    mocker.patch('config.Settings.EMBEDDING_BACKEND', 'onnx')
+    mocker.patch('config.Settings.EMBEDDING_ONNX_QUANTIZE', True)
+    disclaimer_hash = fingerprint_text(DISCLAIMER).content_hash
+    open_search.get_embeddings_by_content_hash.return_value = {disclaimer_hash: [0.5]}
+
+    stored_chunks, embeddings = ChunkDeduplicator(open_search, 'RKM').embed([chunk(DISCLAIMER),
+                                                                             chunk('passage: first article')])
+
+    assert embeddings == [[0.5], [22.0]]
+    open_search.get_embeddings_by_content_hash.assert_called_once_with(
+        'RKM', {disclaimer_hash, fingerprint_text('passage: first article').content_hash}, 'model onnx-int8')
+    assert stored_chunks[0].metadata['embedding_model'] == 'model onnx-int8'
+    embed_texts_mock.assert_called_once_with(['passage: first article'])
+
+
+def test_deduplicator_scopes_vectors_by_datasource(embed_texts_mock, open_search):
+    ChunkDeduplicator(open_search, 'RKM').embed([chunk(DISCLAIMER)])
+    ChunkDeduplicator(open_search, 'HKM').embed([chunk(DISCLAIMER)])
+
+    assert embed_texts_mock.call_count == 2
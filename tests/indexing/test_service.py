@@ -1,15 +1,14 @@
-from langchain.embeddings import SentenceTransformerEmbeddings
 from langchain.schema import Document
 from opensearchpy.exceptions import NotFoundError
 import pytest
 from pytest_mock.plugin import MockerFixture
 
-from embeddings.service import embeddings_function
+from chunking.service import TokenChunker, TokenizedChunk
 from jobs.constants import Datasource, JobType
 from jobs.models import Job, JobStep
 from jobs.service import JobQueue, DeleteDocBy, FeatureService
 from indexing.service import IndexingJobChain
-from opensearch.client import OpenSearchClient, get_open_search_url
+from opensearch.client import OpenSearchClient
 
 
 def test_amend_chunks_metadata(mocker):
@@ -250,10 +249,7 @@ def test_delete_chunks_documents_without_doc_id(mocker: MockerFixture):
 def test_store_chunks(mocker: MockerFixture):
     embeddings = [[-0.010464120656251907], [1212121212]]
     datasource = 'TEST_DATASOURCE'
-    mocker.patch('config.Settings.OPENSEARCH_INDEX', 'TEST_OPENSEARCH_INDEX')
-    from_embeddings_mock = mocker.patch('langchain.vectorstores.OpenSearchVectorSearch.from_embeddings',
-                                        return_value=None)
-    mocker.patch.object(SentenceTransformerEmbeddings, "embed_documents", return_value=embeddings)
+    open_search = mocker.Mock(OpenSearchClient)
     job_queue = mocker.Mock(JobQueue)
     feature_service = mocker.Mock(FeatureService)
     chain = IndexingJobChain(job_queue, feature_service)
@@ -261,17 +257,80 @@ def test_store_chunks(mocker: MockerFixture):
     chunks = [
         Document(
             page_content='chunk content 1',
-            metadata={'datasource': datasource, 'doc_id': 'TEST_DOC_A', 'doc_display_id': 'TEST_DOC_DISPLAY_A'})
+            metadata={'datasource': datasource, 'doc_id': 'TEST_DOC_A', 'doc_display_id': 'TEST_DOC_DISPLAY_A'}),
+        Document(page_content='chunk content 2', metadata={'datasource': datasource, 'doc_id': 'TEST_DOC_A'})
     ]
-    chain.store_chunks(job, chunks)
-    from_embeddings_mock.assert_called_once_with(embeddings,
-                                                 ['chunk content 1'],
-                                                 embeddings_function,
-                                                 metadatas=[{'datasource': 'TEST_DATASOURCE', 'doc_id': 'TEST_DOC_A',
-                                                             'doc_display_id': 'TEST_DOC_DISPLAY_A'}],
-                                                 bulk_size=3,
-                                                 opensearch_url=get_open_search_url(),
-                                                 http_compress=True,
-                                                 index_name="TEST_OPENSEARCH_INDEX",
-                                                 verify_certs=False
-                                                 )
+    chain.store_chunks(open_search, job, chunks, embeddings)
+    open_search.bulk_index_chunks.assert_called_once_with(
+        ['chunk content 1', 'chunk content 2'],
+        embeddings,
+        [{'datasource': 'TEST_DATASOURCE', 'doc_id': 'TEST_DOC_A', 'doc_display_id': 'TEST_DOC_DISPLAY_A'},
+         {'datasource': 'TEST_DATASOURCE', 'doc_id': 'TEST_DOC_A'}])
+
+
+def test_amend_chunks_metadata_prefixes_token_ids(mocker):
+    token_chunker = mocker.Mock(TokenChunker, prefix_token_ids=[7, 8])
+    mocker.patch('indexing.service.get_token_chunker', return_value=token_chunker)
+    chain = IndexingJobChain(mocker.Mock(JobQueue), mocker.Mock(FeatureService))
+    chunks = [TokenizedChunk(page_content='page content', metadata={}, token_ids=[1, 2, 3])]
+
+    chain.amend_chunks_metadata(Job(Datasource.RKM), chunks)
+
+    assert chunks[0].page_content == 'passage: page content'
+    assert chunks[0].token_ids == [7, 8, 1, 2, 3]
+
+
+def test_generate_chunk_batches(mocker: MockerFixture):
+    mocker.patch('chunking.service.get_token_chunker', return_value=None)
+    mocker.patch('config.Settings.INDEXING_BATCH_SIZE', 2)
+    chain = IndexingJobChain(mocker.Mock(JobQueue), mocker.Mock(FeatureService))
+    job = Job(Datasource.RKM)
+    documents = (Document(page_content=f'page {page}', metadata={'page': page}) for page in range(5))
+
+    batches = list(chain.generate_chunk_batches(job, documents))
+
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+    chunks = [chunk for batch in batches for chunk in batch]
+    assert [chunk.metadata['chunk_id'] for chunk in chunks] == [0, 1, 2, 3, 4]
+    assert [chunk.page_content for chunk in chunks] == [f'passage: page {page}' for page in range(5)]
+
+
+def test_index_documents_streams_batches(mocker: MockerFixture):
+    mocker.patch('chunking.service.get_token_chunker', return_value=None)
+    mocker.patch('config.Settings.INDEXING_BATCH_SIZE', 2)
+    mocker.patch('config.Settings.INDEXING_MAX_IN_FLIGHT_BATCHES', 1)
+    open_search = mocker.MagicMock(OpenSearchClient)
+    open_search.__enter__.return_value = open_search
+    open_search.indices = mocker.Mock()
+    open_search.get_embeddings_by_content_hash.return_value = {}
+    mocker.patch('indexing.service.get_open_search_client', return_value=open_search)
+    embed_texts_mock = mocker.patch('embeddings.service.embed_texts', side_effect=lambda texts: [[1.0] for _ in texts])
+    events = []
+    delete_document_mock = mocker.patch(
+        'indexing.service.IndexingJobChain.delete_document',
+        side_effect=lambda client, datasource, key_field, key_value, connection_id: events.append(('delete', key_value)))
+    open_search.bulk_index_chunks.side_effect = lambda texts, embeddings, metadatas: events.append(
+        ('write', [metadata['doc_id'] for metadata in metadatas]))
+    feature_service = mocker.Mock(FeatureService)
+    feature_service.get_delete_doc_by.return_value = DeleteDocBy.BY_DOC_ID
+
+    chain = IndexingJobChain(mocker.Mock(JobQueue), feature_service)
+    job = Job(Datasource.RKM)
+    job_step = JobStep(JobType.LOAD, job.datasource)
+
+    def documents():
+        for doc_id, page_count in [('A', 3), ('B', 2)]:
+            for page in range(page_count):
+                yield Document(page_content=f'{doc_id} page {page}', metadata={'doc_id': doc_id})
+
+    chain.index_documents(job, job_step, documents())
+
+    # each document is deleted once, before its first chunk is written
+    assert delete_document_mock.call_count == 2
+    writes = [doc_ids for event, doc_ids in events if event == 'write']
+    assert writes == [['A', 'A'], ['A', 'B'], ['B']]
+    for doc_id in ['A', 'B']:
+        first_write = next(index for index, (event, value) in enumerate(events) if event == 'write' and doc_id in value)
+        assert events.index(('delete', doc_id)) < first_write
+    assert [len(call.args[0]) for call in embed_texts_mock.mock_calls] == [2, 2, 1]
+    open_search.indices.refresh.assert_called_once()
@@ -6,6 +6,7 @@ from connections.models import Connection
 from jobs.constants import JobStepStatus, JobType
 from jobs.models import Job, JobStep, JobStepWork, PollMoreWork
 from jobs.service import FeatureService, JobChain, JobQueue, JobRepository
+from utils.parser_sandbox import ParserLimitExceededError
 from workers.service import WorkerGroup
 
 
@@ -98,6 +99,27 @@ def test_handle_job_step_with_error(mocker: MockerFixture):
     assert 'error_during_handling' in job_repository.mark_job_step_as_error.mock_calls[0].args[1]
 
 
+def test_handle_job_step_with_parser_limit_exceeded(mocker: MockerFixture):
+    feature_service = mocker.Mock(FeatureService)
+    job_step_handler = mocker.patch(
+        'connections.rkm.crawler.crawl_rkm',
+        side_effect=ParserLimitExceededError('parsing exceeded the wall time limit of 300s'))
+    feature_service.get_handler.return_value = job_step_handler
+    job_repository = mocker.Mock(JobRepository)
+    job_repository.claim_job_step.side_effect = mock_claim_job_status
+    job_chain = mocker.Mock(JobChain)
+    connection = mocker.Mock(Connection)
+
+    job = Job('RKM', id='JOB_ID')
+    job_step = JobStep(JobType.CRAWL, 'RKM', id='JOB_STEP_ID', job_id=job.id)
+
+    job_queue = JobQueue(feature_service, job_repository, lambda a_job_queue: job_chain)
+    job_queue.handle_work(JobStepWork(job, job_step, connection))
+
+    job_repository.mark_job_step_as_error.assert_called_once_with(
+        job_step.id, 'ParserLimitExceededError: parsing exceeded the wall time limit of 300s')
+
+
 def test_handle_poll_more_with_no_pending_job_steps(mocker: MockerFixture):
     feature_service = mocker.Mock(FeatureService)
     job_chain = mocker.Mock(JobChain)
@@ -189,3 +211,24 @@ def test_handle_poll_more_with_a_full_batch(mocker: MockerFixture):
     assert submitted_works[2].job_id == job.id
     assert submitted_works[2].datasource == job.datasource
     assert submitted_works[2].after_display_id == job_step_2.display_id
+
+
+def test_handle_slow_job_step(mocker: MockerFixture):
+    mocker.patch.object(Settings, 'SLOW_JOB_STEP_SECONDS', 0)
+    mocker.patch.object(Settings, 'JOB_STEP_MEMORY_TRACKING', True)
+    warning_mock = mocker.patch('jobs.service.logger.warning')
+    feature_service = mocker.Mock(FeatureService)
+    feature_service.get_handler.return_value = mocker.patch('connections.rkm.crawler.crawl_rkm')
+    job_repository = mocker.Mock(JobRepository)
+    job_repository.claim_job_step.side_effect = mock_claim_job_status
+
+    job = Job('RKM', id='JOB_ID')
+    job_step = JobStep(JobType.CRAWL, 'RKM', id='JOB_STEP_ID', job_id=job.id)
+
+    job_queue = JobQueue(feature_service, job_repository, lambda a_job_queue: mocker.Mock(JobChain))
+    job_queue.handle_work(JobStepWork(job, job_step, mocker.Mock(Connection)))
+
+    warning_mock.assert_called_once()
+    assert warning_mock.mock_calls[0].kwargs['job_step'] == job_step
+    assert 'RSS' in str(warning_mock.mock_calls[0].kwargs['memory'])
+    job_repository.mark_job_step_as_done.assert_called_once_with(job_step.id)
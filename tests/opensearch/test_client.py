@@ -422,3 +422,74 @@ def test_ensure_mappings_called_when_index_already_exists(mocker: MockerFixture)
     client.indices.put_mapping.assert_called_once()
     assert client.indices.put_mapping.mock_calls[0].kwargs['index'] == Settings.OPENSEARCH_INDEX
     assert isinstance(client.indices.put_mapping.mock_calls[0].kwargs['body'], dict)
+
+
+def test_get_indexed_versions(mocker: MockerFixture):
+    mocker.patch('config.Settings.OPENSEARCH_INDEX', 'my-index')
+
+    client = OpenSearchClient()
+    client.transport = mocker.Mock(Transport)
+    client.transport.perform_request.return_value = {
+        'hits': {
+            'hits': [
+                {'_source': {'metadata': {'doc_id': 'att1', 'version': '3'}}},
+                {'_source': {'metadata': {'doc_id': 'att2', 'version': '1'}}},
+            ]
+        }
+    }
+
+    versions = client.get_indexed_versions('CNF', ['att1', 'att2', 'att3'], 'connection-1')
+
+    assert versions == {'att1': '3', 'att2': '1'}
+    perform_request_call = client.transport.perform_request.mock_calls[0]
+    assert perform_request_call.args[1] == '/my-index/_search'
+    body = perform_request_call.kwargs['body']
+    assert {'terms': {'metadata.doc_id': ['att1', 'att2', 'att3']}} in body['query']['bool']['must']
+    assert {'terms': {'metadata.connection_id': ['NONE', 'connection-1']}} in body['query']['bool']['must']
+    assert body['collapse'] == {'field': 'metadata.doc_id'}
+
+
+def test_get_indexed_versions_index_not_found(mocker: MockerFixture):
+    client = OpenSearchClient()
+    client.transport = mocker.Mock(Transport)
+    client.transport.perform_request.side_effect = NotFoundError(404, 'index_not_found_exception', {})
+
+    assert client.get_indexed_versions('CNF', ['att1']) == {}
+
+
+def test_get_embeddings_by_content_hash(mocker: MockerFixture):
+    mocker.patch('config.Settings.OPENSEARCH_INDEX', 'my-index')
+
+    client = OpenSearchClient()
+    client.transport = mocker.Mock(Transport)
+    client.transport.perform_request.return_value = {
+        'hits': {'hits': [{'_source': {'metadata': {'content_hash': 'hash1'}, 'vector_field': [0.1, 0.2]}}]}
+    }
+
+    embeddings = client.get_embeddings_by_content_hash('RKM', ['hash1', 'hash2'], 'model torch')
+
+    assert embeddings == {'hash1': [0.1, 0.2]}
+    body = client.transport.perform_request.mock_calls[0].kwargs['body']
+    assert {'terms': {'metadata.content_hash': ['hash1', 'hash2']}} in body['query']['bool']['must']
+    assert {'term': {'metadata.datasource': {'value': 'RKM'}}} in body['query']['bool']['must']
+    # the vectors of another model or backend aren't reused
+    assert {'term': {'metadata.embedding_model': {'value': 'model torch'}}} in body['query']['bool']['must']
+    assert body['collapse'] == {'field': 'metadata.content_hash'}
+    assert client.get_embeddings_by_content_hash('RKM', [], 'model torch') == {}
+
+
+def test_bulk_index_chunks(mocker: MockerFixture):
+    mocker.patch('config.Settings.OPENSEARCH_INDEX', 'my-index')
+    bulk_mock = mocker.patch('opensearch.client.bulk')
+
+    client = OpenSearchClient()
+    client.bulk_index_chunks(['text 1', 'text 2'], [[0.1], [0.2]], [{'doc_id': 'A'}, {'doc_id': 'B'}])
+
+    bulk_mock.assert_called_once()
+    assert bulk_mock.call_args.args[0] is client
+    actions = list(bulk_mock.call_args.args[1])
+    assert [(action['_index'], action['text'], action['vector_field'], action['metadata']) for action in actions] == [
+        ('my-index', 'text 1', [0.1], {'doc_id': 'A'}),
+        ('my-index', 'text 2', [0.2], {'doc_id': 'B'}),
+    ]
+    assert actions[0]['_id'] != actions[1]['_id']
@@ -0,0 +1,81 @@
+import tracemalloc
+
+import pytest
+
+from config import Settings
+from jobs.constants import JobType
+from jobs.models import JobStep
+from profiling.memory import JobStepMemory, dump_snapshot, start_tracing, stop_tracing, track_job_step_memory
+
+
+def test_track_job_step_memory_disabled():
+    with track_job_step_memory(JobStep(JobType.LOAD, 'RKM')) as memory:
+        pass
+
+    assert memory is None
+
+
+def test_track_job_step_memory(mocker):
+    mocker.patch.object(Settings, 'JOB_STEP_MEMORY_TRACKING', True)
+    mocker.patch.object(Settings, 'JOB_STEP_TRACEMALLOC_RATE', 1.0)
+
+    with track_job_step_memory(JobStep(JobType.LOAD, 'SHAREPOINT')) as memory:
+        allocated = [bytearray(1024 * 1024) for _ in range(4)]
+
+    assert not tracemalloc.is_tracing()
+    assert memory.rss_delta is not None
+    assert memory.scratch_delta == 0
+    assert memory.peak_heap >= 4 * 1024 * 1024
+    assert 'test_memory.py' in memory.top_allocations[0]
+    assert 'peak heap' in str(memory)
+    del allocated
+
+
+def test_job_step_memory_str():
+    memory = JobStepMemory(rss_delta=3 * 1024 * 1024, scratch_delta=0)
+
+    assert str(memory) == 'RSS +3.0 MiB, scratch space +0.0 MiB'
+
+
+def test_dump_snapshot(tmp_path):
+    assert dump_snapshot() is None
+
+    start_tracing()
+    try:
+        snapshot = dump_snapshot()
+    finally:
+        stop_tracing()
+
+    assert not tracemalloc.is_tracing()
+    path = tmp_path / 'memory.tracemalloc'
+    path.write_bytes(snapshot)
+    assert isinstance(tracemalloc.Snapshot.load(str(path)), tracemalloc.Snapshot)
+
+
+def test_job_step_peak_heap_starts_with_step(mocker):
+    mocker.patch.object(Settings, 'JOB_STEP_MEMORY_TRACKING', True)
+    mocker.patch.object(Settings, 'JOB_STEP_TRACEMALLOC_RATE', 1.0)
+    start_tracing()
+    try:
+        allocated = bytearray(64 * 1024 * 1024)
+        del allocated
+        with track_job_step_memory(JobStep(JobType.LOAD, 'RKM')) as memory:
+            pass
+    finally:
+        stop_tracing()
+
+    assert memory.peak_heap < 64 * 1024 * 1024
+
+
+@pytest.mark.parametrize('tracing', [True, False])
+def test_job_step_keeps_requested_tracing(mocker, tracing: bool):
+    mocker.patch.object(Settings, 'JOB_STEP_MEMORY_TRACKING', True)
+    mocker.patch.object(Settings, 'JOB_STEP_TRACEMALLOC_RATE', 1.0)
+    if tracing:
+        start_tracing()
+    try:
+        with track_job_step_memory(JobStep(JobType.LOAD, 'RKM')):
+            assert tracemalloc.is_tracing()
+        assert tracemalloc.is_tracing() == tracing
+    finally:
+        stop_tracing()
@@ -0,0 +1,74 @@
+import pytest
+from fastapi import FastAPI
+
+from config import Settings
+from jobs.constants import JobType
+from jobs.models import JobStep
+from profiling import service
+from profiling.router import memory_router, profiling_router
+from profiling.service import profile_job_step, stop_profiling
+
+
+@pytest.fixture
+def client(client_factory, mocker):
+    mocker.patch.object(Settings, 'ADMIN_TOKEN', 'secret')
+    app = FastAPI()
+    app.include_router(profiling_router)
+    app.include_router(memory_router)
+    yield client_factory(app)
+    stop_profiling()
+    service._active_session = service._last_session = None
+
+
+def test_profiling_requires_admin_token(client, mocker):
+    assert client.get('/admin/profiling/').status_code == 401
+    assert client.get('/admin/profiling/', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+
+    mocker.patch.object(Settings, 'ADMIN_TOKEN', None)
+    assert client.get('/admin/profiling/', headers={'Authorization': 'Bearer secret'}).status_code == 404
+
+
+def test_profiling(client):
+    headers = {'Authorization': 'Bearer secret'}
+
+    response = client.post('/admin/profiling/', json={'mode': 'cprofile', 'jobSteps': 1}, headers=headers)
+    assert response.status_code == 201
+    assert response.json()['active']
+    assert client.post('/admin/profiling/', json={'jobSteps': 1}, headers=headers).status_code == 409
+
+    with profile_job_step(JobStep(JobType.LOAD, 'RKM')):
+        sorted(range(1000))
+
+    response = client.get('/admin/profiling/', headers=headers)
+    assert response.json()['profiledJobSteps'] == 1
+    assert not response.json()['active']
+    response = client.get('/admin/profiling/result', params={'format': 'text'}, headers=headers)
+    assert response.status_code == 200
+    assert 'sorted' in response.text
+    assert client.get('/admin/profiling/result', params={'format': 'collapsed'}, headers=headers).status_code == 400
+
+
+def test_start_profiling_without_limit(client):
+    response = client.post('/admin/profiling/', json={'mode': 'sampling'}, headers={'Authorization': 'Bearer secret'})
+
+    assert response.status_code == 422
+
+
+def test_memory(client):
+    headers = {'Authorization': 'Bearer secret'}
+
+    response = client.get('/admin/memory/', headers=headers)
+    assert response.status_code == 200
+    assert not response.json()['tracing']
+    assert client.get('/admin/memory/snapshot', headers=headers).status_code == 409
+
+    assert client.put('/admin/memory/tracing', json={'frames': 5}, headers=headers).status_code == 204
+    try:
+        response = client.get('/admin/memory/', headers=headers)
+        assert response.json()['tracing']
+        assert response.json()['topAllocations']
+        response = client.get('/admin/memory/snapshot', headers=headers)
+        assert response.status_code == 200
+        assert response.headers['Content-Type'] == 'application/octet-stream'
+    finally:
+        assert client.delete('/admin/memory/tracing', headers=headers).status_code == 204
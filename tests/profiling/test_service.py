@@ -0,0 +1,85 @@
+import marshal
+import time
+
+import pytest
+
+from jobs.constants import JobType
+from jobs.models import JobStep
+from profiling import service
+from profiling.service import ProfilingMode, ProfilingSessionError, get_profiling_session, profile_job_step, \
+    start_profiling, stop_profiling
+
+
+@pytest.fixture(autouse=True)
+def reset_sessions():
+    yield
+    stop_profiling()
+    service._active_session = service._last_session = None
+
+
+def busy_step(seconds: float):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def test_profile_job_step_when_not_profiling():
+    with profile_job_step(JobStep(JobType.LOAD, 'RKM')):
+        pass
+
+    assert get_profiling_session() is None
+
+
+def test_sampling_next_job_steps():
+    session = start_profiling(ProfilingMode.SAMPLING, max_job_steps=1, interval=0.001)
+
+    with profile_job_step(JobStep(JobType.LOAD, 'RKM')):
+        busy_step(0.2)
+    with profile_job_step(JobStep(JobType.LOAD, 'RKM')):  # not profiled
+        pass
+
+    assert not session.active
+    assert session.profiled_job_steps == 1
+    stacks = session.get_collapsed_stacks().splitlines()
+    assert stacks
+    stack, count = stacks[0].rsplit(' ', 1)
+    assert stack.startswith('RKM LOAD;')
+    assert 'busy_step' in stack
+    assert int(count) > 0
+
+
+def test_cprofile_datasource():
+    session = start_profiling(ProfilingMode.CPROFILE, max_job_steps=2, datasource='HKM')
+
+    with profile_job_step(JobStep(JobType.LOAD, 'RKM')):  # not profiled
+        busy_step(0.01)
+    for _ in range(2):
+        with profile_job_step(JobStep(JobType.LOAD, 'HKM')):
+            busy_step(0.01)
+
+    assert not session.active
+    assert session.profiled_job_steps == 2
+    assert any(function == 'busy_step' and call_count == 2
+               for (_, _, function), (call_count, *_) in marshal.loads(session.get_pstats()).items())
+    assert 'busy_step' in session.get_pstats_text()
+
+
+def test_start_profiling_while_active():
+    start_profiling(ProfilingMode.SAMPLING, duration=60)
+
+    with pytest.raises(ProfilingSessionError):
+        start_profiling(ProfilingMode.CPROFILE, max_job_steps=1)
+
+    stop_profiling()
+    assert start_profiling(ProfilingMode.CPROFILE, max_job_steps=1).active
+
+
+def test_profiling_duration_elapsed():
+    session = start_profiling(ProfilingMode.CPROFILE, duration=0.01)
+    time.sleep(0.02)
+
+    with profile_job_step(JobStep(JobType.LOAD, 'RKM')):
+        pass
+
+    assert not session.active
+    assert session.profiled_job_steps == 0
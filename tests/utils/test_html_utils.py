@@ -0,0 +1,87 @@
+import os
+import re
+
+import pytest
+
+from utils.html_utils import Html2textConverter, LxmlHtmlToTextConverter, get_html_to_text_converter
+
+pytest.importorskip('lxml')
+
+HTML_SAMPLES = [
+    '<p>Hello&nbsp;<b>world</b>, see <a href="https://example.com/kb">this article</a>.</p>',
+    '<div>Restart the service:<br>1. Stop it<br>2. Start it</div>',
+    '<ul><li>one</li><li>two<ol><li>two.one</li></ol></li></ul><p>after the list</p>',
+    '<table><tr><th>Field</th><th>Value</th></tr><tr><td>Status</td><td>Closed</td></tr></table>',
+    '<h2>Cause</h2><p>The <code>max_connections</code> parameter is too low &amp; connections are refused.</p>',
+    '<pre>line 1\n    indented line 2</pre><p>text <i>after</i> the code</p>',
+    '<html><head><title>not text</title><style>p {color: red}</style></head><body><p>body</p></body></html>',
+    '<p>An <a href="#anchor">internal link</a> and an image <img src="https://example.com/a.png" alt="diagram"></p>',
+    '<blockquote>quoted <b>text</b></blockquote><hr><p>ending</p>',
+    'plain text without markup',
+    '<p>unclosed paragraph<div>unclosed div',
+]
+
+
+def words(text: str):
+    """ The words of the text, in order, ignoring the markdown markup, the escapes and the line wrapping. """
+    return re.findall(r'\w+', text.replace('\\', ''))
+
+
+def load_test_data(filename):
+    with open(os.path.join(os.path.dirname(__file__), 'text_utils', filename), encoding='utf-8') as file:
+        return file.read()
+
+
+@pytest.mark.parametrize('html', HTML_SAMPLES + [load_test_data('test_data_html_to_markdown.html')])
+def test_lxml_converter_is_equivalent_to_html2text(html):
+    assert words(LxmlHtmlToTextConverter().convert(html)) == words(Html2textConverter().convert(html))
+
+
+def test_lxml_converter_writes_markdown():
+    markdown = LxmlHtmlToTextConverter().convert(load_test_data('test_data_html_to_markdown.html'))
+
+    assert markdown == (
+        '# HTML to Markdown Conversion\n\n'
+        'This is a paragraph with **bold text**, _italic text_, and a [link](https://example.com).\n\n'
+        '  * List item 1\n'
+        '  * List item 2\n'
+        '    * Nested item 1\n'
+        '    * Nested item 2\n'
+        '  * List item 3\n\n'
+        '  1. First ordered item\n'
+        '  2. Second ordered item\n\n'
+        '> This is a blockquote.\n\n'
+        '    function test() {\n'
+        '        console.log("notice the blank line before this function?");\n'
+        '    }\n\n'
+        '![Example Image](https://example.com/image.png)\n\n')
+
+
+@pytest.mark.parametrize('html,expected', [
+    ('', ''),
+    ('  ', ''),
+    ('<!-- comment only -->', ''),
+    ('<?xml version="1.0" encoding="utf-8"?><p>text</p>', 'text\n\n'),
+    ('Title  with\nspaces', 'Title with spaces\n\n'),
+])
+def test_lxml_converter_edge_cases(html, expected):
+    assert LxmlHtmlToTextConverter().convert(html) == expected
+
+
+def test_lxml_converter_convert_all_reuses_its_parser():
+    converter = LxmlHtmlToTextConverter()
+
+    assert converter.convert_all(['<p>first <b>unclosed', '<p>second</p>']) == ['first **unclosed**\n\n', 'second\n\n']
+
+
+def test_get_html_to_text_converter(mocker):
+    mocker.patch('config.Settings.HTML_TO_TEXT_BACKEND', 'auto')
+    assert isinstance(get_html_to_text_converter(), LxmlHtmlToTextConverter)
+    assert get_html_to_text_converter() is get_html_to_text_converter()
+    assert isinstance(get_html_to_text_converter('html2text'), Html2textConverter)
+
+    mocker.patch.object(LxmlHtmlToTextConverter, 'is_available', return_value=False)
+    assert isinstance(get_html_to_text_converter(), Html2textConverter)
+
+    with pytest.raises(ValueError):
+        get_html_to_text_converter('unknown')
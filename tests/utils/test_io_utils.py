@@ -0,0 +1,40 @@
+import os
+
+import pytest
+
+from utils.io_utils import ScratchSpace, ScratchSpaceQuotaExceededError, ScratchSpooledTemporaryFile
+
+
+def test_scratch_spooled_temporary_file_in_memory():
+    scratch_space = ScratchSpace(None, quota=10)
+
+    with ScratchSpooledTemporaryFile(scratch_space, max_size=100) as file:
+        file.write(b'a' * 100)
+        assert not file._rolled
+        assert scratch_space.used == 0
+
+
+def test_scratch_spooled_temporary_file_spilled_to_disk(tmp_path):
+    scratch_space = ScratchSpace(str(tmp_path), quota=1000)
+
+    with ScratchSpooledTemporaryFile(scratch_space, max_size=10) as file:
+        file.write(b'a' * 8)
+        file.write(b'b' * 8)
+        assert file._rolled
+        assert scratch_space.used == 16
+        file.seek(0)
+        assert file.read() == b'a' * 8 + b'b' * 8
+
+    assert scratch_space.used == 0
+    assert os.listdir(tmp_path) == []
+
+
+def test_scratch_spooled_temporary_file_quota_exceeded(tmp_path):
+    scratch_space = ScratchSpace(str(tmp_path), quota=20)
+
+    with ScratchSpooledTemporaryFile(scratch_space, max_size=10) as file:
+        file.write(b'a' * 15)
+        with pytest.raises(ScratchSpaceQuotaExceededError):
+            file.write(b'b' * 10)
+
+    assert scratch_space.used == 0
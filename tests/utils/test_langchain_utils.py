@@ -0,0 +1,61 @@
+import os
+import zipfile
+from io import BytesIO
+
+import pytest
+from pytest_mock import MockerFixture
+
+from utils.file_types_utils import ContentType
+from utils.langchain_utils import get_langchain_loader, load_documents
+
+
+def _read_test_data(filename: str) -> bytes:
+    with open(os.path.join(os.path.dirname(__file__), filename), mode='rb') as file:
+        return file.read()
+
+
+def _build_docx(text: str) -> bytes:
+    document_xml = ('<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"><w:body>'
+                    f'<w:p><w:r><w:t>{text}</w:t></w:r></w:p></w:body></w:document>')
+    output = BytesIO()
+    with zipfile.ZipFile(output, mode='w') as docx:
+        docx.writestr('word/document.xml', document_xml)
+    return output.getvalue()
+
+
+def test_load_documents_pdf():
+    documents = load_documents(ContentType.PDF, BytesIO(_read_test_data('test_data_hello.pdf')), source='hello.pdf')
+
+    assert len(documents) == 1
+    assert documents[0].page_content == 'Hello PDF'
+    assert documents[0].metadata == {'source': 'hello.pdf', 'page': 0}
+
+
+def test_load_documents_pdf_same_as_path_loader(mocker: MockerFixture):
+    mocker.patch('config.Settings.PDF_EXTRACTION_BACKEND', 'pypdf')
+    file_path = os.path.join(os.path.dirname(__file__), 'test_data_hello.pdf')
+    expected = get_langchain_loader(ContentType.PDF, file_path).load()
+
+    documents = load_documents(ContentType.PDF, BytesIO(_read_test_data('test_data_hello.pdf')), source=file_path)
+
+    assert documents == expected
+
+
+def test_load_documents_word():
+    documents = load_documents(ContentType.WORD, BytesIO(_build_docx('Hello Word')), source='hello.docx')
+
+    assert len(documents) == 1
+    assert documents[0].page_content.strip() == 'Hello Word'
+    assert documents[0].metadata == {'source': 'hello.docx'}
+
+
+def test_load_documents_text():
+    documents = load_documents(ContentType.TEXT_PLAIN, BytesIO('Hello téxt'.encode('utf-8')))
+
+    assert len(documents) == 1
+    assert documents[0].page_content == 'Hello téxt'
+
+
+def test_load_documents_unsupported_content_type():
+    with pytest.raises(ValueError):
+        load_documents('image/png', BytesIO(b''))
@@ -0,0 +1,43 @@
+import os
+
+import pytest
+
+from utils.memory_utils import MemoryUsage, get_max_rss, get_memory_usage, get_rss, parse_smaps_rollup
+
+SMAPS_ROLLUP = """55d0c1a00000-7ffd5c3f6000 ---p 00000000 00:00 0                          [rollup]
+Rss:              195584 kB
+Pss:              110592 kB
+Pss_Anon:          26624 kB
+Pss_File:          83968 kB
+Shared_Clean:     168960 kB
+Shared_Dirty:          0 kB
+Private_Clean:         0 kB
+Private_Dirty:     26624 kB
+Referenced:       195584 kB
+Anonymous:         26624 kB
+"""
+
+
+def test_parse_smaps_rollup():
+    memory_usage = parse_smaps_rollup(SMAPS_ROLLUP)
+
+    assert memory_usage == MemoryUsage(rss=191 * 1024 * 1024, pss=108 * 1024 * 1024, shared=165 * 1024 * 1024,
+                                       private=26 * 1024 * 1024)
+    assert str(memory_usage) == 'RSS 191 MiB, PSS 108 MiB, shared 165 MiB, private 26 MiB'
+
+
+@pytest.mark.skipif(not os.path.exists('/proc/self/statm'), reason='Linux only')
+def test_get_memory_usage():
+    memory_usage = get_memory_usage()
+
+    assert memory_usage.rss > 0
+
+
+@pytest.mark.skipif(not os.path.exists('/proc/self/statm'), reason='Linux only')
+def test_get_rss():
+    assert get_rss() > 0
+    assert get_max_rss() > 0
+
+
+def test_get_memory_usage_unavailable():
+    assert get_memory_usage(pid=-1) is None
@@ -0,0 +1,46 @@
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from prometheus_client import REGISTRY
+
+from utils.metrics_utils import count_stage_items, get_current_stage, get_job_step_labels, job_step_labels, \
+    measure_stage
+
+
+def get_sample(name: str, stage: str, datasource: str = 'RKM', job_type: str = 'LOAD') -> float:
+    return REGISTRY.get_sample_value(name, {'datasource': datasource, 'job_type': job_type, 'stage': stage}) or 0
+
+
+def test_measure_stage():
+    count = get_sample('job_step_stage_seconds_count', 'test_stage')
+
+    with job_step_labels('RKM', 'LOAD'):
+        with measure_stage('test_stage'):
+            assert get_current_stage() == 'test_stage'
+        count_stage_items('test_stage', 3)
+
+    assert get_current_stage() is None
+    assert get_job_step_labels() == ('none', 'none')
+    assert get_sample('job_step_stage_seconds_count', 'test_stage') == count + 1
+    assert get_sample('job_step_stage_items_total', 'test_stage') >= 3
+
+
+def test_measure_stage_with_error():
+    errors = get_sample('job_step_stage_errors_total', 'failing_stage', 'HKM', 'CRAWL')
+
+    @measure_stage('failing_stage')
+    def fail():
+        raise ValueError('failed')
+
+    with job_step_labels('HKM', 'CRAWL'), pytest.raises(ValueError):
+        fail()
+
+    assert get_sample('job_step_stage_errors_total', 'failing_stage', 'HKM', 'CRAWL') == errors + 1
+    assert get_current_stage() is None
+
+
+def test_job_step_labels_in_copied_context():
+    with job_step_labels('BWF', 'LOAD'), ThreadPoolExecutor(1) as executor:
+        assert executor.submit(contextvars.copy_context().run, get_job_step_labels).result() == ('BWF', 'LOAD')
+        assert executor.submit(get_job_step_labels).result() == ('none', 'none')
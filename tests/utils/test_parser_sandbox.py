@@ -0,0 +1,112 @@
+import os
+import signal
+import time
+
+import pytest
+from pytest_mock import MockerFixture
+
+from utils.parser_sandbox import ParserLimitExceededError, ParserSandbox, ParserSandboxError, run_parser
+
+
+def _add(a: int, b: int) -> int:
+    return a + b
+
+
+def _get_pid() -> int:
+    return os.getpid()
+
+
+def _fail():
+    raise ValueError('malformed file')
+
+
+def _sleep(seconds: float):
+    time.sleep(seconds)
+
+
+def _spin():
+    while True:
+        pass
+
+
+def _allocate(size: int):
+    data = bytearray(size)
+    time.sleep(5)
+    return len(data)
+
+
+def _crash():
+    os.kill(os.getpid(), signal.SIGKILL)
+
+
+@pytest.fixture
+def parser_sandbox():
+    parser_sandbox = ParserSandbox(processes=1, cpu_time_limit=1, wall_time_limit=3, rss_limit=512 * 1024 * 1024,
+                                   max_tasks_per_process=3)
+    yield parser_sandbox
+    parser_sandbox.shutdown()
+
+
+def test_run(parser_sandbox: ParserSandbox):
+    assert parser_sandbox.run(_add, 1, 2) == 3
+    assert parser_sandbox.run(_get_pid) != os.getpid()
+
+
+def test_run_reraises_parser_exception(parser_sandbox: ParserSandbox):
+    with pytest.raises(ValueError, match='malformed file'):
+        parser_sandbox.run(_fail)
+
+    # the process survives the exceptions of the parsers
+    assert parser_sandbox.run(_add, 1, 2) == 3
+
+
+def test_run_recycles_processes(parser_sandbox: ParserSandbox):
+    pids = [parser_sandbox.run(_get_pid) for _ in range(4)]
+
+    assert len(set(pids[:3])) == 1
+    assert pids[3] != pids[0]
+
+
+def test_run_wall_time_limit(parser_sandbox: ParserSandbox):
+    parser_sandbox.wall_time_limit = 0.5
+
+    with pytest.raises(ParserLimitExceededError, match='wall time limit of 0.5s'):
+        parser_sandbox.run(_sleep, 10)
+
+    # the process was replaced
+    assert parser_sandbox.run(_add, 1, 2) == 3
+
+
+def test_run_cpu_time_limit(parser_sandbox: ParserSandbox):
+    with pytest.raises(ParserLimitExceededError, match='CPU time limit of 1s'):
+        parser_sandbox.run(_spin)
+
+
+@pytest.mark.skipif(not os.path.exists('/proc/self/statm'), reason='requires /proc')
+def test_run_memory_limit(parser_sandbox: ParserSandbox):
+    parser_sandbox.rss_limit = 64 * 1024 * 1024
+
+    with pytest.raises(ParserLimitExceededError, match='memory limit of 64 MiB'):
+        parser_sandbox.run(_allocate, 128 * 1024 * 1024)
+
+
+def test_run_process_crash(parser_sandbox: ParserSandbox):
+    with pytest.raises(ParserSandboxError, match='died with exit code -9'):
+        parser_sandbox.run(_crash)
+
+    assert parser_sandbox.run(_add, 1, 2) == 3
+
+
+def test_run_replaces_a_process_that_died_while_idle(parser_sandbox: ParserSandbox):
+    pid = parser_sandbox.run(_get_pid)
+    os.kill(pid, signal.SIGKILL)
+    time.sleep(0.5)
+
+    assert parser_sandbox.run(_add, 1, 2) == 3
+    assert parser_sandbox.run(_get_pid) != pid
+
+
+def test_run_parser_without_sandbox(mocker: MockerFixture):
+    mocker.patch('config.Settings.PARSER_PROCESSES', 0)
+
+    assert run_parser(_get_pid) == os.getpid()
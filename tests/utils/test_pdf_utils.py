@@ -0,0 +1,116 @@
+import os
+from io import BytesIO
+
+import pypdf
+import pytest
+from pytest_mock import MockerFixture
+
+from utils.io_utils import scratch_space
+from utils.parser_sandbox import get_parser_sandbox, shutdown_parser_sandbox
+from utils.pdf_utils import PypdfTextExtractor, PymupdfTextExtractor, extract_pdf_pages, get_pdf_text_extractor
+
+
+def _read_hello_pdf() -> bytes:
+    with open(os.path.join(os.path.dirname(__file__), 'test_data_hello.pdf'), mode='rb') as file:
+        return file.read()
+
+
+def _build_pdf(page_count: int) -> bytes:
+    """ Builds a PDF repeating the page of `test_data_hello.pdf`. """
+    hello_page = pypdf.PdfReader(BytesIO(_read_hello_pdf())).pages[0]
+    pdf_writer = pypdf.PdfWriter()
+    for _ in range(page_count):
+        pdf_writer.add_page(hello_page)
+    output = BytesIO()
+    pdf_writer.write(output)
+    return output.getvalue()
+
+
+def test_get_pdf_text_extractor():
+    assert isinstance(get_pdf_text_extractor('pypdf'), PypdfTextExtractor)
+    assert isinstance(get_pdf_text_extractor('pymupdf'), PymupdfTextExtractor)
+
+
+def test_get_pdf_text_extractor_defaults_to_pypdf(mocker: MockerFixture):
+    # pymupdf is only used when selected, even when it is installed
+    mocker.patch.object(PymupdfTextExtractor, 'is_available', return_value=True)
+
+    assert isinstance(get_pdf_text_extractor(), PypdfTextExtractor)
+
+
+def test_get_pdf_text_extractor_unsupported():
+    with pytest.raises(ValueError):
+        get_pdf_text_extractor('unknown')
+
+
+def test_pypdf_extract_pages():
+    data = _build_pdf(3)
+    extractor = PypdfTextExtractor()
+
+    assert extractor.get_page_count(data) == 3
+    assert extractor.extract_pages(data, 1, 3) == ['Hello PDF', 'Hello PDF']
+
+
+def test_pymupdf_extract_pages():
+    pytest.importorskip('fitz')
+    data = _build_pdf(3)
+    extractor = PymupdfTextExtractor()
+
+    assert extractor.get_page_count(data) == 3
+    assert [text.strip() for text in extractor.extract_pages(data, 1, 3)] == ['Hello PDF', 'Hello PDF']
+
+
+def test_extract_pdf_pages_without_sandbox(mocker: MockerFixture):
+    mocker.patch('config.Settings.PARSER_PROCESSES', 0)
+    get_parser_sandbox_mock = mocker.patch('utils.pdf_utils.get_parser_sandbox')
+
+    assert extract_pdf_pages(_build_pdf(2), PypdfTextExtractor()) == ['Hello PDF', 'Hello PDF']
+    assert get_parser_sandbox_mock.call_count == 0
+
+
+def test_extract_pdf_pages_small_pdf_in_one_task(mocker: MockerFixture):
+    mocker.patch('config.Settings.PARSER_PROCESSES', 1)
+    mocker.patch('config.Settings.PDF_PARALLEL_MIN_PAGES', 10)
+
+    try:
+        pages = extract_pdf_pages(_build_pdf(2), PypdfTextExtractor())
+    finally:
+        shutdown_parser_sandbox()
+
+    assert pages == ['Hello PDF', 'Hello PDF']
+
+
+def test_extract_pdf_pages_in_parallel(mocker: MockerFixture):
+    mocker.patch('config.Settings.PARSER_PROCESSES', 2)
+    mocker.patch('config.Settings.PDF_PARALLEL_MIN_PAGES', 2)
+    mocker.patch('config.Settings.PDF_PAGES_PER_TASK', 2)
+    data = _build_pdf(5)
+    extractor = PypdfTextExtractor()
+
+    try:
+        pages = extract_pdf_pages(data, extractor)
+    finally:
+        shutdown_parser_sandbox()
+
+    assert pages == extractor.extract_pages(data, 0, 5)
+
+
+def test_extract_pdf_pages_from_a_scratch_file(mocker: MockerFixture, tmp_path):
+    mocker.patch('config.Settings.PARSER_PROCESSES', 1)
+    mocker.patch('config.Settings.PDF_PARALLEL_MIN_PAGES', 2)
+    mocker.patch('config.Settings.PDF_PAGES_PER_TASK', 2)
+    mocker.patch.object(scratch_space, 'directory', str(tmp_path))
+    parser_sandbox = get_parser_sandbox()
+    submit_spy = mocker.spy(parser_sandbox, 'submit')
+
+    try:
+        pages = extract_pdf_pages(BytesIO(_build_pdf(3)), PypdfTextExtractor())
+    finally:
+        shutdown_parser_sandbox()
+
+    assert pages == ['Hello PDF', 'Hello PDF', 'Hello PDF']
+    # the tasks get the path of the PDF rather than its content, which is removed once extracted
+    task_arguments = [call.args[1:] for call in submit_spy.call_args_list]
+    assert all(isinstance(argument, (str, int)) for arguments in task_arguments for argument in arguments)
+    assert list(tmp_path.iterdir()) == []
+    assert scratch_space.used == 0
@@ -1,12 +1,16 @@
 import typing
 
+import pytest
 from pytest_mock import MockerFixture
 import requests, requests.exceptions
 import responses
 from requests import ConnectionError, HTTPError, Response
+from prometheus_client import REGISTRY
 from requests.adapters import HTTPAdapter
 
-from utils.requests_utils import LoggingFilter, FilteringAdapter, AdapterFilter, AdapterFilterChain
+from utils.metrics_utils import job_step_labels, measure_stage
+from utils.requests_utils import LoggingFilter, FilteringAdapter, AdapterFilter, AdapterFilterChain, RetryBudget, \
+    RetryFilter, StageMetricsFilter
 
 
 class FakeFilter(AdapterFilter):
@@ -161,4 +165,102 @@ def test_logging_filter_with_other_error(mocker: MockerFixture):
     error_mock.assert_called_once()
     assert error_mock.mock_calls[0].kwargs['method'] == method
     assert error_mock.mock_calls[0].kwargs['url'] == url
-    assert 'unreachable host' in error_mock.mock_calls[0].kwargs['error']
\ No newline at end of file
+    assert 'unreachable host' in error_mock.mock_calls[0].kwargs['error']
+
+@responses.activate
+def test_stage_metrics_filter():
+    session = requests.Session()
+    session.mount('http://', FilteringAdapter(HTTPAdapter(), [StageMetricsFilter('fetch_stage')]))
+    url = 'http://example.com/'
+    responses.get(url, status=200, body='Hello!')
+    labels = {'datasource': 'RKM', 'job_type': 'LOAD', 'stage': 'fetch_stage'}
+
+    session.get(url)  # outside of job steps
+    assert REGISTRY.get_sample_value('job_step_stage_seconds_count', labels) is None
+
+    with job_step_labels('RKM', 'LOAD'):
+        session.get(url)
+        with measure_stage('other_stage'):
+            session.get(url)
+    assert REGISTRY.get_sample_value('job_step_stage_seconds_count', labels) == 1
+
+
+def retrying_session(retry_filter: RetryFilter) -> requests.Session:
+    session = requests.Session()
+    session.mount('http://', FilteringAdapter(HTTPAdapter(), [retry_filter]))
+    return session
+
+
+@responses.activate
+def test_retry_filter(mocker: MockerFixture):
+    sleep_mock = mocker.patch('utils.requests_utils.time.sleep')
+    url = 'http://example.com/'
+    responses.get(url, status=503)
+    responses.get(url, status=429, headers={'Retry-After': '2'})
+    responses.get(url, status=200, body='Hello!')
+    retries = REGISTRY.get_sample_value('http_retries_total', {'client': 'test', 'reason': '503'}) or 0
+
+    response = retrying_session(RetryFilter('test', max_retries=3, backoff=0.5, max_backoff=10)).get(url)
+
+    assert response.status_code == 200
+    assert len(responses.calls) == 3
+    assert 0 <= sleep_mock.mock_calls[0].args[0] <= 0.5
+    assert sleep_mock.mock_calls[1].args[0] == 2
+    assert REGISTRY.get_sample_value('http_retries_total', {'client': 'test', 'reason': '503'}) == retries + 1
+
+
+@responses.activate
+def test_retry_filter_gives_up(mocker: MockerFixture):
+    mocker.patch('utils.requests_utils.time.sleep')
+    url = 'http://example.com/'
+    responses.get(url, status=502)
+
+    response = retrying_session(RetryFilter('test', max_retries=2)).get(url)
+
+    assert response.status_code == 502
+    assert len(responses.calls) == 3
+
+
+@responses.activate
+def test_retry_filter_with_non_idempotent_method(mocker: MockerFixture):
+    sleep_mock = mocker.patch('utils.requests_utils.time.sleep')
+    url = 'http://example.com/'
+    responses.post(url, status=502)  # may have been processed
+    responses.post(url, status=503, headers={'Retry-After': '60'})  # longer than the max backoff
+    responses.post(url, status=503)  # not processed
+    responses.post(url, status=201)
+    session = retrying_session(RetryFilter('test', max_retries=3, max_backoff=30))
+
+    assert session.post(url, data=b'{}').status_code == 502
+    assert session.post(url, data=b'{}').status_code == 503
+    assert session.post(url, data=b'{}').status_code == 201
+    sleep_mock.assert_called_once()
+
+
+@responses.activate
+def test_retry_filter_with_connection_error(mocker: MockerFixture):
+    mocker.patch('utils.requests_utils.time.sleep')
+    url = 'http://example.com/'
+    responses.get(url, body=ConnectionError('connection reset'))
+    responses.get(url, status=200)
+
+    assert retrying_session(RetryFilter('test')).get(url).status_code == 200
+
+    responses.post(url, body=ConnectionError('connection reset'))  # may have been processed
+    with pytest.raises(ConnectionError):
+        retrying_session(RetryFilter('test')).post(url, data=b'{}')
+
+
+@responses.activate
+def test_retry_filter_without_budget(mocker: MockerFixture):
+    sleep_mock = mocker.patch('utils.requests_utils.time.sleep')
+    url = 'http://example.com/'
+    responses.get(url, status=503)
+    responses.get(url, status=200)
+    responses.get(url, status=503)
+    retry_budget = RetryBudget(ratio=0.5, min_per_second=0, max_retries=1)
+    session = retrying_session(RetryFilter('test', retry_budget=retry_budget))
+
+    assert session.get(url).status_code == 200  # spends the initial retry, and earns half of one
+    assert session.get(url).status_code == 503
+    sleep_mock.assert_called_once()
@@ -0,0 +1,87 @@
+import json
+
+import pytest
+import requests
+import responses
+from requests.adapters import HTTPAdapter
+
+from config import Settings
+from utils.requests_utils import FilteringAdapter, TracingFilter
+from utils.tracing_utils import FileSpanExporter, OtlpSpanExporter, Span, SpanKind, get_span_processor, \
+    start_span, trace_id_of
+
+
+@pytest.fixture
+def exported_spans(mocker):
+    mocker.patch.object(Settings, 'TRACING_EXPORTER', 'file')
+    spans = []
+    processor = get_span_processor()
+    mocker.patch.object(processor, 'on_end', side_effect=spans.append)
+    return spans
+
+
+def test_start_span_when_off():
+    with start_span('LOAD RKM', trace_id=trace_id_of('JOB_ID')) as span:
+        assert span is None
+
+
+def test_start_span(exported_spans):
+    with start_span('stage'):  # outside of a trace
+        pass
+    with start_span('LOAD RKM', trace_id=trace_id_of('JOB_ID'), **{'job.id': 'JOB_ID'}) as step_span:
+        with pytest.raises(ValueError), start_span('embedding'):
+            raise ValueError('failed')
+
+    stage_span, root_span = exported_spans
+    assert root_span is step_span
+    assert root_span.trace_id == trace_id_of('JOB_ID')
+    assert root_span.parent_span_id is None
+    assert root_span.attributes == {'job.id': 'JOB_ID'}
+    assert stage_span.trace_id == root_span.trace_id
+    assert stage_span.parent_span_id == root_span.span_id
+    assert stage_span.error == 'ValueError: failed'
+    assert root_span.start_time <= stage_span.start_time <= stage_span.end_time <= root_span.end_time
+
+
+@responses.activate
+def test_tracing_filter(exported_spans):
+    session = requests.Session()
+    session.mount('http://', FilteringAdapter(HTTPAdapter(), [TracingFilter()]))
+    url = 'http://example.com/'
+    responses.get(url, status=200, body='Hello!')
+
+    session.get(url)  # outside of a trace
+    with start_span('LOAD RKM', trace_id=trace_id_of('JOB_ID')) as step_span:
+        session.get(url)
+
+    assert 'traceparent' not in responses.calls[0].request.headers
+    http_span = exported_spans[0]
+    assert responses.calls[1].request.headers['traceparent'] == http_span.traceparent
+    assert http_span.parent_span_id == step_span.span_id
+    assert http_span.kind == SpanKind.CLIENT
+    assert http_span.attributes == {'http.method': 'GET', 'http.url': url, 'http.status_code': 200}
+
+
+def test_file_span_exporter(mocker, tmp_path):
+    mocker.patch.object(Settings, 'TRACING_FILE', str(tmp_path / 'traces.jsonl'))
+    span = Span('LOAD RKM', trace_id='0' * 32, span_id='1' * 16, start_time=1, end_time=2, attributes={'count': 3})
+
+    FileSpanExporter().export([span])
+
+    request = json.loads((tmp_path / 'traces.jsonl').read_text())
+    otlp_span = request['resourceSpans'][0]['scopeSpans'][0]['spans'][0]
+    assert otlp_span == {
+        'traceId': '0' * 32, 'spanId': '1' * 16, 'name': 'LOAD RKM', 'kind': 1, 'startTimeUnixNano': '1',
+        'endTimeUnixNano': '2', 'attributes': [{'key': 'count', 'value': {'intValue': '3'}}], 'status': {'code': 1}}
+
+
+@responses.activate
+def test_otlp_span_exporter():
+    responses.post(Settings.TRACING_OTLP_ENDPOINT, status=200, json={})
+    span = Span('LOAD RKM', trace_id='0' * 32, span_id='1' * 16, parent_span_id='2' * 16, error='ValueError')
+
+    OtlpSpanExporter().export([span])
+
+    otlp_span = json.loads(responses.calls[0].request.body)['resourceSpans'][0]['scopeSpans'][0]['spans'][0]
+    assert otlp_span['parentSpanId'] == '2' * 16
+    assert otlp_span['status'] == {'code': 2, 'message': 'ValueError'}
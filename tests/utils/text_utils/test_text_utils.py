@@ -2,6 +2,7 @@ import os
 
 import pytest
 
+from utils.text_utils import clean_text, clean_texts
 from utils.text_utils import is_blank
 from utils.text_utils import html_to_markdown
 from utils.text_utils import trim_plain_text
@@ -66,3 +67,20 @@ def test_trim_plain_text(markdown, plain_text):
     markdown_text = load_test_data(markdown)
     expected_plain_text = load_test_data(plain_text)
     assert trim_plain_text(markdown_text) == expected_plain_text
+
+
+@pytest.mark.parametrize('backend', ['html2text', 'lxml'])
+def test_clean_text(mocker, backend):
+    pytest.importorskip(backend)
+    mocker.patch('config.Settings.HTML_TO_TEXT_BACKEND', backend)
+
+    assert clean_text('  <p>Caf\u00e9 <b>menu</b></p>  ') == 'Cafe\u0301 **menu**'
+    assert clean_text('<p> </p>') is None
+    assert clean_text(None) is None
+
+
+def test_clean_texts(mocker):
+    pytest.importorskip('lxml')
+    mocker.patch('config.Settings.HTML_TO_TEXT_BACKEND', 'lxml')
+
+    assert clean_texts('<p>title</p>', None, '', '<ul><li>item</li></ul>') == ['title', None, None, '* item']